@@ -0,0 +1,181 @@
+"""
+Synthetic AESO API Payloads
+
+Generates JSON responses with the same shape as the real endpoints so the processing
+functions can be benchmarked without an API key or network access:
+
+    pool price      return / "Pool Price Report" / [hourly records]
+    merit order     return / data / [hour] / energy_blocks / [offer blocks]
+    metered volume  return / [participant] / asset_list / [asset] / metered_volume_list / [hourly records]
+    asset list      return / [assets]
+
+Values are strings like the real API. Times use a fixed MPT = UTC - 7h offset.
+Payloads are deterministic for a given seed.
+"""
+
+import os
+import json
+import datetime
+import numpy as np
+import pandas as pd
+
+IMPORT_EXPORT_MAP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                      'object_mapping', 'Import_Export_Map.csv')
+
+# Benchmark sizes in days
+SIZES = {'1d': 1, '7d': 7, '30d': 30, '365d': 365}
+
+MPT_OFFSET = datetime.timedelta(hours=7)
+GENERATOR_CLASSES = ['IPP', 'GENCO', 'SPP']
+LOAD_CLASSES = ['DISCO', 'LOAD', 'RETAILER']
+
+#------------------------------------------------------
+def _hours(start_date, days):
+    start = datetime.datetime.combine(pd.Timestamp(start_date).date(), datetime.time()) + MPT_OFFSET
+    return [start + datetime.timedelta(hours=h) for h in range(days * 24)]
+
+def _fmt(timestamp):
+    return timestamp.strftime('%Y-%m-%d %H:%M')
+
+def _envelope(payload):
+    return {'timestamp': '2025-01-01 00:00:00.000+0000', 'responseCode': '200', 'return': payload}
+#------------------------------------------------------
+def intertie_assets():
+    """
+    Active import/export assets from object_mapping/Import_Export_Map.csv
+
+    Returns:
+        DataFrame: ASSET_ID, ASSET_NAME, ASSET_TYPE, POOL_PARTICIPANT_NAME and POOL_PARTICIPANT_ID
+    """
+    df = pd.read_csv(IMPORT_EXPORT_MAP_FILE)
+    df = df[df['OPERATING_STATUS'] == 'Active']
+    return df[['ASSET_ID', 'ASSET_NAME', 'ASSET_TYPE', 'POOL_PARTICIPANT_NAME', 'POOL_PARTICIPANT_ID']].reset_index(drop=True)
+
+def generator_ids(count):
+    return [f'G{i:03d}' if i % 3 else f'S{i:03d}' for i in range(count)]
+#------------------------------------------------------
+def pool_price_payload(start_date, days, seed=0):
+    """
+    Historical_Pool_Price_Date_And_Range response covering `days` days from start_date
+    """
+    rng = np.random.default_rng(seed)
+    prices = np.round(rng.gamma(2.0, 40.0, days * 24), 2)
+    forecasts = np.round(prices * rng.normal(1.0, 0.15, len(prices)), 2)
+    records = []
+    for hour, price, forecast in zip(_hours(start_date, days), prices, forecasts):
+        records.append({
+            'begin_datetime_utc': _fmt(hour),
+            'begin_datetime_mpt': _fmt(hour - MPT_OFFSET),
+            'pool_price': f'{price:.2f}',
+            'forecast_pool_price': f'{forecast:.2f}',
+            'rolling_30day_avg': f'{prices.mean():.2f}',
+        })
+    return _envelope({'Pool Price Report': records})
+
+def merit_order_payload(day, assets=200, blocks_per_asset=5, seed=0):
+    """
+    Merit_Order_Data response for one day (24 hours x assets x blocks energy blocks)
+    """
+    rng = np.random.default_rng(seed + pd.Timestamp(day).dayofyear)
+    asset_ids = generator_ids(assets)
+    data = []
+    for hour in _hours(day, 1):
+        sizes = np.round(rng.uniform(1, 80, (assets, blocks_per_asset)), 1)
+        prices = np.sort(np.round(rng.gamma(1.5, 60, (assets, blocks_per_asset)), 2), axis=1)
+        blocks = []
+        for a, asset_id in enumerate(asset_ids):
+            from_mw = 0.0
+            for b in range(blocks_per_asset):
+                to_mw = from_mw + sizes[a, b]
+                dispatched = prices[a, b] < 80
+                blocks.append({
+                    'import_or_export': '',
+                    'asset_ID': asset_id,
+                    'block_number': str(b),
+                    'block_price': f'{prices[a, b]:.2f}',
+                    'from_MW': f'{from_mw:.1f}',
+                    'to_MW': f'{to_mw:.1f}',
+                    'block_size': f'{sizes[a, b]:.1f}',
+                    'available_MW': f'{sizes[a, b]:.1f}',
+                    'dispatched?': 'Y' if dispatched else 'N',
+                    'dispatched_MW': f'{sizes[a, b] if dispatched else 0:.1f}',
+                    'flexible?': 'N',
+                    'offer_control': f'Participant {a % 40}',
+                })
+                from_mw = to_mw
+        data.append({'begin_dateTime_utc': _fmt(hour), 'begin_dateTime_mpt': _fmt(hour - MPT_OFFSET), 'energy_blocks': blocks})
+    return _envelope({'data': data})
+
+def metered_volume_payload(day, generators=150, loads=50, seed=0):
+    """
+    Metered_Volume_Data response for one day
+
+    Includes every active intertie asset (as IMPORTER/EXPORTER) so the regional
+    import/export steps have matching asset IDs, plus generator and load assets.
+    """
+    rng = np.random.default_rng(seed + pd.Timestamp(day).dayofyear)
+    hours = _hours(day, 1)
+    assets = [(row.POOL_PARTICIPANT_ID, row.ASSET_ID, 'IMPORTER' if row.ASSET_TYPE == 'SOURCE' else 'EXPORTER')
+              for row in intertie_assets().itertuples()]
+    assets += [(f'P{i % 40:02d}', asset_id, GENERATOR_CLASSES[i % len(GENERATOR_CLASSES)])
+               for i, asset_id in enumerate(generator_ids(generators))]
+    assets += [(f'P{i % 40:02d}', f'L{i:03d}', LOAD_CLASSES[i % len(LOAD_CLASSES)]) for i in range(loads)]
+
+    participants = {}
+    for participant_id, asset_id, asset_class in assets:
+        volumes = np.round(rng.uniform(0, 300, len(hours)), 3)
+        if asset_class in ('IMPORTER', 'EXPORTER'):
+            volumes[rng.random(len(hours)) < 0.8] = 0
+        participants.setdefault(participant_id, []).append({
+            'asset_ID': asset_id,
+            'asset_class': asset_class,
+            'metered_volume_list': [
+                {'begin_date_utc': _fmt(hour), 'begin_date_mpt': _fmt(hour - MPT_OFFSET), 'metered_volume': f'{volume}'}
+                for hour, volume in zip(hours, volumes)
+            ],
+        })
+    return _envelope([{'pool_participant_ID': pid, 'asset_list': asset_list} for pid, asset_list in participants.items()])
+
+def asset_list_payload(generators=150, loads=50):
+    """
+    Asset_List response with the active intertie assets plus generator and load assets
+    """
+    records = [{
+        'asset_name': row.ASSET_NAME,
+        'asset_ID': row.ASSET_ID,
+        'asset_type': row.ASSET_TYPE,
+        'operating_status': 'Active',
+        'pool_participant_name': row.POOL_PARTICIPANT_NAME,
+        'pool_participant_ID': row.POOL_PARTICIPANT_ID,
+        'net_to_grid_asset_flag': '',
+        'asset_incl_storage_flag': '',
+    } for row in intertie_assets().itertuples()]
+    for i, asset_id in enumerate(generator_ids(generators)):
+        records.append({'asset_name': f'{asset_id} Generator', 'asset_ID': asset_id, 'asset_type': 'SOURCE',
+                        'operating_status': 'Active', 'pool_participant_name': f'Participant {i % 40}',
+                        'pool_participant_ID': f'P{i % 40:02d}', 'net_to_grid_asset_flag': 'Y', 'asset_incl_storage_flag': 'N'})
+    for i in range(loads):
+        records.append({'asset_name': f'L{i:03d} Load', 'asset_ID': f'L{i:03d}', 'asset_type': 'SINK',
+                        'operating_status': 'Active', 'pool_participant_name': f'Participant {i % 40}',
+                        'pool_participant_ID': f'P{i % 40:02d}', 'net_to_grid_asset_flag': '', 'asset_incl_storage_flag': ''})
+    return _envelope(records)
+
+def ail_demand_frame(start_date, days, seed=0):
+    """
+    Metered_Demand_{year}.csv contents for `days` days (input to the AIL/tie line merge)
+    """
+    rng = np.random.default_rng(seed)
+    hours = _hours(start_date, days)
+    load = np.round(rng.normal(10000, 800, len(hours)))
+    return pd.DataFrame({
+        'begin_datetime_utc': [_fmt(h) for h in hours],
+        'begin_datetime_mpt': [_fmt(h - MPT_OFFSET) for h in hours],
+        'alberta_internal_load': load,
+        'forecast_alberta_internal_load': np.round(load * rng.normal(1.0, 0.02, len(hours))),
+    })
+#------------------------------------------------------
+def to_response_str(payload):
+    """
+    Serialize a payload the way it arrives from urlopen().read().decode('utf-8')
+    """
+    return json.dumps(payload)
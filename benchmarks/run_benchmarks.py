@@ -0,0 +1,319 @@
+"""
+Benchmark Suite for the AESO Processing Functions
+
+Times the processing path of each endpoint on synthetic payloads (see benchmarks/payloads.py)
+at sizes from one day to one year and reports rows/sec and peak memory.
+
+Each (case, size) runs in its own Python process so peak RSS is measured per case.
+The network is replaced by replaying synthetic responses through handle_success(),
+so JSON decoding and preliminary_processing_data are still exercised. The payloads of
+every day are generated before the timed region starts.
+
+Usage:
+    python -m benchmarks.run_benchmarks                              # all cases, 1d/7d/30d
+    python -m benchmarks.run_benchmarks --sizes 1d 365d --cases normalize_pool_price
+    python -m benchmarks.run_benchmarks --output results.jsonl       # save results
+    python -m benchmarks.run_benchmarks --compare results.jsonl      # compare against a saved run
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import datetime
+import tempfile
+import subprocess
+import contextlib
+
+import pandas as pd
+
+from benchmarks import payloads
+
+BENCHMARK_YEAR = 2024
+DEFAULT_SIZES = ['1d', '7d', '30d']
+
+#------------------------------------------------------
+def _api_configs(output_folder):
+    from src.api_tools import build_api_request_context
+    from src.endpoint_registry import endpoint_registry
+    start_date = datetime.date(BENCHMARK_YEAR, 1, 1)
+    end_date = datetime.date(BENCHMARK_YEAR, 12, 31)
+    context = build_api_request_context('benchmark', 'http://localhost/', start_date, end_date, end_date,
+                                        str(start_date), str(end_date), None, 'ALL', 'ALL', output_folder)
+    return {spec.category_key: spec.resolve(context, run_option=False) for spec in endpoint_registry.endpoints('NEW_AESO')}
+
+class _Replay:
+    """
+    Stand-in for utilities.fetch_response that serves pre-generated synthetic responses for each requested day
+    """
+
+    def __init__(self, payload_for_day, days):
+        # Generated up front: the concurrent fetch threads would otherwise time the generation too
+        self.responses = {day: payloads.to_response_str(payload_for_day(day)) for day in days}
+        self.bytes = 0
+        self.rows = 0
+
+    def __call__(self, api_config, start_date, end_date):
+        response_str = self.responses[pd.Timestamp(start_date).date()]
+        self.bytes += len(response_str)
+        return 200, response_str
+
+    def process(self, api_config, response_status_code, response_str):
+        from src.utilities import handle_success
+        df = handle_success(api_config, response_status_code, response_str)
+        self.rows += len(df) if df is not None else 0
+        return df
+
+@contextlib.contextmanager
+def _replay_fetch(payload_for_day, start, end):
+    # fetch_data and src/fetch_pipeline.py both go through fetch_response/process_response
+    import src.utilities as utilities
+    replay = _Replay(payload_for_day, pd.date_range(start, end, freq='D').date)
+    originals = utilities.fetch_response, utilities.process_response
+    utilities.fetch_response, utilities.process_response = replay, replay.process
+    try:
+        yield replay
+    finally:
+        utilities.fetch_response, utilities.process_response = originals
+
+def _project_folder(workdir, days):
+    # Lay out <project>/object_mapping and <project>/output like the real project folder
+    os.makedirs(os.path.join(workdir, 'object_mapping'), exist_ok=True)
+    shutil.copy(payloads.IMPORT_EXPORT_MAP_FILE, os.path.join(workdir, 'object_mapping'))
+    output_folder = os.path.join(workdir, 'output')
+    for sub_folder in ['Asset List', 'Metered Volumes', 'Historical AIL Demand', 'temp']:
+        os.makedirs(os.path.join(output_folder, sub_folder), exist_ok=True)
+    asset_list = pd.DataFrame(payloads.asset_list_payload()['return'])
+    asset_list.columns = [col.upper() for col in asset_list.columns]
+    asset_list.to_csv(os.path.join(output_folder, 'Asset List', 'Asset_Lists.csv'), index=False)
+    payloads.ail_demand_frame(f'{BENCHMARK_YEAR}-01-01', days).to_csv(
+        os.path.join(output_folder, 'Historical AIL Demand', f'Metered_Demand_{BENCHMARK_YEAR}.csv'), index=False)
+    return output_folder
+
+def _dates(days):
+    start = pd.Timestamp(f'{BENCHMARK_YEAR}-01-01')
+    return start, start + pd.Timedelta(days=days - 1)
+
+def _run_metered_volume(workdir, days):
+    # Produces IMPORTER.csv/EXPORTER.csv etc. and runs the full regional import/export chain
+    import src.utilities as utilities
+    output_folder = _project_folder(workdir, days)
+    api_config = dict(_api_configs(output_folder + os.sep)['Metered_Volume_Data'], project_folder=workdir)
+    path = os.path.join(output_folder, 'Metered Volumes', f'metered_volumes_{BENCHMARK_YEAR}.csv')
+    start, end = _dates(days)
+    with _replay_fetch(payloads.metered_volume_payload, start, end) as replay, _timed() as timer:
+        utilities.final_processing_metered_volume_data(api_config, None, None, start, end, end, BENCHMARK_YEAR, path,
+                                                       True, False, None, None, None)
+    return replay.rows, replay, timer
+
+def _intertie_cells(output_folder):
+    # Number of long-format rows of the IMPORTER and EXPORTER matrices (hours x assets)
+    from src.metered_volume_store import SparseMeteredVolumes, sparse_path
+    sparse_volumes = SparseMeteredVolumes.load(sparse_path(output_folder, BENCHMARK_YEAR))
+    return sum(len(sparse_volumes.hours(cls)) * len(sparse_volumes.asset_keys(cls)) for cls in ['IMPORTER', 'EXPORTER'])
+#------------------------------------------------------
+# Benchmark cases. Each returns (rows, bytes, timer) and works inside `workdir`.
+
+def case_normalize_pool_price(workdir, days):
+    from src.utilities import handle_success
+    api_config = _api_configs(workdir + os.sep)['Historical_Pool_Price_Date_And_Range']
+    response_str = payloads.to_response_str(payloads.pool_price_payload(f'{BENCHMARK_YEAR}-01-01', days))
+    with _timed() as timer:
+        df = handle_success(api_config, 200, response_str)
+    return len(df), len(response_str), timer
+
+def case_normalize_merit_order(workdir, days):
+    from src.utilities import handle_success
+    api_config = _api_configs(workdir + os.sep)['Merit_Order_Data']
+    rows, size, elapsed = 0, 0, 0.0
+    for day in pd.date_range(f'{BENCHMARK_YEAR}-01-01', periods=days):
+        response_str = payloads.to_response_str(payloads.merit_order_payload(day))
+        with _timed() as timer:
+            df = handle_success(api_config, 200, response_str)
+        rows, size, elapsed = rows + len(df), size + len(response_str), elapsed + timer['wall_s']
+    return rows, size, {'wall_s': elapsed}
+
+def case_normalize_metered_volume(workdir, days):
+    from src.utilities import handle_success
+    api_config = _api_configs(workdir + os.sep)['Metered_Volume_Data']
+    rows, size, elapsed = 0, 0, 0.0
+    for day in pd.date_range(f'{BENCHMARK_YEAR}-01-01', periods=days):
+        response_str = payloads.to_response_str(payloads.metered_volume_payload(day))
+        with _timed() as timer:
+            df = handle_success(api_config, 200, response_str)
+        rows, size, elapsed = rows + len(df), size + len(response_str), elapsed + timer['wall_s']
+    return rows, size, {'wall_s': elapsed}
+
+def case_normalize_asset_list(workdir, days):
+    from src.utilities import handle_success
+    api_config = _api_configs(workdir + os.sep)['Asset_List']
+    response_str = payloads.to_response_str(payloads.asset_list_payload(generators=150 * days))
+    with _timed() as timer:
+        df = handle_success(api_config, 200, response_str)
+    return len(df), len(response_str), timer
+
+def case_final_processing_pool_price(workdir, days):
+    from src.utilities import handle_success, final_processing_historical_spot_price_specific_date_and_range
+    api_config = _api_configs(workdir + os.sep)['Historical_Pool_Price_Date_And_Range']
+    df = handle_success(api_config, 200, payloads.to_response_str(payloads.pool_price_payload(f'{BENCHMARK_YEAR}-01-01', days)))
+    path = os.path.join(workdir, 'Spot_Prices', f'pool_price_data_{BENCHMARK_YEAR}.csv')
+    start, end = _dates(days)
+    with _timed() as timer:
+        final_processing_historical_spot_price_specific_date_and_range(api_config, df, None, start, end, end, BENCHMARK_YEAR,
+                                                                       path, True, False, None, None, None)
+    return len(df), os.path.getsize(path), timer
+
+def case_final_processing_merit_order(workdir, days):
+    import src.utilities as utilities
+    api_config = _api_configs(workdir + os.sep)['Merit_Order_Data']
+    path = os.path.join(workdir, 'Merit Order Curves', f'merit_order_data_{BENCHMARK_YEAR}.csv')
+    start, end = _dates(days)
+    with _replay_fetch(payloads.merit_order_payload, start, end) as replay, _timed() as timer:
+        utilities.final_processing_merit_order_data(api_config, pd.DataFrame(), None, start, end, end, BENCHMARK_YEAR,
+                                                    path, True, False, None, None, None)
+    rows = sum(1 for _ in open(path)) - 1
+    return rows, replay.bytes, timer
+
+def case_final_processing_metered_volume(workdir, days):
+    rows, replay, timer = _run_metered_volume(workdir, days)
+    return rows, replay.bytes, timer
+
+def case_create_regional_import_export_file(workdir, days):
+    from src.utilities import create_regional_import_export_file
+    _run_metered_volume(workdir, days)
+    output_folder = os.path.join(workdir, 'output')
+    path = os.path.join(output_folder, 'Metered Volumes', f'metered_volumes_{BENCHMARK_YEAR}.csv')
+    start, end = _dates(days)
+    with _timed() as timer:
+        create_regional_import_export_file(path, start, end.date(), workdir)
+    rows = _intertie_cells(output_folder)
+    return rows, None, timer
+
+def case_aggregate_import_exports(workdir, days):
+    from src.aggregate_imports_and_exports import aggregate_import_exports
+    _run_metered_volume(workdir, days)
+    output_folder = os.path.join(workdir, 'output')
+    with _timed() as timer:
+        aggregate_import_exports(BENCHMARK_YEAR, output_folder)
+    rows = sum(len(pd.read_csv(os.path.join(output_folder, 'temp', f'{kind}_categorized_filtered_sorted_{BENCHMARK_YEAR}.csv')))
+               for kind in ['import', 'export'])
+    return rows, None, timer
+
+def case_combine_demand_with_tie_line_data(workdir, days):
+    from src.combine_ail_demand_exports_imports import combine_demand_with_tie_line_data
+    _run_metered_volume(workdir, days)
+    output_folder = os.path.join(workdir, 'output')
+    with _timed() as timer:
+        combine_demand_with_tie_line_data(BENCHMARK_YEAR, output_folder)
+    return days * 24, None, timer
+
+CASES = {
+    'normalize_pool_price': case_normalize_pool_price,
+    'normalize_merit_order': case_normalize_merit_order,
+    'normalize_metered_volume': case_normalize_metered_volume,
+    'normalize_asset_list': case_normalize_asset_list,
+    'final_processing_pool_price': case_final_processing_pool_price,
+    'final_processing_merit_order': case_final_processing_merit_order,
+    'final_processing_metered_volume': case_final_processing_metered_volume,
+    'create_regional_import_export_file': case_create_regional_import_export_file,
+    'aggregate_import_exports': case_aggregate_import_exports,
+    'combine_demand_with_tie_line_data': case_combine_demand_with_tie_line_data,
+}
+
+@contextlib.contextmanager
+def _timed():
+    timer = {}
+    started = time.perf_counter()
+    yield timer
+    timer['wall_s'] = time.perf_counter() - started
+#------------------------------------------------------
+def run_case(case, size):
+    """
+    Run one benchmark case in the current process
+
+    Args:
+        case: Name in CASES
+        size: Size label in payloads.SIZES
+
+    Returns:
+        dict: case, size, days, rows, bytes, wall_s, rows_per_s, peak_rss_mb
+    """
+    from src.instrumentation import peak_rss_mb
+    days = payloads.SIZES[size]
+    workdir = tempfile.mkdtemp(prefix='aeso_benchmark_')
+    try:
+        # The processing functions print their data frames; keep that off the console
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            rows, size_bytes, timer = CASES[case](workdir, days)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    wall_s = max(timer['wall_s'], 1e-9)
+    return {
+        'case': case,
+        'size': size,
+        'days': days,
+        'rows': int(rows),
+        'bytes': size_bytes,
+        'wall_s': round(wall_s, 4),
+        'rows_per_s': round(rows / wall_s, 1),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+def run_isolated(case, size):
+    command = [sys.executable, '-m', 'benchmarks.run_benchmarks', '--child', case, size]
+    completed = subprocess.run(command, capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'no output'
+        return {'case': case, 'size': size, 'error': error}
+    return json.loads(lines[-1])
+
+def print_results(results, baseline=None):
+    df = pd.DataFrame(results)
+    columns = [col for col in ['case', 'size', 'rows', 'wall_s', 'rows_per_s', 'peak_rss_mb', 'error'] if col in df.columns]
+    df = df[columns]
+    if baseline is not None and not baseline.empty:
+        baseline = baseline.set_index(['case', 'size'])
+        keys = list(zip(df['case'], df['size']))
+        df['baseline_rows_per_s'] = [baseline['rows_per_s'].get(key) for key in keys]
+        df['speedup'] = (df['rows_per_s'] / df['baseline_rows_per_s']).round(2)
+    print(df.to_string(index=False))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the AESO processing functions on synthetic payloads')
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=list(CASES))
+    parser.add_argument('--sizes', nargs='+', choices=list(payloads.SIZES), default=DEFAULT_SIZES)
+    parser.add_argument('--output', help='Append results as JSON lines to this file')
+    parser.add_argument('--compare', help='JSON lines file from a previous run to compare against')
+    parser.add_argument('--child', nargs=2, metavar=('CASE', 'SIZE'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_case(*args.child)))
+        return
+
+    results = []
+    run_id = datetime.datetime.now().strftime('%Y%m%dT%H%M%S')
+    for case in args.cases:
+        for size in args.sizes:
+            print(f"Running {case} [{size}]...")
+            result = dict(run_isolated(case, size), run_id=run_id)
+            results.append(result)
+
+    baseline = pd.read_json(args.compare, lines=True) if args.compare else None
+    if baseline is not None:
+        # Compare against the most recent run in the baseline file
+        baseline = baseline[baseline['run_id'] == baseline['run_id'].max()]
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'a') as f:
+            for result in results:
+                f.write(json.dumps(result) + '\n')
+        print(f"Results appended to {args.output}")
+
+if __name__ == '__main__':
+    main()
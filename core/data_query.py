@@ -0,0 +1,245 @@
+"""
+Data Query Module for NEW_AESO_API
+Time-indexed queries over the datasets written by the API pipeline
+
+Annual output files are sorted by time, so a query never has to load a whole file:
+1) Partition pruning: only the annual files that can overlap the time range are opened
+2) Byte-range reads: the first and last matching rows are located with a binary search
+   over byte offsets and only the bytes between them are read
+3) Column projection: only the requested columns are parsed
+"""
+
+import io
+import os
+import csv
+import glob
+import re
+import pandas as pd
+from .platform_config import platform_config
+
+# Stored datasets that can be queried. Files are annual partitions named
+# file_pattern.format(year=YYYY) and sorted by their time columns.
+DATASETS = {
+    'pool_price': {
+        'sub_folder': 'Historical Pool Price',
+        'file_pattern': 'pool_price_data_{year}.csv',
+        'utc_column': 'begin_datetime_utc',
+        'mpt_column': 'begin_datetime_mpt',
+        'asset_column': None,
+    },
+    'spot_price': {
+        'sub_folder': 'Spot_Prices',
+        'file_pattern': 'pool_price_data_{year}.csv',
+        'utc_column': 'begin_datetime_utc',
+        'mpt_column': 'begin_datetime_mpt',
+        'asset_column': None,
+    },
+    'ail_demand': {
+        'sub_folder': 'Historical AIL Demand',
+        'file_pattern': 'Metered_Demand_{year}.csv',
+        'utc_column': 'begin_datetime_utc',
+        'mpt_column': 'begin_datetime_mpt',
+        'asset_column': None,
+    },
+    'merit_order': {
+        'sub_folder': 'Merit Order Curves',
+        'file_pattern': 'merit_order_data_{year}.csv',
+        'utc_column': 'begin_dateTime_utc',
+        'mpt_column': 'begin_dateTime_mpt',
+        'asset_column': 'asset_ID',
+    },
+}
+
+# Timestamps are compared on their 'YYYY-MM-DD HH:MM' prefix
+KEY_LENGTH = 16
+
+
+class DataQuery:
+    """
+    Time range / column / asset queries over stored annual CSV partitions
+    """
+
+    def __init__(self, base_dir=None, datasets=None):
+        """
+        Args:
+            base_dir: Output folder holding the dataset sub folders (default: platform output dir)
+            datasets: Optional dataset catalog, defaults to DATASETS
+        """
+        self._base_dir = base_dir
+        self.datasets = datasets or DATASETS
+
+    @property
+    def base_dir(self):
+        if self._base_dir is None:
+            return platform_config.base_output_dir
+        return self._base_dir
+
+    #------------------------------------------------------
+    def partitions(self, endpoint, years=None):
+        """
+        List the annual partitions of a dataset
+
+        Args:
+            endpoint: Dataset name (see DATASETS)
+            years: Optional iterable of years to keep
+
+        Returns:
+            list: Sorted list of (year, path) tuples
+        """
+        spec = self._spec(endpoint)
+        folder = os.path.join(str(self.base_dir), spec['sub_folder'])
+        pattern = re.escape(spec['file_pattern']).replace(re.escape('{year}'), r'(\d{4})') + '$'
+        wanted = set(years) if years is not None else None
+        found = []
+        for path in glob.glob(os.path.join(folder, spec['file_pattern'].format(year='*'))):
+            match = re.search(pattern, os.path.basename(path))
+            if match and (wanted is None or int(match.group(1)) in wanted):
+                found.append((int(match.group(1)), path))
+        return sorted(found)
+
+    def query(self, endpoint, start, end, columns=None, assets=None, hours=None, time_basis='mpt'):
+        """
+        Query a stored dataset by time range
+
+        Args:
+            endpoint: Dataset name (see DATASETS)
+            start: Inclusive start, e.g. '2019-07-01' or '2019-07-01 17:00'
+            end: Inclusive end; a date without a time covers the whole day
+            columns: Optional list of columns to return (time columns are always included)
+            assets: Optional asset ID or list of asset IDs (datasets with an asset column)
+            hours: Optional iterable of hours of the day to keep, e.g. range(17, 21)
+            time_basis: 'mpt' or 'utc', the clock used for start/end/hours
+
+        Returns:
+            DataFrame: Matching rows
+        """
+        spec = self._spec(endpoint)
+        time_column = spec['mpt_column'] if time_basis == 'mpt' else spec['utc_column']
+
+        start_ts = pd.Timestamp(start)
+        end_ts = pd.Timestamp(end)
+        if isinstance(end, str) and len(end.strip()) <= 10:
+            end_ts = end_ts + pd.Timedelta(days=1) - pd.Timedelta(minutes=1)
+        start_key = start_ts.strftime('%Y-%m-%d %H:%M')
+        end_key = end_ts.strftime('%Y-%m-%d %H:%M')
+
+        usecols = None
+        if columns is not None:
+            usecols = [spec['utc_column'], spec['mpt_column']] + list(columns)
+            if assets is not None and spec['asset_column']:
+                usecols.append(spec['asset_column'])
+            usecols = list(dict.fromkeys(usecols))
+
+        # Files are partitioned by MPT year, a UTC range can spill into the neighbours
+        years = range(start_ts.year - 1, end_ts.year + 2)
+        frames = []
+        for year, path in self.partitions(endpoint, years):
+            frame = self._read_range(path, time_column, start_key, end_key, usecols)
+            if frame is not None and not frame.empty:
+                frames.append(frame)
+
+        if not frames:
+            return pd.DataFrame(columns=usecols or [])
+        df = pd.concat(frames, ignore_index=True)
+
+        # Exact filtering on the (small) slice that was read
+        keys = df[time_column].astype(str).str.slice(0, KEY_LENGTH)
+        mask = (keys >= start_key) & (keys <= end_key)
+        if hours is not None:
+            mask &= keys.str.slice(11, 13).astype(int).isin(list(hours))
+        if assets is not None and spec['asset_column']:
+            assets = [assets] if isinstance(assets, str) else list(assets)
+            mask &= df[spec['asset_column']].isin(assets)
+        return df[mask].reset_index(drop=True)
+
+    def query_joined(self, endpoints, start, end, columns=None, hours=None, time_basis='mpt'):
+        """
+        Query several hourly datasets and join them on the UTC hour
+
+        Args:
+            endpoints: List of dataset names without an asset column, e.g. ['pool_price', 'ail_demand']
+            start: Inclusive start
+            end: Inclusive end
+            columns: Optional dict of endpoint -> list of columns
+            hours: Optional iterable of hours of the day to keep
+            time_basis: 'mpt' or 'utc'
+
+        Returns:
+            DataFrame: One row per hour with begin_datetime_utc, begin_datetime_mpt and the requested columns
+        """
+        columns = columns or {}
+        joined = None
+        for endpoint in endpoints:
+            spec = self._spec(endpoint)
+            df = self.query(endpoint, start, end, columns=columns.get(endpoint), hours=hours, time_basis=time_basis)
+            df = df.rename(columns={spec['utc_column']: 'begin_datetime_utc', spec['mpt_column']: 'begin_datetime_mpt'})
+            if joined is None:
+                joined = df
+            else:
+                joined = pd.merge(joined, df.drop(columns=['begin_datetime_mpt']), on='begin_datetime_utc', how='outer')
+        return joined
+
+    #------------------------------------------------------
+    def _spec(self, endpoint):
+        if endpoint not in self.datasets:
+            raise KeyError(f"Unknown dataset '{endpoint}'. Available: {sorted(self.datasets)}")
+        return self.datasets[endpoint]
+
+    def _read_range(self, path, time_column, start_key, end_key, usecols):
+        with open(path, 'rb') as f:
+            header = f.readline()
+            data_start = f.tell()
+            size = os.fstat(f.fileno()).st_size
+            header_fields = next(csv.reader([header.decode('utf-8-sig')]))
+            if time_column not in header_fields:
+                raise KeyError(f"Column '{time_column}' not found in {path}")
+            column_index = header_fields.index(time_column)
+
+            # '~' sorts after every digit, so this finds the first row strictly after end_key
+            first = self._first_offset(f, column_index, start_key, data_start, size)
+            last = self._first_offset(f, column_index, end_key + '~', data_start, size)
+            if last <= first:
+                return None
+
+            f.seek(first)
+            body = f.read(last - first)
+
+        return pd.read_csv(io.BytesIO(header + body), usecols=usecols)
+
+    @staticmethod
+    def _line_key(line, column_index):
+        text = line.decode('utf-8', errors='replace')
+        fields = next(csv.reader([text])) if '"' in text else text.split(',')
+        if column_index >= len(fields):
+            return ''
+        return fields[column_index].strip()[:KEY_LENGTH]
+
+    @staticmethod
+    def _line_start_at_or_after(f, position, data_start):
+        if position <= data_start:
+            return data_start
+        f.seek(position - 1)
+        f.readline()
+        return f.tell()
+
+    def _first_offset(self, f, column_index, target_key, data_start, size):
+        # Binary search over byte offsets for the first line whose key is >= target_key.
+        # Invariants: every line starting before lo has a smaller key, and the first
+        # line starting at or after hi has a key >= target_key (or is end of file).
+        lo, hi = data_start, size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = self._line_start_at_or_after(f, mid, data_start)
+            if start >= size:
+                hi = mid
+                continue
+            f.seek(start)
+            line = f.readline()
+            if self._line_key(line, column_index) < target_key:
+                lo = min(start + len(line), hi)
+            else:
+                hi = mid
+        return self._line_start_at_or_after(f, hi, data_start)
+
+# Create singleton instance
+data_query = DataQuery()
@@ -226,5 +226,25 @@ class FileHandler:
             
         return base
 
+    def query(self, endpoint, start, end, columns=None, assets=None, hours=None, time_basis='mpt'):
+        """
+        Time-indexed query over a stored dataset in the output directory
+        
+        Args:
+            endpoint: Dataset name, e.g. 'pool_price', 'ail_demand', 'merit_order'
+            start: Inclusive start, e.g. '2019-07-01'
+            end: Inclusive end, e.g. '2019-07-31'
+            columns: Optional list of columns to return
+            assets: Optional asset ID or list of asset IDs
+            hours: Optional iterable of hours of the day, e.g. range(17, 21)
+            time_basis: 'mpt' or 'utc'
+            
+        Returns:
+            DataFrame: Matching rows (see core.data_query)
+        """
+        from .data_query import DataQuery
+        return DataQuery(self.platform_config.base_output_dir).query(
+            endpoint, start, end, columns=columns, assets=assets, hours=hours, time_basis=time_basis)
+
 # Create singleton instance
 file_handler = FileHandler()
@@ -410,5 +410,34 @@ class PlatformConfig:
             'CONSOLIDATE_FILES': self.CONSOLIDATE_FILES
         }
 
-# Create singleton instance
-platform_config = PlatformConfig()
+
+class LazyPlatformConfig:
+    """
+    Stand-in for the PlatformConfig singleton that only runs platform, IDE and
+    directory detection (and prints the configuration) the first time an attribute
+    is used, so importing core has no side effects
+    """
+
+    def __init__(self):
+        object.__setattr__(self, '_instance', None)
+
+    def _get_instance(self):
+        if self._instance is None:
+            object.__setattr__(self, '_instance', PlatformConfig())
+        return self._instance
+
+    @property
+    def is_loaded(self):
+        return self._instance is not None
+
+    def __getattr__(self, name):
+        return getattr(self._get_instance(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._get_instance(), name, value)
+
+    def __repr__(self):
+        return f"LazyPlatformConfig(loaded={self.is_loaded})"
+
+# Create singleton instance (detection runs on first use)
+platform_config = LazyPlatformConfig()
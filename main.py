@@ -23,6 +23,11 @@ from src.api_tools import (
     build_api_request_repository,
     get_api_credientials
 )
+from src.instrumentation import run_report
+from src.logging_tools import configure_logging
+from src.request_coalescer import request_coalescer
+from src.change_detection import change_tracker
+from src.window_planner import fetch_range
 
 import requests
 from tqdm import tqdm
@@ -33,10 +38,13 @@ import io
 ##############################################################################
 
 
-print_directory_tree('C:/Users/kaczanor/OneDrive - Enbridge Inc/Documents/Python/Revised-AESO-API-master')
-
 #Loads the .env file
 load_dotenv()
+configure_logging()
+
+#Optionally print the project folder structure (PRINT_DIRECTORY_TREE=True in .env)
+if os.getenv('PRINT_DIRECTORY_TREE', 'False').lower() in ['true', '1', 'yes']:
+    print_directory_tree(os.path.dirname(os.path.abspath(__file__)))
 
 #Define the api serivices you are running
 services = ['AESO_NEW'] # ['AESO_OLD' and 'AESO_NEW']
@@ -133,8 +141,14 @@ for service in services:
                     operating_status, 
                     asset_type, 
                     output_folder)
-    
-    print(f"API Function Call Dictionary: {api_function_call_dict}")
+    print(f"Enabled API calls for {service}: {[key for entity in api_function_call_dict.values() for key in entity]}")
+
+#Record per-stage timings for this run in output/Run Reports
+run_report.start(output_folder)
+#Endpoints that make identical requests (e.g. the CSD summary endpoints) share one response in this run
+request_coalescer.start([key for entity in api_function_call_dict.values() for key in entity])
+#Slowly changing list endpoints are skipped when their payload did not change since the last run
+change_tracker.configure(output_folder)
 
 #Remove or retain existing output files
 if remove_existing_output_files:
@@ -167,9 +181,9 @@ try:
     category_key = None
     ##############################
     # Step1 :  # Loop through API Call Dictionary to decide what to run
+    # (only endpoints switched on in api_activation_dict are resolved, see config/api_endpoints.json)
     ##############################
     for entity_key, entity_value in api_function_call_dict.items():
-        print(f" {entity_key} and {entity_value}")
         for category_key, api_config in entity_value.items():
             if 'output_consolidated_csv_files' not in api_config:
                 print(f"Missing 'output_consolidated_csv_files' in entity: {entity_key}, category: {category_key}")
@@ -228,9 +242,16 @@ try:
                         print(f"Making API call for {category_key}")
 
                         ###################################
-                        #Step 4: Make API Call
-                        fetched_data_df = fetch_data(api_config, updated_start_date, updated_end_date)
+                        #Step 4: Make API Call (range endpoints are split into the largest windows they allow)
+                        if change_tracker.tracks(api_config):
+                            api_config['output_path'] = create_path(output_folder, sub_folder_template,
+                                                                    file_name_template.replace('None', str(year)))
+                        with run_report.context(category_key, f"{updated_start_date}..{updated_end_date}"):
+                            fetched_data_df = fetch_range(api_config, updated_start_date, updated_end_date)
                         print(f" fetched_data_df: {fetched_data_df}")
+                        if fetched_data_df is None and change_tracker.is_unchanged(category_key):
+                            print(f"{category_key} is unchanged since the last run, keeping {api_config['output_path']}")
+                            continue
                         ###################################
                         
                         # Convert dates back to date format
@@ -284,8 +305,11 @@ try:
                             # to only have mone master function call instead of multiple calls.
                              ###################################
                              
-                            processed_data_df = post_process_function(api_config, fetched_data_df, output_csv_files, updated_start_date, updated_end_date, explicit_end_date, year, \
-                                path, csv_output, sqlite_output, conn, db_table_name, column_order)
+                            with run_report.context(category_key, f"{year}"), run_report.span('post_process') as span:
+                                processed_data_df = post_process_function(api_config, fetched_data_df, output_csv_files, updated_start_date, updated_end_date, explicit_end_date, year, \
+                                    path, csv_output, sqlite_output, conn, db_table_name, column_order)
+                                span.rows = len(processed_data_df) if isinstance(processed_data_df, pd.DataFrame) else None
+                            change_tracker.commit(category_key, path)
 
                             
                         else:
@@ -305,4 +329,8 @@ try:
 
 except Exception as e:
             print(f"An error occurred with DataFrame: {category_key}")
-            print(f"Error: {e}")
\ No newline at end of file
+            print(f"Error: {e}")
+
+print(f"API requests made: {request_coalescer.requests}, shared between endpoints: {request_coalescer.coalesced}")
+request_coalescer.clear()
+run_report.print_summary()
\ No newline at end of file
@@ -2,14 +2,10 @@
 import os
 import sys
 
-print("Current directory:", os.getcwd())
-print("Sys.path:", sys.path)
-
 # Add the project directory to sys.path
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if project_root not in sys.path:
     sys.path.append(project_root)
-print("Updated sys.path:", sys.path)
 
 import pandas as pd
 
@@ -42,13 +38,15 @@ And it aggregates for that given year and creates a file called "aggregated_hour
 
 '''
 
-def aggregate_import_exports(file_year_suffix):
-    from src.utilities import create_path, save_dataframe_to_csv
+def aggregate_import_exports(file_year_suffix, output_folder=None):
+    from src.utilities import create_path, save_dataframe_to_csv, LEGACY_PROJECT_FOLDER
+    if output_folder is None:
+        output_folder = os.path.join(LEGACY_PROJECT_FOLDER, 'output')
     # Load file directory and path
     # file_year_suffix = 2025
 
     # Load file directory and path
-    file_path = r'C:\Users\kaczanor\OneDrive - Enbridge Inc\Documents\Python\Revised-AESO-API-master\output'
+    file_path = output_folder
     filename1 = f'export_categorized_filtered_sorted_{file_year_suffix}.csv'
     filename2 = f'import_categorized_filtered_sorted_{file_year_suffix}.csv'
     subfolder = "temp"
@@ -97,7 +95,7 @@ def aggregate_import_exports(file_year_suffix):
 
     # Load file directory and path
     # Write the aggregated data to a summary CSV file
-    path = r'C:\Users\kaczanor\OneDrive - Enbridge Inc\Documents\Python\Revised-AESO-API-master\output'
+    path = output_folder
     sub_folder =  "temp"
     filename = f'export_import_summary_{file_year_suffix}.csv'
     #new_path = create_path(path,sub_folder, 'export_import_summary.csv')
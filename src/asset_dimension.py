@@ -0,0 +1,273 @@
+"""
+Asset Dimension with Integer Surrogate Keys
+
+asset_ID strings are repeated in every metered volume row and merit order block, and
+create_regional_import_export_file used to join the asset attributes onto the melted
+import/export hours with a string pd.merge. The asset dimension gives every asset_ID
+a stable int32 key, kept in
+
+    Asset List/asset_dimension.csv
+        asset_key, ASSET_ID, <the other Asset_Lists.csv columns>
+
+1) Keys are assigned in order of first appearance and never change or get reused:
+   assets that leave Asset_Lists.csv keep their row, new assets are appended
+2) Attributes come from the latest Asset_Lists.csv. asset_IDs that only appear in fact
+   data (not in the asset list) get a key with empty attributes
+3) Fact frames carry an int32 asset_key column instead of repeating the string, and
+   attributes are joined with attribute(keys, column), which is a take() on an array
+   ordered by key. Row i of the dimension is key i, so no hash join is needed
+
+The dimension is shared by the processes of a run, so update() re-reads the file under
+a lock file before it appends keys.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from src.logging_tools import get_logger
+
+logger = get_logger('asset_dimension')
+
+ASSET_DIMENSION_FILE = os.path.join('Asset List', 'asset_dimension.csv')
+ASSET_LIST_FILE = os.path.join('Asset List', 'Asset_Lists.csv')
+KEY_COLUMN = 'asset_key'
+ID_COLUMN = 'ASSET_ID'
+MISSING_KEY = -1
+# A lock file older than this is left over from a process that died while holding it
+LOCK_STALE_SECONDS = 600
+
+#------------------------------------------------------
+@contextmanager
+def file_lock(path):
+    # O_EXCL lock file, as fcntl is not available on Windows. Waiters only break the lock
+    # once its file is LOCK_STALE_SECONDS old, so a slow holder keeps it
+    lock_path = f"{path}.lock"
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                age = time.time() - os.path.getmtime(lock_path)
+            except FileNotFoundError:
+                continue
+            if age > LOCK_STALE_SECONDS:
+                logger.warning("Removing stale lock %s (%.0f s old)", lock_path, age)
+                try:
+                    os.remove(lock_path)
+                except FileNotFoundError:
+                    pass
+                continue
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+
+
+class AssetDimension:
+    """
+    asset_ID <-> int32 asset_key mapping with the asset attributes in key order
+    """
+
+    def __init__(self, path=None, table=None):
+        """
+        Args:
+            path: asset_dimension.csv (None keeps the dimension in memory)
+            table: Rows in key order, with ASSET_ID and attribute columns
+        """
+        self.path = path
+        self._set_table(table if table is not None else pd.DataFrame(columns=[ID_COLUMN]))
+
+    def _set_table(self, table):
+        self.table = table.drop(columns=[KEY_COLUMN], errors='ignore').reset_index(drop=True)
+        self.ids = pd.Index(self.table[ID_COLUMN].astype(str))
+        self._columns = {}
+
+    @classmethod
+    def load(cls, output_folder):
+        """
+        Read the dimension of an output folder, empty if it was not built yet
+
+        Returns:
+            AssetDimension
+        """
+        path = os.path.join(output_folder, ASSET_DIMENSION_FILE)
+        return cls(path, cls._read(path))
+
+    @staticmethod
+    def _read(path):
+        if path is None or not os.path.exists(path):
+            return None
+        table = pd.read_csv(path, dtype=str, keep_default_na=False)
+        # The file is written in key order; a hand edit that reorders it must not reassign keys
+        order = table[KEY_COLUMN].astype(np.int64).values
+        if not np.array_equal(order, np.arange(len(table))):
+            raise ValueError(f"{path}: asset_key must run from 0 to {len(table) - 1} in file order")
+        return table
+
+    def __len__(self):
+        return len(self.ids)
+
+    #------------------------------------------------------
+    def update(self, asset_list=None, asset_ids=None):
+        """
+        Append keys for new assets and refresh the attributes from the asset list
+
+        Args:
+            asset_list: Asset_Lists.csv frame (upper case columns)
+            asset_ids: asset_IDs seen in fact data
+
+        Returns:
+            AssetDimension: self
+        """
+        with self._locked():
+            # Another process may have appended keys since this dimension was loaded
+            stored = self._read(self.path)
+            if stored is not None and len(stored) > len(self):
+                self._set_table(stored)
+            table = self.table
+            new_ids = []
+            if asset_list is not None:
+                new_ids.extend(asset_list[ID_COLUMN].astype(str))
+            if asset_ids is not None:
+                new_ids.extend(pd.unique(pd.Series(asset_ids, dtype=str)))
+            new_ids = pd.Index(pd.unique(pd.Series(new_ids, dtype=str))).difference(self.ids, sort=False)
+            if len(new_ids):
+                table = pd.concat([table, pd.DataFrame({ID_COLUMN: new_ids})], ignore_index=True)
+                logger.info("Added %s asset keys (%s assets)", len(new_ids), len(table))
+            if asset_list is not None:
+                attributes = asset_list.astype(str).where(asset_list.notna(), '') \
+                    .drop_duplicates(subset=[ID_COLUMN], keep='last').set_index(ID_COLUMN)
+                attributes = attributes.loc[:, ~attributes.columns.str.contains('(?i)Unnamed')]
+                ids = pd.Index(table[ID_COLUMN].astype(str))
+                columns = list(attributes.columns) + [c for c in table.columns if c not in attributes.columns
+                                                      and c != ID_COLUMN]
+                stored_attributes = table.set_index(ids).drop(columns=[ID_COLUMN]).reindex(columns=columns)
+                # Assets missing from the latest list keep their last known attributes
+                table = attributes.reindex(index=ids, columns=columns).fillna(stored_attributes)
+                table = table.rename_axis(ID_COLUMN).reset_index()
+            self._set_table(table.fillna(''))
+            if len(new_ids) or asset_list is not None:
+                self.save()
+        return self
+
+    @contextmanager
+    def _locked(self):
+        if self.path is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with file_lock(self.path):
+            yield
+
+    def save(self):
+        if self.path is None:
+            return
+        table = self.table.copy()
+        table.insert(0, KEY_COLUMN, np.arange(len(table), dtype=np.int32))
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        table.to_csv(temp_path, index=False)
+        os.replace(temp_path, self.path)
+    #------------------------------------------------------
+    def encode(self, asset_ids, add=True):
+        """
+        Translate asset_IDs into asset keys
+
+        The ids are factorized first, so only the distinct values are looked up.
+
+        Args:
+            asset_ids: Sequence of asset_IDs (e.g. a fact table column)
+            add: Assign keys to unknown asset_IDs (False returns MISSING_KEY for them)
+
+        Returns:
+            numpy.ndarray: int32 keys
+        """
+        codes, uniques = pd.factorize(pd.Series(asset_ids), sort=False)
+        uniques = pd.Index(uniques).astype(str)
+        unique_keys = self.ids.get_indexer(uniques)
+        if add and (unique_keys == MISSING_KEY).any():
+            self.update(asset_ids=uniques[unique_keys == MISSING_KEY])
+            unique_keys = self.ids.get_indexer(uniques)
+        # Sentinel entry so missing values (code -1) also map to MISSING_KEY
+        unique_keys = np.append(unique_keys, MISSING_KEY).astype(np.int32)
+        return unique_keys[codes]
+
+    def decode(self, keys):
+        """
+        Returns:
+            numpy.ndarray: asset_IDs of the keys
+        """
+        return self.attribute(keys, ID_COLUMN)
+
+    def attribute(self, keys, column):
+        """
+        Join one attribute onto an array of keys by position
+
+        Returns:
+            numpy.ndarray: Attribute values (NaN for MISSING_KEY and empty values)
+        """
+        values = self._columns.get(column)
+        if values is None:
+            values = self.table[column].replace('', np.nan).to_numpy(dtype=object)
+            # The last entry answers MISSING_KEY (-1)
+            values = np.append(values, np.nan)
+            self._columns[column] = values
+        return values.take(np.asarray(keys, dtype=np.int64))
+
+    def key_table(self, frame):
+        """
+        Reorder a frame with an ASSET_ID column so row i holds the values of key i
+
+        Use it for attributes that are not in the asset list (e.g. the import/export REGION).
+
+        Returns:
+            AssetDimension: In-memory dimension over the same keys with the frame's columns
+        """
+        frame = frame.drop_duplicates(subset=[ID_COLUMN], keep='first')
+        frame = frame.set_index(frame[ID_COLUMN].astype(str)).drop(columns=[ID_COLUMN])
+        table = frame.reindex(self.ids).rename_axis(ID_COLUMN).reset_index()
+        return AssetDimension(None, table.astype(object).where(table.notna(), ''))
+
+    def join(self, df, keys, columns=None):
+        """
+        Add attribute columns to a fact frame, like a left merge on asset_ID
+
+        Args:
+            df: Fact frame
+            keys: Asset keys of its rows
+            columns: Attributes to add (default: all)
+
+        Returns:
+            DataFrame: df with the attribute columns appended
+        """
+        columns = [c for c in self.table.columns if c != ID_COLUMN] if columns is None else columns
+        df = df.copy()
+        for column in columns:
+            df[column] = self.attribute(keys, column)
+        return df
+#------------------------------------------------------
+def load_asset_dimension(output_folder, asset_list=None):
+    """
+    Load the asset dimension of an output folder and bring it up to date with Asset_Lists.csv
+
+    Args:
+        output_folder: Output folder holding the 'Asset List' sub folder
+        asset_list: Asset_Lists.csv frame if it was already read
+
+    Returns:
+        AssetDimension
+    """
+    dimension = AssetDimension.load(output_folder)
+    if asset_list is None:
+        asset_list_path = os.path.join(output_folder, ASSET_LIST_FILE)
+        if os.path.exists(asset_list_path):
+            asset_list = pd.read_csv(asset_list_path)
+    if asset_list is not None and ID_COLUMN in asset_list.columns:
+        dimension.update(asset_list=asset_list)
+    return dimension
@@ -0,0 +1,169 @@
+"""
+Change Detection for Slowly Changing List Endpoints
+
+Asset_List, Pool_Participant_List and Generators_Above_5MW rarely change, but used to be
+downloaded, normalized and rewritten on every run. For endpoints declared with
+"change_detection": true in config/api_endpoints.json:
+
+1) The validators of the last processed response are kept per endpoint and output
+   file in <output folder>/temp/change_state/{category_key}.json: url, ETag,
+   Last-Modified and a content hash of the parsed payload (without its 'timestamp'
+   field). The runner puts the output file in api_config['output_path'] before fetching
+2) While that output file exists, the request is sent with If-None-Match /
+   If-Modified-Since, so a gateway that supports them answers 304 Not Modified
+3) A full 200 response whose content hash matches the stored one counts as unchanged too
+4) Unchanged endpoints skip normalization, rewriting and post-processing; fetch_data
+   returns None and change_tracker.is_unchanged() tells the runner why
+5) The new validators are only stored (commit) after the output was written, so a
+   failed run never hides a change from the next one
+"""
+
+import os
+import json
+import hashlib
+
+from src.logging_tools import get_logger
+
+logger = get_logger('change_detection')
+
+CHANGE_STATE_SUB_FOLDER = os.path.join('temp', 'change_state')
+NOT_MODIFIED = 304
+
+#------------------------------------------------------
+def content_hash(response_str):
+    """
+    Hash of a json payload that ignores its volatile 'timestamp' field and key order
+
+    Returns:
+        str: sha256 hex digest
+    """
+    try:
+        payload = json.loads(response_str)
+    except (TypeError, ValueError):
+        return hashlib.sha256((response_str or '').encode('utf-8')).hexdigest()
+    if isinstance(payload, dict):
+        payload.pop('timestamp', None)
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ChangeTracker:
+    """
+    Stored validators per endpoint and the change status of the current run
+    """
+
+    def __init__(self):
+        self.directory = None
+        self._validators = {}
+        self._pending = {}
+        self._unchanged = set()
+
+    def configure(self, output_folder):
+        """
+        Args:
+            output_folder: Output folder; None switches change detection off
+        """
+        self.directory = os.path.join(output_folder, CHANGE_STATE_SUB_FOLDER) if output_folder else None
+        self._pending = {}
+        self._unchanged = set()
+
+    def tracks(self, api_config):
+        return self.directory is not None and bool(api_config.get('change_detection'))
+
+    def _path(self, category_key):
+        return os.path.join(self.directory, f"{category_key}.json")
+
+    def stored(self, category_key):
+        """
+        Returns:
+            dict: Validators stored for the endpoint, keyed by output file
+        """
+        path = self._path(category_key)
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def _usable(self, api_config, url):
+        # Stored validators only count while the output they describe still exists
+        output_path = api_config.get('output_path')
+        state = self.stored(api_config['category_key']).get(output_path) if output_path else None
+        if state is None or state.get('url') != url or not os.path.exists(output_path):
+            return None
+        return state
+    #------------------------------------------------------
+    def request_headers(self, api_config, url, headers):
+        """
+        Returns:
+            dict: headers plus If-None-Match / If-Modified-Since when validators are stored
+        """
+        if not self.tracks(api_config):
+            return headers
+        state = self._usable(api_config, url)
+        if state is None:
+            return headers
+        headers = dict(headers)
+        if state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
+        return headers
+
+    def record_validators(self, url, response_headers):
+        """
+        Remember the ETag / Last-Modified headers of a 200 response
+        """
+        self._validators[url] = {'etag': response_headers.get('ETag'),
+                                 'last_modified': response_headers.get('Last-Modified')}
+
+    def check(self, api_config, url, response):
+        """
+        Classify a response from fetch_response() as changed or unchanged
+
+        Returns:
+            tuple or None: The response, or (304, '') if the payload did not change
+        """
+        category_key = api_config['category_key']
+        self._unchanged.discard(category_key)
+        if response is None:
+            return None
+        status, response_str = response
+        if status == NOT_MODIFIED:
+            logger.info("%s not modified since the last run (304)", category_key)
+            self._unchanged.add(category_key)
+            return response
+        if status != 200:
+            return response
+        digest = content_hash(response_str)
+        state = self._usable(api_config, url)
+        if state is not None and state.get('content_hash') == digest:
+            logger.info("%s unchanged since the last run (same content hash)", category_key)
+            self._unchanged.add(category_key)
+            return NOT_MODIFIED, ''
+        self._pending[category_key] = dict(self._validators.pop(url, {}), url=url, content_hash=digest)
+        return response
+
+    def is_unchanged(self, category_key):
+        """
+        Returns:
+            bool: True if the last request of the endpoint returned the stored payload
+        """
+        return category_key in self._unchanged
+
+    def commit(self, category_key, output_path):
+        """
+        Store the validators of the processed response once its output has been written
+        """
+        state = self._pending.pop(category_key, None)
+        if state is None or self.directory is None:
+            return
+        outputs = self.stored(category_key)
+        outputs[output_path] = state
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(category_key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(outputs, f, indent=2)
+        os.replace(temp_path, path)
+
+# Create singleton instance
+change_tracker = ChangeTracker()
@@ -0,0 +1,274 @@
+"""
+Command Line Entry Point
+
+    python -m src.cli endpoints                  list the endpoints in config/api_endpoints.json
+    python -m src.cli plan --endpoints Merit_Order_Data --start 2024-01-01 --end 2024-03-31
+    python -m src.cli run --endpoints AIL_Demand --start 2020-01-01 --end 2024-12-31 --workers 4
+    python -m src.cli gaps --datasets pool_price ail_demand --start 2023-01-01 --end 2023-12-31 --repair
+    python -m src.cli poll-csd --interval 60     keep a history of the current supply/demand snapshot
+    python -m src.cli encode-merit-order --years 2022 2023
+                                                 build the run-length merit order stores of stored years
+    python -m src.cli wide-metered-volumes --year 2024 --classes IMPORTER EXPORTER
+                                                 write hour x asset csv files from the sparse metered volumes
+    python -m src.cli populate-hourly-series --datasets pool_price ail_demand
+                                                 load the stored annual files into the memory-mapped hourly series
+    python -m src.cli rollups --datasets pool_price ail_demand tie_lines
+                                                 refresh the daily/monthly/annual rollups of changed files
+
+Only the standard library and the endpoint registry are imported at startup;
+pandas, the API helpers and the platform configuration are imported inside the
+commands that need them, so --help and planning commands start almost instantly.
+"""
+
+import sys
+import argparse
+import datetime
+
+#------------------------------------------------------
+def _date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected a date as YYYY-MM-DD, got '{value}'")
+
+def _selected_endpoints(names):
+    from src.endpoint_registry import endpoint_registry
+    if not names:
+        return endpoint_registry.endpoints()
+    return [endpoint_registry.get(name) for name in names]
+#------------------------------------------------------
+def command_endpoints(args):
+    for spec in _selected_endpoints(args.endpoints):
+        print(f"{spec.category_key:<40} {spec.data_type:<12} {spec.function_name}")
+    return 0
+
+def command_plan(args):
+    if args.end < args.start:
+        print("--end must not be before --start", file=sys.stderr)
+        return 2
+    total = 0
+    for spec in _selected_endpoints(args.endpoints):
+        windows = spec.plan_windows(args.start, args.end)
+        total += len(windows)
+        print(f"{spec.category_key}: {len(windows)} request(s)")
+        if args.verbose:
+            for window_start, window_end in windows:
+                print(f"    {window_start or '-'} .. {window_end or '-'}")
+    print(f"Total: {total} request(s)")
+    return 0
+
+def command_run(args):
+    if args.end < args.start:
+        print("--end must not be before --start", file=sys.stderr)
+        return 2
+    from src.pipeline import run_pipeline
+    results = run_pipeline(args.endpoints, args.start, args.end, workers=args.workers, output_backends=args.output,
+                           cache_mode=args.cache_mode, incremental=args.incremental,
+                           output_folder=args.output_folder, service=args.service,
+                           window_workers=args.window_workers)
+    return 1 if any(result['status'] == 'failed' for result in results) else 0
+
+def command_gaps(args):
+    if args.end < args.start:
+        print("--end must not be before --start", file=sys.stderr)
+        return 2
+    from src.completeness import DATASET_ENDPOINTS, find_gaps, print_gap_report, repair_gaps
+    from src.pipeline import resolve_endpoint_config
+    from src.window_planner import is_range_request, max_window_days
+    from src.logging_tools import configure_logging
+    configure_logging()
+    incomplete = False
+    for dataset in args.datasets:
+        api_config, output_folder = resolve_endpoint_config(DATASET_ENDPOINTS[dataset], args.start, args.end,
+                                                            args.service, args.output_folder)
+        window_days = max_window_days(api_config) if is_range_request(api_config) else None
+        report = find_gaps(dataset, args.start, args.end, base_dir=output_folder, window_days=window_days)
+        print_gap_report(report)
+        if args.repair and report['windows']:
+            repair_gaps(report, api_config, max_workers=args.window_workers)
+            report = find_gaps(dataset, args.start, args.end, base_dir=output_folder, window_days=window_days)
+            print_gap_report(report)
+        incomplete = incomplete or bool(report['windows'])
+    return 1 if incomplete else 0
+
+def command_poll_csd(args):
+    from src.csd_poller import CsdSnapshotPoller
+    from src.logging_tools import configure_logging
+    configure_logging()
+    poller = CsdSnapshotPoller(args.output_folder, interval_seconds=args.interval, flush_seconds=args.flush_interval,
+                               service=args.service)
+    poller.run(count=args.count)
+    return 0
+
+def command_encode_merit_order(args):
+    import os
+    from src.merit_order_runs import encode_merit_order_partitions
+    from src.pipeline import resolve_endpoint_config
+    from src.logging_tools import configure_logging
+    configure_logging()
+    today = datetime.date.today()
+    _, output_folder = resolve_endpoint_config('Merit_Order_Data', today, today, args.service, args.output_folder)
+    results = encode_merit_order_partitions(os.path.join(output_folder, 'Merit Order Curves'), years=args.years,
+                                            memory_budget_mb=args.memory_budget, force=args.force)
+    for year, stats in results.items():
+        if stats is None:
+            print(f"{year}: unchanged since it was encoded")
+            continue
+        print(f"{year}: {stats['rows']} rows -> {stats['runs']} runs "
+              f"({stats['csv_bytes'] / 1e6:.1f} MB -> {stats['runs_bytes'] / 1e6:.1f} MB)")
+    if not results:
+        print("No merit order files found")
+    return 0 if results else 1
+
+def command_wide_metered_volumes(args):
+    import os
+    from src.asset_dimension import AssetDimension
+    from src.metered_volume_store import SparseMeteredVolumes, sparse_path, METERED_VOLUME_SUB_FOLDER
+    from src.pipeline import resolve_endpoint_config
+    from src.utilities import write_wide_metered_volumes
+    today = datetime.date.today()
+    _, output_folder = resolve_endpoint_config('Metered_Volume_Data', today, today, args.service, args.output_folder)
+    path = sparse_path(output_folder, args.year)
+    if not os.path.exists(path):
+        print(f"No sparse metered volumes for {args.year} ({path})", file=sys.stderr)
+        return 1
+    sparse_volumes = SparseMeteredVolumes.load(path)
+    unknown = [c for c in args.classes or [] if c not in sparse_volumes.classes]
+    if unknown:
+        print(f"Unknown asset classes {unknown}, stored: {sparse_volumes.classes}", file=sys.stderr)
+        return 2
+    write_wide_metered_volumes(sparse_volumes, AssetDimension.load(output_folder),
+                               os.path.join(output_folder, METERED_VOLUME_SUB_FOLDER), args.classes or sparse_volumes.classes)
+    return 0
+
+def command_populate_hourly_series(args):
+    from src.hourly_series_store import HourlySeriesStore, SERIES_SOURCES
+    from src.pipeline import resolve_endpoint_config
+    today = datetime.date.today()
+    _, output_folder = resolve_endpoint_config(SERIES_SOURCES[(args.datasets or list(SERIES_SOURCES))[0]]['category_key'],
+                                               today, today, args.service, args.output_folder)
+    loaded = HourlySeriesStore(output_folder).populate(args.datasets, years=args.years, force=args.force)
+    for dataset, files in loaded.items():
+        print(f"{dataset}: {len(files)} files loaded")
+    return 0
+
+def command_rollups(args):
+    from src.rollups import RollupStore, ROLLUP_DATASETS
+    from src.pipeline import resolve_endpoint_config
+    from src.logging_tools import configure_logging
+    configure_logging()
+    if (args.start is None) != (args.end is None):
+        print("--start and --end go together", file=sys.stderr)
+        return 2
+    datasets = args.datasets or list(ROLLUP_DATASETS)
+    today = datetime.date.today()
+    _, output_folder = resolve_endpoint_config(ROLLUP_DATASETS[datasets[0]]['category_key'], today, today,
+                                               args.service, args.output_folder)
+    store = RollupStore(output_folder)
+    for dataset in datasets:
+        if args.rebuild:
+            store.clear(dataset)
+        ranges = store.refresh(dataset, args.start, args.end)
+        sizes = {level: len(store.load(dataset, level)) for level in ('daily', 'monthly', 'annual')}
+        print(f"{dataset}: {len(ranges)} ranges refreshed, {sizes['daily']} days, {sizes['monthly']} months, "
+              f"{sizes['annual']} years")
+    return 0
+#------------------------------------------------------
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m src.cli', description='AESO API data pipeline')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    endpoints_parser = subparsers.add_parser('endpoints', help='List the declared endpoints')
+    endpoints_parser.add_argument('--endpoints', nargs='*', help='Endpoint names (default: all)')
+    endpoints_parser.set_defaults(func=command_endpoints)
+
+    plan_parser = subparsers.add_parser('plan', help='Show the API requests a run would make (dry run)')
+    plan_parser.add_argument('--endpoints', nargs='*', help='Endpoint names (default: all)')
+    plan_parser.add_argument('--start', type=_date, required=True, help='First date, YYYY-MM-DD')
+    plan_parser.add_argument('--end', type=_date, required=True, help='Last date (inclusive), YYYY-MM-DD')
+    plan_parser.add_argument('-v', '--verbose', action='store_true', help='List every request window')
+    plan_parser.set_defaults(func=command_plan)
+
+    run_parser = subparsers.add_parser('run', help='Fetch and process data')
+    run_parser.add_argument('--endpoints', nargs='+', required=True, help='Endpoint names (see the endpoints command)')
+    run_parser.add_argument('--start', type=_date, required=True, help='First date, YYYY-MM-DD')
+    run_parser.add_argument('--end', type=_date, required=True, help='Last date (inclusive), YYYY-MM-DD')
+    run_parser.add_argument('--workers', type=int, default=1, help='Parallel worker processes (default: 1)')
+    run_parser.add_argument('--window-workers', type=int, default=4,
+                            help='Request windows fetched concurrently within a job (default: 4)')
+    run_parser.add_argument('--output', nargs='+', default=['csv'], choices=['csv', 'sqlite'],
+                            help='Output backends (default: csv)')
+    run_parser.add_argument('--cache-mode', default='off', choices=['off', 'use', 'refresh', 'only'],
+                            help='API response cache mode (default: off)')
+    run_parser.add_argument('--incremental', action='store_true',
+                            help='Skip endpoint/years whose output already covers the requested dates')
+    run_parser.add_argument('--output-folder', help='Output folder (default: from .env)')
+    run_parser.add_argument('--service', default='AESO_NEW', help='Service whose credentials are used (default: AESO_NEW)')
+    run_parser.set_defaults(func=command_run)
+
+    gaps_parser = subparsers.add_parser('gaps', help='Find (and optionally refetch) missing hours in stored datasets')
+    gaps_parser.add_argument('--datasets', nargs='+', required=True,
+                             choices=['pool_price', 'spot_price', 'ail_demand', 'merit_order'])
+    gaps_parser.add_argument('--start', type=_date, required=True, help='First MPT date, YYYY-MM-DD')
+    gaps_parser.add_argument('--end', type=_date, required=True, help='Last MPT date (inclusive), YYYY-MM-DD')
+    gaps_parser.add_argument('--repair', action='store_true', help='Refetch the missing windows')
+    gaps_parser.add_argument('--window-workers', type=int, default=4, help='Windows fetched concurrently (default: 4)')
+    gaps_parser.add_argument('--output-folder', help='Output folder (default: from .env)')
+    gaps_parser.add_argument('--service', default='AESO_NEW', help='Service whose credentials are used (default: AESO_NEW)')
+    gaps_parser.set_defaults(func=command_gaps)
+
+    poll_parser = subparsers.add_parser('poll-csd', help='Poll the current supply/demand snapshot and store the changes')
+    poll_parser.add_argument('--interval', type=float, default=60, help='Seconds between polls (default: 60)')
+    poll_parser.add_argument('--flush-interval', type=float, default=600,
+                             help='Seconds between writes to the history files (default: 600)')
+    poll_parser.add_argument('--count', type=int, help='Stop after this many polls (default: run until Ctrl+C)')
+    poll_parser.add_argument('--output-folder', help='Output folder (default: from .env)')
+    poll_parser.add_argument('--service', default='AESO_NEW', help='Service whose credentials are used (default: AESO_NEW)')
+    poll_parser.set_defaults(func=command_poll_csd)
+
+    encode_parser = subparsers.add_parser('encode-merit-order',
+                                          help='Build run-length merit order stores from the annual csv files')
+    encode_parser.add_argument('--years', nargs='*', type=int, help='Years to encode (default: all stored years)')
+    encode_parser.add_argument('--memory-budget', type=float, default=512, help='Memory budget in MB (default: 512)')
+    encode_parser.add_argument('--force', action='store_true', help='Encode files that did not change')
+    encode_parser.add_argument('--output-folder', help='Output folder (default: from .env)')
+    encode_parser.add_argument('--service', default='AESO_NEW', help='Service whose credentials are used (default: AESO_NEW)')
+    encode_parser.set_defaults(func=command_encode_merit_order)
+
+    wide_parser = subparsers.add_parser('wide-metered-volumes',
+                                        help='Write hour x asset csv files from the sparse metered volumes')
+    wide_parser.add_argument('--year', type=int, required=True, help='Year of the sparse store')
+    wide_parser.add_argument('--classes', nargs='*', help='Asset classes, e.g. IMPORTER IPP (default: all)')
+    wide_parser.add_argument('--output-folder', help='Output folder (default: from .env)')
+    wide_parser.add_argument('--service', default='AESO_NEW', help='Service whose credentials are used (default: AESO_NEW)')
+    wide_parser.set_defaults(func=command_wide_metered_volumes)
+
+    series_parser = subparsers.add_parser('populate-hourly-series',
+                                          help='Load the stored pool price / AIL files into the memory-mapped hourly series')
+    series_parser.add_argument('--datasets', nargs='*', choices=['pool_price', 'ail_demand'],
+                               help='Datasets to load (default: all)')
+    series_parser.add_argument('--years', nargs='*', type=int, help='Years to load (default: all stored years)')
+    series_parser.add_argument('--force', action='store_true', help='Reload files that did not change')
+    series_parser.add_argument('--output-folder', help='Output folder (default: from .env)')
+    series_parser.add_argument('--service', default='AESO_NEW', help='Service whose credentials are used (default: AESO_NEW)')
+    series_parser.set_defaults(func=command_populate_hourly_series)
+
+    rollups_parser = subparsers.add_parser('rollups', help='Refresh the daily/monthly/annual rollups')
+    rollups_parser.add_argument('--datasets', nargs='*', choices=['pool_price', 'ail_demand', 'tie_lines'],
+                                help='Datasets to refresh (default: all)')
+    rollups_parser.add_argument('--start', type=_date, help='First MPT day to refresh (default: days of changed files)')
+    rollups_parser.add_argument('--end', type=_date, help='Last MPT day to refresh')
+    rollups_parser.add_argument('--rebuild', action='store_true', help='Drop the stored rollups and rebuild them')
+    rollups_parser.add_argument('--output-folder', help='Output folder (default: from .env)')
+    rollups_parser.add_argument('--service', default='AESO_NEW', help='Service whose credentials are used (default: AESO_NEW)')
+    rollups_parser.set_defaults(func=command_rollups)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
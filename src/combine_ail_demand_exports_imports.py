@@ -2,12 +2,23 @@
 import pandas as pd
 import os
 from tqdm import tqdm
+from src.hourly_calendar import hourly_calendar
+
+#------------------------------------------------------
+def read_csv_with_dates(path, date_columns):
+    # Timestamp columns are converted through the shared hourly calendar instead of parse_dates
+    df = pd.read_csv(path)
+    for column in date_columns:
+        df[column] = hourly_calendar.to_datetime(df[column])
+    return df
 
 ##############################################
 #Step 1: Create individual combined demand and import/export file
 ##############################################
-def combine_demand_with_tie_line_data(file_year_suffix):
-    from src.utilities import create_path, save_dataframe_to_csv
+def combine_demand_with_tie_line_data(file_year_suffix, output_folder=None):
+    from src.utilities import create_path, save_dataframe_to_csv, LEGACY_PROJECT_FOLDER
+    if output_folder is None:
+        output_folder = os.path.join(LEGACY_PROJECT_FOLDER, 'output')
     '''
     This takes the aggregated import export file creates for a given year that looks like this:
 
@@ -27,17 +38,17 @@ def combine_demand_with_tie_line_data(file_year_suffix):
 
     # Define path to the  "Metered_Demand_YYYY.csv" file
     # Path to the directory containing ail_demand files
-    directory = 'C:/Users/kaczanor/OneDrive - Enbridge Inc/Documents/Python/Revised-AESO-API-master/output/Historical AIL Demand'
+    directory = os.path.join(output_folder, 'Historical AIL Demand')
 
     # Load the "export_import_summary.csv" file
-    source_file_location = r'C:\Users\kaczanor\OneDrive - Enbridge Inc\Documents\Python\Revised-AESO-API-master\output\temp'
+    source_file_location = os.path.join(output_folder, 'temp')
     filename = f'export_import_summary_{file_year_suffix}.csv'
     export_import_summary_filepath = os.path.join(source_file_location, filename)
 
     
 
     #export_import_by_tielines_summary = pd.read_csv(r'C:\Users\kaczanor\OneDrive - Enbridge Inc\Documents\Python\Revised-AESO-API-master\output\temp\export_import_summary.csv', parse_dates=['begin_date_utc', 'begin_date_mpt'])
-    export_import_by_tielines_summary = pd.read_csv(export_import_summary_filepath, parse_dates=['begin_date_utc', 'begin_date_mpt'])
+    export_import_by_tielines_summary = read_csv_with_dates(export_import_summary_filepath, ['begin_date_utc', 'begin_date_mpt'])
     print(f"export_import_by_tielines_summary.columns: {export_import_by_tielines_summary.columns}")
     print(f"Number of rows in export_import_by_tielines_summary: {len(export_import_by_tielines_summary)}")
 
@@ -67,7 +78,7 @@ def combine_demand_with_tie_line_data(file_year_suffix):
             file_path = os.path.join(directory, filename)
             
             # Load annual ail_demand
-            ail_demand= pd.read_csv(file_path, parse_dates=['begin_datetime_utc', 'begin_datetime_mpt'])
+            ail_demand= read_csv_with_dates(file_path, ['begin_datetime_utc', 'begin_datetime_mpt'])
             print(f"ail_demand.columns: {ail_demand.columns}")
             print(f"Number of rows in ail_demand: {len(ail_demand)}")
             
@@ -103,15 +114,17 @@ def combine_demand_with_tie_line_data(file_year_suffix):
 ##############################################
 #Step 2: Create aggregated combined demand and import/export file for all years
 ##############################################
-def append_aggregated_annual_data_with_tie_line_data(file_year_suffix):
-    from src.utilities import create_path, save_dataframe_to_csv
+def append_aggregated_annual_data_with_tie_line_data(file_year_suffix, output_folder=None):
+    from src.utilities import create_path, save_dataframe_to_csv, LEGACY_PROJECT_FOLDER
+    if output_folder is None:
+        output_folder = os.path.join(LEGACY_PROJECT_FOLDER, 'output')
 
     """
     This appends the aggregated annual file with newly created annual file
     """
 
     # Path to the directory containing the combined files
-    combined_directory = 'C:/Users/kaczanor/OneDrive - Enbridge Inc/Documents/Python/Revised-AESO-API-master/output/Historical AIL Demand'
+    combined_directory = os.path.join(output_folder, 'Historical AIL Demand')
 
     # Ask user for a specific year to process
     #specific_year = input("Enter a specific year to process (or leave blank to process all years): ").strip()
@@ -138,7 +151,7 @@ def append_aggregated_annual_data_with_tie_line_data(file_year_suffix):
             min_year = int(parts[3])  # Assuming this is the correct index for the start year
             max_year = int(parts[5].split('.')[0])  # Assuming this is the correct index for the end year
             combined_filepath = os.path.join(combined_directory, filename)
-            combined_df = pd.read_csv(combined_filepath, parse_dates=['begin_datetime_utc', 'begin_datetime_mpt'])
+            combined_df = read_csv_with_dates(combined_filepath, ['begin_datetime_utc', 'begin_datetime_mpt'])
             print(f"Loaded consolidated file: {filename}")
             break
 
@@ -152,7 +165,7 @@ def append_aggregated_annual_data_with_tie_line_data(file_year_suffix):
                 year = int(filename.split('_')[3].split('.')[0])
                 year_list.append(year)
                 file_path = os.path.join(combined_directory, filename)
-                df = pd.read_csv(file_path, parse_dates=['begin_datetime_mpt'])
+                df = read_csv_with_dates(file_path, ['begin_datetime_mpt'])
                 df_list.append(df)
                 print(f"Loaded {filename} with {len(df)} rows.")
 
@@ -184,7 +197,7 @@ def append_aggregated_annual_data_with_tie_line_data(file_year_suffix):
                 specific_file = f'combined_Metered_Demand_{specific_year}.csv'
                 specific_filepath = os.path.join(combined_directory, specific_file)
                 if os.path.exists(specific_filepath):
-                    specific_df = pd.read_csv(specific_filepath, parse_dates=['begin_datetime_utc', 'begin_datetime_mpt'])
+                    specific_df = read_csv_with_dates(specific_filepath, ['begin_datetime_utc', 'begin_datetime_mpt'])
                     if is_full_year(specific_df, specific_year):
                         combined_df = pd.concat([combined_df, specific_df], ignore_index=True)
                         new_aggregated_filename = f'combined_Metered_Demand_{min_year}_to_{specific_year}.csv'
@@ -4,6 +4,7 @@ import os
 import re
 from src.utilities import create_path, save_dataframe_to_csv
 from src.api_tools import get_api_credientials
+from src.hourly_calendar import hourly_calendar
 
 
 '''
@@ -51,7 +52,7 @@ for file in csv_files:
     df = pd.read_csv(file)
     
     # Convert 'begin_datetime_mpt' to datetime
-    df['begin_datetime_mpt'] = pd.to_datetime(df['begin_datetime_mpt'])
+    df['begin_datetime_mpt'] = hourly_calendar.to_datetime(df['begin_datetime_mpt'])
     
     # Append the DataFrame to the list
     data_frames.append(df)
@@ -0,0 +1,208 @@
+"""
+Completeness Checks and Targeted Refetch
+
+Compares a stored hourly dataset (see DATASETS in core/data_query.py) with the hours it
+should contain and re-downloads only what is missing:
+
+1) Expected hours: every UTC hour between local midnight (America/Edmonton) of the first
+   day and local midnight after the last day, so DST days have 23 or 25 hours
+2) Stored hours: the distinct UTC hours found in the annual files (read with DataQuery,
+   only the time columns of the requested range are parsed)
+3) Gaps: missing hours are grouped into MPT dates and consecutive dates are merged into
+   the fewest refetch windows the endpoint allows (never crossing a calendar year, since
+   every year is stored in its own file)
+4) Repair: each window is fetched and upserted into the annual file on the endpoint's
+   natural key (src/storage.py, only the rows of the window are parsed). Merit order rows
+   get their asset_key like in the pipeline, and the derived stores of the file (hourly
+   series, rollups, run-length merit order store) are updated as after a normal run
+
+    from src.completeness import find_gaps, repair_gaps
+    report = find_gaps('pool_price', '2023-01-01', '2023-12-31', base_dir=output_folder)
+    repair_gaps(report, api_config)
+"""
+
+import os
+import copy
+import datetime
+
+import pandas as pd
+
+from core.data_query import DataQuery, DATASETS
+from src.window_planner import fetch_range, is_range_request
+from src.hourly_calendar import hourly_calendar
+
+MPT_TIMEZONE = 'America/Edmonton'
+
+# Endpoint (config/api_endpoints.json) that produces each stored dataset
+DATASET_ENDPOINTS = {
+    'pool_price': 'Historical_Pool_Price_Date',
+    'spot_price': 'Historical_Pool_Price_Date_And_Range',
+    'ail_demand': 'AIL_Demand',
+    'merit_order': 'Merit_Order_Data',
+}
+
+#------------------------------------------------------
+def _to_date(value):
+    return pd.Timestamp(value).date()
+
+def expected_hours_utc(start_date, end_date):
+    """
+    UTC hour starts covering the MPT days start_date..end_date (DST aware)
+
+    Returns:
+        DatetimeIndex: Naive UTC timestamps
+    """
+    first = pd.Timestamp(_to_date(start_date)).tz_localize(MPT_TIMEZONE).tz_convert('UTC')
+    last = pd.Timestamp(_to_date(end_date) + datetime.timedelta(days=1)).tz_localize(MPT_TIMEZONE).tz_convert('UTC')
+    return pd.date_range(first, last, freq='h', inclusive='left').tz_localize(None)
+
+def stored_hours_utc(dataset, start_date, end_date, base_dir=None):
+    """
+    Distinct UTC hours stored for the MPT days start_date..end_date
+
+    Returns:
+        DatetimeIndex: Naive UTC timestamps
+    """
+    spec = DATASETS[dataset]
+    df = DataQuery(base_dir).query(dataset, str(_to_date(start_date)), str(_to_date(end_date)), columns=[])
+    if df.empty:
+        return pd.DatetimeIndex([])
+    hours = hourly_calendar.to_datetime(df[spec['utc_column']].astype(str).str.slice(0, 16))
+    return pd.DatetimeIndex(hours.unique()).sort_values()
+
+def utc_to_mpt_date(hours_utc):
+    """
+    Returns:
+        list: Sorted distinct MPT dates of the given naive UTC hours
+    """
+    if len(hours_utc) == 0:
+        return []
+    local = pd.DatetimeIndex(hours_utc).tz_localize('UTC').tz_convert(MPT_TIMEZONE)
+    return sorted(set(local.date))
+
+def coalesce_dates(dates, window_days=None):
+    """
+    Merge dates into the fewest (start, end) windows
+
+    Consecutive dates are merged; windows are split at year boundaries and at window_days.
+
+    Returns:
+        list: (window_start, window_end) date tuples, both inclusive
+    """
+    windows = []
+    for day in sorted(dates):
+        if windows:
+            window_start, window_end = windows[-1]
+            fits = window_days is None or (day - window_start).days < window_days
+            if day == window_end + datetime.timedelta(days=1) and day.year == window_start.year and fits:
+                windows[-1] = (window_start, day)
+                continue
+        windows.append((day, day))
+    return windows
+#------------------------------------------------------
+def find_gaps(dataset, start_date, end_date, base_dir=None, window_days=None):
+    """
+    Compare a stored dataset with its expected hourly index
+
+    Args:
+        dataset: Dataset name (see DATASETS in core/data_query.py)
+        start_date: First MPT date
+        end_date: Last MPT date (inclusive)
+        base_dir: Output folder holding the dataset sub folders
+        window_days: Largest refetch window in days (None = no limit besides calendar years)
+
+    Returns:
+        dict: dataset, expected_hours, stored_hours, missing_hours (DatetimeIndex, UTC),
+              missing_dates (MPT dates) and windows (refetch windows)
+    """
+    expected = expected_hours_utc(start_date, end_date)
+    stored = stored_hours_utc(dataset, start_date, end_date, base_dir)
+    missing = expected.difference(stored)
+    missing_dates = utc_to_mpt_date(missing)
+    return {
+        'dataset': dataset,
+        'base_dir': base_dir,
+        'expected_hours': len(expected),
+        'stored_hours': len(expected.intersection(stored)),
+        'missing_hours': missing,
+        'missing_dates': missing_dates,
+        'windows': coalesce_dates(missing_dates, window_days),
+    }
+
+def print_gap_report(report):
+    print(f"{report['dataset']}: {report['stored_hours']}/{report['expected_hours']} hours stored, "
+          f"{len(report['missing_hours'])} missing in {len(report['windows'])} window(s)")
+    for window_start, window_end in report['windows']:
+        print(f"    {window_start} .. {window_end}")
+#------------------------------------------------------
+def _fetch_window(api_config, window_start, window_end, max_workers):
+    if is_range_request(api_config):
+        return fetch_range(api_config, window_start, window_end, max_workers=max_workers)
+    # Daily endpoints return one day per request
+    frames = []
+    day = window_start
+    while day <= window_end:
+        df = fetch_range(copy.deepcopy(api_config), day.strftime('%Y-%m-%d'), day.strftime('%Y-%m-%d'))
+        if df is not None:
+            frames.append(df)
+        day += datetime.timedelta(days=1)
+    return pd.concat(frames, ignore_index=True) if frames else None
+
+def merge_hours(path, fetched, api_config, utc_column):
+    """
+    Upsert refetched rows into the annual file at path and update its derived stores
+
+    Args:
+        path: Annual csv file
+        fetched: Refetched rows
+        api_config: Resolved API call dictionary of the dataset's endpoint (natural_key, column_order)
+        utc_column: Time column of the dataset, the key when the endpoint declares none
+
+    Returns:
+        DataFrame: The rows that were written
+    """
+    from src.utilities import save_dataframe_to_csv
+    from src.asset_dimension import load_asset_dimension, KEY_COLUMN
+    from src.hourly_series_store import update_hourly_series
+    from src.rollups import update_rollups
+    from src.merit_order_runs import update_merit_order_runs
+
+    if 'asset_ID' in fetched.columns and api_config.get('category_key') == 'Merit_Order_Data':
+        # Stored merit order blocks carry the int32 key of Asset List/asset_dimension.csv
+        asset_dimension = load_asset_dimension(os.path.dirname(os.path.dirname(path)))
+        fetched = fetched.assign(**{KEY_COLUMN: asset_dimension.encode(fetched['asset_ID'])})
+        column_order = api_config.get('column_order')
+        if column_order:
+            fetched = fetched.reindex(columns=list(column_order) + [KEY_COLUMN])
+
+    save_dataframe_to_csv(fetched, path, api_config.get('natural_key') or [utc_column])
+    update_hourly_series(api_config, fetched, path)
+    update_rollups(api_config, fetched, path)
+    update_merit_order_runs(api_config, path)
+    return fetched
+
+def repair_gaps(report, api_config, max_workers=4):
+    """
+    Refetch the windows of a find_gaps() report and merge them into the annual files
+
+    Args:
+        report: Result of find_gaps()
+        api_config: Resolved API call dictionary of the dataset's endpoint
+        max_workers: Windows fetched concurrently
+
+    Returns:
+        list: (window_start, window_end, rows) for every refetched window (rows None on failure)
+    """
+    spec = DATASETS[report['dataset']]
+    base_dir = report['base_dir'] or str(DataQuery().base_dir)
+    results = []
+    for window_start, window_end in report['windows']:
+        print(f"Refetching {report['dataset']} {window_start}..{window_end}")
+        fetched = _fetch_window(api_config, window_start, window_end, max_workers)
+        if fetched is None or fetched.empty:
+            results.append((window_start, window_end, None))
+            continue
+        path = os.path.join(base_dir, spec['sub_folder'], spec['file_pattern'].format(year=window_start.year))
+        merge_hours(path, fetched, api_config, spec['utc_column'])
+        results.append((window_start, window_end, len(fetched)))
+    return results
@@ -0,0 +1,329 @@
+"""
+Current Supply Demand (CSD) Snapshot Poller
+
+report/v1/csd/summary/current only returns the current snapshot, and
+final_processing_supply_demand_data overwrites its csv files, so no history is kept.
+CsdSnapshotPoller samples the endpoint on a fixed cadence and keeps a compact history
+of its three lists:
+
+    generation   generation_data_list, one row per fuel_type
+    interties    interchange_list, one row per path
+    summary      the scalar fields of the report, one row
+
+Each poll makes one request and hands the response to the normalizers of the three
+Supply_Demand_Data_* endpoints. Every row is compared with the last stored state of
+its key (snapshot_key in config/api_endpoints.json) and only rows that changed are
+stored, with op 'u'. Rows that disappear from the snapshot are stored with op 'd'.
+The deltas are appended to monthly gzip csv files:
+
+    Supply and Demand/CSD History/csd_{list}_{yyyy-mm}.csv.gz
+        snapshot_utc, op, <key columns>, <value columns>
+    Supply and Demand/CSD History/csd_polls_{yyyy-mm}.csv.gz
+        poll_utc, snapshot_utc, status, changed rows per list
+
+The first poll of every month stores the full state, so each monthly file can be
+read on its own. Deltas are buffered and written as one gzip member every
+flush_seconds, because many tiny members compress poorly. A month of minute polls
+takes a few MB. read_history() and snapshot_at() rebuild the snapshots.
+
+    python -m src.cli poll-csd --interval 60
+"""
+
+import io
+import os
+import csv
+import gzip
+import time
+import datetime
+
+import pandas as pd
+
+from src.logging_tools import get_logger
+
+logger = get_logger('csd_poller')
+
+HISTORY_SUB_FOLDER = os.path.join('Supply and Demand', 'CSD History')
+HISTORY_FILE_TEMPLATE = 'csd_{name}_{month}.csv.gz'
+SNAPSHOT_ENDPOINTS = {
+    'generation': 'Supply_Demand_Data_Generation',
+    'interties': 'Supply_Demand_Data_Interties',
+    'summary': 'Supply_Demand_Data_Summary',
+}
+# Fields that change on every poll; they become snapshot_utc instead of being compared
+SNAPSHOT_TIME_COLUMNS = ('last_updated_datetime_utc', 'last_updated_datetime_mpt')
+DEFAULT_INTERVAL_SECONDS = 60
+DEFAULT_FLUSH_SECONDS = 600
+
+#------------------------------------------------------
+def history_path(output_folder, name, month):
+    """
+    Returns:
+        str: Monthly history file of one list ('generation', 'interties', 'summary' or 'polls')
+    """
+    return os.path.join(output_folder, HISTORY_SUB_FOLDER, HISTORY_FILE_TEMPLATE.format(name=name, month=month))
+
+def _append_gzip(path, header, rows):
+    # Every call adds one gzip member; readers see the members as one file
+    new_file = not os.path.exists(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    if new_file:
+        writer.writerow(header)
+    writer.writerows(rows)
+    with gzip.open(path, 'at', encoding='utf-8', newline='') as f:
+        f.write(buffer.getvalue())
+
+def _read_gzip_csv(path):
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path, dtype=str, keep_default_na=False, compression='gzip')
+
+
+class SnapshotDeltaStore:
+    """
+    Last known state of one list and the deltas not yet written
+    """
+
+    def __init__(self, name, key_columns):
+        """
+        Args:
+            name: List name, e.g. 'generation'
+            key_columns: Columns identifying a row (empty for single-row lists)
+        """
+        self.name = name
+        self.key_columns = list(key_columns)
+        self.value_columns = None
+        self.state = {}
+        self.pending = []
+        # Write every row on the next diff, not just the changed ones
+        self.keyframe = False
+
+    @property
+    def header(self):
+        return ['snapshot_utc', 'op'] + self.key_columns + self.value_columns
+
+    def load(self, path):
+        """
+        Rebuild the state from a monthly history file (after a restart)
+        """
+        history = _read_gzip_csv(path)
+        self.state = {}
+        if history is None or history.empty:
+            return
+        self.value_columns = [c for c in history.columns if c not in ['snapshot_utc', 'op'] + self.key_columns]
+        for values in history.itertuples(index=False, name=None):
+            row = dict(zip(history.columns, values))
+            key = tuple(row[c] for c in self.key_columns)
+            if row['op'] == 'd':
+                self.state.pop(key, None)
+            else:
+                self.state[key] = tuple(row[c] for c in self.value_columns)
+
+    def diff(self, df, snapshot_utc):
+        """
+        Compare a snapshot with the state and queue the changed rows
+
+        Returns:
+            int: Number of changed rows
+        """
+        df = df.drop(columns=[c for c in SNAPSHOT_TIME_COLUMNS if c in df.columns])
+        df = df.fillna('').astype(str)
+        if self.value_columns is None:
+            self.value_columns = [c for c in df.columns if c not in self.key_columns]
+        new_columns = [c for c in df.columns if c not in self.key_columns + self.value_columns]
+        if new_columns:
+            logger.warning("Ignoring new %s columns %s (not in the history file header)", self.name, new_columns)
+        df = df.reindex(columns=self.key_columns + self.value_columns, fill_value='')
+
+        seen = set()
+        changed = 0
+        for row in df.itertuples(index=False, name=None):
+            key = tuple(row[:len(self.key_columns)])
+            values = tuple(row[len(self.key_columns):])
+            seen.add(key)
+            if self.keyframe or self.state.get(key) != values:
+                self.state[key] = values
+                self.pending.append([snapshot_utc, 'u', *key, *values])
+                changed += 1
+        for key in [key for key in self.state if key not in seen]:
+            del self.state[key]
+            self.pending.append([snapshot_utc, 'd', *key] + [''] * len(self.value_columns))
+            changed += 1
+        self.keyframe = False
+        return changed
+
+    def flush(self, path):
+        if self.pending:
+            _append_gzip(path, self.header, self.pending)
+            self.pending = []
+
+
+class CsdSnapshotPoller:
+    """
+    Polls the CSD summary endpoint and appends the changes to the monthly history files
+    """
+
+    def __init__(self, output_folder, interval_seconds=DEFAULT_INTERVAL_SECONDS,
+                 flush_seconds=DEFAULT_FLUSH_SECONDS, service='AESO_NEW'):
+        """
+        Args:
+            output_folder: Output folder holding the 'Supply and Demand' sub folder (None = from .env)
+            interval_seconds: Seconds between polls
+            flush_seconds: Seconds between writes of the buffered deltas
+            service: Service whose credentials are used
+        """
+        from src.pipeline import resolve_endpoint_config
+        today = datetime.date.today()
+        self.api_configs = {}
+        for name, category_key in SNAPSHOT_ENDPOINTS.items():
+            self.api_configs[name], output_folder_resolved = resolve_endpoint_config(category_key, today, today,
+                                                                                     service, output_folder)
+        self.output_folder = output_folder_resolved
+        self.interval_seconds = interval_seconds
+        self.flush_seconds = flush_seconds
+        self.stores = {name: SnapshotDeltaStore(name, config.get('snapshot_key') or [])
+                       for name, config in self.api_configs.items()}
+        self.polls = []
+        self.month = None
+        self._last_flush = time.monotonic()
+
+    def _start_month(self, month):
+        # The first poll of a month writes every row (and the rows that disappeared since the
+        # previous month), so monthly files can be read on their own
+        self.flush()
+        previous_month = (datetime.date.fromisoformat(f"{month}-01") - datetime.timedelta(days=1)).strftime('%Y-%m')
+        for name, store in self.stores.items():
+            path = history_path(self.output_folder, name, month)
+            if os.path.exists(path):
+                # Restart within the month
+                store.load(path)
+                continue
+            if not store.state:
+                store.load(history_path(self.output_folder, name, previous_month))
+            store.keyframe = True
+        self.month = month
+
+    def poll_once(self):
+        """
+        Make one request and queue the changes of all three lists
+
+        Returns:
+            dict: Changed rows per list (empty if the request failed)
+        """
+        import src.utilities as utilities
+        poll_utc = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        month = poll_utc[:7]
+        if month != self.month:
+            self._start_month(month)
+
+        response = None
+        try:
+            response = utilities.fetch_response(self.api_configs['summary'], None, None)
+        except Exception as e:
+            logger.error("CSD request failed: %s", e)
+        if response is None or response[0] != 200:
+            self.polls.append([poll_utc, '', 'failed', '', '', ''])
+            return {}
+
+        # One response, three normalizers
+        frames = {name: utilities.process_response(config, *response) for name, config in self.api_configs.items()}
+        summary = frames.get('summary')
+        snapshot_utc = poll_utc[:16]
+        if summary is not None and 'last_updated_datetime_utc' in summary.columns:
+            snapshot_utc = str(summary['last_updated_datetime_utc'].iloc[0])
+
+        changes = {}
+        for name, df in frames.items():
+            if df is None:
+                logger.warning("CSD %s list could not be normalized", name)
+                continue
+            changes[name] = self.stores[name].diff(df, snapshot_utc)
+        self.polls.append([poll_utc, snapshot_utc, 'ok'] + [changes.get(name, '') for name in SNAPSHOT_ENDPOINTS])
+        logger.info("CSD snapshot %s: changed rows %s", snapshot_utc, changes)
+
+        if time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+        return changes
+
+    def flush(self):
+        """
+        Append the buffered deltas and poll log to the history files
+        """
+        if self.month is None:
+            return
+        for name, store in self.stores.items():
+            store.flush(history_path(self.output_folder, name, self.month))
+        if self.polls:
+            _append_gzip(history_path(self.output_folder, 'polls', self.month),
+                         ['poll_utc', 'snapshot_utc', 'status'] + list(SNAPSHOT_ENDPOINTS), self.polls)
+            self.polls = []
+        self._last_flush = time.monotonic()
+
+    def run(self, count=None):
+        """
+        Poll every interval_seconds until count polls were made (forever if None) or Ctrl+C
+
+        Returns:
+            int: Number of polls made
+        """
+        polls = 0
+        next_poll = time.monotonic()
+        print(f"Polling CSD every {self.interval_seconds} s into {os.path.join(self.output_folder, HISTORY_SUB_FOLDER)}")
+        try:
+            while count is None or polls < count:
+                self.poll_once()
+                polls += 1
+                if count is not None and polls >= count:
+                    break
+                # Fixed cadence: the next poll is scheduled from the previous one, not from when it finished
+                next_poll += self.interval_seconds
+                time.sleep(max(0.0, next_poll - time.monotonic()))
+        except KeyboardInterrupt:
+            print("Stopping CSD poller")
+        finally:
+            self.flush()
+        return polls
+#------------------------------------------------------
+def read_history(output_folder, name, months=None):
+    """
+    Read the stored deltas of one list
+
+    Args:
+        output_folder: Output folder holding the 'Supply and Demand' sub folder
+        name: 'generation', 'interties', 'summary' or 'polls'
+        months: Optional list of 'yyyy-mm' strings (default: all months)
+
+    Returns:
+        DataFrame: Deltas in time order (all values as text)
+    """
+    folder = os.path.join(output_folder, HISTORY_SUB_FOLDER)
+    prefix = f"csd_{name}_"
+    files = sorted(f for f in os.listdir(folder) if f.startswith(prefix) and f.endswith('.csv.gz')) \
+        if os.path.isdir(folder) else []
+    if months is not None:
+        files = [f for f in files if f[len(prefix):len(prefix) + 7] in months]
+    frames = [_read_gzip_csv(os.path.join(folder, f)) for f in files]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+def snapshot_at(history, key_columns, snapshot_utc):
+    """
+    Rebuild a list as it was at a point in time from read_history()
+
+    Args:
+        history: Deltas of one list
+        key_columns: snapshot_key of the list
+        snapshot_utc: 'YYYY-MM-DD HH:MM' (UTC)
+
+    Returns:
+        DataFrame: Rows of the list at that time
+    """
+    history = history[history['snapshot_utc'] <= snapshot_utc]
+    if key_columns:
+        latest = history.drop_duplicates(subset=key_columns, keep='last')
+    else:
+        latest = history.tail(1)
+    latest = latest[latest['op'] != 'd']
+    return latest.drop(columns=['snapshot_utc', 'op']).reset_index(drop=True)
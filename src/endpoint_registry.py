@@ -0,0 +1,230 @@
+"""
+Declarative Endpoint Registry
+
+The API calls are described in config/api_endpoints.json instead of being built as one
+large nested dictionary on every run. Each entry is a template; values in {braces}
+are filled in when the endpoint is resolved:
+
+    {aeso_key} {base_url} {output_folder} {year} {start_date} {end_date}
+    {explicit_end_date} {str_start_date} {str_explicit_end_date}
+    {operating_status} {asset_type}
+
+The file is read on first use and endpoints are only resolved into an api_config
+dictionary (the same keys fetch_data and the final_processing_* functions expect)
+when their activation flag is switched on. Adding an endpoint only means adding
+an entry to the JSON file.
+
+Endpoints whose url and params templates are identical (e.g. the three CSD summary
+endpoints) form a request group, so a run can fetch the response once and hand it to
+each endpoint's normalizer (see src/request_coalescer.py).
+"""
+
+import os
+import json
+import copy
+import datetime
+
+ENDPOINT_CONFIG_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                    'config', 'api_endpoints.json')
+
+# Entry fields whose strings are formatted with the request context
+TEMPLATE_FIELDS = ('headers', 'params', 'api_url', 'file_name_template', 'output_csv_files',
+                   'output_consolidated_csv_files')
+
+REQUIRED_FIELDS = ('function_name', 'data_type', 'api_url', 'sub_folder_template', 'file_name_template',
+                   'output_csv_files', 'activation_key')
+
+#------------------------------------------------------
+def _format_template(value, context):
+    if isinstance(value, str):
+        return value.format_map(context)
+    if isinstance(value, dict):
+        return {key: _format_template(item, context) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_format_template(item, context) for item in value]
+    return value
+
+
+class EndpointSpec:
+    """
+    One API call as declared in the endpoint config file
+    """
+
+    def __init__(self, service: str, category_key: str, entry: dict):
+        """
+        Args:
+            service: Service name, e.g. 'NEW_AESO'
+            category_key: Endpoint name, e.g. 'Merit_Order_Data'
+            entry: Raw entry from the config file
+        """
+        missing = [field for field in REQUIRED_FIELDS if field not in entry]
+        if missing:
+            raise ValueError(f"Endpoint '{category_key}' is missing {missing} in {ENDPOINT_CONFIG_FILE}")
+        self.service: str = service
+        self.category_key: str = category_key
+        self.function_name: str = entry['function_name']
+        self.data_type: str = entry['data_type']
+        self.activation_key: str = entry['activation_key']
+        self.reporting_limit: int | None = entry.get('reporting_limit')
+        self.max_window_days: int | None = entry.get('max_window_days') or self.reporting_limit
+        self.consolidate_files: bool = entry.get('consolidate_files', False)
+        self.special_note: str = entry.get('special_note', '')
+        # Endpoints making the same request (same url and params), set by EndpointRegistry
+        self.request_group: tuple = ()
+        self._entry = entry
+
+    def __repr__(self):
+        return f"EndpointSpec({self.service}/{self.category_key}, {self.function_name})"
+
+    @property
+    def request_key(self):
+        """
+        Unformatted url and params; endpoints with the same key make identical requests
+        """
+        return self._entry['api_url'], json.dumps(self._entry.get('params') or {}, sort_keys=True)
+
+    def is_enabled(self, api_activation_dict):
+        """
+        Returns:
+            bool: True if the endpoint's activation flag is switched on
+        """
+        return bool(api_activation_dict.get(self.activation_key, False))
+
+    @property
+    def is_daily(self):
+        """
+        Time series endpoints that only take a startDate return one day per request
+        """
+        params = self._entry.get('params') or {}
+        return self.data_type == 'time series' and 'endDate' not in params
+
+    def plan_windows(self, start_date, end_date):
+        """
+        Request windows needed to cover a date range
+
+        List endpoints need a single request, daily endpoints one request per day and
+        range endpoints one request per calendar year (split further by max_window_days).
+        fetch_range() in src/window_planner.py may shrink windows further at run time.
+
+        Args:
+            start_date: First date (datetime.date)
+            end_date: Last date, inclusive (datetime.date)
+
+        Returns:
+            list: (window_start, window_end) date tuples, (None, None) for list endpoints
+        """
+        if self.data_type != 'time series':
+            return [(None, None)]
+        one_day = datetime.timedelta(days=1)
+        if self.is_daily:
+            return [(start_date + one_day * i, start_date + one_day * i) for i in range((end_date - start_date).days + 1)]
+        windows = []
+        for year in range(start_date.year, end_date.year + 1):
+            window_start = max(start_date, datetime.date(year, 1, 1))
+            year_end = min(end_date, datetime.date(year, 12, 31))
+            while window_start <= year_end:
+                window_end = year_end
+                if self.max_window_days:
+                    window_end = min(year_end, window_start + one_day * (int(self.max_window_days) - 1))
+                windows.append((window_start, window_end))
+                window_start = window_end + one_day
+        return windows
+
+    def resolve(self, context, run_option=True):
+        """
+        Build the api_config dictionary for this endpoint
+
+        Args:
+            context: Dict with the template values (see module docstring)
+            run_option: Value stored under 'run_option'
+
+        Returns:
+            dict: api_config in the format used by fetch_data and the final_processing_* functions
+        """
+        context = {key: '' if value is None and key != 'year' else str(value) for key, value in context.items()}
+        api_config = copy.deepcopy(self._entry)
+        api_config.pop('activation_key')
+        for field in TEMPLATE_FIELDS:
+            if field in api_config:
+                api_config[field] = _format_template(api_config[field], context)
+        api_config['run_option'] = run_option
+        api_config['category_key'] = self.category_key
+        # Lets src/request_coalescer.py share one response between the endpoints of the group
+        api_config['request_group'] = list(self.request_group)
+        return api_config
+
+
+class EndpointRegistry:
+    """
+    Endpoint specs loaded on first use from the endpoint config file
+    """
+
+    def __init__(self, config_file=None):
+        self.config_file = config_file or ENDPOINT_CONFIG_FILE
+        self._specs = None
+
+    @property
+    def specs(self):
+        if self._specs is None:
+            self._specs = self._load()
+        return self._specs
+
+    def _load(self):
+        with open(self.config_file, 'r') as f:
+            config = json.load(f)
+        specs = {}
+        for service, endpoints in config.items():
+            for category_key, entry in endpoints.items():
+                specs[(service, category_key)] = EndpointSpec(service, category_key, entry)
+        # Group endpoints that request the same url with the same params
+        groups = {}
+        for spec in specs.values():
+            groups.setdefault((spec.service,) + spec.request_key, []).append(spec)
+        for members in groups.values():
+            if len(members) > 1:
+                for spec in members:
+                    spec.request_group = tuple(member.category_key for member in members)
+        return specs
+
+    #------------------------------------------------------
+    def endpoints(self, service=None):
+        """
+        Args:
+            service: Optional service name to filter on
+
+        Returns:
+            list: EndpointSpec objects in config file order
+        """
+        return [spec for spec in self.specs.values() if service is None or spec.service == service]
+
+    def get(self, category_key, service='NEW_AESO'):
+        """
+        Returns:
+            EndpointSpec: Spec for the endpoint (KeyError if it is not declared)
+        """
+        try:
+            return self.specs[(service, category_key)]
+        except KeyError:
+            raise KeyError(f"Unknown endpoint '{category_key}' for service '{service}'. "
+                           f"Available: {[spec.category_key for spec in self.endpoints(service)]}")
+
+    def request_groups(self, service=None):
+        """
+        Returns:
+            list: Tuples of endpoint names that make identical requests
+        """
+        groups = []
+        for spec in self.endpoints(service):
+            if spec.request_group and spec.request_group not in groups:
+                groups.append(spec.request_group)
+        return groups
+
+    def enabled(self, api_activation_dict, service=None):
+        """
+        Returns:
+            list: EndpointSpec objects whose activation flag is switched on
+        """
+        return [spec for spec in self.endpoints(service) if spec.is_enabled(api_activation_dict)]
+
+# Create singleton instance
+endpoint_registry = EndpointRegistry()
@@ -0,0 +1,180 @@
+"""
+Fetch / Normalize / Write Pipeline for Daily Endpoints
+
+Daily endpoints (merit order, metered volumes) make one request per day. Done in a
+plain loop, every day waits for its network round trip and then for the CPU bound
+decode and normalization in preliminary_processing_data before the next request
+starts, so a year costs network + CPU. run_daily_pipeline() runs the stages side by side:
+
+    fetch (asyncio, fetch_concurrency requests)  ->  bounded queue  ->
+    normalize (normalize_workers threads)        ->  writer (day order)
+
+1) The fetch stage runs fetch_response() for up to fetch_concurrency days at a time.
+   The blocking urllib calls run in threads, so they wait on the network without
+   holding the GIL
+2) Raw responses go through a queue of at most queue_size entries to a pool of
+   normalize workers running process_response()
+3) The writer hands each normalized day to write(day, df) in day order, so annual
+   files stay time sorted. Days without rows (failed or empty) are not written
+
+Backpressure: a day takes a slot before it is fetched and gives it back once it is
+written, and there are at most max_in_flight slots. A slow writer or normalizer
+therefore stops new requests instead of letting responses pile up in memory, and the
+reorder buffer for days that finish out of order never holds more than max_in_flight
+frames. With the network and normalization overlapped a daily loop takes about
+max(network, CPU) instead of their sum.
+"""
+
+import copy
+import asyncio
+import datetime
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from src.logging_tools import get_logger
+
+logger = get_logger('fetch_pipeline')
+
+DEFAULT_FETCH_CONCURRENCY = 4
+DEFAULT_NORMALIZE_WORKERS = 1
+DEFAULT_QUEUE_SIZE = 4
+
+#------------------------------------------------------
+def daily_dates(start_date, end_date):
+    """
+    Returns:
+        list: Every date from start_date to end_date (inclusive)
+    """
+    days = []
+    while start_date <= end_date:
+        days.append(start_date)
+        start_date += datetime.timedelta(days=1)
+    return days
+
+def pipeline_options(api_config):
+    """
+    Pipeline settings declared for an endpoint in config/api_endpoints.json
+
+    Returns:
+        dict: fetch_concurrency, normalize_workers and queue_size
+    """
+    return {
+        'fetch_concurrency': int(api_config.get('fetch_concurrency') or DEFAULT_FETCH_CONCURRENCY),
+        'normalize_workers': int(api_config.get('normalize_workers') or DEFAULT_NORMALIZE_WORKERS),
+        'queue_size': int(api_config.get('pipeline_queue_size') or DEFAULT_QUEUE_SIZE),
+    }
+#------------------------------------------------------
+def _fetch(api_config, day, end_date):
+    import src.utilities as utilities
+    # fetch_response writes the request dates into api_config['params'], so every day gets its own copy
+    return utilities.fetch_response(copy.deepcopy(api_config), day, end_date)
+
+def _normalize(api_config, response):
+    import src.utilities as utilities
+    return utilities.process_response(api_config, *response)
+
+
+async def _run(api_config, days, end_date, write, fetch_concurrency, normalize_workers, queue_size, max_in_flight):
+    loop = asyncio.get_running_loop()
+    raw_queue = asyncio.Queue(maxsize=queue_size)
+    normalized_queue = asyncio.Queue()
+    slots = asyncio.Semaphore(max_in_flight)
+    requests = asyncio.Semaphore(fetch_concurrency)
+    stats = {'days': len(days), 'written': 0, 'failed': [], 'rows': 0}
+
+    async def fetch_day(index, day):
+        async with requests:
+            try:
+                # to_thread copies the context, so run_report spans keep the endpoint/window
+                response = await asyncio.to_thread(_fetch, api_config, day, end_date)
+            except Exception as e:
+                logger.error("Request for %s failed: %s", day, e)
+                response = None
+        await raw_queue.put((index, day, response))
+
+    async def produce():
+        tasks = []
+        for index, day in enumerate(days):
+            await slots.acquire()
+            tasks.append(asyncio.create_task(fetch_day(index, day)))
+        await asyncio.gather(*tasks)
+
+    async def normalize(executor):
+        while True:
+            index, day, response = await raw_queue.get()
+            df = None
+            if response is not None:
+                try:
+                    df = await loop.run_in_executor(executor, contextvars.copy_context().run,
+                                                    _normalize, api_config, response)
+                except Exception as e:
+                    logger.error("Normalizing %s failed: %s", day, e)
+            raw_queue.task_done()
+            await normalized_queue.put((index, day, df))
+
+    async def write_in_order():
+        pending = {}
+        next_index = 0
+        while next_index < len(days):
+            index, day, df = await normalized_queue.get()
+            pending[index] = (day, df)
+            while next_index in pending:
+                day, df = pending.pop(next_index)
+                if df is None or df.empty:
+                    stats['failed'].append(day)
+                else:
+                    # write() runs in a thread so the fetch and normalize stages keep going meanwhile
+                    await asyncio.to_thread(write, day, df)
+                    stats['written'] += 1
+                    stats['rows'] += len(df)
+                slots.release()
+                next_index += 1
+
+    with ThreadPoolExecutor(max_workers=normalize_workers) as executor:
+        normalizers = [asyncio.create_task(normalize(executor)) for _ in range(normalize_workers)]
+        producer = asyncio.create_task(produce())
+        try:
+            await write_in_order()
+            await producer
+        finally:
+            producer.cancel()
+            for task in normalizers:
+                task.cancel()
+            await asyncio.gather(producer, *normalizers, return_exceptions=True)
+    return stats
+
+def run_daily_pipeline(api_config, start_date, end_date, write, fetch_concurrency=None, normalize_workers=None,
+                       queue_size=None, max_in_flight=None):
+    """
+    Fetch, normalize and write one response per day from start_date to end_date
+
+    Args:
+        api_config: API call dictionary of a daily endpoint
+        start_date: First date (datetime.date)
+        end_date: Last date, inclusive (datetime.date)
+        write: Called as write(day, df) for every day that returned rows, in day order. An
+               exception raised by write stops the pipeline and is raised again
+        fetch_concurrency: Requests in flight at once (default from the endpoint config)
+        normalize_workers: Threads running process_response() (default from the endpoint config)
+        queue_size: Raw responses allowed to wait for a normalize worker
+        max_in_flight: Days fetched but not yet written (default fetch_concurrency + queue_size + normalize_workers)
+
+    Returns:
+        dict: days, written, rows and failed (dates that returned no data)
+    """
+    options = pipeline_options(api_config)
+    fetch_concurrency = fetch_concurrency or options['fetch_concurrency']
+    normalize_workers = normalize_workers or options['normalize_workers']
+    queue_size = queue_size or options['queue_size']
+    max_in_flight = max_in_flight or fetch_concurrency + queue_size + normalize_workers
+
+    days = daily_dates(start_date, end_date)
+    if not days:
+        return {'days': 0, 'written': 0, 'failed': [], 'rows': 0}
+    stats = asyncio.run(_run(api_config, days, end_date, write, fetch_concurrency, normalize_workers,
+                             queue_size, max_in_flight))
+    if stats['failed']:
+        logger.warning("%s of %s days returned no data: %s", len(stats['failed']), len(days),
+                       ', '.join(str(day) for day in stats['failed']))
+    logger.info("Pipeline wrote %s rows for %s of %s days", stats['rows'], stats['written'], len(days))
+    return stats
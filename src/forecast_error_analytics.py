@@ -0,0 +1,371 @@
+"""
+Pool Price Forecast Error Analytics
+
+Reusable version of test_code/spot_forcast_error.py that works over the stored
+pool price dataset (Historical Pool Price/pool_price_data_{year}.csv):
+
+1) All rolling windows (5 day and 30 day mean/std of pool_price) are computed in one
+   pass from a single set of cumulative sums over the hourly series.
+2) Results are cached per year in forecast_error/forecast_error_{year}.csv together
+   with a manifest of the source files they were computed from. Only years whose
+   source (or a neighbouring year's source) changed are recomputed.
+3) append_day() adds a new day of hourly prices and updates the rolling statistics
+   from the trailing 30 days of cached data instead of recomputing from 2000.
+
+The forecast error is the difference between the current period forecast and the
+next period actual, as in the original script:
+
+    forecast_error = forecast_pool_price.shift(-1) - pool_price
+"""
+
+import os
+import re
+import glob
+import json
+import numpy as np
+import pandas as pd
+
+from src.hourly_calendar import hourly_calendar
+from src.storage import file_signature
+
+POOL_PRICE_SUB_FOLDER = 'Historical Pool Price'
+POOL_PRICE_FILE_PATTERN = 'pool_price_data_*.csv'
+CACHE_SUB_FOLDER = 'forecast_error'
+CACHE_FILE_TEMPLATE = 'forecast_error_{year}.csv'
+MANIFEST_FILE = 'forecast_error_manifest.json'
+
+UTC_COLUMN = 'begin_datetime_utc'
+MPT_COLUMN = 'begin_datetime_mpt'
+SOURCE_COLUMNS = [UTC_COLUMN, MPT_COLUMN, 'pool_price', 'forecast_pool_price']
+
+# Rolling windows in days, keyed by the label used in the column names
+ROLLING_WINDOWS = {'5day': 5, '30day': 30}
+CONTEXT_DAYS = max(ROLLING_WINDOWS.values())
+
+# Small constant that avoids division by zero in hours with a pool price of 0
+APE_EPSILON = 0.001
+
+_NS_PER_DAY = 86_400 * 1_000_000_000
+
+#------------------------------------------------------
+def compute_rolling_windows(times, values, windows=ROLLING_WINDOWS):
+    """
+    Time-based rolling mean and sample std for several windows in one pass
+
+    Matches pandas .rolling('{n}D') semantics: each window covers (t - n days, t] and
+    NaN values are ignored. The series is centred before the cumulative sums are
+    taken to keep the sum of squares numerically stable over 20+ years of data.
+
+    Args:
+        times: datetime64 array, sorted ascending
+        values: float array of the same length
+        windows: dict of label -> window length in days
+
+    Returns:
+        dict: {f'rolling_{label}_avg': ndarray, f'rolling_{label}_std': ndarray}
+    """
+    times_ns = np.asarray(times, dtype='datetime64[ns]').astype(np.int64)
+    values = np.asarray(values, dtype=np.float64)
+
+    valid = ~np.isnan(values)
+    centre = values[valid].mean() if valid.any() else 0.0
+    centred = np.where(valid, values - centre, 0.0)
+
+    # One set of prefix sums shared by every window
+    count_cum = np.concatenate(([0], np.cumsum(valid)))
+    sum_cum = np.concatenate(([0.0], np.cumsum(centred)))
+    sq_cum = np.concatenate(([0.0], np.cumsum(centred * centred)))
+
+    end = np.arange(1, len(values) + 1)
+    results = {}
+    for label, days in windows.items():
+        start = np.searchsorted(times_ns, times_ns - days * _NS_PER_DAY, side='right')
+        count = count_cum[end] - count_cum[start]
+        total = sum_cum[end] - sum_cum[start]
+        squares = sq_cum[end] - sq_cum[start]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+            variance = (squares - count * mean * mean) / (count - 1)
+        variance = np.where(variance < 0, 0.0, variance)
+
+        results[f'rolling_{label}_avg'] = np.where(count > 0, mean + centre, np.nan)
+        results[f'rolling_{label}_std'] = np.where(count > 1, np.sqrt(variance), np.nan)
+    return results
+#------------------------------------------------------
+def compute_forecast_error_frame(df):
+    """
+    Add rolling statistics and forecast error columns to an hourly pool price frame
+
+    Args:
+        df: DataFrame with begin_datetime_utc, begin_datetime_mpt, pool_price and
+            forecast_pool_price columns, sorted by begin_datetime_utc
+
+    Returns:
+        DataFrame: Copy of df with rolling_*, forecast_error, abs_error and ape columns
+    """
+    df = df.copy()
+    times = hourly_calendar.to_datetime(df[UTC_COLUMN], format='%Y-%m-%d %H:%M').to_numpy()
+    pool_price = pd.to_numeric(df['pool_price'], errors='coerce')
+    forecast = pd.to_numeric(df['forecast_pool_price'], errors='coerce')
+
+    for column, values in compute_rolling_windows(times, pool_price.to_numpy()).items():
+        df[column] = values
+
+    df['forecast_error'] = forecast.shift(-1) - pool_price
+    df['abs_error'] = df['forecast_error'].abs()
+    df['ape'] = df['abs_error'] / (pool_price + APE_EPSILON)
+    return df
+
+
+class ForecastErrorAnalytics:
+    """
+    Cached, incrementally updated forecast error analytics over stored pool prices
+    """
+
+    def __init__(self, directory, cache_directory=None):
+        """
+        Args:
+            directory: Folder containing pool_price_data_{year}.csv files
+            cache_directory: Folder for the per-year cache (default: directory/forecast_error)
+        """
+        self.directory = directory
+        self.cache_directory = cache_directory or os.path.join(directory, CACHE_SUB_FOLDER)
+        self.manifest_path = os.path.join(self.cache_directory, MANIFEST_FILE)
+        self.manifest = self._load_manifest()
+
+    #------------------------------------------------------
+    def _load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        return {}
+
+    def _save_manifest(self):
+        os.makedirs(self.cache_directory, exist_ok=True)
+        with open(self.manifest_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+
+    def source_partitions(self):
+        """
+        Returns:
+            dict: year -> path of each stored pool price partition
+        """
+        partitions = {}
+        for file_path in glob.glob(os.path.join(self.directory, POOL_PRICE_FILE_PATTERN)):
+            match = re.search(r'pool_price_data_(\d{4})\.csv$', file_path)
+            if match:
+                partitions[int(match.group(1))] = file_path
+        return dict(sorted(partitions.items()))
+
+    def cache_path(self, year):
+        return os.path.join(self.cache_directory, CACHE_FILE_TEMPLATE.format(year=year))
+
+    def _year_signature(self, partitions, year):
+        # A year's rolling windows look back into the previous year and its last forecast
+        # error looks ahead into the next year, so all three sources form its cache key
+        return {str(y): file_signature(partitions[y]) for y in (year - 1, year, year + 1) if y in partitions}
+
+    def _read_source(self, path):
+        df = pd.read_csv(path, usecols=lambda c: c in SOURCE_COLUMNS)
+        return df.sort_values(UTC_COLUMN, kind='stable').reset_index(drop=True)
+
+    #------------------------------------------------------
+    def stale_years(self, years=None):
+        """
+        Args:
+            years: Optional iterable of years to check (default: every stored year)
+
+        Returns:
+            list: Years whose cache is missing or out of date
+        """
+        partitions = self.source_partitions()
+        years = sorted(partitions) if years is None else [y for y in years if y in partitions]
+        return [
+            year for year in years
+            if not os.path.exists(self.cache_path(year))
+            or self.manifest.get(str(year)) != self._year_signature(partitions, year)
+        ]
+
+    def refresh(self, years=None):
+        """
+        Recompute the cache for stale years only
+
+        Args:
+            years: Optional iterable of years to refresh (default: every stored year)
+
+        Returns:
+            list: Years that were recomputed
+        """
+        partitions = self.source_partitions()
+        stale = self.stale_years(years)
+        for year in stale:
+            print(f"Computing forecast error analytics for {year}")
+            frames = []
+            if year - 1 in partitions:
+                previous = self._read_source(partitions[year - 1])
+                previous_times = hourly_calendar.to_datetime(previous[UTC_COLUMN])
+                cutoff = previous_times.max() - pd.Timedelta(days=CONTEXT_DAYS)
+                frames.append(previous[previous_times > cutoff])
+            current = self._read_source(partitions[year])
+            frames.append(current)
+            if year + 1 in partitions:
+                frames.append(self._read_source(partitions[year + 1]).head(1))
+
+            combined = compute_forecast_error_frame(pd.concat(frames, ignore_index=True))
+            result = combined[combined[UTC_COLUMN].isin(current[UTC_COLUMN])]
+
+            os.makedirs(self.cache_directory, exist_ok=True)
+            result.to_csv(self.cache_path(year), index=False)
+            self.manifest[str(year)] = self._year_signature(partitions, year)
+
+        if stale:
+            self._save_manifest()
+        return stale
+
+    def load(self, years=None):
+        """
+        Load cached analytics, refreshing stale years first
+
+        Args:
+            years: Optional iterable of years to load (default: every stored year)
+
+        Returns:
+            DataFrame: Hourly analytics indexed by begin_datetime_mpt
+        """
+        self.refresh(years)
+        partitions = self.source_partitions()
+        years = sorted(partitions) if years is None else [y for y in years if y in partitions]
+        frames = [pd.read_csv(self.cache_path(year)) for year in years]
+        df = pd.concat(frames, ignore_index=True)
+        df[MPT_COLUMN] = hourly_calendar.to_datetime(df[MPT_COLUMN], format='%Y-%m-%d %H:%M')
+        return df.set_index(MPT_COLUMN)
+
+    #------------------------------------------------------
+    def append_day(self, new_rows):
+        """
+        Append new hourly pool prices and update the rolling statistics incrementally
+
+        The new rows are appended to their annual pool_price_data_{year}.csv partition
+        (rows at or before the last stored hour are ignored). Rolling windows are then
+        computed from the trailing 30 days of cached data plus the new rows only.
+
+        Args:
+            new_rows: DataFrame with the pool price report columns for the new hours
+
+        Returns:
+            DataFrame: Analytics rows that were added to the cache
+        """
+        new_rows = new_rows[[c for c in SOURCE_COLUMNS if c in new_rows.columns]]
+        new_rows = new_rows.sort_values(UTC_COLUMN, kind='stable')
+        year = int(str(new_rows[MPT_COLUMN].iloc[0])[:4])
+
+        partitions = self.source_partitions()
+        source_path = partitions.get(year, os.path.join(self.directory, f'pool_price_data_{year}.csv'))
+
+        # Bring the cache up to date before extending it
+        if year in partitions:
+            self.refresh([year])
+        # cached holds the cache of cached_year: this year, or the previous year on the first day of a year
+        cached_year = year
+        cached = pd.read_csv(self.cache_path(year)) if os.path.exists(self.cache_path(year)) else None
+        if cached is None and year - 1 in partitions:
+            self.refresh([year - 1])
+            cached_year = year - 1
+            cached = pd.read_csv(self.cache_path(year - 1))
+
+        if cached is not None and not cached.empty:
+            last_hour = cached[UTC_COLUMN].max()
+            new_rows = new_rows[new_rows[UTC_COLUMN] > last_hour]
+        if new_rows.empty:
+            print("No new hours to append")
+            return new_rows
+
+        # Append the raw hours to the stored partition
+        new_rows.to_csv(source_path, mode='a', header=not os.path.exists(source_path), index=False)
+
+        # Recompute only the trailing context window plus the new hours
+        if cached is not None and not cached.empty:
+            cached_times = hourly_calendar.to_datetime(cached[UTC_COLUMN])
+            cutoff = cached_times.max() - pd.Timedelta(days=CONTEXT_DAYS)
+            context = cached[cached_times > cutoff][SOURCE_COLUMNS]
+            # Early in a year the window reaches back into the previous year's cache
+            if cached_times.min() > cutoff and cached_year == year and os.path.exists(self.cache_path(year - 1)):
+                previous = pd.read_csv(self.cache_path(year - 1))
+                previous_times = hourly_calendar.to_datetime(previous[UTC_COLUMN])
+                context = pd.concat([previous[previous_times > cutoff][SOURCE_COLUMNS], context], ignore_index=True)
+        else:
+            context = pd.DataFrame(columns=SOURCE_COLUMNS)
+        updated = compute_forecast_error_frame(pd.concat([context, new_rows], ignore_index=True))
+        added = updated.tail(len(new_rows))
+
+        # The previous last hour now has a next-period forecast, so its error changes. On the
+        # first day of a year that hour is the last row of the previous year's cache
+        if cached is not None and not cached.empty:
+            previous_hour = updated.iloc[len(context) - 1]
+            last_index = cached.index[-1]
+            for column in ('forecast_error', 'abs_error', 'ape'):
+                cached.loc[last_index, column] = previous_hour[column]
+
+        os.makedirs(self.cache_directory, exist_ok=True)
+        if cached is not None and not cached.empty and cached_year == year:
+            year_cache = pd.concat([cached, added], ignore_index=True)
+        else:
+            year_cache = added
+            if cached is not None and not cached.empty:
+                cached.to_csv(self.cache_path(cached_year), index=False)
+        year_cache.to_csv(self.cache_path(year), index=False)
+
+        partitions = self.source_partitions()
+        self.manifest[str(year)] = self._year_signature(partitions, year)
+        if year - 1 in partitions and str(year - 1) in self.manifest:
+            # The previous year's cache now depends on this year's first hour as well
+            self.manifest[str(year - 1)] = self._year_signature(partitions, year - 1)
+        self._save_manifest()
+
+        print(f"Appended {len(added)} hours to the {year} forecast error cache")
+        return added
+
+    #------------------------------------------------------
+    def annual_summary(self, df=None):
+        """
+        Annual forecast error and volatility metrics
+
+        Args:
+            df: Optional output of load() (loaded if not provided)
+
+        Returns:
+            DataFrame: One row per year with mean_error, mae, mape and the mean rolling stds
+        """
+        df = self.load() if df is None else df
+        grouped = df.groupby(df.index.year)
+        summary = pd.DataFrame({
+            'mean_error': grouped['forecast_error'].mean(),
+            'mae': grouped['abs_error'].mean(),
+            'mape': grouped['ape'].mean() * 100,
+        })
+        for label in ROLLING_WINDOWS:
+            summary[f'rolling_{label}_std'] = grouped[f'rolling_{label}_std'].mean()
+        summary.index.name = 'year'
+        return summary
+
+    def correlations(self, df=None, summary=None):
+        """
+        Correlations between forecast error and pool price level/volatility
+
+        Args:
+            df: Optional output of load()
+            summary: Optional output of annual_summary()
+
+        Returns:
+            dict: Correlation name -> value
+        """
+        df = self.load() if df is None else df
+        summary = self.annual_summary(df) if summary is None else summary
+        results = {}
+        for label in ROLLING_WINDOWS:
+            results[f'forecast_error_vs_rolling_{label}_avg'] = df['forecast_error'].corr(df[f'rolling_{label}_avg'])
+            results[f'forecast_error_vs_rolling_{label}_std'] = df['forecast_error'].corr(df[f'rolling_{label}_std'])
+            results[f'annual_mae_vs_rolling_{label}_std'] = summary['mae'].corr(summary[f'rolling_{label}_std'])
+            results[f'annual_mape_vs_rolling_{label}_std'] = summary['mape'].corr(summary[f'rolling_{label}_std'])
+        return results
@@ -0,0 +1,204 @@
+"""
+Shared UTC/MPT Hourly Calendar
+
+Every stage used to turn AESO's 'YYYY-MM-DD HH:MM' strings into datetimes with its own
+pd.to_datetime call, mostly without a format, so pandas inferred it again on every
+column of every file. The calendar is built once per process and covers every hour from
+2000-01-01 00:00 to GRID_END (the grid of the hourly series store):
+
+    grid number n    'YYYY-MM-DD HH:MM' wall clock string of 2000-01-01 00:00 + n hours
+    utc_to_mpt[h]    grid number of the MPT (America/Edmonton) wall clock of UTC hour h
+    mpt_to_utc[n]    UTC hour of MPT wall clock n; NO_HOUR for the hour skipped when
+                     DST starts, the earlier (MDT) hour for the hour repeated when it ends
+
+A UTC string and an MPT string both look up their grid number in one sorted table of
+fixed-width strings (ISO strings sort in time order, so a binary search finds them; the
+table takes 7 MB). Columns are factorized first, so only the distinct timestamps of a
+column are looked up and a long frame (e.g. assets x hours) costs one hash per row. Strings that are not on
+the grid (other formats, minutes other than :00, years outside the grid) fall back to
+pd.to_datetime for those distinct values only.
+
+    from src.hourly_calendar import hourly_calendar
+    df['begin_date_mpt'] = hourly_calendar.to_datetime(df['begin_date_mpt'])
+    hours = hourly_calendar.mpt_hours(df['begin_date_mpt'])      # UTC hour indices
+"""
+
+import numpy as np
+import pandas as pd
+
+MPT_TIMEZONE = 'America/Edmonton'
+GRID_START = pd.Timestamp('2000-01-01 00:00')
+GRID_END = pd.Timestamp('2051-01-01 00:00')
+GRID_HOURS = int((GRID_END - GRID_START) / pd.Timedelta(hours=1))
+TIME_FORMAT = '%Y-%m-%d %H:%M'
+
+# Hour index of timestamps that are missing, unparseable or do not exist in MPT
+NO_HOUR = np.iinfo(np.int64).min
+
+_NS_PER_HOUR = 3_600 * 1_000_000_000
+_GRID_START_NS = GRID_START.value
+_NAT = np.iinfo(np.int64).min
+
+#------------------------------------------------------
+def _format_hours(hours):
+    # 'YYYY-MM-DD HH:MM' as S16 built digit by digit (datetime_as_string needs 10x the memory)
+    years = hours.astype('datetime64[Y]')
+    months = hours.astype('datetime64[M]')
+    days = hours.astype('datetime64[D]')
+    fields = [(years.astype(np.int64) + 1970, 0, 4), ((months - years).astype(np.int64) + 1, 5, 2),
+              ((days - months).astype(np.int64) + 1, 8, 2), ((hours - days).astype(np.int64), 11, 2)]
+    chars = np.zeros((len(hours), 16), dtype=np.uint8)
+    chars[:, [4, 7]] = ord('-')
+    chars[:, 10] = ord(' ')
+    chars[:, 13] = ord(':')
+    chars[:, 14:16] = ord('0')
+    for values, position, width in fields:
+        for digit in range(width):
+            chars[:, position + width - 1 - digit] = ord('0') + (values // 10 ** digit) % 10
+    return chars.view('S16').ravel()
+
+
+class HourlyCalendar:
+    """
+    'YYYY-MM-DD HH:MM' <-> hour index lookups with the MPT daylight saving transitions resolved
+    """
+
+    def __init__(self):
+        self._strings = None
+        self._utc_to_mpt = None
+        self._mpt_to_utc = None
+
+    def _build(self):
+        hours = np.arange(np.datetime64(GRID_START, 'h'), np.datetime64(GRID_END, 'h'))
+        self._strings = _format_hours(hours)
+
+        local = pd.DatetimeIndex(hours.astype('datetime64[ns]')).tz_localize('UTC') \
+            .tz_convert(MPT_TIMEZONE).tz_localize(None)
+        utc_to_mpt = (local.asi8 - _GRID_START_NS) // _NS_PER_HOUR
+        mpt_to_utc = np.full(GRID_HOURS, NO_HOUR, dtype=np.int64)
+        on_grid = np.flatnonzero((utc_to_mpt >= 0) & (utc_to_mpt < GRID_HOURS))
+        # np.unique keeps the first UTC hour of a repeated wall clock hour
+        wall_clock, first = np.unique(utc_to_mpt[on_grid], return_index=True)
+        mpt_to_utc[wall_clock] = on_grid[first]
+        self._utc_to_mpt = utc_to_mpt
+        self._mpt_to_utc = mpt_to_utc
+
+    def _tables(self):
+        if self._strings is None:
+            self._build()
+        return self
+
+    def _grid_positions(self, keys):
+        # Position of each key in the string table, -1 if it is not on the grid
+        grid = np.full(len(keys), -1, dtype=np.int64)
+        candidates = np.flatnonzero(keys.str.len() == 16)
+        try:
+            wanted = np.array(keys[candidates].tolist(), dtype='S16')
+        except UnicodeEncodeError:
+            return grid
+        table = self._tables()._strings
+        positions = np.minimum(np.searchsorted(table, wanted), len(table) - 1)
+        found = table[positions] == wanted
+        grid[candidates[found]] = positions[found]
+        return grid
+
+    #------------------------------------------------------
+    def _lookup(self, values, format=None):
+        """
+        Returns:
+            tuple: (codes, ns) - ns[codes] is the int64 nanosecond timestamp of each value,
+                   the last entry of ns (code -1) is NaT
+        """
+        values = pd.Series(values) if not isinstance(values, pd.Series) else values
+        if pd.api.types.is_datetime64_any_dtype(values.dtype):
+            ns = values.to_numpy(dtype='datetime64[ns]').view(np.int64)
+            return np.arange(len(ns)), np.append(ns, _NAT)
+        codes, uniques = pd.factorize(values)
+        if format in (None, TIME_FORMAT, TIME_FORMAT + ':%S'):
+            keys = pd.Index(uniques).astype(str)
+            # pandas writes whole-hour datetimes as 'YYYY-MM-DD HH:MM:SS'
+            with_seconds = (keys.str.len() == 19) & keys.str.endswith(':00')
+            keys = keys.where(~with_seconds, keys.str.slice(0, 16))
+            grid = self._grid_positions(keys)
+        else:
+            # Other formats are parsed as given, like pd.to_datetime would
+            grid = np.full(len(uniques), -1)
+        ns = np.where(grid >= 0, _GRID_START_NS + grid.astype(np.int64) * _NS_PER_HOUR, _NAT)
+        missed = np.flatnonzero(grid < 0)
+        if len(missed):
+            parsed = pd.to_datetime(pd.Series(np.asarray(uniques, dtype=object)[missed]), format=format)
+            ns[missed] = parsed.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        return codes, np.append(ns, _NAT)
+
+    def to_datetime(self, values, format=None):
+        """
+        Drop-in for pd.to_datetime on a column of timestamp strings
+
+        Args:
+            values: Series or array of 'YYYY-MM-DD HH:MM' strings (UTC or MPT)
+            format: Format of the values (None = inferred); values in another format than
+                    'YYYY-MM-DD HH:MM[:SS]' are parsed by pd.to_datetime
+
+        Returns:
+            Series or DatetimeIndex: datetime64[ns] values (a Series keeps the index and name)
+        """
+        codes, ns = self._lookup(values, format)
+        result = ns[codes].view('datetime64[ns]')
+        if isinstance(values, pd.Series):
+            return pd.Series(result, index=values.index, name=values.name)
+        return pd.DatetimeIndex(result)
+
+    def grid_numbers(self, values, format=None):
+        """
+        Returns:
+            numpy.ndarray: int64 wall clock hours since 2000-01-01 00:00 (floored; NO_HOUR for missing values)
+        """
+        codes, ns = self._lookup(values, format)
+        numbers = np.where(ns == _NAT, NO_HOUR, np.floor_divide(ns - _GRID_START_NS, _NS_PER_HOUR))
+        return numbers[codes]
+
+    def utc_hours(self, values, format=None):
+        """
+        Returns:
+            numpy.ndarray: UTC hour indices (hours since 2000-01-01 00:00 UTC) of UTC timestamps
+        """
+        return self.grid_numbers(values, format)
+
+    def mpt_hours(self, values, format=None):
+        """
+        UTC hour indices of MPT timestamps
+
+        The wall clock hour repeated when daylight saving time ends maps to its first (MDT)
+        occurrence; pair the column with its UTC column when both hours are needed.
+
+        Returns:
+            numpy.ndarray: UTC hour indices (NO_HOUR for the hour skipped when DST starts)
+        """
+        numbers = self.grid_numbers(values, format)
+        on_grid = (numbers >= 0) & (numbers < GRID_HOURS)
+        return np.where(on_grid, self._tables()._mpt_to_utc[np.where(on_grid, numbers, 0)], NO_HOUR)
+
+    def mpt_of_utc(self, hours):
+        """
+        Returns:
+            numpy.ndarray: MPT wall clock grid numbers of UTC hour indices
+        """
+        return self._tables()._utc_to_mpt[np.asarray(hours, dtype=np.int64)]
+
+    def strings(self, numbers):
+        """
+        Returns:
+            numpy.ndarray: 'YYYY-MM-DD HH:MM' strings of grid numbers
+        """
+        return self._tables()._strings[np.asarray(numbers, dtype=np.int64)].astype(str)
+
+    def timestamps(self, numbers):
+        """
+        Returns:
+            DatetimeIndex: Naive timestamps of grid numbers
+        """
+        numbers = np.asarray(numbers, dtype=np.int64)
+        return pd.DatetimeIndex((_GRID_START_NS + numbers * _NS_PER_HOUR).view('datetime64[ns]'))
+
+# Create singleton instance
+hourly_calendar = HourlyCalendar()
@@ -0,0 +1,363 @@
+"""
+Fixed-Grid Hourly Series Store
+
+Pool price, forecast pool price, AIL and forecast AIL are dense hourly series from 2000
+onward, but every analytics script (e.g. test_code/spot_forcast_error.py) re-parses the
+annual csv files to get at them. The store keeps each series as a memory-mapped NumPy
+array on a fixed grid of hours since 2000-01-01 00:00 UTC:
+
+    Hourly Series/{series}.npy          float64 value of every hour (NaN when not valid)
+    Hourly Series/{series}_flags.npy    uint8 validity flag of every hour
+    Hourly Series/{dataset}_sources.json  signatures of the csv files already loaded
+
+1) Hour h of the grid is always element h of the arrays, so reading one hour or a range
+   is an index or a slice of the memory map: O(1) and no copy
+2) The flags tell an hour that was never loaded (MISSING) from one that was in the
+   source with an empty or non-numeric value (INVALID)
+3) The grid has a fixed capacity (GRID_END_UTC), so the files never have to be resized
+4) The series are written when Historical_Pool_Price_Date_And_Range and AIL_Demand
+   are processed ("hourly_series_store": true in config/api_endpoints.json), or loaded
+   from the stored annual csv files with populate() / python -m src.cli populate-hourly-series,
+   which skips the files that did not change since they were loaded or written
+5) The pipeline runs years in parallel processes, so the files are created and the
+   sources updated under a lock file (see file_lock in src/asset_dimension.py)
+
+    store = HourlySeriesStore(output_folder)
+    values, flags = store.slice('pool_price', '2019-01-01 07:00', '2020-01-01 07:00')
+"""
+
+import os
+import re
+import glob
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.hourly_calendar import hourly_calendar, GRID_START as GRID_START_UTC, GRID_END as GRID_END_UTC, GRID_HOURS
+from src.asset_dimension import file_lock
+from src.storage import file_signature
+from src.logging_tools import get_logger
+
+logger = get_logger('hourly_series_store')
+
+STORE_SUB_FOLDER = 'Hourly Series'
+UTC_COLUMN = 'begin_datetime_utc'
+
+# Validity flags
+MISSING = 0
+VALID = 1
+INVALID = 2
+
+# Annual csv outputs the series are loaded from, keyed by dataset
+SERIES_SOURCES = {
+    'pool_price': {
+        'category_key': 'Historical_Pool_Price_Date_And_Range',
+        'sub_folder': 'Spot_Prices',
+        'file_pattern': 'pool_price_data_{year}.csv',
+        'series': ['pool_price', 'forecast_pool_price'],
+    },
+    'ail_demand': {
+        'category_key': 'AIL_Demand',
+        'sub_folder': 'Historical AIL Demand',
+        'file_pattern': 'Metered_Demand_{year}.csv',
+        'series': ['alberta_internal_load', 'forecast_alberta_internal_load'],
+    },
+}
+
+_NS_PER_HOUR = 3_600 * 1_000_000_000
+_GRID_START_NS = GRID_START_UTC.value
+
+#------------------------------------------------------
+def hour_index(timestamps):
+    """
+    Grid positions of UTC timestamps
+
+    Args:
+        timestamps: 'YYYY-MM-DD HH:MM' string, Timestamp or a sequence of them
+
+    Returns:
+        int or numpy.ndarray: Hours since 2000-01-01 00:00 UTC
+    """
+    if isinstance(timestamps, (str, pd.Timestamp)):
+        return int((pd.Timestamp(timestamps).value - _GRID_START_NS) // _NS_PER_HOUR)
+    return hourly_calendar.utc_hours(timestamps)
+
+def hour_timestamps(start, stop):
+    """
+    Returns:
+        DatetimeIndex: UTC hours of grid positions start..stop-1
+    """
+    return pd.date_range(GRID_START_UTC + pd.Timedelta(hours=start), periods=max(stop - start, 0), freq='h')
+
+def _dataset_of(series):
+    for dataset, source in SERIES_SOURCES.items():
+        if series in source['series']:
+            return dataset
+    raise KeyError(f"Unknown hourly series '{series}'")
+
+
+class HourlySeriesStore:
+    """
+    Memory-mapped hourly series of one output folder
+    """
+
+    def __init__(self, output_folder=None, directory=None):
+        """
+        Args:
+            output_folder: Output folder holding the source sub folders (default: platform output dir)
+            directory: Folder of the store files (default: output_folder/Hourly Series)
+        """
+        if output_folder is None:
+            from core.platform_config import platform_config
+            output_folder = platform_config.base_output_dir
+        self.output_folder = output_folder
+        self.directory = directory or os.path.join(output_folder, STORE_SUB_FOLDER)
+        self._maps = {}
+
+    def _paths(self, series):
+        return (os.path.join(self.directory, f"{series}.npy"),
+                os.path.join(self.directory, f"{series}_flags.npy"))
+
+    def _open(self, series, writable=False):
+        """
+        Returns:
+            tuple: (values, flags) memory maps, or None if the series was never written
+        """
+        _dataset_of(series)
+        cached = self._maps.get(series)
+        if cached is not None and (not writable or cached[2]):
+            return cached[:2]
+        values_path, flags_path = self._paths(series)
+        if not os.path.exists(values_path):
+            if not writable:
+                return None
+            self._create(series)
+        mode = 'r+' if writable else 'r'
+        values = np.load(values_path, mmap_mode=mode)
+        flags = np.load(flags_path, mmap_mode=mode)
+        self._maps[series] = (values, flags, writable)
+        return values, flags
+
+    def _create(self, series):
+        # Another process may be creating (and already writing) the same series, so the files
+        # are built under a lock and only moved into place when they are complete
+        values_path, flags_path = self._paths(series)
+        os.makedirs(self.directory, exist_ok=True)
+        with file_lock(values_path):
+            if os.path.exists(values_path):
+                return
+            for path, dtype, fill in ((flags_path, np.uint8, MISSING), (values_path, np.float64, np.nan)):
+                temp_path = f"{path}.{os.getpid()}.tmp.npy"
+                array = np.lib.format.open_memmap(temp_path, mode='w+', dtype=dtype, shape=(GRID_HOURS,))
+                array[:] = fill
+                array.flush()
+                del array
+                os.replace(temp_path, path)
+
+    def close(self):
+        """
+        Flush and release the memory maps
+        """
+        for values, flags, writable in self._maps.values():
+            if writable:
+                values.flush()
+                flags.flush()
+        self._maps = {}
+
+    def series_names(self):
+        """
+        Returns:
+            list: Series that have been written
+        """
+        return [series for source in SERIES_SOURCES.values() for series in source['series']
+                if os.path.exists(self._paths(series)[0])]
+
+    #------------------------------------------------------
+    def slice(self, series, start, end):
+        """
+        Values and flags of the hours in [start, end), as views on the memory maps
+
+        Args:
+            series: e.g. 'pool_price'
+            start, end: UTC 'YYYY-MM-DD HH:MM' strings, Timestamps or grid positions
+
+        Returns:
+            tuple: (values, flags) numpy views; empty if the series was never written
+        """
+        start = start if isinstance(start, (int, np.integer)) else hour_index(start)
+        end = end if isinstance(end, (int, np.integer)) else hour_index(end)
+        maps = self._open(series)
+        if maps is None:
+            return np.zeros(0), np.zeros(0, dtype=np.uint8)
+        start, end = max(start, 0), min(end, GRID_HOURS)
+        values, flags = maps
+        return values[start:end], flags[start:end]
+
+    def value_at(self, series, timestamp):
+        """
+        Returns:
+            float: Value of one UTC hour (NaN unless the hour is VALID)
+        """
+        values, _ = self.slice(series, timestamp, hour_index(timestamp) + 1)
+        return float(values[0]) if len(values) else np.nan
+
+    def frame(self, series, start, end):
+        """
+        Several series over [start, end) as a DataFrame (copies the values)
+
+        Args:
+            series: List of series names
+
+        Returns:
+            DataFrame: One column per series, indexed by begin_datetime_utc
+        """
+        start_hour, end_hour = hour_index(start), hour_index(end)
+        columns = {}
+        for name in series:
+            values, _ = self.slice(name, start_hour, end_hour)
+            columns[name] = np.array(values) if len(values) else np.full(max(end_hour - start_hour, 0), np.nan)
+        df = pd.DataFrame(columns, index=hour_timestamps(start_hour, end_hour))
+        df.index.name = UTC_COLUMN
+        return df
+
+    #------------------------------------------------------
+    def write_frame(self, dataset, df):
+        """
+        Write the hours of a source frame into the series of its dataset
+
+        Args:
+            dataset: Key of SERIES_SOURCES, e.g. 'pool_price'
+            df: Frame with begin_datetime_utc and (some of) the dataset's series columns
+
+        Returns:
+            int: Number of hours written
+        """
+        if df is None or df.empty or UTC_COLUMN not in df.columns:
+            return 0
+        hours = hour_index(df[UTC_COLUMN])
+        inside = (hours >= 0) & (hours < GRID_HOURS)
+        if not inside.all():
+            logger.warning("Skipping %s %s hours outside the grid (%s to %s)", (~inside).sum(), dataset,
+                           GRID_START_UTC, GRID_END_UTC)
+        hours = hours[inside]
+        for series in SERIES_SOURCES[dataset]['series']:
+            if series not in df.columns:
+                continue
+            values = pd.to_numeric(df[series], errors='coerce').to_numpy(dtype=np.float64)[inside]
+            valid = ~np.isnan(values)
+            store_values, store_flags = self._open(series, writable=True)
+            store_values[hours] = values
+            store_flags[hours] = np.where(valid, VALID, INVALID).astype(np.uint8)
+        return int(len(hours))
+
+    def _sources_path(self, dataset):
+        return os.path.join(self.directory, f"{dataset}_sources.json")
+
+    def sources(self, dataset):
+        """
+        Returns:
+            dict: File name -> [size, mtime] of the csv files the dataset's series hold
+        """
+        sources_path = self._sources_path(dataset)
+        if not os.path.exists(sources_path):
+            return {}
+        with open(sources_path, 'r') as f:
+            return json.load(f)
+
+    def record_sources(self, dataset, signatures):
+        """
+        Add file signatures to the dataset's sources (under a lock, other processes may record theirs)
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        sources_path = self._sources_path(dataset)
+        with file_lock(sources_path):
+            stored = self.sources(dataset)
+            stored.update(signatures)
+            temp_path = f"{sources_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(stored, f, indent=2)
+            os.replace(temp_path, sources_path)
+
+    def load_file(self, dataset, path):
+        """
+        Load one annual csv file into the series of its dataset and record its signature
+
+        Returns:
+            int: Number of hours written
+        """
+        source = SERIES_SOURCES[dataset]
+        signature = file_signature(path)
+        df = pd.read_csv(path, usecols=lambda c: c == UTC_COLUMN or c in source['series'], dtype=str)
+        hours = self.write_frame(dataset, df)
+        self.close()
+        self.record_sources(dataset, {os.path.basename(path): signature})
+        return hours
+
+    def populate(self, datasets=None, years=None, force=False):
+        """
+        Load the stored annual csv files into the series
+
+        Files whose size and modification time match the last load are skipped.
+
+        Args:
+            datasets: Keys of SERIES_SOURCES (default: all)
+            years: Optional iterable of years (default: every stored year)
+            force: Reload every file
+
+        Returns:
+            dict: dataset -> list of files loaded
+        """
+        loaded = {}
+        for dataset in datasets or SERIES_SOURCES:
+            source = SERIES_SOURCES[dataset]
+            pattern = source['file_pattern'].format(year='*')
+            year_pattern = re.escape(source['file_pattern']).replace(r'\{year\}', r'(\d{4})') + '$'
+            signatures = {} if force else self.sources(dataset)
+
+            loaded[dataset] = []
+            for path in sorted(glob.glob(os.path.join(self.output_folder, source['sub_folder'], pattern))):
+                match = re.search(year_pattern, os.path.basename(path))
+                if match is None or (years is not None and int(match.group(1)) not in years):
+                    continue
+                name = os.path.basename(path)
+                if signatures.get(name) == file_signature(path):
+                    continue
+                hours = self.load_file(dataset, path)
+                loaded[dataset].append(path)
+                logger.info("Loaded %s hours of %s from %s", hours, dataset, name)
+        return loaded
+#------------------------------------------------------
+def update_hourly_series(api_config, df, path):
+    """
+    Write a processed pool price / AIL frame into the store of its output folder
+
+    Args:
+        api_config: Endpoint configuration ("hourly_series_store": true to enable)
+        df: Frame that was just saved to path
+        path: Annual csv file ({output_folder}{sub_folder}/{file})
+
+    Returns:
+        int: Number of hours written
+    """
+    if not api_config.get('hourly_series_store'):
+        return 0
+    dataset = next((d for d, source in SERIES_SOURCES.items()
+                    if source['category_key'] == api_config.get('category_key')), None)
+    if dataset is None:
+        return 0
+    store = HourlySeriesStore(os.path.dirname(os.path.dirname(os.path.abspath(path))))
+    name = os.path.basename(path)
+    if name not in store.sources(dataset):
+        # The store never saw this file, which may hold more hours than df: load all of it once
+        hours = store.load_file(dataset, path)
+        logger.info("Hourly series store: %s hours of %s loaded from %s", hours, dataset, name)
+        return hours
+    try:
+        hours = store.write_frame(dataset, df)
+    finally:
+        store.close()
+    # df holds every row that changed in the file, so the store is in step with it again
+    store.record_sources(dataset, {name: file_signature(path)})
+    logger.info("Hourly series store: %s hours of %s written", hours, dataset)
+    return hours
@@ -0,0 +1,247 @@
+"""
+Per-Stage Instrumentation for the API Pipeline
+
+Wraps the stages of a run (fetch, decode, normalize, post_process, persist) in
+timed spans and writes one JSON line per span to a run report:
+
+    {"run_id": "20250101T120000", "stage": "fetch", "category_key": "Merit_Order_Data",
+     "window": "2024-01-01..2024-12-31", "parent": null, "wall_s": 1.84, "bytes": 5234121,
+     "rows": null, "rows_per_s": null, "rss_growth_mb": 35.2, "process_peak_rss_mb": 412.3,
+     "started": "2025-01-01T12:00:03"}
+
+The peak RSS of a process only ever goes up, so a span records how much it raised it
+(rss_growth_mb, 0 when an earlier stage already used more) next to the process
+high-water mark at its end (process_peak_rss_mb).
+
+The category key and window are set once per loop iteration with run_report.context()
+and inherited by every span opened underneath it, so the helpers in utilities.py do not
+need extra arguments. Reports from two runs can be compared with compare_run_reports().
+"""
+
+import os
+import sys
+import json
+import time
+import datetime
+import contextvars
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    # Not available on Windows
+    import resource
+except ImportError:
+    resource = None
+
+RUN_REPORT_SUB_FOLDER = 'Run Reports'
+RUN_REPORT_FILE_TEMPLATE = 'run_report_{run_id}.jsonl'
+
+_context = contextvars.ContextVar('run_report_context', default={})
+
+#------------------------------------------------------
+def peak_rss_mb():
+    """
+    Return the peak resident set size of the current process in MB
+
+    Returns:
+        float or None: Peak RSS in MB, None where it cannot be measured (Windows)
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+def current_context():
+    """
+    Returns:
+        dict: category_key, window and stage of the innermost context/span (keys may be missing)
+    """
+    return _context.get()
+
+
+class Span:
+    """
+    One timed stage; set .bytes and .rows inside the with block
+    """
+
+    def __init__(self, stage, category_key, window, parent):
+        self.stage = stage
+        self.category_key = category_key
+        self.window = window
+        self.parent = parent
+        self.bytes = None
+        self.rows = None
+        self.started = datetime.datetime.now().isoformat(timespec='seconds')
+        self._start = time.perf_counter()
+        self._peak_start = peak_rss_mb()
+
+    def to_record(self, run_id):
+        wall_s = time.perf_counter() - self._start
+        rows_per_s = round(self.rows / wall_s, 1) if self.rows and wall_s > 0 else None
+        peak = peak_rss_mb()
+        return {
+            'run_id': run_id,
+            'stage': self.stage,
+            'category_key': self.category_key,
+            'window': self.window,
+            'parent': self.parent,
+            'wall_s': round(wall_s, 4),
+            'bytes': self.bytes,
+            'rows': self.rows,
+            'rows_per_s': rows_per_s,
+            'rss_growth_mb': round(peak - self._peak_start, 1) if peak is not None else None,
+            'process_peak_rss_mb': peak,
+            'started': self.started,
+        }
+
+
+class RunReport:
+    """
+    Collects span records for one run and appends them to a JSON-lines file
+    """
+
+    def __init__(self):
+        self.run_id = datetime.datetime.now().strftime('%Y%m%dT%H%M%S')
+        self.path = None
+        self.records = []
+
+    #------------------------------------------------------
+    def start(self, output_folder, run_id=None):
+        """
+        Start writing span records to output_folder/Run Reports/run_report_{run_id}.jsonl
+
+        Args:
+            output_folder: Base output folder
+            run_id: Optional run id (defaults to the start timestamp)
+
+        Returns:
+            str: Path of the run report
+        """
+        if run_id:
+            self.run_id = run_id
+        folder = os.path.join(output_folder, RUN_REPORT_SUB_FOLDER)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        self.path = os.path.join(folder, RUN_REPORT_FILE_TEMPLATE.format(run_id=self.run_id))
+        print(f"Run report: {self.path}")
+        return self.path
+
+    @contextmanager
+    def context(self, category_key=None, window=None):
+        """
+        Set the category key and window inherited by spans opened inside the block
+        """
+        current = dict(_context.get())
+        if category_key is not None:
+            current['category_key'] = category_key
+        if window is not None:
+            current['window'] = window
+        token = _context.set(current)
+        try:
+            yield
+        finally:
+            _context.reset(token)
+
+    @contextmanager
+    def span(self, stage, category_key=None, window=None):
+        """
+        Time a pipeline stage
+
+        Args:
+            stage: Stage name, e.g. 'fetch', 'decode', 'normalize', 'post_process', 'persist'
+            category_key: Overrides the category key from context()
+            window: Overrides the window from context()
+
+        Yields:
+            Span: Set .bytes and .rows on it to record throughput
+        """
+        current = _context.get()
+        span = Span(stage,
+                    category_key or current.get('category_key'),
+                    window or current.get('window'),
+                    current.get('stage'))
+        token = _context.set(dict(current, stage=stage))
+        try:
+            yield span
+        finally:
+            _context.reset(token)
+            self._record(span.to_record(self.run_id))
+
+    def _record(self, record):
+        self.records.append(record)
+        if self.path:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+
+    #------------------------------------------------------
+    def summary(self):
+        """
+        Totals per stage and category key for this run
+
+        Returns:
+            DataFrame: count, wall_s, bytes, rows, max rss_growth_mb and process_peak_rss_mb per stage/category_key
+        """
+        return summarize_run_report(pd.DataFrame(self.records))
+
+    def print_summary(self):
+        if not self.records:
+            return
+        print("Run timing summary:")
+        print(self.summary().to_string())
+#------------------------------------------------------
+def summarize_run_report(records):
+    """
+    Aggregate span records by stage and category key
+
+    Args:
+        records: DataFrame of span records (or a path to a run report .jsonl file)
+
+    Returns:
+        DataFrame: count, wall_s, bytes, rows, rows_per_s, max rss_growth_mb and process_peak_rss_mb
+                   per stage/category_key
+    """
+    if isinstance(records, str):
+        records = pd.read_json(records, lines=True)
+    if records.empty:
+        return records
+    # Reports written before the RSS fields were split only have the process high-water mark
+    records = records.rename(columns={'peak_rss_mb': 'process_peak_rss_mb'})
+    for column in ('rss_growth_mb', 'process_peak_rss_mb'):
+        if column not in records:
+            records[column] = None
+    records['category_key'] = records['category_key'].fillna('')
+    summary = records.groupby(['stage', 'category_key']).agg(
+        count=('wall_s', 'size'),
+        wall_s=('wall_s', 'sum'),
+        bytes=('bytes', 'sum'),
+        rows=('rows', 'sum'),
+        rss_growth_mb=('rss_growth_mb', 'max'),
+        process_peak_rss_mb=('process_peak_rss_mb', 'max'),
+    )
+    summary['rows_per_s'] = (summary['rows'] / summary['wall_s']).where(summary['rows'] > 0).round(1)
+    return summary
+#------------------------------------------------------
+def compare_run_reports(baseline_path, candidate_path):
+    """
+    Compare two run reports stage by stage
+
+    Args:
+        baseline_path: Path to the reference run report
+        candidate_path: Path to the run report being compared
+
+    Returns:
+        DataFrame: Baseline and candidate wall_s/rows_per_s/rss_growth_mb with the wall time ratio
+    """
+    baseline = summarize_run_report(baseline_path)
+    candidate = summarize_run_report(candidate_path)
+    columns = ['wall_s', 'rows_per_s', 'rss_growth_mb']
+    comparison = baseline[columns].join(candidate[columns], lsuffix='_baseline', rsuffix='_candidate', how='outer')
+    comparison['wall_s_ratio'] = (comparison['wall_s_candidate'] / comparison['wall_s_baseline']).round(3)
+    return comparison
+
+# Create singleton instance
+run_report = RunReport()
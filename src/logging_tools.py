@@ -0,0 +1,139 @@
+"""
+Logging for the API Pipeline
+
+Replaces the unconditional payload prints in fetch_data / handle_success /
+preliminary_processing_data with level-gated logging:
+
+    INFO   one line per request/stage (what is being fetched, status, row counts)
+    DEBUG  request details and payload dumps (response strings, parsed JSON, frame previews)
+
+Every record carries the endpoint (category key) and request window set with
+run_report.context() in main.py (see src/instrumentation.py).
+
+Settings are read from the environment (.env):
+
+    AESO_LOG_LEVEL          DEBUG / INFO / WARNING / ERROR            (default INFO)
+    AESO_LOG_FORMAT         text / json                               (default text)
+    AESO_LOG_SAMPLE_RATE    fraction of payload dumps kept at DEBUG   (default 1.0)
+    AESO_LOG_PAYLOAD_CHARS  max characters per payload dump           (default 2000)
+"""
+
+import os
+import sys
+import json
+import random
+import logging
+
+from src.instrumentation import current_context
+
+LOGGER_NAME = 'aeso'
+TEXT_FORMAT = '%(asctime)s %(levelname)s [%(endpoint)s %(window)s] %(message)s'
+REDACTED_HEADERS = {'API-KEY', 'Ocp-Apim-Subscription-Key'}
+
+_configured = False
+
+#------------------------------------------------------
+class ContextFilter(logging.Filter):
+    """
+    Adds the endpoint and window of the current run_report context to each record
+    """
+
+    def filter(self, record):
+        context = current_context()
+        record.endpoint = context.get('category_key') or '-'
+        record.window = context.get('window') or '-'
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, logger, endpoint, window, message
+    """
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'endpoint': getattr(record, 'endpoint', '-'),
+            'window': getattr(record, 'window', '-'),
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+#------------------------------------------------------
+def configure_logging(level=None, log_format=None, stream=None):
+    """
+    Configure the 'aeso' logger (called automatically by get_logger)
+
+    Args:
+        level: Log level name, defaults to AESO_LOG_LEVEL or INFO
+        log_format: 'text' or 'json', defaults to AESO_LOG_FORMAT or text
+        stream: Output stream, defaults to stdout so logs interleave with the progress prints
+
+    Returns:
+        logging.Logger: The configured 'aeso' logger
+    """
+    global _configured
+    logger = logging.getLogger(LOGGER_NAME)
+    level = (level or os.getenv('AESO_LOG_LEVEL', 'INFO')).upper()
+    log_format = (log_format or os.getenv('AESO_LOG_FORMAT', 'text')).lower()
+
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.addFilter(ContextFilter())
+    handler.setFormatter(JsonFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    _configured = True
+    return logger
+
+def get_logger(name=None):
+    """
+    Args:
+        name: Child logger name, e.g. 'utilities'
+
+    Returns:
+        logging.Logger: 'aeso' logger or one of its children
+    """
+    if not _configured:
+        configure_logging()
+    return logging.getLogger(f'{LOGGER_NAME}.{name}' if name else LOGGER_NAME)
+#------------------------------------------------------
+def _sample_rate():
+    try:
+        return float(os.getenv('AESO_LOG_SAMPLE_RATE', '1.0'))
+    except ValueError:
+        return 1.0
+
+def log_payload(logger, label, payload):
+    """
+    Log a (possibly huge) payload at DEBUG, sampled and truncated
+
+    Nothing is formatted unless DEBUG is enabled and the record is sampled, so at INFO
+    a payload costs one level check instead of a multi-megabyte string conversion.
+
+    Args:
+        logger: Logger from get_logger()
+        label: Short description, e.g. 'response_str'
+        payload: Object to dump (str, dict, list, DataFrame...)
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    if random.random() >= _sample_rate():
+        return
+    max_chars = int(os.getenv('AESO_LOG_PAYLOAD_CHARS', '2000'))
+    text = payload if isinstance(payload, str) else str(payload)
+    if len(text) > max_chars:
+        text = f"{text[:max_chars]}... [{len(text) - max_chars} more characters]"
+    logger.debug('%s: %s', label, text)
+
+def redact_headers(headers):
+    """
+    Returns:
+        dict: Copy of the request headers with API keys masked
+    """
+    return {key: ('***' if key in REDACTED_HEADERS else value) for key, value in (headers or {}).items()}
@@ -0,0 +1,301 @@
+"""
+Out-of-core processing for Merit Order Data
+
+Merit order data is hourly x asset x block from September 2009 onward and does not
+fit in memory as a single DataFrame. The functions in this module work directly
+against the annual partitions written by final_processing_merit_order_data:
+
+    Merit Order Curves/merit_order_data_{year}.csv
+
+and process them in bounded-size chunks so that filtering, aggregation and export
+never materialize the full dataset. The chunk size is derived from a memory budget
+(in MB) and is re-tuned after every chunk from the observed in-memory size of the
+rows that were actually read.
+"""
+
+import os
+import re
+import glob
+import pandas as pd
+
+from src.instrumentation import peak_rss_mb
+from src.logging_tools import get_logger
+
+logger = get_logger('merit_order_out_of_core')
+
+MERIT_ORDER_SUB_FOLDER = 'Merit Order Curves'
+MERIT_ORDER_FILE_PATTERN = 'merit_order_data_*.csv'
+DEFAULT_MEMORY_BUDGET_MB = 512
+
+# A chunk is only allowed to use a fraction of the budget. The remainder covers the
+# CSV parser buffers, the filtered copy of the chunk and any partial aggregates.
+CHUNK_BUDGET_FRACTION = 0.25
+MIN_CHUNK_ROWS = 1_000
+SAMPLE_ROWS = 5_000
+
+# Partial aggregates that can be combined across chunks
+_COMBINABLE_AGGREGATES = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max'}
+
+#------------------------------------------------------
+def list_merit_order_partitions(directory, years=None):
+    """
+    List the annual merit order partitions in a directory
+
+    Args:
+        directory: Folder containing merit_order_data_{year}.csv files
+        years: Optional iterable of years to keep (partition pruning)
+
+    Returns:
+        list: Sorted list of (year, path) tuples
+    """
+    wanted = set(int(y) for y in years) if years is not None else None
+    partitions = []
+    for file_path in glob.glob(os.path.join(directory, MERIT_ORDER_FILE_PATTERN)):
+        match = re.search(r'merit_order_data_(\d{4})\.csv$', file_path)
+        if not match:
+            continue
+        year = int(match.group(1))
+        if wanted is None or year in wanted:
+            partitions.append((year, file_path))
+    return sorted(partitions)
+#------------------------------------------------------
+def estimate_chunk_rows(file_path, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, columns=None):
+    """
+    Estimate how many rows of a partition fit in one chunk for a given budget
+
+    Args:
+        file_path: Path to a merit order partition
+        memory_budget_mb: Memory budget for the whole out-of-core run in MB
+        columns: Optional column subset (projection) that will be read
+
+    Returns:
+        int: Number of rows to read per chunk
+    """
+    sample = pd.read_csv(file_path, usecols=columns, nrows=SAMPLE_ROWS)
+    if sample.empty:
+        return MIN_CHUNK_ROWS
+    bytes_per_row = sample.memory_usage(deep=True, index=False).sum() / len(sample)
+    chunk_bytes = memory_budget_mb * 1024 * 1024 * CHUNK_BUDGET_FRACTION
+    return max(MIN_CHUNK_ROWS, int(chunk_bytes / bytes_per_row))
+#------------------------------------------------------
+def _apply_filters(chunk, filters, predicate):
+    # filters maps a column to a single allowed value or a list of allowed values
+    if filters:
+        mask = pd.Series(True, index=chunk.index)
+        for column, allowed in filters.items():
+            if isinstance(allowed, (list, tuple, set, frozenset)):
+                mask &= chunk[column].isin(allowed)
+            else:
+                mask &= chunk[column] == allowed
+        chunk = chunk[mask]
+    if predicate is not None and not chunk.empty:
+        chunk = chunk[predicate(chunk)]
+    return chunk
+#------------------------------------------------------
+def iter_merit_order_chunks(directory, years=None, columns=None, filters=None, predicate=None,
+                            memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, dtype=None):
+    """
+    Stream merit order data from the stored partitions in bounded-size chunks
+
+    Args:
+        directory: Folder containing merit_order_data_{year}.csv files
+        years: Optional iterable of years to read, other partitions are never opened
+        columns: Optional column subset, only these columns are parsed
+        filters: Optional dict of column -> value or list of values to keep
+        predicate: Optional callable taking a chunk and returning a boolean mask
+        memory_budget_mb: Memory budget in MB used to size the chunks
+        dtype: Optional dtype mapping passed to pd.read_csv
+
+    Yields:
+        DataFrame: Filtered chunk of merit order rows
+    """
+    # Filter columns must be parsed even if they are not part of the projection
+    read_columns = columns
+    if columns is not None and filters:
+        read_columns = list(dict.fromkeys(list(columns) + list(filters)))
+
+    chunk_budget_bytes = memory_budget_mb * 1024 * 1024 * CHUNK_BUDGET_FRACTION
+
+    for year, file_path in list_merit_order_partitions(directory, years):
+        chunk_rows = estimate_chunk_rows(file_path, memory_budget_mb, read_columns)
+        logger.info("Streaming %s in chunks of %s rows", os.path.basename(file_path), chunk_rows)
+        # ru_maxrss is a process high-water mark: only what reading this partition added to it counts
+        peak_before = peak_rss_mb()
+
+        with pd.read_csv(file_path, usecols=read_columns, dtype=dtype, iterator=True) as reader:
+            while True:
+                try:
+                    chunk = reader.get_chunk(chunk_rows)
+                except StopIteration:
+                    break
+
+                # Re-tune the chunk size from what this chunk actually cost in memory
+                chunk_bytes = chunk.memory_usage(deep=True, index=False).sum()
+                if len(chunk) and chunk_bytes:
+                    chunk_rows = max(MIN_CHUNK_ROWS, int(chunk_budget_bytes / (chunk_bytes / len(chunk))))
+
+                chunk = _apply_filters(chunk, filters, predicate)
+                if columns is not None:
+                    chunk = chunk[list(columns)]
+                if not chunk.empty:
+                    yield chunk
+
+        peak_after = peak_rss_mb()
+        if peak_after is not None and peak_after - peak_before > memory_budget_mb:
+            logger.warning("Peak RSS rose by %.0f MB (to %.0f MB) while reading %s, more than the %s MB budget",
+                           peak_after - peak_before, peak_after, year, memory_budget_mb)
+#------------------------------------------------------
+def aggregate_merit_order(directory, group_by, value_columns, aggregations=('sum', 'count', 'min', 'max', 'mean'),
+                          years=None, filters=None, predicate=None, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Aggregate merit order data without materializing the full dataset
+
+    Each chunk is reduced to partial aggregates (sum, count, min, max) per group. The
+    partials are combined every time they grow past the chunk budget, so memory is
+    bounded by the number of distinct groups rather than the number of rows.
+
+    Args:
+        directory: Folder containing merit_order_data_{year}.csv files
+        group_by: Column or list of columns to group on
+        value_columns: Column or list of columns to aggregate
+        aggregations: Any of 'sum', 'count', 'min', 'max', 'mean'
+        years: Optional iterable of years to read
+        filters: Optional dict of column -> value or list of values to keep
+        predicate: Optional callable taking a chunk and returning a boolean mask
+        memory_budget_mb: Memory budget in MB used to size the chunks
+
+    Returns:
+        DataFrame: One row per group with columns named {value_column}_{aggregation}
+    """
+    group_by = [group_by] if isinstance(group_by, str) else list(group_by)
+    value_columns = [value_columns] if isinstance(value_columns, str) else list(value_columns)
+
+    partial_aggregations = ['sum', 'count', 'min', 'max']
+    combine_rules = {
+        (column, agg): _COMBINABLE_AGGREGATES[agg] for column in value_columns for agg in partial_aggregations
+    }
+    chunk_budget_bytes = memory_budget_mb * 1024 * 1024 * CHUNK_BUDGET_FRACTION
+
+    partials = []
+    partial_bytes = 0
+    for chunk in iter_merit_order_chunks(directory, years=years, columns=group_by + value_columns,
+                                         filters=filters, predicate=predicate, memory_budget_mb=memory_budget_mb):
+        chunk[value_columns] = chunk[value_columns].apply(pd.to_numeric, errors='coerce')
+        partial = chunk.groupby(group_by)[value_columns].agg(partial_aggregations)
+        partials.append(partial)
+        partial_bytes += partial.memory_usage(deep=True).sum()
+
+        # Fold the partials together before they outgrow the chunk budget
+        if partial_bytes > chunk_budget_bytes and len(partials) > 1:
+            combined = pd.concat(partials).groupby(level=group_by).agg(combine_rules)
+            partials = [combined]
+            partial_bytes = combined.memory_usage(deep=True).sum()
+
+    if not partials:
+        return pd.DataFrame(columns=group_by)
+
+    combined = pd.concat(partials).groupby(level=group_by).agg(combine_rules)
+
+    result = pd.DataFrame(index=combined.index)
+    for column in value_columns:
+        for agg in aggregations:
+            if agg == 'mean':
+                result[f"{column}_mean"] = combined[(column, 'sum')] / combined[(column, 'count')]
+            else:
+                result[f"{column}_{agg}"] = combined[(column, agg)]
+    return result.reset_index()
+#------------------------------------------------------
+def export_merit_order(directory, output_path, years=None, columns=None, filters=None, predicate=None,
+                       memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Export a filtered/projected slice of merit order data to a single CSV file
+
+    Args:
+        directory: Folder containing merit_order_data_{year}.csv files
+        output_path: CSV file to write
+        years: Optional iterable of years to read
+        columns: Optional column subset to export
+        filters: Optional dict of column -> value or list of values to keep
+        predicate: Optional callable taking a chunk and returning a boolean mask
+        memory_budget_mb: Memory budget in MB used to size the chunks
+
+    Returns:
+        int: Number of rows written
+    """
+    writer = MeritOrderCsvWriter(output_path)
+    for chunk in iter_merit_order_chunks(directory, years=years, columns=columns, filters=filters,
+                                         predicate=predicate, memory_budget_mb=memory_budget_mb):
+        writer.append(chunk)
+    writer.close()
+    logger.info("Exported %s merit order rows to %s", writer.rows_written, output_path)
+    return writer.rows_written
+
+#####################################
+# Streaming writer used while fetching
+#####################################
+class MeritOrderCsvWriter:
+    """
+    Append DataFrames to a CSV file one at a time
+
+    Rows are written to a '.partial' file that only replaces the target path when the
+    writer is closed, so an interrupted run never leaves a truncated annual file behind.
+    A run that only covers part of the year is merged into the stored file on its
+    natural key instead (close(replace=False)).
+    """
+
+    def __init__(self, path, column_order=None, natural_key=None, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+        self.path = path
+        self.partial_path = f"{path}.partial"
+        self.column_order = list(column_order) if column_order else None
+        self.natural_key = list(natural_key) if natural_key else None
+        self.memory_budget_mb = memory_budget_mb
+        self.rows_written = 0
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+    def append(self, df):
+        """
+        Append a DataFrame to the partial file
+
+        Args:
+            df: DataFrame to append, skipped if None or empty
+        """
+        if df is None or df.empty:
+            return
+        if self.column_order is None:
+            self.column_order = list(df.columns)
+        # reindex keeps every chunk on the same header even if a day is missing a column
+        df.reindex(columns=self.column_order).to_csv(
+            self.partial_path, mode='a', header=self.rows_written == 0, index=False)
+        self.rows_written += len(df)
+
+    def close(self, replace=True):
+        """
+        Move the partial file into place
+
+        Args:
+            replace: Replace the target file (the partial file holds the whole year). If False,
+                     the partial file is upserted into the existing target chunk by chunk on
+                     natural_key (see src/storage.py), keeping the stored days outside the run
+
+        Returns:
+            str or None: Final path, None if nothing was written
+        """
+        if self.rows_written == 0:
+            return None
+        if replace or not self.natural_key or not os.path.exists(self.path):
+            os.replace(self.partial_path, self.path)
+            return self.path
+
+        from src.storage import upsert_csv
+        chunk_rows = estimate_chunk_rows(self.partial_path, self.memory_budget_mb)
+        # Stored and streamed rows are both kept as text, so untouched rows are written back unchanged
+        with pd.read_csv(self.partial_path, dtype=str, keep_default_na=False, chunksize=chunk_rows) as reader:
+            for chunk in reader:
+                upsert_csv(chunk, self.path, self.natural_key)
+        os.remove(self.partial_path)
+        return self.path
@@ -0,0 +1,434 @@
+"""
+Run-Length Encoded Merit Order Store
+
+The annual merit order files hold one csv row per hour, asset and block, although
+most offers (block_price, from_MW, to_MW, available_MW, ...) stay the same for many
+hours. MeritOrderRunEncoder stores every (asset_ID, block_number) offer as runs
+instead: for each column, a run starts only at the hours where the value of that
+block changes
+
+    Merit Order Curves/merit_order_runs_{year}.npz
+        series_*             asset_ID and block_number of every block series
+        hour, hour_utc, hour_mpt
+                             the hours of the file (hours since 1970, utc and mpt text)
+        {column}__series, {column}__start, {column}__code
+                             runs sorted by series and start hour
+        {column}__values     distinct values of the column (the codes index into it)
+        present__*           runs of 1 (block offered) and 0 (block missing)
+
+Values are dictionary encoded as text, so a decoded row has the same text as the csv
+file it came from. Runs are written with np.savez_compressed, together with the size and
+modification time of the csv file they were encoded from (source_signature).
+
+Encoding reads the whole annual csv file, so it is only repeated when that signature
+changed. Every run that writes to a year changes its file, which is why the pipeline only
+encodes with "run_length_store": true (meant for backfills); after incremental runs, build
+the stores once with python -m src.cli encode-merit-order.
+
+MeritOrderRunStore reads a file back. The value of a column at hour h is its last
+run starting at or before h, found with one searchsorted over (series, start), so
+stack_at() rebuilds the merit order of one hour without expanding the year.
+
+    store = MeritOrderRunStore(runs_path_for(csv_path))
+    stack = store.stack_at('2024-07-15 18:00')
+"""
+
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from src.hourly_calendar import hourly_calendar
+from src.logging_tools import get_logger
+from src.merit_order_out_of_core import estimate_chunk_rows, list_merit_order_partitions, DEFAULT_MEMORY_BUDGET_MB
+from src.storage import file_signature
+
+logger = get_logger('merit_order_runs')
+
+TIME_COLUMNS = ['begin_dateTime_utc', 'begin_dateTime_mpt']
+SERIES_COLUMNS = ['asset_ID', 'block_number']
+PRESENT = 'present'
+TIME_FORMAT = '%Y-%m-%d %H:%M'
+# Code of a series that has no run yet
+NO_CODE = -2
+NO_HOUR = np.iinfo(np.int64).min // 2
+
+#------------------------------------------------------
+def runs_path_for(csv_path):
+    """
+    Returns:
+        str: merit_order_runs_{year}.npz next to merit_order_data_{year}.csv
+    """
+    directory, filename = os.path.split(csv_path)
+    return os.path.join(directory, re.sub(r'^merit_order_data_(.*)\.csv$', r'merit_order_runs_\1.npz', filename))
+
+def is_encoded(csv_path, runs_path=None):
+    """
+    Returns:
+        bool: True if the runs file exists and was encoded from the csv file as it is now
+    """
+    runs_path = runs_path or runs_path_for(csv_path)
+    if not os.path.exists(runs_path) or not os.path.exists(csv_path):
+        return False
+    with np.load(runs_path) as data:
+        if 'source_signature' not in data.files:
+            return False
+        return data['source_signature'].tolist() == file_signature(csv_path)
+
+def hours_since_epoch(timestamps):
+    """
+    Returns:
+        numpy.ndarray: int64 hours since 1970-01-01 of 'YYYY-MM-DD HH:MM' strings or Timestamps
+    """
+    values = pd.Series(list(timestamps), dtype=object)
+    if values.map(lambda value: isinstance(value, str)).all():
+        values = hourly_calendar.to_datetime(values.str.slice(0, 16), format=TIME_FORMAT)
+    else:
+        values = pd.to_datetime(values)
+    return values.to_numpy(dtype='datetime64[h]').astype(np.int64)
+
+def _series_key(df):
+    return df['asset_ID'].astype(str) + '\x1f' + df['block_number'].astype(str)
+
+def _typed(text):
+    # Stored text back to numbers where every non-empty value is a number, like pd.read_csv
+    text = pd.Series(text, dtype=object).replace('', np.nan)
+    numbers = pd.to_numeric(text, errors='coerce')
+    return numbers.to_numpy() if numbers.notna().sum() == text.notna().sum() else text.to_numpy()
+
+
+class _Dictionary:
+    """
+    Distinct values of one column, in order of first appearance
+    """
+
+    def __init__(self):
+        self.values = pd.Index([], dtype=object)
+
+    def encode(self, values):
+        codes, uniques = pd.factorize(values, sort=False)
+        known = self.values.get_indexer(uniques)
+        new = known == -1
+        if new.any():
+            known[new] = np.arange(len(self.values), len(self.values) + new.sum())
+            self.values = self.values.append(pd.Index(uniques[new], dtype=object))
+        return np.append(known, -1)[codes]
+
+
+class MeritOrderRunEncoder:
+    """
+    Turn merit order rows, fed in time order, into runs of unchanged values
+    """
+
+    def __init__(self):
+        self.columns = None
+        self.series = _Dictionary()
+        self.hours = {}
+        self.dictionaries = {}
+        self.runs = {}
+        self.last_hour = np.zeros(0, dtype=np.int64)
+        self.last_code = {}
+        self.rows = 0
+
+    def _grow(self, size):
+        # Per series state, extended as new blocks appear
+        if size <= len(self.last_hour):
+            return
+        extra = size - len(self.last_hour)
+        self.last_hour = np.append(self.last_hour, np.full(extra, NO_HOUR, dtype=np.int64))
+        for column in self.last_code:
+            self.last_code[column] = np.append(self.last_code[column], np.full(extra, NO_CODE, dtype=np.int64))
+
+    def _emit(self, column, series, starts, codes):
+        self.runs.setdefault(column, []).append((series.astype(np.int32), starts.astype(np.int32),
+                                                 codes.astype(np.int32)))
+
+    #------------------------------------------------------
+    def append(self, df):
+        """
+        Add rows that come after every row added so far (per block)
+
+        Args:
+            df: Merit order rows with the csv columns, e.g. a chunk of an annual file read with dtype=str
+        """
+        if df is None or df.empty:
+            return
+        if self.columns is None:
+            self.columns = [c for c in df.columns if c not in TIME_COLUMNS + SERIES_COLUMNS]
+            self.column_order = list(df.columns)
+            self.last_code = {column: np.zeros(0, dtype=np.int64) for column in self.columns + [PRESENT]}
+            self.dictionaries = {column: _Dictionary() for column in self.columns}
+
+        # Hour table: only the distinct timestamps of the chunk are parsed
+        utc_codes, utc_values = pd.factorize(df['begin_dateTime_utc'].astype(str).str.slice(0, 16))
+        utc_hours = hours_since_epoch(list(utc_values))
+        mpt_values = df['begin_dateTime_mpt'].astype(str).groupby(utc_codes).first()
+        for text, hour, mpt in zip(utc_values, utc_hours, mpt_values.reindex(range(len(utc_values)))):
+            self.hours.setdefault(int(hour), (text, mpt))
+        hours = utc_hours[utc_codes]
+
+        series = self.series.encode(_series_key(df))
+        self._grow(len(self.series.values))
+        order = np.lexsort((hours, series))
+        series, hours = series[order], hours[order]
+
+        same = np.zeros(len(series), dtype=bool)
+        same[1:] = series[1:] == series[:-1]
+        previous_hour = np.where(same, np.roll(hours, 1), self.last_hour[series])
+        if (hours <= previous_hour).any():
+            raise ValueError("Merit order rows must be appended in time order without duplicate blocks")
+        last_of_series = np.ones(len(series), dtype=bool)
+        last_of_series[:-1] = series[:-1] != series[1:]
+
+        # Presence: a block that skips hours gets a 0 run after its last hour and a 1 run again
+        gap = hours != previous_hour + 1
+        resumed = gap & (previous_hour != NO_HOUR)
+        self._emit(PRESENT, series[resumed], previous_hour[resumed] + 1, np.zeros(resumed.sum()))
+        self._emit(PRESENT, series[gap], hours[gap], np.ones(gap.sum()))
+
+        for column in self.columns:
+            values = df[column].to_numpy(dtype=object)[order]
+            codes = self.dictionaries[column].encode(pd.Series(values).fillna('').astype(str).to_numpy(dtype=object))
+            previous_code = np.where(same, np.roll(codes, 1), self.last_code[column][series])
+            changed = codes != previous_code
+            self._emit(column, series[changed], hours[changed], codes[changed])
+            self.last_code[column][series[last_of_series]] = codes[last_of_series]
+        self.last_hour[series[last_of_series]] = hours[last_of_series]
+        self.rows += len(df)
+
+    def save(self, path, source_signature=None):
+        """
+        Write the runs to an .npz file
+
+        Args:
+            path: Output file
+            source_signature: [size, mtime] of the csv file the rows came from
+
+        Returns:
+            int: Number of runs written
+        """
+        if self.columns is None:
+            raise ValueError("No merit order rows were appended")
+        # Every block ends with a 0 run after its last hour
+        seen = np.flatnonzero(self.last_hour != NO_HOUR)
+        self._emit(PRESENT, seen, self.last_hour[seen] + 1, np.zeros(len(seen)))
+
+        hour_index = np.array(sorted(self.hours), dtype=np.int64)
+        series_values = np.array([value.split('\x1f', 1) for value in self.series.values], dtype=str).reshape(-1, 2)
+        arrays = {
+            'column_order': np.array(self.column_order, dtype=str),
+            'columns': np.array(self.columns, dtype=str),
+            'series_asset_ID': series_values[:, 0],
+            'series_block_number': series_values[:, 1],
+            'hour': hour_index,
+            'hour_utc': np.array([self.hours[h][0] for h in hour_index], dtype=str),
+            'hour_mpt': np.array([self.hours[h][1] for h in hour_index], dtype=str),
+        }
+        if source_signature is not None:
+            arrays['source_signature'] = np.array(source_signature, dtype=np.int64)
+        total_runs = 0
+        for column in self.columns + [PRESENT]:
+            series, starts, codes = (np.concatenate(parts) for parts in zip(*self.runs[column]))
+            order = np.lexsort((starts, series))
+            arrays[f'{column}__series'] = series[order]
+            arrays[f'{column}__start'] = starts[order]
+            arrays[f'{column}__code'] = codes[order]
+            if column != PRESENT:
+                arrays[f'{column}__values'] = np.array(self.dictionaries[column].values, dtype=str)
+            total_runs += len(series)
+        self.runs[PRESENT].pop()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(temp_path, **arrays)
+        os.replace(temp_path, path)
+        return total_runs
+
+
+class MeritOrderRunStore:
+    """
+    Read access to a run-length encoded merit order file
+    """
+
+    def __init__(self, path):
+        with np.load(path) as data:
+            self.arrays = {name: data[name] for name in data.files}
+        self.path = path
+        self.column_order = list(self.arrays['column_order'])
+        self.columns = list(self.arrays['columns'])
+        self.series_count = len(self.arrays['series_asset_ID'])
+        self.hours = self.arrays['hour']
+        self._lookup_keys = {}
+        self._values = {}
+
+    def _keys(self, column):
+        # (series, start) packed into one sorted int64 per run
+        keys = self._lookup_keys.get(column)
+        if keys is None:
+            keys = (self.arrays[f'{column}__series'].astype(np.int64) << 32) + self.arrays[f'{column}__start']
+            self._lookup_keys[column] = keys
+        return keys
+
+    def _column_values(self, column):
+        values = self._values.get(column)
+        if values is None:
+            values = _typed(self.arrays[f'{column}__values'])
+            self._values[column] = values
+        return values
+
+    def decode(self, column, codes):
+        """
+        Returns:
+            Series: Values of the codes (NaN for -1)
+        """
+        values = self._column_values(column)
+        if not len(values):
+            return pd.Series(np.nan, index=range(len(codes)))
+        decoded = pd.Series(values[np.maximum(codes, 0)])
+        return decoded.where(codes != -1) if (codes == -1).any() else decoded
+
+    def lookup_codes(self, column, series, hours):
+        """
+        Codes of a column for (series, hour) pairs: the last run starting at or before the hour
+
+        Returns:
+            numpy.ndarray: Codes (-1 where the series has no run yet)
+        """
+        keys = self._keys(column)
+        position = np.searchsorted(keys, (series.astype(np.int64) << 32) + hours, side='right') - 1
+        valid = position >= 0
+        valid[valid] = self.arrays[f'{column}__series'][position[valid]] == series[valid]
+        return np.where(valid, self.arrays[f'{column}__code'][np.maximum(position, 0)], -1)
+
+    #------------------------------------------------------
+    def _rows(self, hours):
+        # Every block offered in the given hours
+        series = np.tile(np.arange(self.series_count, dtype=np.int64), len(hours))
+        hour_of_row = np.repeat(hours, self.series_count)
+        present = self.lookup_codes(PRESENT, series, hour_of_row) == 1
+        return series[present], hour_of_row[present]
+
+    def frame(self, series, hours):
+        """
+        Decode (series, hour) pairs into merit order rows
+
+        Returns:
+            DataFrame: Rows with the columns of the original csv file
+        """
+        hour_position = np.searchsorted(self.hours, hours)
+        data = {
+            'begin_dateTime_utc': self.arrays['hour_utc'][hour_position],
+            'begin_dateTime_mpt': self.arrays['hour_mpt'][hour_position],
+            'asset_ID': self.arrays['series_asset_ID'][series],
+            'block_number': _typed(self.arrays['series_block_number'])[series],
+        }
+        for column in self.columns:
+            data[column] = self.decode(column, self.lookup_codes(column, series, hours)).to_numpy()
+        return pd.DataFrame({column: data[column] for column in self.column_order})
+
+    def stack_at(self, timestamp):
+        """
+        Merit order of one hour
+
+        Args:
+            timestamp: UTC hour, 'YYYY-MM-DD HH:MM' or Timestamp
+
+        Returns:
+            DataFrame: Blocks offered in that hour, sorted by block_price
+        """
+        hour = hours_since_epoch([timestamp])[0]
+        if not np.isin(hour, self.hours):
+            return pd.DataFrame(columns=self.column_order)
+        series, hours = self._rows(np.array([hour], dtype=np.int64))
+        df = self.frame(series, hours)
+        if 'block_price' in df.columns:
+            df = df.sort_values('block_price', kind='stable')
+        return df.reset_index(drop=True)
+
+    def iter_hours(self, start=None, end=None, hours_per_chunk=24):
+        """
+        Decode the stored hours from start to end (UTC, inclusive) in chunks
+
+        Yields:
+            DataFrame: Merit order rows of hours_per_chunk hours, in time order
+        """
+        hours = self.hours
+        if start is not None:
+            hours = hours[hours >= hours_since_epoch([start])[0]]
+        if end is not None:
+            hours = hours[hours <= hours_since_epoch([end])[0]]
+        for first in range(0, len(hours), hours_per_chunk):
+            series, hour_of_row = self._rows(hours[first:first + hours_per_chunk])
+            if len(series):
+                yield self.frame(series, hour_of_row)
+
+    def read(self, start=None, end=None):
+        """
+        Returns:
+            DataFrame: Merit order rows from start to end (UTC, inclusive)
+        """
+        frames = list(self.iter_hours(start, end))
+        if not frames:
+            return pd.DataFrame(columns=self.column_order)
+        return pd.concat(frames, ignore_index=True)
+#------------------------------------------------------
+def encode_merit_order_partition(csv_path, runs_path=None, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Build the run-length store of one annual merit order file, reading it in chunks
+
+    Args:
+        csv_path: merit_order_data_{year}.csv (time sorted, as written by final_processing_merit_order_data)
+        runs_path: Output file (default: merit_order_runs_{year}.npz next to the csv)
+        memory_budget_mb: Memory budget used to size the chunks
+
+    Returns:
+        dict: rows, runs, csv_bytes and runs_bytes
+    """
+    runs_path = runs_path or runs_path_for(csv_path)
+    encoder = MeritOrderRunEncoder()
+    source_signature = file_signature(csv_path)
+    chunk_rows = estimate_chunk_rows(csv_path, memory_budget_mb)
+    with pd.read_csv(csv_path, dtype=str, keep_default_na=False, chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            encoder.append(chunk)
+    runs = encoder.save(runs_path, source_signature)
+    stats = {'rows': encoder.rows, 'runs': runs, 'csv_bytes': os.path.getsize(csv_path),
+             'runs_bytes': os.path.getsize(runs_path)}
+    logger.info("Encoded %s rows of %s into %s runs (%.1f MB -> %.1f MB)", stats['rows'], os.path.basename(csv_path),
+                runs, stats['csv_bytes'] / 1e6, stats['runs_bytes'] / 1e6)
+    return stats
+
+def encode_merit_order_partitions(directory, years=None, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, force=False):
+    """
+    Build the run-length stores of the annual merit order files in a folder
+
+    Args:
+        force: Also encode the files that did not change since they were encoded
+
+    Returns:
+        dict: Stats of encode_merit_order_partition() per year (None for the unchanged years)
+    """
+    return {year: encode_merit_order_partition(path, memory_budget_mb=memory_budget_mb)
+            if force or not is_encoded(path) else None
+            for year, path in list_merit_order_partitions(directory, years)}
+
+def update_merit_order_runs(api_config, path):
+    """
+    Re-encode the run-length store of an annual merit order file that was just written
+
+    Args:
+        api_config: Endpoint configuration ("run_length_store": true to enable)
+        path: merit_order_data_{year}.csv
+
+    Returns:
+        dict or None: Stats of encode_merit_order_partition(), None if nothing was encoded
+    """
+    if not api_config.get('run_length_store') or not os.path.exists(path):
+        return None
+    if is_encoded(path):
+        logger.info("Run-length store of %s is up to date", os.path.basename(path))
+        return None
+    return encode_merit_order_partition(path, memory_budget_mb=api_config.get('memory_budget_mb') or DEFAULT_MEMORY_BUDGET_MB)
@@ -0,0 +1,256 @@
+"""
+Sparse Metered Volume Store
+
+Most metered volumes are zero (intertie assets only flow a few hours a day) or
+missing, but the per-class files written by reshape_data are dense hour x asset
+matrices, and create_regional_import_export_file had to melt IMPORTER.csv and
+EXPORTER.csv back into long form only to drop the zeros again. The metered volume
+pipeline now keeps the readings as sparse (hour, asset_key, value) entries:
+
+    Metered Volumes/metered_volumes_sparse_{year}.npz
+        hour_utc, hour_mpt        the hours of the year (sorted)
+        classes                   asset classes
+        entry_*                   hour, asset_key, class and value of every non-zero reading,
+                                  plus the missing cells (value NaN)
+        class_hours, class_assets hours and assets of each class (ragged, *_offsets)
+
+Per asset class, the wide matrix is class_hours x class_assets (the hours and assets
+with at least one reading, as pivot_table keeps them). Every cell that is not an
+entry is 0, so the matrix can be rebuilt exactly, but only when a wide file is
+asked for (wide_output in config/api_endpoints.json or
+python -m src.cli wide-metered-volumes).
+
+SparseMeteredVolumeBuilder takes the daily frames one at a time and keeps only the
+entries, so memory scales with the non-zero readings rather than hours x assets.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.asset_dimension import KEY_COLUMN
+from src.logging_tools import get_logger
+
+logger = get_logger('metered_volume_store')
+
+SPARSE_FILE_TEMPLATE = 'metered_volumes_sparse_{year}.npz'
+METERED_VOLUME_SUB_FOLDER = 'Metered Volumes'
+
+#------------------------------------------------------
+def sparse_path(output_folder, year):
+    """
+    Returns:
+        str: Sparse store of one year in the 'Metered Volumes' sub folder
+    """
+    return os.path.join(output_folder, METERED_VOLUME_SUB_FOLDER, SPARSE_FILE_TEMPLATE.format(year=year))
+
+def _ragged(groups, count):
+    # List of arrays -> (values, offsets) with group i in values[offsets[i]:offsets[i + 1]]
+    lengths = [len(groups.get(i, ())) for i in range(count)]
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+    values = np.concatenate([np.asarray(groups.get(i, ()), dtype=np.int32) for i in range(count)]) if count \
+        else np.zeros(0, dtype=np.int32)
+    return values, offsets
+
+
+class SparseMeteredVolumeBuilder:
+    """
+    Collect daily metered volume frames as sparse entries
+    """
+
+    def __init__(self):
+        self.hours = {}
+        self.classes = {}
+        self.entries = []
+        # (class, hours, assets) of every day, to find the cells of assets missing on that day
+        self.day_grids = []
+        self.readings = 0
+
+    def _hour_codes(self, df):
+        codes, pairs = pd.factorize(pd.MultiIndex.from_arrays([df['begin_date_utc'].astype(str),
+                                                                df['begin_date_mpt'].astype(str)]))
+        lookup = np.array([self.hours.setdefault(pair, len(self.hours)) for pair in pairs], dtype=np.int32)
+        return lookup[codes]
+
+    #------------------------------------------------------
+    def append(self, df):
+        """
+        Add one day of metered volumes
+
+        Args:
+            df: Rows with begin_date_utc, begin_date_mpt, asset_key, asset_class and metered_volume
+        """
+        values = pd.to_numeric(df['metered_volume'], errors='coerce').to_numpy(dtype=np.float64)
+        observed = ~np.isnan(values)
+        df = df[observed]
+        values = values[observed]
+        if df.empty:
+            return
+        hours = self._hour_codes(df)
+        assets = df[KEY_COLUMN].to_numpy(dtype=np.int32)
+        class_codes, class_names = pd.factorize(df['asset_class'].astype(str))
+        class_lookup = np.array([self.classes.setdefault(name, len(self.classes)) for name in class_names],
+                                dtype=np.int16)
+        classes = class_lookup[class_codes]
+
+        nonzero = values != 0
+        self.entries.append((hours[nonzero], assets[nonzero], classes[nonzero], values[nonzero]))
+        for class_code in np.unique(classes):
+            in_class = classes == class_code
+            day_hours, hour_index = np.unique(hours[in_class], return_inverse=True)
+            day_assets, asset_index = np.unique(assets[in_class], return_inverse=True)
+            # Cells of the day's grid without a reading
+            grid = np.zeros((len(day_hours), len(day_assets)), dtype=bool)
+            grid[hour_index, asset_index] = True
+            missing_hours, missing_assets = np.nonzero(~grid)
+            if len(missing_hours):
+                self.entries.append((day_hours[missing_hours], day_assets[missing_assets],
+                                     np.full(len(missing_hours), class_code, dtype=np.int16),
+                                     np.full(len(missing_hours), np.nan)))
+            self.day_grids.append((class_code, day_hours, day_assets))
+        self.readings += len(df)
+
+    def build(self):
+        """
+        Returns:
+            SparseMeteredVolumes
+        """
+        # Hours in (utc, mpt) order, the row order of pivot_table
+        pairs = list(self.hours)
+        order = sorted(range(len(pairs)), key=lambda i: pairs[i])
+        remap = np.empty(len(pairs), dtype=np.int32)
+        remap[order] = np.arange(len(pairs), dtype=np.int32)
+
+        class_assets = {}
+        for class_code, _, day_assets in self.day_grids:
+            class_assets.setdefault(class_code, set()).update(day_assets.tolist())
+        class_hours = {}
+        entries = list(self.entries)
+        for class_code, day_hours, day_assets in self.day_grids:
+            class_hours.setdefault(class_code, set()).update(day_hours.tolist())
+            # Assets of the class that did not report on this day: all their cells are missing
+            absent = np.array(sorted(class_assets[class_code] - set(day_assets.tolist())), dtype=np.int32)
+            if len(absent):
+                entries.append((np.repeat(day_hours, len(absent)), np.tile(absent, len(day_hours)),
+                                np.full(len(day_hours) * len(absent), class_code, dtype=np.int16),
+                                np.full(len(day_hours) * len(absent), np.nan)))
+
+        if entries:
+            hours, assets, classes, values = (np.concatenate(parts) for parts in zip(*entries))
+        else:
+            hours = assets = np.zeros(0, dtype=np.int32)
+            classes, values = np.zeros(0, dtype=np.int16), np.zeros(0)
+        class_hours_values, class_hours_offsets = _ragged(
+            {c: sorted(remap[list(h)].tolist()) for c, h in class_hours.items()}, len(self.classes))
+        class_assets_values, class_assets_offsets = _ragged(
+            {c: sorted(a) for c, a in class_assets.items()}, len(self.classes))
+        return SparseMeteredVolumes({
+            'hour_utc': np.array([pairs[i][0] for i in order], dtype=str),
+            'hour_mpt': np.array([pairs[i][1] for i in order], dtype=str),
+            'classes': np.array(list(self.classes), dtype=str),
+            'entry_hour': remap[hours.astype(np.int64)],
+            'entry_asset': assets.astype(np.int32),
+            'entry_class': classes.astype(np.int16),
+            'entry_value': values.astype(np.float64),
+            'class_hours': class_hours_values,
+            'class_hours_offsets': class_hours_offsets,
+            'class_assets': class_assets_values,
+            'class_assets_offsets': class_assets_offsets,
+        })
+
+
+class SparseMeteredVolumes:
+    """
+    Sparse metered volumes of one year
+    """
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.classes = list(arrays['classes'])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls({name: data[name] for name in data.files})
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(temp_path, **self.arrays)
+        os.replace(temp_path, path)
+
+    def _ragged(self, name, class_code):
+        offsets = self.arrays[f'{name}_offsets']
+        return self.arrays[name][offsets[class_code]:offsets[class_code + 1]]
+
+    def class_code(self, asset_class):
+        return self.classes.index(asset_class)
+
+    #------------------------------------------------------
+    def hours(self, asset_class):
+        """
+        Returns:
+            DataFrame: begin_date_utc and begin_date_mpt of the hours with readings of the class
+        """
+        hours = self._ragged('class_hours', self.class_code(asset_class))
+        return pd.DataFrame({'begin_date_utc': self.arrays['hour_utc'][hours],
+                             'begin_date_mpt': self.arrays['hour_mpt'][hours]})
+
+    def asset_keys(self, asset_class=None):
+        """
+        Returns:
+            numpy.ndarray: Asset keys with readings (of one class or all classes)
+        """
+        if asset_class is not None:
+            return self._ragged('class_assets', self.class_code(asset_class))
+        return np.unique(self.arrays['class_assets'])
+
+    def readings(self, asset_class, asset_dimension, value_name='metered_volume'):
+        """
+        Non-zero readings of one class in long form, ordered by asset_ID and hour like a
+        melt of the wide matrix
+
+        Returns:
+            DataFrame: begin_date_utc, begin_date_mpt, ASSET_ID, asset_key and value_name
+        """
+        class_code = self.class_code(asset_class)
+        values = self.arrays['entry_value']
+        selected = np.flatnonzero((self.arrays['entry_class'] == class_code) & ~np.isnan(values))
+        hours = self.arrays['entry_hour'][selected]
+        keys = self.arrays['entry_asset'][selected]
+        asset_ids = asset_dimension.decode(keys).astype(str)
+        order = np.lexsort((hours, asset_ids))
+        selected, hours, keys, asset_ids = selected[order], hours[order], keys[order], asset_ids[order]
+        return pd.DataFrame({'begin_date_utc': self.arrays['hour_utc'][hours],
+                             'begin_date_mpt': self.arrays['hour_mpt'][hours],
+                             'ASSET_ID': asset_ids, KEY_COLUMN: keys, value_name: values[selected]})
+
+    def wide(self, asset_class, asset_dimension):
+        """
+        Hour x asset_ID matrix of one class, as reshape_data writes it
+
+        Returns:
+            DataFrame: begin_date_utc, begin_date_mpt and one column per asset_ID (sorted)
+        """
+        class_code = self.class_code(asset_class)
+        hours = self._ragged('class_hours', class_code)
+        keys = self._ragged('class_assets', class_code)
+        matrix = np.zeros((len(hours), len(keys)))
+        selected = self.arrays['entry_class'] == class_code
+        rows = np.searchsorted(hours, self.arrays['entry_hour'][selected])
+        columns = np.searchsorted(keys, self.arrays['entry_asset'][selected])
+        matrix[rows, columns] = self.arrays['entry_value'][selected]
+
+        asset_ids = asset_dimension.decode(keys).astype(str)
+        column_order = np.argsort(asset_ids, kind='stable')
+        wide = pd.DataFrame(matrix[:, column_order], columns=asset_ids[column_order])
+        wide.insert(0, 'begin_date_mpt', self.arrays['hour_mpt'][hours])
+        wide.insert(0, 'begin_date_utc', self.arrays['hour_utc'][hours])
+        return wide
+
+    def stats(self):
+        values = self.arrays['entry_value']
+        cells = sum(len(self._ragged('class_hours', c)) * len(self._ragged('class_assets', c))
+                    for c in range(len(self.classes)))
+        return {'cells': cells, 'nonzero': int((~np.isnan(values)).sum()), 'missing': int(np.isnan(values).sum())}
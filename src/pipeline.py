@@ -0,0 +1,299 @@
+"""
+Pipeline Runner
+
+Runs the same fetch_data -> final_processing_* steps as main.py for a chosen set of
+endpoints and dates, without editing api_activation_dict or the dates in main.py:
+
+    python -m src.cli run --endpoints Historical_Pool_Price_Date_And_Range AIL_Demand \
+        --start 2020-01-01 --end 2024-12-31 --workers 4 --cache-mode use --incremental
+
+The work is split into jobs of one endpoint and one calendar year (list endpoints are a
+single job). Jobs write to their own annual files, so they can run in parallel worker
+processes, and separate runs for disjoint endpoints or years can run side by side.
+Jobs of endpoints that make identical requests run in the same worker and share the
+responses (see src/request_coalescer.py).
+Annual files are consolidated in the parent process once all jobs of an endpoint are done.
+"""
+
+import os
+import re
+import time
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+OUTPUT_BACKENDS = ('csv', 'sqlite')
+DEFAULT_SERVICE = 'AESO_NEW'
+SQLITE_SUB_FOLDER = 'SQLite/'
+SQLITE_DB_FILE_NAME = 'Alberta_Houlry_Merit_Order_Test_File.db'
+SQLITE_TABLE_NAME = 'merit_order_daily_hourly_data'
+
+DATE_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2})')
+
+#------------------------------------------------------
+def plan_jobs(endpoints, start_date, end_date):
+    """
+    Split a run into (endpoint, year) jobs
+
+    Args:
+        endpoints: List of EndpointSpec objects
+        start_date: First date (datetime.date)
+        end_date: Last date, inclusive (datetime.date)
+
+    Returns:
+        list: Job dicts with category_key, service, year, start_date and end_date
+    """
+    jobs = []
+    for spec in endpoints:
+        if spec.data_type != 'time series':
+            jobs.append({'category_key': spec.category_key, 'service': spec.service, 'year': start_date.year,
+                         'start_date': start_date, 'end_date': end_date})
+            continue
+        for year in range(start_date.year, end_date.year + 1):
+            jobs.append({'category_key': spec.category_key, 'service': spec.service, 'year': year,
+                         'start_date': max(start_date, datetime.date(year, 1, 1)),
+                         'end_date': min(end_date, datetime.date(year, 12, 31))})
+    return jobs
+
+def bundle_jobs(jobs, endpoints):
+    """
+    Group the jobs whose endpoints make identical requests (see src/request_coalescer.py)
+
+    Jobs of one request group and year run one after the other in the same worker, so
+    the response fetched for the first one is reused by the others.
+
+    Returns:
+        list: Lists of jobs
+    """
+    request_groups = {spec.category_key: spec.request_group for spec in endpoints}
+    bundles = {}
+    for job in jobs:
+        group = request_groups.get(job['category_key']) or (job['category_key'],)
+        bundles.setdefault((group, job['year']), []).append(job)
+    return list(bundles.values())
+
+def last_stored_date(path):
+    """
+    First date found on the last line of a stored (time sorted) csv file
+
+    Returns:
+        datetime.date or None
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        block = b''
+        while position > 0 and block.count(b'\n') < 2:
+            step = min(4096, position)
+            position -= step
+            f.seek(position)
+            block = f.read(step) + block
+    lines = [line for line in block.decode('utf-8', errors='replace').splitlines() if line.strip()]
+    if not lines:
+        return None
+    match = DATE_PATTERN.search(lines[-1])
+    return datetime.date.fromisoformat(match.group(1)) if match else None
+#------------------------------------------------------
+def _job_context(job, options):
+    from src.api_tools import get_api_credientials, build_api_request_context
+    aeso_key, base_url, output_folder = get_api_credientials(options['service'])
+    output_folder = options.get('output_folder') or output_folder
+    start_date = options['start_date']
+    # Same template values main.py passes to build_api_request_repository
+    context = build_api_request_context(aeso_key, base_url, start_date, datetime.date(start_date.year, 12, 31),
+                                        options['end_date'], start_date.strftime('%Y-%m-%d'),
+                                        options['end_date'].strftime('%Y-%m-%d'), None, 'ALL', 'ALL', output_folder)
+    return context, output_folder
+
+def resolve_endpoint_config(category_key, start_date, end_date, service=DEFAULT_SERVICE, output_folder=None):
+    """
+    Resolve one endpoint outside a pipeline run (e.g. for gap repair)
+
+    Returns:
+        tuple: (api_config, output_folder)
+    """
+    from src.endpoint_registry import endpoint_registry
+    options = {'service': service, 'start_date': start_date, 'end_date': end_date, 'output_folder': output_folder}
+    context, output_folder = _job_context(None, options)
+    return endpoint_registry.get(category_key).resolve(context), output_folder
+
+def _configure_worker(options, output_folder):
+    from src.logging_tools import configure_logging
+    from src.response_cache import response_cache, CACHE_SUB_FOLDER
+    from src.instrumentation import run_report
+    from src.change_detection import change_tracker
+    configure_logging()
+    change_tracker.configure(output_folder)
+    response_cache.configure(options['cache_mode'],
+                             os.path.join(output_folder, CACHE_SUB_FOLDER) if options['cache_mode'] != 'off' else None)
+    if run_report.path is None:
+        run_report.start(output_folder, run_id=options['run_id'])
+
+def run_job(job, options):
+    """
+    Fetch and post-process one (endpoint, year) job
+
+    Args:
+        job: Job dict from plan_jobs()
+        options: Run options from run_pipeline()
+
+    Returns:
+        dict: The job with status ('done', 'skipped', 'unchanged', 'failed'), rows and wall_s added
+    """
+    import pandas as pd
+    import src.utilities as utilities
+    from src.endpoint_registry import endpoint_registry
+    from src.instrumentation import run_report
+    from src.window_planner import fetch_range
+    from src.change_detection import change_tracker
+
+    started = time.perf_counter()
+    result = dict(job, status='failed', rows=None, wall_s=None)
+    context, output_folder = _job_context(job, options)
+    _configure_worker(options, output_folder)
+
+    spec = endpoint_registry.get(job['category_key'], job['service'])
+    api_config = spec.resolve(context)
+    year_str = str(job['year'])
+    file_name = api_config['file_name_template'].replace('None', year_str)
+    path = utilities.create_path(output_folder, api_config['sub_folder_template'], file_name)
+
+    # Incremental mode: skip jobs whose annual file already reaches the end of the window
+    if options['incremental'] and spec.data_type == 'time series':
+        stored_through = last_stored_date(path)
+        if stored_through is not None and stored_through >= job['end_date']:
+            print(f"Skipping {job['category_key']} {year_str}: stored through {stored_through}")
+            result.update(status='skipped', wall_s=round(time.perf_counter() - started, 3))
+            return result
+
+    conn = None
+    sqlite_output = 'sqlite' in options['output_backends']
+    if sqlite_output:
+        db_path = utilities.create_path(output_folder, SQLITE_SUB_FOLDER, SQLITE_DB_FILE_NAME)
+        conn = utilities.create_sqlite_table(db_path, SQLITE_TABLE_NAME)
+
+    window_start = job['start_date'].strftime('%Y-%m-%d')
+    window_end = job['end_date'].strftime('%Y-%m-%d')
+    api_config['output_path'] = path
+    try:
+        print(f"Fetching data for {job['category_key']} {window_start}..{window_end}")
+        with run_report.context(job['category_key'], f"{window_start}..{window_end}"):
+            fetched_data_df = fetch_range(api_config, window_start, window_end, max_workers=options['window_workers'])
+        if fetched_data_df is None and change_tracker.is_unchanged(job['category_key']):
+            print(f"{job['category_key']} is unchanged since the last run, keeping {path}")
+            result.update(status='unchanged')
+            return result
+        if fetched_data_df is None:
+            print(f"Failed to fetch data for {job['category_key']}")
+            return result
+
+        post_process_function = getattr(utilities, api_config['function_name'])
+        # The job end is passed as the 'original' end date so the daily endpoints stop at the end of the year
+        with run_report.context(job['category_key'], year_str), run_report.span('post_process') as span:
+            processed_data_df = post_process_function(
+                api_config, fetched_data_df, api_config['output_csv_files'], pd.to_datetime(window_start),
+                pd.to_datetime(window_end), pd.to_datetime(window_end), job['year'], path,
+                'csv' in options['output_backends'], sqlite_output, conn, SQLITE_TABLE_NAME, api_config['column_order'])
+            span.rows = len(processed_data_df) if isinstance(processed_data_df, pd.DataFrame) else None
+        change_tracker.commit(job['category_key'], path)
+        result.update(status='done', rows=span.rows)
+    except Exception as e:
+        print(f"An error occurred with DataFrame: {job['category_key']}")
+        print(f"Error: {e}")
+    finally:
+        if conn is not None:
+            conn.close()
+        result['wall_s'] = round(time.perf_counter() - started, 3)
+    return result
+
+def run_bundle(bundle, options):
+    """
+    Run a bundle of jobs from bundle_jobs() in this process
+
+    Returns:
+        list: Job results from run_job()
+    """
+    from src.request_coalescer import request_coalescer
+    request_coalescer.start(options['endpoint_names'])
+    try:
+        return [run_job(job, options) for job in bundle]
+    finally:
+        request_coalescer.clear()
+
+def _run_bundle_star(args):
+    return run_bundle(*args)
+#------------------------------------------------------
+def run_pipeline(endpoint_names, start_date, end_date, workers=1, output_backends=('csv',), cache_mode='off',
+                 incremental=False, output_folder=None, service=DEFAULT_SERVICE, window_workers=4):
+    """
+    Run the pipeline for the selected endpoints and dates
+
+    Args:
+        endpoint_names: Endpoint names from config/api_endpoints.json
+        start_date: First date (datetime.date)
+        end_date: Last date, inclusive (datetime.date)
+        workers: Number of worker processes (1 runs the jobs in this process)
+        output_backends: Any of OUTPUT_BACKENDS
+        cache_mode: Response cache mode, see src/response_cache.py
+        incremental: Skip jobs whose output already covers their window
+        output_folder: Output folder (default: {service}_OUTPUT_FOLDER_PATH from .env)
+        service: Service whose credentials are used
+        window_workers: Request windows fetched concurrently within a job (see src/window_planner.py)
+
+    Returns:
+        list: Job results from run_job()
+    """
+    from src.endpoint_registry import endpoint_registry
+    from src.instrumentation import run_report, summarize_run_report
+
+    unknown = [name for name in output_backends if name not in OUTPUT_BACKENDS]
+    if unknown:
+        raise ValueError(f"Unknown output backend(s) {unknown}. Choose from {OUTPUT_BACKENDS}")
+
+    endpoints = [endpoint_registry.get(name) for name in endpoint_names]
+    jobs = plan_jobs(endpoints, start_date, end_date)
+    bundles = bundle_jobs(jobs, endpoints)
+    options = {
+        'endpoint_names': [spec.category_key for spec in endpoints],
+        'service': service,
+        'start_date': start_date,
+        'end_date': end_date,
+        'output_backends': tuple(output_backends),
+        'cache_mode': cache_mode,
+        'incremental': incremental,
+        'output_folder': output_folder,
+        'run_id': run_report.run_id,
+        'window_workers': window_workers,
+    }
+    _, resolved_output_folder = _job_context(None, options)
+    run_report.start(resolved_output_folder)
+    print(f"Running {len(jobs)} job(s) for {len(endpoints)} endpoint(s) with {workers} worker(s)")
+
+    if workers > 1 and len(bundles) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = [result for bundle_results in executor.map(_run_bundle_star, [(bundle, options) for bundle in bundles])
+                       for result in bundle_results]
+    else:
+        results = [result for bundle in bundles for result in run_bundle(bundle, options)]
+
+    _consolidate(endpoints, results, options)
+    for result in results:
+        print(f"{result['category_key']:<40} {result['year']} {result['status']:<8} rows={result['rows']} wall_s={result['wall_s']}")
+    if os.path.exists(run_report.path):
+        print("Run timing summary:")
+        print(summarize_run_report(run_report.path).to_string())
+    return results
+
+def _consolidate(endpoints, results, options):
+    import src.utilities as utilities
+    context, output_folder = _job_context(None, options)
+    for spec in endpoints:
+        if not spec.consolidate_files:
+            continue
+        if not any(r['category_key'] == spec.category_key and r['status'] == 'done' for r in results):
+            continue
+        api_config = spec.resolve(context)
+        utilities.consolidate_annual_files(api_config, output_folder, api_config['output_consolidated_csv_files'],
+                                           api_config['sub_folder_template'], 'csv' in options['output_backends'],
+                                           False, None, None, api_config['column_order'])
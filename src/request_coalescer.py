@@ -0,0 +1,126 @@
+"""
+Request Coalescing
+
+Some endpoints make exactly the same request and only keep different parts of the
+response: the three Supply_Demand_Data_* endpoints all read report/v1/csd/summary/current,
+and Historical_Pool_Price_Date_And_Range and Historical_Pool_Price_Date request the same
+poolPrice windows. The endpoint registry puts such endpoints in a request group.
+
+Within a run, fetch_response() goes through request_coalescer.fetch():
+- Identical requests (same url with params) made at the same time share one call:
+  the first caller makes it and the others wait for its response (single flight)
+- A successful response to a grouped endpoint is kept until every other endpoint of
+  its group that takes part in the run has picked it up, then it is dropped. Each
+  endpoint runs its own normalizer and post-processing on the shared response.
+
+Responses are only kept between start() and clear(), and only for grouped endpoints,
+so daily endpoints (merit order, metered volumes) never accumulate responses.
+"""
+
+import threading
+from concurrent.futures import Future
+
+from src.logging_tools import get_logger
+
+logger = get_logger('request_coalescer')
+
+
+class RequestCoalescer:
+    """
+    Single-flight requests and fan-out of shared responses within one run
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._shared = {}
+        self.run_endpoints = None
+        self.requests = 0
+        self.coalesced = 0
+
+    def start(self, category_keys):
+        """
+        Start a run: responses are kept for the grouped endpoints among category_keys
+
+        Args:
+            category_keys: Names of the endpoints taking part in the run
+        """
+        with self._lock:
+            self._shared.clear()
+            self.run_endpoints = set(category_keys)
+            self.requests = 0
+            self.coalesced = 0
+
+    def clear(self):
+        """
+        End the run and drop any responses that were not picked up
+        """
+        with self._lock:
+            if self._shared:
+                logger.debug("Dropping %s shared response(s) that were not picked up", len(self._shared))
+            self._shared.clear()
+            self.run_endpoints = None
+
+    def _consumers(self, api_config, joined):
+        # Endpoints of the group that still have to pick the response up
+        if self.run_endpoints is None:
+            return set()
+        group = set(api_config.get('request_group') or ()) & self.run_endpoints
+        return group - {api_config.get('category_key')} - joined
+
+    #------------------------------------------------------
+    def fetch(self, url, api_config, request):
+        """
+        Make a request once per run for every endpoint that needs it
+
+        Args:
+            url: Request url including the query parameters
+            api_config: API call dictionary of the endpoint making the request
+            request: Function making the request, returns (response_status_code, response_str) or None
+
+        Returns:
+            tuple or None: The result of request(), possibly shared with other endpoints
+        """
+        category_key = api_config.get('category_key')
+        with self._lock:
+            entry = self._shared.get(url)
+            if entry is not None:
+                entry['consumers'].discard(category_key)
+                if not entry['consumers']:
+                    del self._shared[url]
+                self.coalesced += 1
+                logger.info("Reusing the response fetched for %s (%s)", entry['fetched_by'], url)
+                return entry['response']
+            in_flight = self._in_flight.get(url)
+            if in_flight is None:
+                in_flight = {'future': Future(), 'joined': set()}
+                self._in_flight[url] = in_flight
+                owner = True
+            else:
+                in_flight['joined'].add(category_key)
+                self.coalesced += 1
+                owner = False
+
+        if not owner:
+            logger.info("Waiting for the identical request in flight (%s)", url)
+            return in_flight['future'].result()
+
+        try:
+            response = request()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[url]
+            in_flight['future'].set_exception(e)
+            raise
+
+        with self._lock:
+            del self._in_flight[url]
+            self.requests += 1
+            consumers = self._consumers(api_config, in_flight['joined'])
+            if consumers and response is not None and response[0] == 200:
+                self._shared[url] = {'response': response, 'consumers': consumers, 'fetched_by': category_key}
+        in_flight['future'].set_result(response)
+        return response
+
+# Create singleton instance
+request_coalescer = RequestCoalescer()
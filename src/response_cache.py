@@ -0,0 +1,85 @@
+"""
+On-disk API Response Cache
+
+Raw response strings of successful (200) API calls are stored gzip-compressed
+under <output folder>/temp/api_cache, keyed by a hash of the request URL
+(endpoint + query parameters; the API key is sent as a header and is not part of the key).
+
+Modes:
+    off      never read or write the cache (default, main.py behaviour)
+    use      serve cached responses, fetch and store anything missing
+    refresh  always fetch, overwrite the cached response
+    only     serve cached responses only, never call the API (offline reprocessing)
+"""
+
+import os
+import gzip
+import hashlib
+
+CACHE_MODES = ('off', 'use', 'refresh', 'only')
+CACHE_SUB_FOLDER = os.path.join('temp', 'api_cache')
+
+
+class ResponseCache:
+    """
+    URL-keyed cache of raw API response strings
+    """
+
+    def __init__(self, directory=None, mode='off'):
+        self.directory = directory
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, mode, directory=None):
+        """
+        Args:
+            mode: One of CACHE_MODES
+            directory: Cache folder (required unless mode is 'off')
+        """
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode '{mode}'. Choose from {CACHE_MODES}")
+        if mode != 'off' and not directory:
+            raise ValueError(f"Cache mode '{mode}' needs a cache directory")
+        self.mode = mode
+        self.directory = directory
+
+    @property
+    def offline(self):
+        return self.mode == 'only'
+
+    def _path(self, url):
+        digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], f"{digest}.json.gz")
+
+    #------------------------------------------------------
+    def get(self, url):
+        """
+        Returns:
+            str or None: Cached response string for the URL
+        """
+        if self.mode not in ('use', 'only'):
+            return None
+        path = self._path(url)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+        self.hits += 1
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return f.read()
+
+    def put(self, url, response_str):
+        """
+        Store a response string (written to a temp file first so readers never see a partial file)
+        """
+        if self.mode not in ('use', 'refresh'):
+            return
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+            f.write(response_str)
+        os.replace(temp_path, path)
+
+# Create singleton instance
+response_cache = ResponseCache()
@@ -0,0 +1,205 @@
+"""
+Streaming Rolling Statistics for Live Pool Price Updates
+
+Maintains the same 5 day and 30 day rolling mean/std of pool_price that
+spot_forcast_error.py and src/forecast_error_analytics.py compute, but updates them
+one hour at a time as new hours arrive from Historical_Pool_Price_Date_And_Range.
+
+Each window is a fixed-size ring buffer with one slot per hour. The mean and the sum
+of squared deviations (M2) are updated with Welford-style add/remove steps, so each
+hourly update costs O(1) and no DataFrame is rebuilt. Windows are time based like
+pandas .rolling('5D'): hours that never arrive are treated as missing, not skipped.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Window lengths in hours, keyed by the label used in the output names
+STREAMING_WINDOWS = {'5day': 5 * 24, '30day': 30 * 24}
+
+# Re-derive mean/M2 from the buffer every N updates to stop floating point drift
+RECOMPUTE_INTERVAL = 10_000
+
+_NS_PER_HOUR = 3_600_000_000_000
+
+#------------------------------------------------------
+def _hour_key(timestamp_utc):
+    return int(pd.Timestamp(timestamp_utc).value // _NS_PER_HOUR)
+
+
+class RollingWindow:
+    """
+    Time-based rolling mean/std over a ring buffer of hourly values
+    """
+
+    def __init__(self, hours):
+        self.hours = int(hours)
+        self.values = np.full(self.hours, np.nan)
+        self.last_hour = None
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self._updates = 0
+
+    #------------------------------------------------------
+    def _add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    def _remove(self, x):
+        self.count -= 1
+        if self.count == 0:
+            self.mean = 0.0
+            self.m2 = 0.0
+            return
+        delta = x - self.mean
+        self.mean -= delta / self.count
+        self.m2 -= delta * (x - self.mean)
+
+    def _evict(self, slot):
+        old = self.values[slot]
+        if not np.isnan(old):
+            self._remove(old)
+        self.values[slot] = np.nan
+
+    def _recompute(self):
+        valid = self.values[~np.isnan(self.values)]
+        self.count = len(valid)
+        self.mean = float(valid.mean()) if self.count else 0.0
+        self.m2 = float(((valid - self.mean) ** 2).sum()) if self.count else 0.0
+
+    #------------------------------------------------------
+    def update(self, hour, value):
+        """
+        Add (or correct) the value for an hour
+
+        Hours newer than the last one seen advance the window, evicting the hours that
+        fall out of it. Hours still inside the window replace their previous value,
+        which lets a blank (unsettled) pool price be corrected once it settles. Hours
+        older than the window are ignored.
+
+        Args:
+            hour: Hour key (hours since 1970-01-01 UTC)
+            value: Pool price, NaN for a missing value
+        """
+        value = float(value) if value is not None else np.nan
+
+        if self.last_hour is None or hour > self.last_hour:
+            # Every slot between the last hour and this one drops out of the window
+            gap = hour - self.last_hour if self.last_hour is not None else self.hours
+            if gap >= self.hours:
+                self.values[:] = np.nan
+                self.count, self.mean, self.m2 = 0, 0.0, 0.0
+            else:
+                for skipped in range(self.last_hour + 1, hour + 1):
+                    self._evict(skipped % self.hours)
+            self.last_hour = hour
+        elif hour <= self.last_hour - self.hours:
+            return
+        else:
+            self._evict(hour % self.hours)
+
+        slot = hour % self.hours
+        self.values[slot] = value
+        if not np.isnan(value):
+            self._add(value)
+
+        self._updates += 1
+        if self._updates % RECOMPUTE_INTERVAL == 0:
+            self._recompute()
+
+    def std(self):
+        """
+        Returns:
+            float: Sample standard deviation (ddof=1), NaN with fewer than 2 values
+        """
+        if self.count < 2:
+            return np.nan
+        return float(np.sqrt(max(self.m2, 0.0) / (self.count - 1)))
+
+    def avg(self):
+        """
+        Returns:
+            float: Mean of the values in the window, NaN if the window is empty
+        """
+        return self.mean if self.count else np.nan
+
+
+class StreamingRollingStats:
+    """
+    Streaming 5 day / 30 day rolling statistics of pool_price
+    """
+
+    def __init__(self, windows=STREAMING_WINDOWS):
+        self.windows = {label: RollingWindow(hours) for label, hours in windows.items()}
+
+    @property
+    def last_hour(self):
+        return next(iter(self.windows.values())).last_hour
+
+    def update(self, begin_datetime_utc, pool_price):
+        """
+        Add one hourly pool price and return the updated statistics
+
+        Args:
+            begin_datetime_utc: UTC hour, e.g. '2024-01-01 07:00'
+            pool_price: Pool price for the hour (blank/None while unsettled)
+
+        Returns:
+            dict: rolling_{label}_avg and rolling_{label}_std for every window
+        """
+        hour = _hour_key(begin_datetime_utc)
+        value = pd.to_numeric(pool_price, errors='coerce')
+        for window in self.windows.values():
+            window.update(hour, value)
+        return self.snapshot()
+
+    def update_from_frame(self, df, utc_column='begin_datetime_utc', value_column='pool_price'):
+        """
+        Feed the rows of a pool price report (e.g. a Historical_Pool_Price_Date_And_Range fetch)
+
+        Args:
+            df: DataFrame with the UTC hour and pool price columns
+            utc_column: Name of the UTC hour column
+            value_column: Name of the pool price column
+
+        Returns:
+            dict: Statistics after the last row
+        """
+        hours = df[utc_column].to_numpy()
+        values = pd.to_numeric(df[value_column], errors='coerce').to_numpy()
+        for hour, value in zip(hours, values):
+            hour_key = _hour_key(hour)
+            for window in self.windows.values():
+                window.update(hour_key, value)
+        return self.snapshot()
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: Current rolling_{label}_avg and rolling_{label}_std for every window
+        """
+        stats = {}
+        for label, window in self.windows.items():
+            stats[f'rolling_{label}_avg'] = window.avg()
+            stats[f'rolling_{label}_std'] = window.std()
+        return stats
+
+    @classmethod
+    def seed_from_pool_price_file(cls, path, windows=STREAMING_WINDOWS):
+        """
+        Create an aggregator primed with the trailing hours of a stored pool price file
+
+        Args:
+            path: Path to a pool_price_data_{year}.csv file
+            windows: Window lengths in hours
+
+        Returns:
+            StreamingRollingStats: Aggregator ready for live updates
+        """
+        stats = cls(windows)
+        history = pd.read_csv(path, usecols=['begin_datetime_utc', 'pool_price'])
+        stats.update_from_frame(history.tail(max(windows.values())))
+        return stats
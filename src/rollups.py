@@ -0,0 +1,331 @@
+"""
+Materialized Daily / Monthly / Annual Rollups
+
+Every analysis of pool prices, AIL and tie line flows re-aggregated the hourly csv files
+from scratch. The rollups keep the aggregates of each hourly dataset in small tables:
+
+    Rollups/{dataset}_daily.csv      one row per MPT day
+    Rollups/{dataset}_monthly.csv    one row per MPT month
+    Rollups/{dataset}_annual.csv     one row per MPT year
+        period, hours, and for every value column v:
+        v_mean, v_min, v_max, v_sum, v_count, v_on_peak_mean, v_off_peak_mean,
+        v_on_peak_sum, v_on_peak_count, v_off_peak_sum, v_off_peak_count
+
+On-peak hours are HE08-HE23 (begin hours 07:00-22:00 MPT) Monday to Saturday; all other
+hours are off-peak. Sums and counts are kept next to the means, so a month is rebuilt from
+its daily rows and a year from its monthly rows without going back to the hourly data.
+
+1) refresh(dataset, start, end) re-reads only the days start..end from the annual csv
+   files (byte-range reads through DataQuery), replaces those daily rows and rebuilds the
+   months and years they fall in. The pipeline calls it with the days it just ingested
+   ("rollups": true in config/api_endpoints.json)
+2) refresh(dataset) without a range rebuilds the years whose annual file changed since it
+   was last rolled up (size and modification time in Rollups/{dataset}_sources.json)
+3) load(dataset, level, start, end) reads a materialized table for dashboards
+
+The pipeline runs one process per (endpoint, year), so refresh() and clear() hold
+Rollups/{dataset}.lock (see file_lock in src/asset_dimension.py) from reading the tables
+to recording the sources.
+
+    python -m src.cli rollups --datasets pool_price ail_demand tie_lines
+"""
+
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+from core.data_query import DataQuery
+from src.asset_dimension import file_lock
+from src.hourly_calendar import hourly_calendar, NO_HOUR
+from src.logging_tools import get_logger
+from src.storage import file_signature
+
+logger = get_logger('rollups')
+
+ROLLUP_SUB_FOLDER = 'Rollups'
+ROLLUP_FILE_TEMPLATE = '{dataset}_{level}.csv'
+LEVELS = {'daily': 10, 'monthly': 7, 'annual': 4}
+
+# HE08-HE23 Monday to Saturday, as begin hours of the MPT day
+ON_PEAK_HOURS = range(7, 23)
+ON_PEAK_WEEKDAYS = range(0, 6)
+# 2000-01-01 (grid day 0) was a Saturday
+_WEEKDAY_OF_DAY_0 = 5
+
+# Hourly datasets, in the DataQuery catalog layout. values=None rolls up every column
+# except the time columns
+ROLLUP_DATASETS = {
+    'pool_price': {
+        'category_key': 'Historical_Pool_Price_Date_And_Range',
+        'sub_folder': 'Spot_Prices',
+        'file_pattern': 'pool_price_data_{year}.csv',
+        'utc_column': 'begin_datetime_utc',
+        'mpt_column': 'begin_datetime_mpt',
+        'asset_column': None,
+        'values': ['pool_price', 'forecast_pool_price'],
+    },
+    'ail_demand': {
+        'category_key': 'AIL_Demand',
+        'sub_folder': 'Historical AIL Demand',
+        'file_pattern': 'Metered_Demand_{year}.csv',
+        'utc_column': 'begin_datetime_utc',
+        'mpt_column': 'begin_datetime_mpt',
+        'asset_column': None,
+        'values': ['alberta_internal_load', 'forecast_alberta_internal_load'],
+    },
+    'tie_lines': {
+        'category_key': 'Metered_Volume_Data',
+        'sub_folder': 'temp',
+        'file_pattern': 'export_import_summary_{year}.csv',
+        'utc_column': 'begin_date_utc',
+        'mpt_column': 'begin_date_mpt',
+        'asset_column': None,
+        'values': None,
+    },
+}
+
+_STATISTICS = ['mean', 'min', 'max', 'sum', 'count', 'on_peak_mean', 'off_peak_mean',
+               'on_peak_sum', 'on_peak_count', 'off_peak_sum', 'off_peak_count']
+
+#------------------------------------------------------
+def _value_columns(spec, df):
+    if spec['values'] is not None:
+        return [c for c in spec['values'] if c in df.columns]
+    return [c for c in df.columns if c not in (spec['utc_column'], spec['mpt_column'])]
+
+def _with_means(table, value_columns):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for column in value_columns:
+            for prefix in ('', 'on_peak_', 'off_peak_'):
+                table[f'{column}_{prefix}count'] = table[f'{column}_{prefix}count'].astype(np.int64)
+                table[f'{column}_{prefix}mean'] = table[f'{column}_{prefix}sum'] / \
+                    table[f'{column}_{prefix}count'].where(table[f'{column}_{prefix}count'] > 0)
+    table['hours'] = table['hours'].astype(np.int64)
+    ordered = ['period', 'hours'] + [f'{c}_{s}' for c in value_columns for s in _STATISTICS]
+    return table[ordered]
+
+def daily_rollup(df, spec):
+    """
+    Aggregate hourly rows into one row per MPT day
+
+    Args:
+        df: Hourly rows with the dataset's time and value columns
+        spec: Entry of ROLLUP_DATASETS
+
+    Returns:
+        DataFrame: Daily rollup rows
+    """
+    value_columns = _value_columns(spec, df)
+    numbers = hourly_calendar.grid_numbers(df[spec['mpt_column']])
+    keep = numbers != NO_HOUR
+    numbers = numbers[keep]
+    values = df.loc[keep, value_columns].apply(pd.to_numeric, errors='coerce').reset_index(drop=True)
+
+    days = numbers // 24
+    on_peak = np.isin(numbers % 24, ON_PEAK_HOURS) & np.isin((days + _WEEKDAY_OF_DAY_0) % 7, ON_PEAK_WEEKDAYS)
+    grouped = values.groupby(days)
+    on_peak_grouped = values.where(pd.Series(on_peak)).groupby(days)
+    off_peak_grouped = values.where(pd.Series(~on_peak)).groupby(days)
+
+    parts = {'hours': grouped.size()}
+    for name, frame in [('sum', grouped.sum()), ('count', grouped.count()), ('min', grouped.min()),
+                        ('max', grouped.max()), ('on_peak_sum', on_peak_grouped.sum()),
+                        ('on_peak_count', on_peak_grouped.count()), ('off_peak_sum', off_peak_grouped.sum()),
+                        ('off_peak_count', off_peak_grouped.count())]:
+        for column in value_columns:
+            parts[f'{column}_{name}'] = frame[column]
+    table = pd.DataFrame(parts)
+    table.insert(0, 'period', (np.datetime64('2000-01-01') + table.index.to_numpy().astype('timedelta64[D]')).astype(str))
+    return _with_means(table.reset_index(drop=True), value_columns)
+
+def coarser_rollup(table, level):
+    """
+    Combine daily (or monthly) rows into monthly or annual rows
+
+    Returns:
+        DataFrame: Rollup rows of the level
+    """
+    value_columns = [c[:-len('_count')] for c in table.columns
+                     if c.endswith('_count') and not c.endswith('peak_count')]
+    if table.empty:
+        return table
+    keys = table['period'].astype(str).str.slice(0, LEVELS[level])
+    aggregations = {'hours': 'sum'}
+    for column in value_columns:
+        aggregations[f'{column}_min'] = 'min'
+        aggregations[f'{column}_max'] = 'max'
+        for statistic in ('sum', 'count', 'on_peak_sum', 'on_peak_count', 'off_peak_sum', 'off_peak_count'):
+            aggregations[f'{column}_{statistic}'] = 'sum'
+    combined = table.groupby(keys, sort=True).agg(aggregations).rename_axis('period').reset_index()
+    return _with_means(combined, value_columns)
+
+def _replace_periods(table, replaced, fresh):
+    # Empty frames are left out of the concat, so they do not turn integer columns into floats
+    frames = [frame for frame in (table[~replaced], fresh) if not frame.empty]
+    if not frames:
+        return fresh
+    return pd.concat(frames, ignore_index=True).sort_values('period', kind='stable').reset_index(drop=True)
+
+
+class RollupStore:
+    """
+    Materialized rollup tables of one output folder
+    """
+
+    def __init__(self, output_folder=None):
+        """
+        Args:
+            output_folder: Output folder holding the dataset sub folders (default: platform output dir)
+        """
+        self.query = DataQuery(output_folder, ROLLUP_DATASETS)
+        self.output_folder = self.query.base_dir
+        self.directory = os.path.join(self.output_folder, ROLLUP_SUB_FOLDER)
+
+    def path(self, dataset, level):
+        return os.path.join(self.directory, ROLLUP_FILE_TEMPLATE.format(dataset=dataset, level=level))
+
+    def _lock_path(self, dataset):
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, dataset)
+
+    def _sources_path(self, dataset):
+        return os.path.join(self.directory, f"{dataset}_sources.json")
+
+    def _write(self, path, table):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        table.to_csv(temp_path, index=False)
+        os.replace(temp_path, path)
+
+    #------------------------------------------------------
+    def load(self, dataset, level='daily', start=None, end=None):
+        """
+        Read a materialized rollup table
+
+        Args:
+            dataset: Key of ROLLUP_DATASETS
+            level: 'daily', 'monthly' or 'annual'
+            start, end: Optional inclusive period bounds, e.g. '2023-01' or '2023-01-15'
+
+        Returns:
+            DataFrame: Rollup rows (empty if the dataset was never rolled up)
+        """
+        path = self.path(dataset, level)
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=['period', 'hours'])
+        table = pd.read_csv(path, dtype={'period': str})
+        if start is not None:
+            table = table[table['period'] >= str(start)[:LEVELS[level]]]
+        if end is not None:
+            table = table[table['period'] <= str(end)[:LEVELS[level]]]
+        return table.reset_index(drop=True)
+
+    def refresh(self, dataset, start=None, end=None):
+        """
+        Bring the rollups of a dataset up to date
+
+        Args:
+            dataset: Key of ROLLUP_DATASETS
+            start, end: Inclusive MPT days that changed ('YYYY-MM-DD'). Without them the
+                        years whose annual file changed are refreshed
+
+        Returns:
+            list: (start, end) day ranges that were refreshed
+        """
+        with file_lock(self._lock_path(dataset)):
+            return self._refresh(dataset, start, end)
+
+    def _refresh(self, dataset, start, end):
+        if start is None or end is None:
+            ranges = [(f'{year}-01-01', f'{year}-12-31') for year in self.stale_years(dataset)]
+        else:
+            ranges = [(str(pd.Timestamp(start).date()), str(pd.Timestamp(end).date()))]
+        if not ranges:
+            return []
+
+        spec = ROLLUP_DATASETS[dataset]
+        daily = self.load(dataset, 'daily')
+        monthly = self.load(dataset, 'monthly')
+        annual = self.load(dataset, 'annual')
+        for first_day, last_day in ranges:
+            # All columns: a value column may be missing from older files
+            hourly = self.query.query(dataset, first_day, last_day)
+            fresh = daily_rollup(hourly, spec) if not hourly.empty else pd.DataFrame(columns=['period'])
+            daily = _replace_periods(daily, (daily['period'] >= first_day) & (daily['period'] <= last_day), fresh)
+
+            # Only the months and years the range falls in are rebuilt
+            months = pd.period_range(first_day, last_day, freq='M').strftime('%Y-%m')
+            days_in_months = daily[daily['period'].str.slice(0, 7).isin(months)]
+            monthly = _replace_periods(monthly, monthly['period'].isin(months), coarser_rollup(days_in_months, 'monthly'))
+            years = [str(year) for year in range(int(first_day[:4]), int(last_day[:4]) + 1)]
+            months_in_years = monthly[monthly['period'].str.slice(0, 4).isin(years)]
+            annual = _replace_periods(annual, annual['period'].isin(years), coarser_rollup(months_in_years, 'annual'))
+            logger.info("Refreshed %s rollups for %s to %s (%s hourly rows)", dataset, first_day, last_day, len(hourly))
+
+        for level, table in (('daily', daily), ('monthly', monthly), ('annual', annual)):
+            self._write(self.path(dataset, level), table)
+        self._record_sources(dataset, {int(first_day[:4]) for first_day, _ in ranges}
+                             | {int(last_day[:4]) for _, last_day in ranges})
+        return ranges
+
+    def clear(self, dataset):
+        """
+        Drop the stored rollups of a dataset, so the next refresh() rebuilds every year
+        """
+        with file_lock(self._lock_path(dataset)):
+            for path in [self.path(dataset, level) for level in LEVELS] + [self._sources_path(dataset)]:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    #------------------------------------------------------
+    def _stored_sources(self, dataset):
+        path = self._sources_path(dataset)
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def stale_years(self, dataset):
+        """
+        Returns:
+            list: Years whose annual file changed (or is new) since it was rolled up
+        """
+        stored = self._stored_sources(dataset)
+        return [year for year, path in self.query.partitions(dataset)
+                if stored.get(os.path.basename(path)) != file_signature(path)]
+
+    def _record_sources(self, dataset, years):
+        # The rolled up files are current for the years that were just refreshed
+        stored = self._stored_sources(dataset)
+        for year, path in self.query.partitions(dataset, years):
+            stored[os.path.basename(path)] = file_signature(path)
+        temp_path = f"{self._sources_path(dataset)}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(stored, f, indent=2)
+        os.replace(temp_path, self._sources_path(dataset))
+#------------------------------------------------------
+def update_rollups(api_config, df, path):
+    """
+    Refresh the rollups of the days in a frame that was just saved to its annual file
+
+    Args:
+        api_config: Endpoint configuration ("rollups": true to enable)
+        df: Saved frame
+        path: Annual csv file ({output_folder}{sub_folder}/{file})
+
+    Returns:
+        list: Refreshed day ranges
+    """
+    if not api_config.get('rollups') or df is None or df.empty:
+        return []
+    dataset = next((d for d, spec in ROLLUP_DATASETS.items()
+                    if spec['category_key'] == api_config.get('category_key')), None)
+    if dataset is None or ROLLUP_DATASETS[dataset]['mpt_column'] not in df.columns:
+        return []
+    days = df[ROLLUP_DATASETS[dataset]['mpt_column']].astype(str).str.slice(0, 10)
+    store = RollupStore(os.path.dirname(os.path.dirname(os.path.abspath(path))))
+    ranges = store.refresh(dataset, days.min(), days.max())
+    logger.info("Rollups: %s refreshed for %s to %s", dataset, days.min(), days.max())
+    return ranges
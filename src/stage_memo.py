@@ -0,0 +1,268 @@
+"""
+Content-Hash Memoization of Derived Datasets
+
+The post-processing stages of the metered volume pipeline (consolidate_generation_files
+and steps 8a-8c: create_regional_import_export_file, aggregate_import_exports and
+combine_demand_with_tie_line_data) used to rerun and rewrite their outputs on every run,
+even when their inputs were byte-identical to the last one. With "memoize_stages": true
+in config/api_endpoints.json every run of a stage is recorded, like a build system does:
+
+    temp/stage_manifests/{stage}.json   per key (the year): the parameters, the sha256 of
+                                        every input and output file and the return value
+
+1) A stage is skipped (and returns its recorded value) when its parameters and code are
+   the same (the source of the module defining the stage function and the stage's
+   'version' in STAGE_FILES, to bump when a helper in another module changes), every
+   input still has its recorded hash and every output still exists with its recorded
+   hash. A missing file counts as a hash of its own (None)
+2) The inputs of a stage are the outputs of the stage before it, so a stage that reruns
+   but writes the same bytes does not make the next one rerun
+3) A file whose size and modification time match the manifest is not hashed again
+4) .npz files are hashed by their members, as the zip container changes with every save
+5) Input hashes are recorded after the stage ran, as a stage may bring an input up to
+   date itself (e.g. asset_dimension.csv)
+
+Delete temp/stage_manifests (or pass force=True) to rerun every stage.
+
+    memo = StageMemo(output_folder)
+    year = memo.run('aggregate_import_exports', year, aggregate_import_exports, year, output_folder,
+                    output_folder=output_folder, year=year)
+"""
+
+import os
+import json
+import zipfile
+import hashlib
+import inspect
+
+from src.logging_tools import get_logger
+
+logger = get_logger('stage_memo')
+
+MANIFEST_SUB_FOLDER = os.path.join('temp', 'stage_manifests')
+
+# Files read and written by each stage, formatted with the folders and the year of the run
+# (bump 'version' when the outputs change through code outside the stage function's module):
+#   output_folder   project_folder/output
+#   project_folder  folder holding output/ and object_mapping/
+#   metered_folder  'Metered Volumes' folder of the metered volume csv files
+STAGE_FILES = {
+    'consolidate_generation_files': {
+        'version': 1,
+        'inputs': ['{metered_folder}/IPP.csv', '{metered_folder}/GENCO.csv'],
+        'outputs': ['{metered_folder}/Consolidated Generation Metered Volumes.csv'],
+    },
+    'create_regional_import_export_file': {
+        'version': 1,
+        'inputs': ['{output_folder}/Metered Volumes/metered_volumes_sparse_{year}.npz',
+                   '{output_folder}/Metered Volumes/IMPORTER.csv',
+                   '{output_folder}/Metered Volumes/EXPORTER.csv',
+                   '{output_folder}/Asset List/Asset_Lists.csv',
+                   '{output_folder}/Asset List/asset_dimension.csv',
+                   '{project_folder}/object_mapping/Import_Export_Map.csv',
+                   '{project_folder}/object_mapping/Region_Mapping.csv'],
+        'outputs': ['{metered_folder}/IMPORT_EXPORT_MAP.csv',
+                    '{output_folder}/temp/import_categorized_filtered_sorted_{year}.csv',
+                    '{output_folder}/temp/export_categorized_filtered_sorted_{year}.csv',
+                    '{output_folder}/temp/aggregated_hourly_import_export_data_{year}.csv'],
+    },
+    'aggregate_import_exports': {
+        'version': 1,
+        'inputs': ['{output_folder}/temp/export_categorized_filtered_sorted_{year}.csv',
+                   '{output_folder}/temp/import_categorized_filtered_sorted_{year}.csv'],
+        'outputs': ['{output_folder}/temp/export_import_summary_{year}.csv'],
+    },
+    'combine_demand_with_tie_line_data': {
+        'version': 1,
+        'inputs': ['{output_folder}/temp/export_import_summary_{year}.csv',
+                   '{output_folder}/Historical AIL Demand/Metered_Demand_{year}.csv'],
+        'outputs': ['{output_folder}/Historical AIL Demand/combined_Metered_Demand_{year}.csv'],
+    },
+}
+
+_CHUNK_SIZE = 1 << 20
+
+#------------------------------------------------------
+def file_hash(path):
+    """
+    sha256 of a file's content (of the members of an .npz file)
+
+    Returns:
+        str: Hex digest, or None if the file does not exist
+    """
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    if path.endswith('.npz'):
+        with zipfile.ZipFile(path) as archive:
+            for name in sorted(archive.namelist()):
+                digest.update(name.encode('utf-8'))
+                with archive.open(name) as f:
+                    for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+                        digest.update(chunk)
+        return digest.hexdigest()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def code_hash(func, version=None):
+    """
+    Args:
+        func: Stage function
+        version: Explicit version of the stage (STAGE_FILES[stage]['version'])
+
+    Returns:
+        str: sha256 of the source of the module defining func and of the version
+             (None if the source is not available)
+    """
+    try:
+        source = inspect.getsource(inspect.getmodule(func) or func)
+    except (OSError, TypeError):
+        return None
+    return hashlib.sha256(f"{version}\n{source}".encode('utf-8')).hexdigest()
+
+def _json_value(value):
+    # Parameters as they read back from the manifest (dates and Timestamps become strings)
+    return json.loads(json.dumps(value, default=str))
+
+
+class StageMemo:
+    """
+    Manifests of the memoized stages of one output folder
+    """
+
+    def __init__(self, output_folder, enabled=True, force=False):
+        """
+        Args:
+            output_folder: Output folder (manifests go to output_folder/temp/stage_manifests)
+            enabled: False runs every stage without recording it
+            force: Rerun every stage, but record the runs
+        """
+        self.output_folder = output_folder
+        self.directory = os.path.join(output_folder, MANIFEST_SUB_FOLDER)
+        self.enabled = bool(enabled)
+        self.force = force
+
+    def _path(self, stage):
+        return os.path.join(self.directory, f"{stage}.json")
+
+    def manifest(self, stage):
+        """
+        Returns:
+            dict: Recorded runs of a stage, keyed by str(key)
+        """
+        path = self._path(stage)
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def _save_manifest(self, stage, manifest):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(stage)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, path)
+
+    def clear(self, stage=None):
+        """
+        Forget the recorded runs of one stage (default: all stages)
+        """
+        for name in [stage] if stage else STAGE_FILES:
+            if os.path.exists(self._path(name)):
+                os.remove(self._path(name))
+
+    #------------------------------------------------------
+    def files(self, stage, **folders):
+        """
+        Args:
+            stage: Key of STAGE_FILES
+            folders: year, output_folder, project_folder and metered_folder of the run
+
+        Returns:
+            tuple: (inputs, outputs) lists of normalized paths
+        """
+        spec = STAGE_FILES[stage]
+        return ([os.path.normpath(template.format(**folders)) for template in spec['inputs']],
+                [os.path.normpath(template.format(**folders)) for template in spec['outputs']])
+
+    def _signatures(self, paths, recorded):
+        """
+        Returns:
+            dict: path -> {'hash', 'size', 'mtime_ns'}, reusing the recorded hash of unchanged files
+        """
+        signatures = {}
+        for path in paths:
+            name = os.path.relpath(path, self.output_folder)
+            if not os.path.exists(path):
+                signatures[name] = {'hash': None}
+                continue
+            stat = os.stat(path)
+            previous = recorded.get(name) or {}
+            if previous.get('size') == stat.st_size and previous.get('mtime_ns') == stat.st_mtime_ns:
+                file_digest = previous['hash']
+            else:
+                file_digest = file_hash(path)
+            signatures[name] = {'hash': file_digest, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        return signatures
+
+    def is_current(self, stage, key, inputs, outputs, params, code=None):
+        """
+        Returns:
+            bool: True if the last recorded run of the stage for key is still valid
+        """
+        record = self.manifest(stage).get(str(key))
+        if record is None or record.get('params') != _json_value(params) or record.get('code') != code:
+            return False
+        for paths, recorded in ((inputs, record['inputs']), (outputs, record['outputs'])):
+            signatures = self._signatures(paths, recorded)
+            if set(signatures) != set(recorded):
+                return False
+            if any(signatures[name]['hash'] != recorded[name]['hash'] for name in signatures):
+                return False
+        return True
+
+    def record(self, stage, key, inputs, outputs, params, result=None, code=None):
+        """
+        Store the hashes of a run that just finished
+        """
+        manifest = self.manifest(stage)
+        previous = manifest.get(str(key)) or {}
+        manifest[str(key)] = {
+            'params': _json_value(params),
+            'code': code,
+            'inputs': self._signatures(inputs, previous.get('inputs') or {}),
+            'outputs': self._signatures(outputs, previous.get('outputs') or {}),
+            'result': _json_value(result),
+        }
+        self._save_manifest(stage, manifest)
+
+    def run(self, stage, key, func, *args, params=None, **folders):
+        """
+        Run a stage unless its recorded run is still current
+
+        Args:
+            stage: Key of STAGE_FILES
+            key: Key of the run within the stage (the year)
+            func: Stage function, called as func(*args)
+            params: json-serializable arguments that change the outputs (besides the files)
+            folders: Values for the STAGE_FILES templates (year, output_folder, ...)
+
+        Returns:
+            Return value of func, or the recorded one if the stage was skipped
+        """
+        if not self.enabled:
+            return func(*args)
+        inputs, outputs = self.files(stage, **folders)
+        code = code_hash(func, STAGE_FILES[stage].get('version'))
+        if not self.force and self.is_current(stage, key, inputs, outputs, params, code):
+            logger.info("Skipping %s (%s): inputs and outputs unchanged", stage, key)
+            return self.manifest(stage)[str(key)]['result']
+        result = func(*args)
+        try:
+            self.record(stage, key, inputs, outputs, params, result, code)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning("Could not record %s (%s): %s", stage, key, e)
+        return result
@@ -0,0 +1,152 @@
+"""
+Upsert Storage for Time-Sorted Datasets
+
+Overlapping request windows and repeated runs for the same year return rows that are
+already stored. Instead of rewriting annual files with whatever the last run fetched
+(or appending duplicates), rows are upserted on each endpoint's natural key, declared
+as natural_key in config/api_endpoints.json:
+
+    pool price / AIL demand   [begin_datetime_utc]
+    merit order               [begin_dateTime_utc, asset_ID, block_number]
+    metered volumes           [begin_date_utc, asset_ID]
+
+The first key column is the time column the annual files are sorted by. upsert_csv()
+uses that ordering to merge without reloading the whole file: the stored rows from the
+earliest to the latest new timestamp are located with binary searches over byte offsets
+(see core/data_query.py). Everything before and after them is copied byte for byte, and
+only that range is parsed, merged with the new rows and rewritten. Appending the next
+window to a file, or filling a gap in the middle of it, therefore only parses the rows
+of the window.
+"""
+
+import io
+import os
+import csv
+
+import pandas as pd
+
+from core.data_query import DataQuery, KEY_LENGTH
+
+#------------------------------------------------------
+def file_signature(path):
+    """
+    Returns:
+        list: [size, whole-second modification time], json-serializable, to tell whether a
+              file changed since a derived store was built from it
+    """
+    stat = os.stat(path)
+    return [stat.st_size, int(stat.st_mtime)]
+
+def _key_frame(df, key_columns):
+    # Keys are compared as text so values read back from csv ('3') match fetched values (3 or '3')
+    keys = df[key_columns].astype(str)
+    keys[key_columns[0]] = keys[key_columns[0]].str.slice(0, KEY_LENGTH)
+    return keys
+
+def dedupe_frame(df, key_columns):
+    """
+    Drop duplicate natural keys, keeping the last occurrence, and sort by the time column
+
+    Args:
+        df: DataFrame to clean
+        key_columns: Natural key, time column first
+
+    Returns:
+        DataFrame: Deduplicated frame in time order (row order within a timestamp is kept)
+    """
+    if df is None or df.empty or not key_columns:
+        return df
+    df = df[~_key_frame(df, key_columns).duplicated(keep='last').values]
+    order = df[key_columns[0]].astype(str).str.slice(0, KEY_LENGTH).argsort(kind='stable')
+    return df.iloc[order].reset_index(drop=True)
+#------------------------------------------------------
+def _write_atomic(path, write):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        write(f)
+    os.replace(temp_path, path)
+
+def upsert_csv(df, path, key_columns):
+    """
+    Insert or replace rows of a time-sorted csv file on their natural key
+
+    Args:
+        df: New rows
+        key_columns: Natural key, time column first
+        path: Annual csv file (created if missing)
+
+    Returns:
+        dict: rows_written (new rows), rows_kept (stored rows copied without parsing) and rows_total
+              (None when there were no new rows and the file was left as it was)
+    """
+    new = dedupe_frame(df, key_columns)
+    time_column = key_columns[0]
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        new.to_csv(path, index=False)
+        return {'rows_written': len(new), 'rows_kept': 0, 'rows_total': len(new)}
+
+    if new.empty:
+        return {'rows_written': 0, 'rows_kept': None, 'rows_total': None}
+    new_keys = new[time_column].astype(str).str.slice(0, KEY_LENGTH)
+    with open(path, 'rb') as f:
+        header = f.readline()
+        data_start = f.tell()
+        size = os.fstat(f.fileno()).st_size
+        header_fields = next(csv.reader([header.decode('utf-8-sig')]))
+        if time_column not in header_fields or any(column not in header_fields for column in new.columns):
+            # A new column means every stored row is rewritten
+            split, split_end = data_start, size
+        else:
+            query = DataQuery()
+            column_index = header_fields.index(time_column)
+            split = query._first_offset(f, column_index, new_keys.min(), data_start, size)
+            # First row after the last new timestamp ('\x7f' sorts after every key character)
+            split_end = query._first_offset(f, column_index, new_keys.max() + '\x7f', split, size)
+        f.seek(data_start)
+        head = f.read(split - data_start)
+        window_bytes = f.read(split_end - split)
+        tail = f.read()
+
+    # Stored rows are read as text so they are written back exactly as they were
+    window = pd.read_csv(io.BytesIO(header + window_bytes), dtype=str, keep_default_na=False) \
+        if window_bytes.strip() else pd.DataFrame(columns=header_fields)
+    columns = list(window.columns) + [column for column in new.columns if column not in window.columns]
+    # Stored rows get '' for added columns, so integer columns of the new rows are not cast to float
+    window = window.reindex(columns=columns, fill_value='')
+    merged = dedupe_frame(pd.concat([window, new], ignore_index=True)[columns], key_columns)
+
+    def write(f):
+        f.write(','.join(columns).encode('utf-8') + b'\n' if columns != header_fields else header)
+        f.write(head)
+        f.write(merged.to_csv(index=False, header=False).encode('utf-8'))
+        f.write(tail)
+    _write_atomic(path, write)
+
+    rows_kept = head.count(b'\n') + tail.count(b'\n') + (1 if tail and not tail.endswith(b'\n') else 0)
+    return {'rows_written': len(new), 'rows_kept': rows_kept, 'rows_total': rows_kept + len(merged)}
+#------------------------------------------------------
+def upsert_sqlite(df, connection, table_name, key_columns):
+    """
+    Insert or replace rows of a SQLite table on their natural key
+
+    The table is created from the frame's columns if it does not exist, with a unique
+    index on the natural key so repeated rows replace the stored ones.
+
+    Returns:
+        int: Rows written
+    """
+    df = dedupe_frame(df, key_columns)
+    if df is None or df.empty:
+        return 0
+    columns = [str(column) for column in df.columns]
+    quoted = ', '.join(f'"{column}"' for column in columns)
+    key_quoted = ', '.join(f'"{column}"' for column in key_columns)
+    cursor = connection.cursor()
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS "{table_name}" ({quoted})')
+    cursor.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "ux_{table_name}_natural_key" ON "{table_name}" ({key_quoted})')
+    rows = df.astype(object).where(df.notna(), None).values.tolist()
+    cursor.executemany(f'INSERT OR REPLACE INTO "{table_name}" ({quoted}) VALUES ({", ".join("?" for _ in columns)})',
+                       rows)
+    connection.commit()
+    return len(rows)
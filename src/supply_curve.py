@@ -0,0 +1,269 @@
+"""
+Merit Order Supply Curve Engine
+
+Builds hourly supply curves (offer price vs cumulative available_MW) from the
+merit_order_data_{year}.csv output and keeps them in a compact, array-backed layout:
+
+    hours     int64[H]    settlement hours (hours since 1970-01-01 UTC), sorted
+    offsets   int64[H+1]  start of each hour's stack in the block arrays
+    prices    float32[N]  block prices, sorted ascending within each hour
+    cum_mw    float32[N]  cumulative available MW within each hour
+
+Locating an hour is a binary search over `hours` and locating a MW level is a binary
+search over that hour's slice of `cum_mw`, so clearing price queries are O(log n)
+over a whole year instead of re-sorting millions of rows.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+
+from src.merit_order_out_of_core import iter_merit_order_chunks, DEFAULT_MEMORY_BUDGET_MB
+from src.hourly_calendar import hourly_calendar
+from src.logging_tools import get_logger
+
+logger = get_logger('supply_curve')
+
+HOUR_COLUMN = 'begin_dateTime_utc'
+PRICE_COLUMN = 'block_price'
+MW_COLUMN = 'available_MW'
+SUPPLY_CURVE_FILE_TEMPLATE = 'supply_curves_{year}.npz'
+
+_NS_PER_HOUR = 3_600_000_000_000
+
+#------------------------------------------------------
+def to_hour_key(value):
+    """
+    Convert a UTC timestamp to an integer hour key (hours since 1970-01-01 UTC)
+
+    Args:
+        value: int hour key, 'YYYY-MM-DD HH:MM' string, datetime or pd.Timestamp (UTC)
+
+    Returns:
+        int: Hour key
+    """
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return int(pd.Timestamp(value).value // _NS_PER_HOUR)
+#------------------------------------------------------
+def to_hour_keys(values):
+    """
+    Vectorized version of to_hour_key for a Series/array of UTC timestamp strings
+
+    Args:
+        values: Series or array of 'YYYY-MM-DD HH:MM' UTC strings
+
+    Returns:
+        ndarray: int64 hour keys
+    """
+    timestamps = hourly_calendar.to_datetime(pd.Series(values), format='%Y-%m-%d %H:%M')
+    return timestamps.to_numpy().astype('datetime64[h]').astype(np.int64)
+
+
+class SupplyCurveEngine:
+    """
+    Precomputed per-hour merit order supply stacks with O(log n) queries
+    """
+
+    def __init__(self, hours, offsets, prices, cum_mw):
+        self.hours = np.asarray(hours, dtype=np.int64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.prices = np.asarray(prices, dtype=np.float32)
+        self.cum_mw = np.asarray(cum_mw, dtype=np.float32)
+
+    #------------------------------------------------------
+    @classmethod
+    def from_arrays(cls, hour_keys, prices, available_mw):
+        """
+        Build the engine from flat block arrays
+
+        Args:
+            hour_keys: int hour key of each offer block
+            prices: offer price of each block
+            available_mw: available MW of each block
+
+        Returns:
+            SupplyCurveEngine: Engine holding one sorted stack per hour
+        """
+        hour_keys = np.asarray(hour_keys, dtype=np.int64)
+        prices = np.asarray(prices, dtype=np.float64)
+        available_mw = np.asarray(available_mw, dtype=np.float64)
+
+        # Blocks with no available MW cannot set the price
+        keep = np.isfinite(prices) & np.isfinite(available_mw) & (available_mw > 0)
+        hour_keys, prices, available_mw = hour_keys[keep], prices[keep], available_mw[keep]
+
+        # Sort by hour, then by price within the hour
+        order = np.lexsort((prices, hour_keys))
+        hour_keys, prices, available_mw = hour_keys[order], prices[order], available_mw[order]
+
+        hours, starts = np.unique(hour_keys, return_index=True)
+        offsets = np.append(starts, len(hour_keys)).astype(np.int64)
+
+        # Cumulative MW restarting at every hour
+        running = np.cumsum(available_mw)
+        hour_base = np.repeat(running[starts] - available_mw[starts], np.diff(offsets))
+        cum_mw = running - hour_base
+
+        return cls(hours, offsets, prices, cum_mw)
+
+    #------------------------------------------------------
+    @classmethod
+    def from_merit_order(cls, directory, year, filters=None, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+        """
+        Build the engine for one year from the stored merit order partition
+
+        Only the hour, price and MW columns are read and the partition is streamed in
+        bounded-size chunks, so only the compact arrays are ever held in memory.
+
+        Args:
+            directory: Folder containing merit_order_data_{year}.csv files
+            year: Year to build
+            filters: Optional dict of column -> value(s), e.g. {'import_or_export': ''}
+            memory_budget_mb: Memory budget used to size the chunks
+
+        Returns:
+            SupplyCurveEngine: Engine for every hour in the year
+        """
+        hour_parts, price_parts, mw_parts = [], [], []
+        for chunk in iter_merit_order_chunks(directory, years=[year], columns=[HOUR_COLUMN, PRICE_COLUMN, MW_COLUMN],
+                                             filters=filters, memory_budget_mb=memory_budget_mb):
+            hour_parts.append(to_hour_keys(chunk[HOUR_COLUMN]))
+            price_parts.append(pd.to_numeric(chunk[PRICE_COLUMN], errors='coerce').to_numpy(dtype=np.float32))
+            mw_parts.append(pd.to_numeric(chunk[MW_COLUMN], errors='coerce').to_numpy(dtype=np.float32))
+
+        if not hour_parts:
+            raise FileNotFoundError(f"No merit order data found for {year} in {directory}")
+
+        logger.info("Building supply curves for %s", year)
+        return cls.from_arrays(np.concatenate(hour_parts), np.concatenate(price_parts), np.concatenate(mw_parts))
+
+    #------------------------------------------------------
+    def save(self, path):
+        """
+        Save the engine arrays to an .npz file
+
+        Args:
+            path: Output path
+
+        Returns:
+            str: Path written
+        """
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        np.savez(path, hours=self.hours, offsets=self.offsets, prices=self.prices, cum_mw=self.cum_mw)
+        logger.info("Supply curves saved to %s", path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load an engine saved with save()
+
+        Args:
+            path: Path to the .npz file
+
+        Returns:
+            SupplyCurveEngine: Loaded engine
+        """
+        with np.load(path) as data:
+            return cls(data['hours'], data['offsets'], data['prices'], data['cum_mw'])
+
+    #------------------------------------------------------
+    def _hour_slice(self, hour):
+        hour_key = to_hour_key(hour)
+        position = np.searchsorted(self.hours, hour_key)
+        if position == len(self.hours) or self.hours[position] != hour_key:
+            raise KeyError(f"No supply curve for hour {hour}")
+        return self.offsets[position], self.offsets[position + 1]
+
+    def clearing_price(self, hour, mw):
+        """
+        Price of the marginal block needed to serve `mw` in a given hour
+
+        Args:
+            hour: UTC hour (string, timestamp or hour key)
+            mw: Demand level in MW
+
+        Returns:
+            float: Clearing price, NaN if the stack cannot serve `mw`
+        """
+        start, end = self._hour_slice(hour)
+        index = np.searchsorted(self.cum_mw[start:end], mw, side='left')
+        if index == end - start:
+            return float('nan')
+        return float(self.prices[start + index])
+
+    def clearing_prices(self, hours, mws):
+        """
+        Vectorized clearing_price for arrays of hours and MW levels
+
+        Args:
+            hours: Iterable of hour keys or UTC timestamps
+            mws: Iterable of demand levels in MW, same length as hours
+
+        Returns:
+            ndarray: Clearing prices, NaN where the hour is missing or the stack is too short
+        """
+        hour_keys = np.array([to_hour_key(h) for h in hours], dtype=np.int64)
+        mws = np.asarray(mws, dtype=np.float64)
+        result = np.full(len(hour_keys), np.nan)
+
+        positions = np.searchsorted(self.hours, hour_keys)
+        positions_clipped = np.minimum(positions, len(self.hours) - 1)
+        found = (positions < len(self.hours)) & (self.hours[positions_clipped] == hour_keys)
+
+        for i in np.flatnonzero(found):
+            start, end = self.offsets[positions[i]], self.offsets[positions[i] + 1]
+            index = np.searchsorted(self.cum_mw[start:end], mws[i], side='left')
+            if index < end - start:
+                result[i] = self.prices[start + index]
+        return result
+
+    def available_mw_at_price(self, hour, price):
+        """
+        Cumulative MW offered at or below a price in a given hour
+
+        Args:
+            hour: UTC hour (string, timestamp or hour key)
+            price: Offer price in $/MWh
+
+        Returns:
+            float: Cumulative available MW
+        """
+        start, end = self._hour_slice(hour)
+        index = np.searchsorted(self.prices[start:end], price, side='right')
+        return float(self.cum_mw[start + index - 1]) if index else 0.0
+
+    def curve(self, hour):
+        """
+        Return the full supply curve for an hour
+
+        Args:
+            hour: UTC hour (string, timestamp or hour key)
+
+        Returns:
+            DataFrame: block_price and cumulative_MW columns sorted by price
+        """
+        start, end = self._hour_slice(hour)
+        return pd.DataFrame({'block_price': self.prices[start:end], 'cumulative_MW': self.cum_mw[start:end]})
+#------------------------------------------------------
+def build_supply_curves(directory, year, output_folder=None, filters=None, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Build and save the supply curves for one year of merit order output
+
+    Args:
+        directory: Folder containing merit_order_data_{year}.csv files
+        year: Year to build
+        output_folder: Where to write supply_curves_{year}.npz (defaults to directory)
+        filters: Optional dict of column -> value(s) applied to the merit order rows
+        memory_budget_mb: Memory budget used to size the chunks
+
+    Returns:
+        SupplyCurveEngine: The engine that was saved
+    """
+    engine = SupplyCurveEngine.from_merit_order(directory, year, filters=filters, memory_budget_mb=memory_budget_mb)
+    path = os.path.join(output_folder or directory, SUPPLY_CURVE_FILE_TEMPLATE.format(year=year))
+    engine.save(path)
+    return engine
@@ -1,11 +1,13 @@
 #import main
 import pandas as pd
+import numpy as np
 
 # Request library
 # old Used with old wagger API Gateway
 import requests
 #new used with new 'Azure APIM API Gateway'
 import urllib.request
+import urllib.error
 # Speical Note:
 # When transitioning from using the requests library to urllib.request, there are a 
 # few differences to be aware of. The requests library is designed to be more user-friendly, 
@@ -19,7 +21,6 @@ import urllib.request
 
 
 import os
-from dotenv import load_dotenv
 import datetime
 import csv
 import sqlite3
@@ -27,11 +28,31 @@ from tqdm import tqdm
 import json
 import glob
 import re
+import hashlib
 
 from src.aggregate_imports_and_exports import aggregate_import_exports
 from src.combine_ail_demand_exports_imports import combine_demand_with_tie_line_data, append_aggregated_annual_data_with_tie_line_data
-
-load_dotenv()
+from src.merit_order_out_of_core import MeritOrderCsvWriter
+from src.merit_order_runs import update_merit_order_runs
+from src.fetch_pipeline import run_daily_pipeline
+from src.instrumentation import run_report, peak_rss_mb
+from src.logging_tools import get_logger, log_payload, redact_headers
+from src.response_cache import response_cache
+from src.request_coalescer import request_coalescer
+from src.change_detection import change_tracker, NOT_MODIFIED
+from src.storage import dedupe_frame, upsert_csv, upsert_sqlite, file_signature
+from src.asset_dimension import load_asset_dimension, KEY_COLUMN as ASSET_KEY_COLUMN
+from src.metered_volume_store import SparseMeteredVolumeBuilder, SparseMeteredVolumes, sparse_path, METERED_VOLUME_SUB_FOLDER
+from src.hourly_series_store import update_hourly_series
+from src.rollups import RollupStore, update_rollups
+from src.stage_memo import StageMemo
+from src.hourly_calendar import hourly_calendar
+
+logger = get_logger('utilities')
+
+# Project folder (holding output/ and object_mapping/) used by the import/export
+# post-processing steps when no other folder is passed in
+LEGACY_PROJECT_FOLDER = r'C:\Users\kaczanor\OneDrive - Enbridge Inc\Documents\Python\Revised-AESO-API-master'
 ###############################################
 #SQLite Functions
 ###############################################
@@ -81,7 +102,11 @@ def create_sqlite_table(db_name,db_table_name):
 
 #----------------------------------------------
 # Function to save the fetched data to SQLite
-def save_to_sqlite(data, table_name, columns, connection):
+def save_to_sqlite(data, table_name, columns, connection, key_columns=None):
+    # With a natural key the rows are upserted instead of appended (see src/storage.py)
+    if key_columns:
+        upsert_sqlite(data, connection, table_name, key_columns)
+        return
     # Convert DataFrame to list of lists
     rows = data.values.tolist()
     
@@ -163,9 +188,11 @@ def create_path(output_folder, sub_folder_template, filename_template, **kwargs)
     
     return path 
         
-def save_dataframe_to_csv(df, path): 
+def save_dataframe_to_csv(df, path, key_columns=None): 
     """ Save the DataFrame to a CSV file at the specified path. Parameters: df (pd.DataFrame): 
         The DataFrame to save. path (str): The complete path where the file should be saved. 
+        key_columns (list): Optional natural key; rows are then upserted into the existing file 
+        instead of overwriting it (see src/storage.py). 
         """ 
     #print(f" calculation of path in save_data_frame_to_csv function: {path}")
     
@@ -174,7 +201,13 @@ def save_dataframe_to_csv(df, path):
         os.makedirs(os.path.dirname(path)) 
     
     # Export the DataFrame to the specified CSV file 
-    df.to_csv(path, index=False) 
+    with run_report.span('persist') as span:
+        if key_columns:
+            upsert_csv(df, path, key_columns)
+        else:
+            df.to_csv(path, index=False) 
+        span.rows = len(df)
+        span.bytes = os.path.getsize(path)
 
 ###############################################
 # Function to Create Directory Tree
@@ -201,7 +234,7 @@ def print_directory_tree(root_dir, padding=''):
 # Function to do preliminary processing of the data
 #####################################
 def preliminary_processing_data(api_config, response_json):
-    print("Processing data...")
+    logger.debug("Processing data...")
     
     # reporting_limit = api_config['reporting_limit']
     # headers = api_config['headers']
@@ -297,18 +330,18 @@ def preliminary_processing_data(api_config, response_json):
         #df = response.json()
         df = response_json
         # Check the keys within 'return'
-        print(f" df.keys: {df.keys()}")
+        logger.debug("df.keys: %s", list(df.keys()))
         
         # Ensure 'return_key' exists within the nested 'return' key
         nested_return = df.get('return', {})
         
         if isinstance(df["return"], dict):
             # Debugging print to check the keys inside the nested 'return'
-            print(f"Keys in nested 'return': {nested_return.keys()}")
+            logger.debug("Keys in nested 'return': %s", list(nested_return.keys()))
         
         # Print all keys to identify exact key name
         for key in df.keys():
-            print(f"Key in 'return': '{key}'")
+            logger.debug("Key in 'return': '%s'", key)
 
         # Step 4: If required normalize and or explode json data prior to passing to data frame
         # Loop through json_normalize_keys that are already loaded into the api call dictionary
@@ -330,33 +363,33 @@ def preliminary_processing_data(api_config, response_json):
             # The purpose of this next snippet is to transform a nested JSON structure into a flat table structure that can 
             # be easily manipulated as a pandas dataframe.
             
-            print(f"{return_key}, {record_path_for_normalize_json}, {meta_for_normalized_json}")
+            logger.debug("%s, %s, %s", return_key, record_path_for_normalize_json, meta_for_normalized_json)
             
             try:
-                print(f"df[return_key]: {nested_return.get(return_key, 'Key not found')}")
+                log_payload(logger, "df[return_key]", nested_return.get(return_key, 'Key not found'))
             except AttributeError:
-                print("'nested_return' is not a dictionary or does not have 'get' method.")
+                logger.debug("'nested_return' is not a dictionary or does not have 'get' method.")
             
-            print("API response data needs to normalize the JSON object.")
+            logger.debug("API response data needs to normalize the JSON object.")
             
             if json_explode:
-                print(f"Normalizing json data......")
+                logger.debug("Normalizing json data......")
                 # This line is flattening the nested structure in the column specified by record_path_for_normalize_json.
                 # The resulting dataframe df_normalized has a flattened structure for this column.
-                print(f" record_path_for_normalize_json: {record_path_for_normalize_json}")
+                logger.debug("record_path_for_normalize_json: %s", record_path_for_normalize_json)
                 df_normalized = pd.json_normalize(df, record_path_for_normalize_json)
 
-                print(f"Exploding normalized json data ....")
+                logger.debug("Exploding normalized json data ....")
                 # This line is "exploding" lists in the column specified by meta_for_normalized_json into separate rows. 
                 # Now, df_normalized has multiple rows for each item in the exploded list.
-                print(f" meta_for_normalized_json: {meta_for_normalized_json}")
+                logger.debug("meta_for_normalized_json: %s", meta_for_normalized_json)
                 df_normalized = df_normalized.explode(meta_for_normalized_json)
 
                 # check if exploded column contains dictionaries and normalize it.abs# If the exploded column contains 
                 # dictionaries (meaning it has further nested structure), we need to flatten it. But if we flatten it 
                 # directly in the dataframe, we would lose the association between the flattened data and the other 
                 # columns in the original row. This is where the concatenation comes in.
-                print(f" Prepping exploded/normalized json data for concatnation...")
+                logger.debug("Prepping exploded/normalized json data for concatnation...")
 
                 if normalized_concatenation_keys:
                     # This is dropping the exploded column that contains dictionaries from df_normalized. We're doing this because we're about to 
@@ -364,11 +397,11 @@ def preliminary_processing_data(api_config, response_json):
                     # (df_normalized[concatenation_keys].reset_index(drop=True)) with the dataframe that contains the flattened version of the 
                     # exploded column. The result is a dataframe that has both the other columns and the flattened version of the exploded column.
                     #if isinstance(df_normalized[normalized_concatenation_keys].iloc[0], dict):
-                    print("Concatentating exploded json data.....")
-                    print(f" Concatenation Keys {normalized_concatenation_keys}....")
+                    logger.debug("Concatentating exploded json data.....")
+                    logger.debug("Concatenation Keys %s....", normalized_concatenation_keys)
                     #if normalized_concatenation_keys:
                     df_normalized = pd.concat([df_normalized[normalized_concatenation_keys].reset_index(drop=True),
-                                    pd.json_normalize(df_normalized[meta_for_normalized_json])], axis=1)
+                                    pd.json_normalize(df_normalized[meta_for_normalized_json].reset_index(drop=True))], axis=1)
                         
                 else:
                     raise ValueError("Concatenation keys must be provided when exploding dictionary data")
@@ -377,13 +410,16 @@ def preliminary_processing_data(api_config, response_json):
                 
                 if return_key in nested_return:
                     df_normalized = pd.json_normalize(nested_return[return_key], record_path_for_normalize_json, meta_for_normalized_json)
+                elif return_key is None and isinstance(record_path_for_normalize_json, list):
+                    # The record path starts at the top of the response, e.g. ['return', 'generation_data_list']
+                    df_normalized = pd.json_normalize(df, record_path_for_normalize_json, meta_for_normalized_json)
                 else:
                     raise KeyError(f"'{return_key}' not found in the nested 'return' object.")
                 
             if column_order:
-                print("Reordering column data....")
+                logger.debug("Reordering column data....")
                 df_normalized = df_normalized[column_order]
-                print(f" df_normalized.head(): {df_normalized.head()}")
+                log_payload(logger, "df_normalized.head()", df_normalized.head())
             return df_normalized 
         
         else:
@@ -392,52 +428,47 @@ def preliminary_processing_data(api_config, response_json):
             # checks to see if the response is a "list" object. If so is simply passes the 
             # the data frame to the return statement. If it is not a list, then it is likely
             # a dictionary and we have to pass both the data frame AND the return key
-            print("API response data does not need to normalize the JSON object.")
+            logger.debug("API response data does not need to normalize the JSON object.")
             
             # Check the type of the response
-            print(f"Type of response: {type(df)}")
+            logger.debug("Type of response: %s", type(df))
 
             #if list, pass df in return statement
             if isinstance(df["return"], list):
                 
-                print ("API Call returned a list object.")
+                logger.debug("API Call returned a list object.")
                 return pd.DataFrame(df["return"]) #!!!!!!!!!!
             else:
-                print("API Return is not a List")
+                logger.debug("API Return is not a List")
                 #if df returned by api call is not a list it is likel a dictionary then include the key in the return
                 if return_key is not None:
-                    print(f"return_key = {return_key}")
+                    logger.debug("return_key = %s", return_key)
                     return pd.DataFrame(df["return"][return_key])  #!!!!!!!!!!
                     print ("API Call returned a dictionary object.")
                 else:
-                    print("API Return is None")
+                    logger.debug("API Return is None")
                     
                     ##############################################
                     if removed_data_lists is not None:
-                        # initialize counter for removed lists
-                        count = 0
-                        # iterate over the removed_data_list
-                        for item in removed_data_lists:
-                            # if the item exists in the dictionary, increment the counter and remove the item
-                            print(f" print df : {df}")
-                            if item in df['return']:
-                                count += 1
-                                df['return'].pop(item, None)
-                                # print the count
-                                print(f"Removed {count} items")
+                        # Build a reduced copy instead of popping the lists, so a response shared
+                        # with other endpoints (see src/request_coalescer.py) is left intact
+                        count = sum(1 for item in removed_data_lists if item in df['return'])
+                        summary = {key: value for key, value in df['return'].items() if key not in removed_data_lists}
+                        logger.debug("Removed %s items", count)
+                        return pd.DataFrame(summary, index=[0])
                     return pd.DataFrame(df['return'], index=[0])
                     
                     ################################################
    
             #Lastly, reset column order if required for all other scenarios
             if column_order:
-                print("Reordering column data....")
+                logger.debug("Reordering column data....")
                 df_normalized = df_normalized[column_order]
-                print(f" df_normalized.head(): {df_normalized.head()}")
+                log_payload(logger, "df_normalized.head()", df_normalized.head())
                 return df_normalized  
     
     except KeyError as e:
-        print(f"KeyError encountered while loading data into DataFrame: {e}")
+        logger.error("KeyError encountered while loading data into DataFrame: %s", e)
         return None  
 
 #####################################
@@ -447,6 +478,7 @@ def handle_status_code(api_config, response_status_code, response_str):
     # Define actions for each status code
     actions = {
         200: handle_success,
+        304: handle_not_modified,
         400: handle_bad_request,
         401: handle_unauthorized,
         403: handle_forbidden,
@@ -465,7 +497,7 @@ def handle_status_code(api_config, response_status_code, response_str):
 #----------------------------------------------
 #def handle_success(api_config, response):
 def handle_success(api_config, response_status_code, response_str):
-    print("Response code is 200 (OK)")
+    logger.debug("Response code is 200 (OK)")
 
     # try:
     #     # Attempt to parse response JSON
@@ -493,49 +525,58 @@ def handle_success(api_config, response_status_code, response_str):
 
         # Parse the JSON string to a Python object
         if response_str:
-            response_json = json.loads(response_str)
-            print(f"response_json: {response_json}")
+            with run_report.span('decode') as span:
+                response_json = json.loads(response_str)
+                span.bytes = len(response_str)
+            log_payload(logger, "response_json", response_json)
             data_temp = response_json
             # Call the function to process data here if needed
             if data_temp:
                 # Call the function to process data
-                df = preliminary_processing_data(api_config, response_json)
+                with run_report.span('normalize') as span:
+                    df = preliminary_processing_data(api_config, response_json)
+                    span.rows = len(df) if df is not None else 0
                 return df
         else:
-            print("Response JSON is empty or None")
+            logger.warning("Response JSON is empty or None")
 
     except json.JSONDecodeError as e:
-        print(f"Error decoding JSON: {str(e)}")
+        logger.error("Error decoding JSON: %s", e)
         return None
         
     except Exception as e:
-        print(f"An error occurred: {str(e)}")
+        logger.error("An error occurred: %s", e)
         return None
 
 #----------------------------------------------
+def handle_not_modified(api_config, response_status_code, response_str):
+    # Nothing to normalize: the payload is the one processed in the last run (see src/change_detection.py)
+    logger.info("Not Modified (304): %s is unchanged since the last run", api_config.get('category_key'))
+    return None
+#----------------------------------------------
 def handle_bad_request(api_config, response):
-    print("Bad Request (400): Check your request parameters")
+    logger.error("Bad Request (400): Check your request parameters")
 #----------------------------------------------
 def handle_unauthorized(api_config, response):
-    print("Unauthorized (401): Authentication failed or missing credentials")
+    logger.error("Unauthorized (401): Authentication failed or missing credentials")
 #----------------------------------------------
 def handle_forbidden(api_config, response):
-    print("Forbidden (403): Access to the resource is denied")
+    logger.error("Forbidden (403): Access to the resource is denied")
 #----------------------------------------------
 def handle_not_found(api_config, response):
-    print("Not Found (404): The requested resource was not found")
+    logger.error("Not Found (404): The requested resource was not found")
 #----------------------------------------------
 def handle_invalid_method(api_config, response):
-    print("Invalid Method (405): HTTP method not allowed for the requested resource")
+    logger.error("Invalid Method (405): HTTP method not allowed for the requested resource")
 #----------------------------------------------
 def handle_internal_server_error(api_config, response):
-    print("Internal Server Error (500): Something went wrong on the server side")
+    logger.error("Internal Server Error (500): Something went wrong on the server side")
 #----------------------------------------------
 def handle_service_unavailable(api_config, response):
-    print("Service Unavailable (503): The server is currently unable to handle the request")
+    logger.error("Service Unavailable (503): The server is currently unable to handle the request")
 #----------------------------------------------
 def handle_generic_error(api_config, response):
-    print(f"Error: Response code {response.status_code} - {response.reason}")
+    logger.error("Error: Response code %s - %s", response.status_code, response.reason)
 
 #####################################
 # Function to make the API call
@@ -545,14 +586,32 @@ def fetch_data(
         updated_start_date, 
         updated_end_date
         ):
-    
+    # Network stage and normalization stage back to back. src/fetch_pipeline.py runs the
+    # two stages separately so daily loops can overlap them
+    response = fetch_response(api_config, updated_start_date, updated_end_date)
+    if response is None:
+        return None
+    return process_response(api_config, *response)
+#----------------------------------------------
+def fetch_response(api_config, updated_start_date, updated_end_date):
+    """
+    Make the API call (or read it from the response cache) without processing the response
+
+    Args:
+        api_config: API call dictionary (its params are updated with the request dates)
+        updated_start_date: First date of the request
+        updated_end_date: Last date of the request
+
+    Returns:
+        tuple or None: (response_status_code, response_str), None when no response is available
+    """
     # STEP 1: Take slices of API Call Dictionary to define headers, paramters, and keys for request
     reporting_limit = api_config['reporting_limit']
     headers = api_config['headers']
-    print(f"headers:{headers}")
+    logger.debug("headers: %s", redact_headers(headers))
     params = api_config['params']
     api_url = api_config['api_url']
-    print(f" api_url: {api_url}")
+    logger.debug("api_url: %s", api_url)
     return_key = api_config.get('return_key')
     # normalize_json = api_config.get('normalize_json')
     # record_path_for_normalize_json = api_config.get('record_path_for_normalize_json')
@@ -568,7 +627,7 @@ def fetch_data(
     # that require udpated filname{year}.csv formats. And also to incorproate any limitatons
     # that a particular api call my have on how much time-based data it can provide in its returned data set
     
-    print("fetch data function running")
+    logger.debug("fetch data function running")
     #print(f" api_config['params'] inside fetch_dat () function: {api_config['params']}")
     updated_start_date_str = updated_start_date
     updated_end_date_str = updated_end_date
@@ -598,18 +657,20 @@ def fetch_data(
         if reporting_limit is None:
             # a) 365 days
             # Pass updated end date with yyyy-12-31 format back to dictionary
-            print(f" api_config['params'].get('endDate') : {api_config['params'].get('endDate') }")
+            logger.debug("api_config['params'].get('endDate'): %s", api_config['params'].get('endDate'))
             if api_config['params'].get('endDate') is not None:
                 api_config['params']['endDate'] = updated_end_date
                 #print(f" Updated End Date: {updated_end_date}")
         else:
             # b) days determined by reporting limit 
-            # Adjust updated end date by adding # days to updated started date
+            # Cap the requested end date at updated start date + (limit - 1) days. Ranges longer than
+            # the limit are split into several requests by src/window_planner.py before they get here
             # First convert the updated starte date string back to to a date
-            start_date_dt = datetime.datetime.strptime(updated_start_date, '%Y-%m-%d')
+            start_date_dt = datetime.datetime.strptime(str(updated_start_date)[:10], '%Y-%m-%d')
+            requested_end_dt = datetime.datetime.strptime(str(updated_end_date)[:10], '%Y-%m-%d')
             
-            # Then add add 183 days to the converted date object
-            updated_end_date = start_date_dt + datetime.timedelta(days=int(reporting_limit))
+            # Then add the reporting limit to the converted date object
+            updated_end_date = min(requested_end_dt, start_date_dt + datetime.timedelta(days=int(reporting_limit) - 1))
 
             # Then convert it back to a string
             updated_end_date_string = updated_end_date.strftime('%Y-%m-%d')
@@ -618,7 +679,7 @@ def fetch_data(
                 api_config['params']['endDate'] = updated_end_date_string
         
     else:
-        print("No need to dynamically adust dates for list data")
+        logger.debug("No need to dynamically adust dates for list data")
 
     #print(f" params: {params}")
     
@@ -630,41 +691,90 @@ def fetch_data(
     
     # new
     # Encode parameters into the URL
-    url_with_params = f"{api_url}?{urllib.parse.urlencode(params)}"
-    print(f" url_with_params:{url_with_params}")
-    
-    # Create a request object with the URL and headers
-    req = urllib.request.Request(url_with_params, headers=headers)
-    print(f"req: {req}")
-    
-    with urllib.request.urlopen(req) as response:
-        # Print the HTTP status code
-        response_status_code = response.getcode()
-        print(f" response_status_code: {response_status_code}")
-        # Read and print the response content
-        response_str = response.read().decode('utf-8')
-        #response_str = response.read()
-        print(f" response_str: {response_str}")
-        # print(f"data:{data}")
+    url_with_params = f"{api_url}?{urllib.parse.urlencode(params or {})}"
+    logger.info("Requesting %s", url_with_params)
+    
+    # Slowly changing list endpoints send the validators of their last response (see src/change_detection.py)
+    headers = change_tracker.request_headers(api_config, url_with_params, headers)
+
+    # Identical requests made by several endpoints in one run are only sent once (see src/request_coalescer.py)
+    window = f"{updated_start_date_str}..{updated_end_date_str}"
+    response = request_coalescer.fetch(url_with_params, api_config,
+                                       lambda: request_url(url_with_params, headers, window))
+    if change_tracker.tracks(api_config):
+        response = change_tracker.check(api_config, url_with_params, response)
+    return response
+#----------------------------------------------
+def request_url(url_with_params, headers, window=None):
+    """
+    Read one url from the response cache or the API
+
+    Returns:
+        tuple or None: (response_status_code, response_str), None when no response is available
+    """
+    # Serve the response from the on-disk cache when enabled (see src/response_cache.py)
+    cached_response_str = response_cache.get(url_with_params)
+    if cached_response_str is not None:
+        logger.info("Using cached response for %s", url_with_params)
+        response_status_code = 200
+        response_str = cached_response_str
+    elif response_cache.offline:
+        logger.warning("No cached response for %s (cache mode 'only')", url_with_params)
+        return None
+    else:
+        # Create a request object with the URL and headers
+        req = urllib.request.Request(url_with_params, headers=headers)
+        logger.debug("req: %s", req)
 
+        try:
+            with run_report.span('fetch', window=window) as span, \
+                    urllib.request.urlopen(req) as response:
+                # Print the HTTP status code
+                response_status_code = response.getcode()
+                # Read and print the response content
+                response_bytes = response.read()
+                span.bytes = len(response_bytes)
+                logger.info("Response status %s (%s bytes)", response_status_code, len(response_bytes))
+                response_str = response_bytes.decode('utf-8')
+                #response_str = response.read()
+                log_payload(logger, "response_str", response_str)
+                if response_status_code == 200:
+                    change_tracker.record_validators(url_with_params, response.headers)
+        except urllib.error.HTTPError as e:
+            # urllib raises for 304 Not Modified, the answer to a conditional request
+            if e.code != NOT_MODIFIED:
+                raise
+            logger.info("Response status 304 (not modified)")
+            return NOT_MODIFIED, ''
+        if response_status_code == 200:
+            response_cache.put(url_with_params, response_str)
+    return response_status_code, response_str
+#----------------------------------------------
+def process_response(api_config, response_status_code, response_str):
+    """
+    Turn a response from fetch_response() into a DataFrame (CPU bound: decode and normalize)
+
+    Returns:
+        DataFrame or None
+    """
 ###################################
     #new code
     try:
         #if response.status_code in [200, 400, 401, 403, 404, 405, 500, 503]:
-        if response.getcode() in [200, 400, 401, 403, 404, 405, 500, 503]:
+        if response_status_code in [200, 304, 400, 401, 403, 404, 405, 500, 503]:
             df = handle_status_code(api_config, response_status_code, response_str)
             #df = handle_status_code(response_str)
             return df
         else:
-            print(f"API request failed. Status Code: {response_status_code}, Reason: {response_str}")
+            logger.error("API request failed. Status Code: %s, Reason: %s", response_status_code, response_str[:500])
             return None
         
     except requests.Timeout:
-        print("Request timed out. Consider adjusting the timeout value.")
+        logger.error("Request timed out. Consider adjusting the timeout value.")
         return None
     
     except requests.RequestException as e:
-        print(f"Request failed: {str(e)}")
+        logger.error("Request failed: %s", e)
         return None
     #############################################
     
@@ -747,6 +857,33 @@ def consolidate_generation_files(path):
 
     return
 #------------------------------------------------------
+def write_wide_metered_volumes(sparse_volumes, asset_dimension, folder, asset_classes, memoize=False):
+    """
+    Write hour x asset_ID csv files ({asset_class}.csv) from the sparse metered volumes
+
+    Args:
+        sparse_volumes: SparseMeteredVolumes of one year
+        asset_dimension: AssetDimension decoding the asset keys
+        folder: 'Metered Volumes' folder
+        asset_classes: Asset classes to write
+        memoize: Skip consolidate_generation_files when IPP.csv and GENCO.csv did not change
+
+    Returns:
+        list: Paths written
+    """
+    paths = []
+    for asset_class in asset_classes:
+        new_path = os.path.join(folder, f"{asset_class}.csv").replace("\\", "/")
+        save_dataframe_to_csv(sparse_volumes.wide(asset_class, asset_dimension), new_path)
+        print(f"Saved reshaped data for {asset_class} to {new_path}")
+        paths.append(new_path)
+    if {'IPP', 'GENCO'} <= set(asset_classes):
+        print("Combining metered volume files...")
+        StageMemo(os.path.dirname(folder), enabled=memoize).run(
+            'consolidate_generation_files', METERED_VOLUME_SUB_FOLDER, consolidate_generation_files,
+            os.path.join(folder, 'IPP.csv'), metered_folder=folder)
+    return paths
+#------------------------------------------------------
 def consolidate_annual_files(api_config, output_folder, output_consolidated_csv_files, sub_folder_template, csv_output, \
                                         sqlite_output, conn, db_table_name, column_order):
     '''
@@ -767,7 +904,7 @@ def consolidate_annual_files(api_config, output_folder, output_consolidated_csv_
         #save_dataframe_to_csv(df, path)
 
         # Define the directory containing the CSV files
-        directory = r'C:\Users\kaczanor\OneDrive - Enbridge Inc\Documents\Python\Revised-AESO-API-master\output\Spot_Prices'
+        directory = os.path.join(output_folder, sub_folder_template)
         
         # Create an empty list to store individual DataFrames
         data_frames = []
@@ -791,7 +928,7 @@ def consolidate_annual_files(api_config, output_folder, output_consolidated_csv_
             df = pd.read_csv(file)
             
             # Convert 'begin_datetime_mpt' to datetime
-            df['begin_datetime_mpt'] = pd.to_datetime(df['begin_datetime_mpt'])
+            df['begin_datetime_mpt'] = hourly_calendar.to_datetime(df['begin_datetime_mpt'])
             
             # Append the DataFrame to the list
             data_frames.append(df)
@@ -955,7 +1092,28 @@ def determine_region(row):
     return None
 
 #------------------------------------------------------
-def read_import_export_map(file_path):
+def _region_mapping_sidecar(output_file_path):
+    # Content hash of the map file and the mapping built from it, next to Region_Mapping.csv
+    return f"{os.path.splitext(output_file_path)[0]}.json"
+
+def read_import_export_map(file_path, output_file_path=None):
+    # The mapping is only rebuilt (and Region_Mapping.csv rewritten) when the map file changed
+    with open(file_path, 'rb') as f:
+        source_hash = hashlib.sha256(f.read()).hexdigest()
+    if output_file_path is None:
+        output_file_path = os.path.join(LEGACY_PROJECT_FOLDER, 'object_mapping', 'Region_Mapping.csv')
+    sidecar_path = _region_mapping_sidecar(output_file_path)
+    if os.path.exists(output_file_path) and os.path.exists(sidecar_path):
+        try:
+            with open(sidecar_path, 'r') as f:
+                sidecar = json.load(f)
+        except (OSError, ValueError):
+            sidecar = {}
+        if (sidecar.get('source_hash') == source_hash
+                and sidecar.get('output_signature') == file_signature(output_file_path)):
+            logger.info("Import/export map unchanged, reusing region mapping (%s assets)", len(sidecar['region_mapping']))
+            return {asset_id: tuple(values) for asset_id, values in sidecar['region_mapping'].items()}
+
     # Read the CSV file into a DataFrame
     df = pd.read_csv(file_path)
 
@@ -984,8 +1142,13 @@ def read_import_export_map(file_path):
         region_mapping[asset_id] = (asset_name, region, asset_type, pool_id)
         print(f"Asset ID: {asset_id}, Asset Name: {asset_name}, Region: {region}, Asset Type: {asset_type}, Pool ID: {pool_id}")
 
-    output_file_path = r'C:\Users\kaczanor\OneDrive - Enbridge Inc\Documents\Python\Revised-AESO-API-master\object_mapping\Region_Mapping.csv'
     save_region_mapping_to_csv(region_mapping, output_file_path)
+    temp_path = f"{sidecar_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump({'source': os.path.abspath(file_path), 'source_hash': source_hash,
+                   'output_signature': file_signature(output_file_path),
+                   'region_mapping': region_mapping}, f, indent=2, default=str)
+    os.replace(temp_path, sidecar_path)
 
     return region_mapping
 #------------------------------------------------------
@@ -1002,17 +1165,22 @@ def find_length_shape_of_data_frames(*named_data_frames):
 def create_complete_date_range(start_date_str, end_date_str):
     start_date = pd.to_datetime(start_date_str)
     end_date = pd.to_datetime(end_date_str)
-    return pd.date_range(start=start_date, end=end_date, freq='H')
+    return pd.date_range(start=start_date, end=end_date, freq='h')
 #-----------------------------------------------------
 def check_missing_dates(df, date_col, complete_date_range, df_name):
+    # Returns the missing hours; src/completeness.py can refetch them for the stored datasets
     missing_dates = complete_date_range.difference(df[date_col].dropna())
     if not missing_dates.empty:
         print(f"Missing dates in {df_name} ({date_col}): {missing_dates}")
     else:
         print(f"No missing dates in {df_name} ({date_col})")
+    return missing_dates
 #-----------------------------------------------------
-def create_regional_import_export_file(path, updated_start_date, original_end_date):
+def create_regional_import_export_file(path, updated_start_date, original_end_date, project_folder=None):
     #This converts the import/export data by asset id into specific tie lines
+    # project_folder holds the output/ and object_mapping/ folders (defaults to LEGACY_PROJECT_FOLDER)
+    project_folder = project_folder or LEGACY_PROJECT_FOLDER
+    output_folder = os.path.join(project_folder, 'output')
     print(f" start_date and end_date data types: {type(updated_start_date)} and {type(original_end_date)}")
     print(f" start_date: {updated_start_date}")
     print(f" end_date: {original_end_date}")
@@ -1037,8 +1205,10 @@ def create_regional_import_export_file(path, updated_start_date, original_end_da
     #Import all data files before loop
     ######################################
     #Load the Asset List File and it is need to combine meta data from the Asset List and the Import/Export data
-    asset_list = pd.read_csv(r'C:\Users\kaczanor\OneDrive - Enbridge Inc\Documents\Python\Revised-AESO-API-master\output\Asset List\Asset_Lists.csv')
+    asset_list = pd.read_csv(os.path.join(output_folder, 'Asset List', 'Asset_Lists.csv'))
     print(f" asset_list: {asset_list}")
+    # Asset attributes are joined through the int32 keys of Asset List/asset_dimension.csv
+    asset_dimension = load_asset_dimension(output_folder, asset_list)
     # Create Import Export File by filtering on the Asset IDs for 
 
 
@@ -1047,25 +1217,34 @@ def create_regional_import_export_file(path, updated_start_date, original_end_da
     # We will filter it down to the data we need 
     # Call the function to get the region mapping dictionary
     # !!!! Where does this file come from?
-    region_mapping = read_import_export_map(r'C:\Users\kaczanor\OneDrive - Enbridge Inc\Documents\Python\Revised-AESO-API-master\object_mapping\Import_Export_Map.csv')
+    region_mapping = read_import_export_map(os.path.join(project_folder, 'object_mapping', 'Import_Export_Map.csv'),
+                                            os.path.join(project_folder, 'object_mapping', 'Region_Mapping.csv'))
     print(f" region_mapping: {region_mapping}")
 
     #####################################
     # Load the Importer and Exporter data files as it is these files that we are going to:
     # 1) Map the Asset ID to the Region, and
     # 2) Aggregate the imports and exports by 3x regions/lines (BC, SK, MT)
-    import_data = pd.read_csv(r'C:\Users\kaczanor\OneDrive - Enbridge Inc\Documents\Python\Revised-AESO-API-master\output\Metered Volumes\IMPORTER.csv')
+    # The sparse store written by final_processing_metered_volume_data holds only the non-zero
+    # readings; import_data/export_data are then just the hours of each class. Without a store
+    # the wide IMPORTER.csv and EXPORTER.csv files are read and melted
+    sparse_file = sparse_path(output_folder, file_year_suffix)
+    sparse_volumes = SparseMeteredVolumes.load(sparse_file) if os.path.exists(sparse_file) else None
+    if sparse_volumes is not None:
+        import_data = sparse_volumes.hours('IMPORTER')
+        export_data = sparse_volumes.hours('EXPORTER')
+    else:
+        import_data = pd.read_csv(os.path.join(output_folder, 'Metered Volumes', 'IMPORTER.csv'))
+        export_data = pd.read_csv(os.path.join(output_folder, 'Metered Volumes', 'EXPORTER.csv'))
     print(f"import_data: {import_data.head()}")
-
-    export_data = pd.read_csv(r'C:\Users\kaczanor\OneDrive - Enbridge Inc\Documents\Python\Revised-AESO-API-master\output\Metered Volumes\EXPORTER.csv')
     print(f"export_data: {export_data.head()}")
     
     # Convert date columns to datetime
-    import_data['begin_date_mpt'] = pd.to_datetime(import_data['begin_date_mpt'])
-    export_data['begin_date_mpt'] = pd.to_datetime(export_data['begin_date_mpt'])
+    import_data['begin_date_mpt'] = hourly_calendar.to_datetime(import_data['begin_date_mpt'])
+    export_data['begin_date_mpt'] = hourly_calendar.to_datetime(export_data['begin_date_mpt'])
 
      # Create a complete date range from updated_start_date to original_end_date
-    complete_date_range = pd.date_range(start=updated_start_date, end=original_end_date, freq='H')
+    complete_date_range = pd.date_range(start=updated_start_date, end=original_end_date, freq='h')
 
     # Identify missing dates in import data
     missing_import_dates = complete_date_range.difference(import_data['begin_date_mpt'])
@@ -1224,8 +1403,17 @@ def create_regional_import_export_file(path, updated_start_date, original_end_da
 
     '''
 
-    import_data_long = import_data.melt(id_vars=['begin_date_utc', 'begin_date_mpt'], var_name='ASSET_ID', value_name='TOTAL_IMPORTS')
-    export_data_long = export_data.melt(id_vars=['begin_date_utc', 'begin_date_mpt'], var_name='ASSET_ID', value_name='TOTAL_EXPORTS')
+    if sparse_volumes is not None:
+        # Already long: the non-zero readings in the order the melt would give them
+        import_data_long = sparse_volumes.readings('IMPORTER', asset_dimension, 'TOTAL_IMPORTS')
+        export_data_long = sparse_volumes.readings('EXPORTER', asset_dimension, 'TOTAL_EXPORTS')
+        import_data_long['begin_date_mpt'] = hourly_calendar.to_datetime(import_data_long['begin_date_mpt'])
+        export_data_long['begin_date_mpt'] = hourly_calendar.to_datetime(export_data_long['begin_date_mpt'])
+    else:
+        import_data_long = import_data.melt(id_vars=['begin_date_utc', 'begin_date_mpt'], var_name='ASSET_ID', value_name='TOTAL_IMPORTS')
+        export_data_long = export_data.melt(id_vars=['begin_date_utc', 'begin_date_mpt'], var_name='ASSET_ID', value_name='TOTAL_EXPORTS')
+        import_data_long[ASSET_KEY_COLUMN] = asset_dimension.encode(import_data_long['ASSET_ID'])
+        export_data_long[ASSET_KEY_COLUMN] = asset_dimension.encode(export_data_long['ASSET_ID'])
 
     #Check Length of Import and Export Data
     print("Second Check on Length and Shape of Data Frames")
@@ -1306,7 +1494,7 @@ def create_regional_import_export_file(path, updated_start_date, original_end_da
     #    DataFrame is matched with the ASSET_ID column in the right DataFrame.
 
     #import_export_map = pd.read_csv(r'C:\Users\kaczanor\OneDrive - Enbridge Inc\Documents\Python\Revised-AESO-API-master\Import_Export_Map.csv')
-    import_export_map = pd.read_csv(r'C:\Users\kaczanor\OneDrive - Enbridge Inc\Documents\Python\Revised-AESO-API-master\output\Metered Volumes\IMPORT_EXPORT_MAP.csv')
+    import_export_map = pd.read_csv(os.path.join(output_folder, 'Metered Volumes', 'IMPORT_EXPORT_MAP.csv'))
 
     '''
     At this point your data will look like this for import_data_long:
@@ -1319,8 +1507,13 @@ def create_regional_import_export_file(path, updated_start_date, original_end_da
     89,         89,         ABCP APC BC IMPORT, ABCP,SOURCE, Active,        Heartland Generation 1, APC                    ,                    ,                       ,                        EXPORT_BC
     93,         93,         ABSK APC SK IMPORT, ABSK,SOURCE, Active,        Heartland Generation 1, APC                    ,                    ,                       ,                        EXPORT_SK
     '''
-    import_categorized = pd.merge(import_data_long, import_export_map, how='left', left_on='ASSET_ID', right_on='ASSET_ID')
-    export_categorized = pd.merge(export_data_long, import_export_map, how='left', left_on='ASSET_ID', right_on='ASSET_ID')
+    # The left join runs on asset keys: import_export_keys holds the map in key order, so the
+    # attributes of every row are picked by array indexing instead of a string merge
+    import_export_keys = asset_dimension.key_table(import_export_map)
+    import_keys = import_data_long.pop(ASSET_KEY_COLUMN).to_numpy()
+    export_keys = export_data_long.pop(ASSET_KEY_COLUMN).to_numpy()
+    import_categorized = import_export_keys.join(import_data_long, import_keys)
+    export_categorized = import_export_keys.join(export_data_long, export_keys)
     
     #Check Length of Import and Export Data
     print("Fourth Check on Length and Shape of Data Frames")
@@ -1380,8 +1573,8 @@ def create_regional_import_export_file(path, updated_start_date, original_end_da
     print(export_categorized_filtered.head())
 
     # Convert to date time
-    import_categorized_filtered['begin_date_mpt'] = pd.to_datetime(import_categorized_filtered['begin_date_mpt'],'%m/%d/%Y %H:%M')
-    export_categorized_filtered['begin_date_mpt'] = pd.to_datetime(export_categorized_filtered['begin_date_mpt'],'%m/%d/%Y %H:%M')
+    import_categorized_filtered['begin_date_mpt'] = hourly_calendar.to_datetime(import_categorized_filtered['begin_date_mpt'])
+    export_categorized_filtered['begin_date_mpt'] = hourly_calendar.to_datetime(export_categorized_filtered['begin_date_mpt'])
 
     # Ensure datetime conversion
     print("\nImport Data with DateTime Conversion:")
@@ -1411,14 +1604,14 @@ def create_regional_import_export_file(path, updated_start_date, original_end_da
     2024-01-01 07:00,2024-01-01 00:00:00,PW20,935.0,PW20 PWX EXPORT TO BCH,SINK,Active,Powerex Corp.,PWX,,,EXPORT_BC
     
     '''
-    path = r'C:\Users\kaczanor\OneDrive - Enbridge Inc\Documents\Python\Revised-AESO-API-master\output'
+    path = output_folder
     sub_folder =  "temp"
     new_path1 = create_path(path,sub_folder, f'import_categorized_filtered_sorted_{file_year_suffix}.csv')
     new_path1 = new_path1.replace("\\", "/") 
     print(f"new_path1: {new_path1}")
     save_dataframe_to_csv(import_categorized_filtered_sorted, new_path1)
 
-    path = r'C:\Users\kaczanor\OneDrive - Enbridge Inc\Documents\Python\Revised-AESO-API-master\output'
+    path = output_folder
     sub_folder =  "temp"
     new_path2 = create_path(path,sub_folder, f'export_categorized_filtered_sorted_{file_year_suffix}.csv')
     new_path2 = new_path2.replace("\\", "/") 
@@ -1428,59 +1621,24 @@ def create_regional_import_export_file(path, updated_start_date, original_end_da
     #--------------------------------------------------------
     # Step 10: Aggregate data by route
     # Function to map Type to Route columns
-    # This passes the row of the data frame and the list of route mapping to the fnction
+    # Each route column gets the volume of the rows whose REGION maps to that route
+    # (only rows with an ASSET_TYPE), and 0 for the other rows.
     # the route mappings are 
     # ['IMPORT_BC', 'IMPORT_MT', 'IMPORT_SK','EXPORT_BC', 'EXPORT_MT', 'EXPORT_SK']
-    def map_to_route(row, route_mapping, total_column):
-        #print(f"Processing hour: {row['begin_date_mpt']}, row: {row['ASSET_ID']}, Type: {row['ASSET_TYPE']}, Volume: {row[total_column]}")
-        # Only proceed with non null values in the ASSET_TYPE column
-        # These values will be either 'SOURCE' or 'SINK'
-        if pd.notnull(row['ASSET_TYPE']):
-            #print(f"row['ASSET_TYPE']: {row['ASSET_TYPE']}")
-            pass
-            # Get the route based on the ASSET_TYPE column 'SOURCE/SINK'
-            route = route_mapping.get(row['REGION'])
-            #print(f"Route: {route}")
-            # Assign the volume to the corresponding route column
-            if route:
-                row[route] = row[total_column]  # Assuming 'Volume' is the relevant data to aggregate
-                #print(f"Assigned Volume: {row[total_column]} to Route: {route} for Asset ID: {row['ASSET_ID']}")
-            else:
-                #print(f"No route mapping found for ASSET_TYPE: {row['ASSET_TYPE']}")
-                pass
-        return row
-
-    for route in import_routes + export_routes:
-        import_categorized[route] = 0
-        export_categorized[route] = 0
-
-    # Function to process data in batches as the data set is large and creates memory issues
-    def process_in_batches(df, route_mapping, total_column, batch_size=1000):
-        num_batches = (len(df) // batch_size) + 1
-        df_list = []
-        for i in tqdm(range(num_batches), desc="Processing in batches"):
-            start_idx = i * batch_size
-            end_idx = start_idx + batch_size
-            batch = df.iloc[start_idx:end_idx].copy()  # Use .copy() to avoid SettingWithCopyWarning
-            batch = batch.apply(lambda row: map_to_route(row, route_mapping, total_column), axis=1)
-            df_list.append(batch)
-        return pd.concat(df_list, ignore_index=True)
-
-    # iterates through each route name stored in import_routes and export_routes. These are lists containing 
-    # names of different import and export routes. For each route name (route), it sets the corresponding column 
-    # in both import_categorized and export_categorized DataFrames to 0. This initializes these columns to zero 
-    # before they are populated with aggregated values in subsequent steps. This ensures that all routes have a 
-    # starting point of zero before aggregation, preventing issues with uninitialized or NaN values during aggregation operations.
-    
-    tqdm.pandas(desc="Processing import routes")
-    # Apply map_to_route function to each row
+    def map_to_routes(df, route_mapping, total_column):
+        # Whole-column masks instead of a row by row apply
+        routes = df['REGION'].map(route_mapping).where(df['ASSET_TYPE'].notna())
+        for route in import_routes + export_routes:
+            df[route] = df[total_column].where(routes == route, 0)
+        return df
+
+    # Apply map_to_routes to the import and export rows
     total_column = 'TOTAL_IMPORTS'
-    import_categorized = process_in_batches(import_categorized, route_mapping, total_column)
+    import_categorized = map_to_routes(import_categorized, route_mapping, total_column)
     print(f"import_categorized: {import_categorized.head(100)}")
     
-    tqdm.pandas(desc="Processing export routes")
     total_column = 'TOTAL_EXPORTS'
-    export_categorized = process_in_batches(export_categorized, route_mapping, total_column)
+    export_categorized = map_to_routes(export_categorized, route_mapping, total_column)
     print(f"export_categorized: {export_categorized.head(100)}")
 
     #Check Length of Import and Export Data
@@ -1505,6 +1663,9 @@ def create_regional_import_export_file(path, updated_start_date, original_end_da
         #new
         #import_summary = import_categorized_filtered.groupby(['begin_date_utc', 'begin_date_mpt'])[['TOTAL_IMPORTS']].sum().reset_index()
         import_summary = import_categorized.groupby(['begin_date_utc', 'begin_date_mpt'])[['TOTAL_IMPORTS']].sum().reset_index()
+        if sparse_volumes is not None:
+            # Hours without a non-zero reading are not in the sparse rows; they sum to 0
+            import_summary = import_data[['begin_date_utc', 'begin_date_mpt']].merge(import_summary, how='left').fillna(0)
         #print(f"Import Summary:\n{import_summary}")
         #print specific row for the date: 1/1/2010 0:00
         #print(f"Import Summary for 1/1/2010 0:00: {import_summary[import_summary['begin_date_mpt'] == '1/1/2010 0:00']}")
@@ -1519,6 +1680,8 @@ def create_regional_import_export_file(path, updated_start_date, original_end_da
         #new
         #export_summary = export_categorized_filtered.groupby(['begin_date_utc', 'begin_date_mpt'])[['TOTAL_EXPORTS']].sum().reset_index()
         export_summary = export_categorized.groupby(['begin_date_utc', 'begin_date_mpt'])[['TOTAL_EXPORTS']].sum().reset_index()
+        if sparse_volumes is not None:
+            export_summary = export_data[['begin_date_utc', 'begin_date_mpt']].merge(export_summary, how='left').fillna(0)
 
         print(f"Export Summary:\n{export_summary}")
         #print specific row for the date: 1/1/2010 0:00
@@ -1554,8 +1717,8 @@ def create_regional_import_export_file(path, updated_start_date, original_end_da
 
         #Sort Data
         # Convert begin_date_mpt to datetime first
-        final_summary['begin_date_utc'] = pd.to_datetime(final_summary['begin_date_utc'], format='%m/%d/%Y %H:%M')
-        final_summary['begin_date_mpt'] = pd.to_datetime(final_summary['begin_date_mpt'], format='%m/%d/%Y %H:%M')
+        final_summary['begin_date_utc'] = hourly_calendar.to_datetime(final_summary['begin_date_utc'], format='%m/%d/%Y %H:%M')
+        final_summary['begin_date_mpt'] = hourly_calendar.to_datetime(final_summary['begin_date_mpt'], format='%m/%d/%Y %H:%M')
 
         # Handle NaN values in date columns
         final_summary['begin_date_utc'] = final_summary['begin_date_utc'].fillna(pd.Timestamp('1900-01-01 00:00:00'))
@@ -1588,7 +1751,7 @@ def create_regional_import_export_file(path, updated_start_date, original_end_da
     # new_path = new_path.replace("\\", "/") 
     # save_dataframe_to_csv(final_summary, new_path)
 
-    path = r'C:\Users\kaczanor\OneDrive - Enbridge Inc\Documents\Python\Revised-AESO-API-master\output'
+    path = output_folder
     filename = f'aggregated_hourly_import_export_data_{file_year_suffix}.csv'
     sub_folder =  "temp"
     #new_path = create_path(path_without_subfolder,sub_folder, 'aggregated_hourly_import_export_data.csv')
@@ -1657,12 +1820,17 @@ def final_processing_actual_forecast_report_data(api_config, df, output_csv_file
     
     
     if csv_output:
-        save_dataframe_to_csv(df, path) 
+        save_dataframe_to_csv(df, path, api_config.get('natural_key')) 
    
     if sqlite_output:
-        save_to_sqlite(df, table, columns, conn)
+        save_to_sqlite(df, table, columns, conn, api_config.get('natural_key'))
 
     print(f"Data saved to {path}")
+
+    # Memory-mapped AIL / forecast AIL series (Hourly Series/)
+    update_hourly_series(api_config, df, path)
+    # Daily / monthly / annual rollups of the ingested days (Rollups/)
+    update_rollups(api_config, df, path)
     return df
  #---------------------------------------------------    
 def final_processing_ail_demand_data(api_config, df, output_csv_files, updated_start_date, updated_end_date, original_end_date, year, path, csv_output, sqlite_output, conn, table, columns):
@@ -1683,6 +1851,10 @@ def final_processing_asset_list_data(api_config, df, output_csv_files, updated_s
     save_dataframe_to_csv(df, path) 
     
     print(f"Data saved to {path}")
+
+    # New assets get their keys in Asset List/asset_dimension.csv, existing keys never change
+    asset_dimension = load_asset_dimension(os.path.dirname(os.path.dirname(path)), df)
+    print(f"Asset dimension: {len(asset_dimension)} asset keys")
     return df
  #---------------------------------------------------    
 def final_processing_generators_above_5MW_data(api_config, df, output_csv_files, updated_start_date, updated_end_date, original_end_date, year, path, csv_output, sqlite_output, conn, table, columns):
@@ -1703,9 +1875,14 @@ def final_processing_historical_spot_price_specific_date_and_range(api_config, d
     print(df.head())
 
     #save_dataframe_to_csv(df_expanded, path) 
-    save_dataframe_to_csv(df, path) 
+    save_dataframe_to_csv(df, path, api_config.get('natural_key')) 
     
     print(f"Data saved to {path}")
+
+    # Memory-mapped pool price / forecast pool price series (Hourly Series/)
+    update_hourly_series(api_config, df, path)
+    # Daily / monthly / annual rollups of the ingested days (Rollups/)
+    update_rollups(api_config, df, path)
     #return df_expanded
     return df
  #---------------------------------------------------    
@@ -1722,7 +1899,7 @@ def final_processing_historical_spot_price_specific_date(api_config, df, output_
     #df_expanded = pd.DataFrame(time_series_data)
 
     #save_dataframe_to_csv(df_expanded, path) 
-    save_dataframe_to_csv(df, path) 
+    save_dataframe_to_csv(df, path, api_config.get('natural_key')) 
     
     print(f"Data saved to {path}")
     #return df_expanded
@@ -1740,6 +1917,19 @@ def final_processing_merit_order_data(api_config, df, output_csv_files, updated_
 
     all_data = []
 
+    # Stored blocks reference Asset List/asset_dimension.csv through an int32 asset_key column
+    asset_dimension = load_asset_dimension(os.path.dirname(os.path.dirname(path)))
+    column_order = api_config.get('column_order')
+    if column_order:
+        column_order = list(column_order) + [ASSET_KEY_COLUMN]
+
+    # In out-of-core mode each daily fetch is appended straight to the annual csv file instead
+    # of being held in all_data until the end of the year. See src/merit_order_out_of_core.py
+    out_of_core = api_config.get('out_of_core', False)
+    if out_of_core:
+        csv_writer = MeritOrderCsvWriter(path, column_order, api_config.get('natural_key'),
+                                         api_config.get('memory_budget_mb') or 512)
+
     Counter = 0
     current_date = updated_start_date.date()
     original_end_date = original_end_date.date()
@@ -1754,60 +1944,60 @@ def final_processing_merit_order_data(api_config, df, output_csv_files, updated_
     #Step 1: Make API for daily data and Loop though each daily report
     #####################################
 
-    # Inner loop for hours within each year
+    # Inner loop for hours within each year. Daily requests, normalization and writing overlap
+    # in src/fetch_pipeline.py; write_day() receives the days in order
     with tqdm(total=total_hours, desc='Hour', position=1, leave=False) as pbar:
-        while current_date <= original_end_date:
-            formatted_current_date = current_date.strftime('%Y-%m-%d %H:%M')
-            formatted_end_date = original_end_date.strftime('%Y-%m-%d %H:%M')
-            print(f" current_date: {formatted_current_date} and end_date: {formatted_end_date}")
-
-            #####################################
-            # Step 2: Make API call for daily data
-            #####################################
-
-            #this fetches 1 day of merit order data
-            print(f" current_date: {current_date}")
-            fetched_data = fetch_data(api_config, current_date, original_end_date) 
-            # print(f" fetched_data: {fetched_data.head(10)}")
-            # print(f" fetched_tail: {fetched_data.tail(10)}")
-            print("Appending Data")
+        def write_day(day, fetched_data):
             #####################################
             # Step 3: Append Daily data to all_data which will hold all the daily data
             #####################################
-
-            #all_data.append(df)
-            all_data.append(fetched_data)
-            # print(f" current_date: {current_date}")
-            # print(f"Appended df:\n{df.head()}")  # Print what was appended
-            # print(f"Appended df:\n{df.tail()}")  # Print what was appended
-            # print(f"Length of all_data: {len(all_data)}")  # Check length of all_data
+            print(f"Appending Data for {day}")
+            fetched_data[ASSET_KEY_COLUMN] = asset_dimension.encode(fetched_data['asset_ID'])
+            if out_of_core:
+                csv_writer.append(fetched_data)
+            else:
+                all_data.append(fetched_data)
 
             #####################################
             # Step 4: Update the inner progress bar
             #####################################
             pbar.update(1)
 
-            try:
-                print(f"Length of all_data: {len(all_data)}")  # Check length of all_data
-            except Exception as e:
-                print(f"Error on date {current_date}: {e}")
-
-            current_date += datetime.timedelta(days=1)  # Move to the next day
-            # Increment the current date by 1 hour
-            #current_date += datetime.timedelta(hours=1)
-            Counter = Counter + 1 
-            #print(f" Merit Order Daily Counter: {Counter}")
+        #####################################
+        # Step 2: Make API calls for daily data
+        #####################################
+        stats = run_daily_pipeline(api_config, current_date, original_end_date, write_day)
+        Counter = stats['written']
+        print(f" Merit Order days fetched: {Counter} of {stats['days']}")
 
     #######################################
     # Step 5: After the daily loop has completed looping, combine all fetched data into one dataframe
     #######################################
-    print("Combining all fetched data into one dateframe")
-    df_combined = pd.concat(all_data, ignore_index=True)
-    print(f"Appended df.head():\n{df_combined.head()}")  # Print what was appended
-    print(f"Appended df.tail():\n{df_combined.tail()}")  # Print what was appended
-    
-    save_dataframe_to_csv(df_combined, path) 
-    print(f"Data saved to {path}")
+    if out_of_core:
+        # Only a run over the whole year (with every day returned) replaces the annual file;
+        # otherwise the streamed days are upserted into it so the other stored days are kept
+        whole_year = current_date == datetime.date(current_date.year, 1, 1) and \
+            original_end_date >= datetime.date(current_date.year, 12, 31) and not stats['failed']
+        csv_writer.close(replace=whole_year)
+        print(f"Streamed {csv_writer.rows_written} rows to {path} (peak RSS: {peak_rss_mb()} MB)")
+    else:
+        print("Combining all fetched data into one dateframe")
+        df_combined = pd.concat(all_data, ignore_index=True)
+        print(f"Appended df.head():\n{df_combined.head()}")  # Print what was appended
+        print(f"Appended df.tail():\n{df_combined.tail()}")  # Print what was appended
+
+        save_dataframe_to_csv(df_combined, path, api_config.get('natural_key')) 
+        print(f"Data saved to {path}")
+
+    #######################################
+    # Step 6: Encode the annual file as runs of unchanged offers (merit_order_runs_{year}.npz)
+    # See src/merit_order_runs.py
+    #######################################
+    # Only with "run_length_store": true, and only if the annual file changed since it was encoded
+    stats = update_merit_order_runs(api_config, path)
+    if stats:
+        print(f"Run-length store: {stats['runs']} runs for {stats['rows']} rows "
+              f"({stats['csv_bytes'] / 1e6:.1f} MB csv, {stats['runs_bytes'] / 1e6:.1f} MB runs)")
 
     return df
  #---------------------------------------------------    
@@ -1819,11 +2009,17 @@ def final_processing_metered_volume_data(api_config, df, output_csv_files, updat
     Counter = 0
     print(f" Counter: {Counter}")
 
-    all_data = []
+    # Only the non-zero readings are kept (src/metered_volume_store.py), with the int32
+    # asset_key of Asset List/asset_dimension.csv instead of the asset_ID string
+    sparse_builder = SparseMeteredVolumeBuilder()
+    natural_key = [ASSET_KEY_COLUMN if column == 'asset_ID' else column for column in api_config.get('natural_key') or []]
 
-    master_asset_ids = set()
+    master_asset_keys = set()
     new_asset_ids_per_day = {}
 
+    output_folder = os.path.dirname(os.path.dirname(path))
+    asset_dimension = load_asset_dimension(output_folder)
+
     print(f" start_date and end_date data types: {type(updated_start_date)} and {type(original_end_date)}")
     print(f" start_date: {updated_start_date}")
     print(f" end_date: {original_end_date}")
@@ -1836,69 +2032,47 @@ def final_processing_metered_volume_data(api_config, df, output_csv_files, updat
     #Step 1: Make API for daily data and Loop though each daily report
     #####################################
     
-    while current_date <= original_end_date:
-        print("Current Date is <= End Date")
-        try:
-            
-            print("Fetching Data")
-            #####################################
-            # Step 2: Make API call for daily data
-            #####################################
-            df = fetch_data(api_config, current_date, original_end_date) #>>>>>>>>
-            print(f" df: {df}")
+    # Daily requests and normalization overlap in src/fetch_pipeline.py; write_day() receives
+    # the days in order. Days that return no data are reported by the pipeline and skipped
+    def write_day(day, df):
+        #####################################
+        # Step 3: Extract unique Asset_IDs for the day
+        #####################################
+        asset_keys = asset_dimension.encode(df['asset_ID'])
+        day_asset_keys = set(np.unique(asset_keys).tolist())
 
-            print("Extracting unique Asset_IDs")
-            print(df['asset_ID'].unique())
-            #####################################
-            # Step 3: Extract unique Asset_IDs for the day
-            #####################################
-            day_asset_ids = set(df['asset_ID'].unique())
-            
-            print("Find new Asset_IDs for the day")
-            # Find new Asset_IDs for the day
-            new_ids = day_asset_ids - master_asset_ids
-            
-            print("update the master list")
-            # Update the master list
-            master_asset_ids.update(new_ids)
-            
-            print("Store the new IDs for the day")
-            # Store the new IDs for the day
-            if new_ids:
-                new_asset_ids_per_day[current_date] = new_ids
-            
-            print("Appending Data")
-            #####################################
-            # Step 3: Append Daily data to all_data which will hold all the daily data
-            #####################################
-            all_data.append(df)
-            print(f"Appended df:\n{df.head()}")  # Print what was appended
-            print(f"Appended df:\n{df.tail()}")  # Print what was appended
-            print(f"Length of all_data: {len(all_data)}")  # Check length of all_data
-            
-            try:
-                print(f"Length of all_data: {len(all_data)}")  # Check length of all_data
-            except Exception as e:
-                print(f"Error on date {current_date}: {e}")
-                
-            current_date += datetime.timedelta(days=1)  # Move to the next day
-            
-            Counter = Counter + 1 
-            print(f" Metered Volumne Daily Counter: {Counter}")
-        except Exception as e:
-            print(f"Error on date {current_date}: {e}")
-        
-        print("Processing Metered Volume Data")
-        #print(f"Data saved to {path}")
+        # Find new Asset_IDs for the day
+        new_keys = day_asset_keys - master_asset_keys
+
+        # Update the master list
+        master_asset_keys.update(new_keys)
+
+        # Store the new IDs for the day
+        if new_keys:
+            new_asset_ids_per_day[day] = set(asset_dimension.decode(sorted(new_keys)))
+
+        #####################################
+        # Step 4: Add the day's readings to the sparse store
+        #####################################
+        df = dedupe_frame(df.drop(columns=['asset_ID']).assign(**{ASSET_KEY_COLUMN: asset_keys}), natural_key)
+        sparse_builder.append(df)
+        print(f"Added {len(df)} readings for {day} ({sparse_builder.readings} so far)")
+
+    #####################################
+    # Step 2: Make API calls for daily data
+    #####################################
+    stats = run_daily_pipeline(api_config, current_date, original_end_date, write_day)
+    Counter = stats['written']
+    print(f" Metered Volumne days fetched: {Counter} of {stats['days']}")
+    print("Processing Metered Volume Data")
     #######################################
-    # Step 5: After the daily loop has completed looping, combine all fetched data into one dataframe
+    # Step 5: After the daily loop has completed looping, save the sparse readings of the year
     #######################################
-    print("Combining all fetched data into one dateframe")
-    df_combined = pd.concat(all_data, ignore_index=True)
-    print(f"Appended df:\n{df_combined.head()}")  # Print what was appended
-    print(f"Appended df:\n{df_combined.tail()}")  # Print what was appended
-    print("Process and save the data as 1 file broken down by Asset_Class")
-    
+    sparse_volumes = sparse_builder.build()
+    sparse_volumes.save(sparse_path(output_folder, year))
+    sparse_stats = sparse_volumes.stats()
+    print(f"Saved {sparse_stats['nonzero']} non-zero readings ({sparse_stats['missing']} missing) "
+          f"of {sparse_stats['cells']} hour/asset cells to {sparse_path(output_folder, year)}")
     
     #######################################
     # Step 6: After data has been saved, break down the daily data by the various asset classes
@@ -1917,49 +2091,20 @@ def final_processing_metered_volume_data(api_config, df, output_csv_files, updat
    
     #######################################    
 
-    unique_asset_ids, unique_asset_classes = process_unique_asset_ids(df_combined)
+    unique_asset_ids = asset_dimension.decode(sparse_volumes.asset_keys())
+    unique_asset_classes = sparse_volumes.classes
     print(f" unique_asset_ids: {unique_asset_ids}")
     
     #######################################
-    # Step 7: Create separate CSV files for each asset_class
+    # Step 7: Create separate wide CSV files for the asset classes listed in wide_output
+    # (true for all classes). Data for generators is stored in IPP and GENCO files, which
+    # are consolidated when both are written
     #######################################
-    '''
-    This separates out the metered volumnes by:
-
-    '''
-    #Create file Path
-    #Use existing path and take out the .csv file already in it
-    reduced_path = remove_filename(path)
-    sub_folder =  get_last_folder(reduced_path)
-    # Get the path without the sub_folder
-    path_without_subfolder = os.path.dirname(reduced_path)
-
+    wide_output = api_config.get('wide_output')
+    wide_classes = unique_asset_classes if wide_output is True else [c for c in wide_output or [] if c in unique_asset_classes]
+    write_wide_metered_volumes(sparse_volumes, asset_dimension, os.path.dirname(path), wide_classes,
+                               memoize=api_config.get('memoize_stages'))
 
-    for asset_class in unique_asset_classes:
-        subset_df = df_combined[df_combined['asset_class'] == asset_class]
-        
-        # Reshape the data for this asset_class
-        reshaped_data = reshape_data(subset_df)
-
-        #Create filename and subfolder
-        filename = f"{asset_class}.csv"
-        new_path = create_path(path_without_subfolder,sub_folder, filename)
-        new_path = new_path.replace("\\", "/")  
-        #------------------------------------------------------------
-        save_dataframe_to_csv(reshaped_data, new_path) #!!!!!!!!!!
-        print(f"\nSaved reshaped data for {asset_class} to {new_path}")
-        #------------------------------------------------------------
-    ################
-    print("Process and save the data in separate files by Asset_Class")
-
-
-    # Add the function call at the end of your routine
-    print("Combining metered volume files...")
-    #######################################
-    # Step 7: Data for generators is stroed in IPP and GENCO files. We need to consolidate these files
-    #######################################
-    consolidate_generation_files(new_path) #!!!!!!!!!!
-    
     #######################################
     # Step 8: Create regional data for the import/export files that are currently only delineated by asset_id
     # This will create a new file with headers:
@@ -1971,7 +2116,18 @@ def final_processing_metered_volume_data(api_config, df, output_csv_files, updat
     #-----------------
     # Reset current_date as the next function has a similar While loop like the
     # This creates the files: 'aggregated_hourly_import_export_data.csv', 'import_categorized_filtered_sorted.csv' and 'export_categorized_filtered_sorted.csv'
-    file_year_suffix = create_regional_import_export_file(path, updated_start_date, original_end_date)
+    # api_config['project_folder'] optionally redirects steps 8a-8d away from LEGACY_PROJECT_FOLDER
+    project_folder = api_config.get('project_folder') or LEGACY_PROJECT_FOLDER
+    # With "memoize_stages": true, steps 8a-8c are skipped when their input files did not change
+    # since the last run for the year (manifests in output/temp/stage_manifests)
+    stage_memo = StageMemo(os.path.join(project_folder, 'output'), enabled=api_config.get('memoize_stages'))
+    stage_folders = {'output_folder': os.path.join(project_folder, 'output'), 'project_folder': project_folder,
+                     'metered_folder': os.path.dirname(path), 'year': updated_start_date.year}
+    file_year_suffix = stage_memo.run('create_regional_import_export_file', updated_start_date.year,
+                                      create_regional_import_export_file, path, updated_start_date,
+                                      original_end_date, project_folder,
+                                      params={'start_date': updated_start_date, 'end_date': original_end_date},
+                                      **stage_folders)
 
     #-----------------
     # Step 8b
@@ -1979,7 +2135,12 @@ def final_processing_metered_volume_data(api_config, df, output_csv_files, updat
     # Combines the separate import and export data files 
     # begin_date_utc,begin_date_mpt,IMPORT_BC,IMPORT_MT,IMPORT_SK,EXPORT_BC,EXPORT_MT,EXPORT_SK,TOTAL_IMPORTS,TOTAL_EXPORTS
     # Creates the 'export_import_summary{yyyy}.csv' file
-    aggregate_import_exports(file_year_suffix)
+    stage_memo.run('aggregate_import_exports', file_year_suffix, aggregate_import_exports,
+                   file_year_suffix, os.path.join(project_folder, 'output'), **stage_folders)
+
+    # Tie line rollups of the days just processed (Rollups/tie_lines_*.csv)
+    if api_config.get('rollups'):
+        RollupStore(os.path.join(project_folder, 'output')).refresh('tie_lines', updated_start_date, original_end_date)
 
     #-----------------
     # Step 8c
@@ -1996,14 +2157,15 @@ def final_processing_metered_volume_data(api_config, df, output_csv_files, updat
     #begin_datetime_utc,begin_datetime_mpt,alberta_internal_load,forecast_alberta_internal_load,IMPORT_BC,IMPORT_MT,IMPORT_SK,EXPORT_BC,EXPORT_MT,EXPORT_SK,TOTAL_IMPORTS,TOTAL_EXPORTS
     #2024-01-01 07:00:00,2024-01-01 00:00:00,9809.0,9779,0.0,34.696,0.0,935.0,0.0,0.0,34.696,935.0
     # Creates the 'combined_Metered_Demand_{year}.csv' file
-    combine_demand_with_tie_line_data(file_year_suffix)
+    stage_memo.run('combine_demand_with_tie_line_data', file_year_suffix, combine_demand_with_tie_line_data,
+                   file_year_suffix, os.path.join(project_folder, 'output'), **stage_folders)
 
     #-----------------
     # Step 8d
     #-----------------
     # Take thge f'combined_Metered_Demand_{specific_year}.csv' file created above
     # and appends it to the combined_Metered_Demand_2000_to_20XX
-    append_aggregated_annual_data_with_tie_line_data(file_year_suffix)
+    append_aggregated_annual_data_with_tie_line_data(file_year_suffix, os.path.join(project_folder, 'output'))
 
     return 
  #---------------------------------------------------    
@@ -2017,7 +2179,7 @@ def final_processing_supply_demand_data(api_config, df, output_csv_files, update
 def final_processing_system_marginal_price_data(api_config, df, output_csv_files, updated_start_date, updated_end_date, original_end_date, year, path, csv_output, sqlite_output, conn, table, columns):
     print("Processing System Marginal Price Data")
 
-    save_dataframe_to_csv(df, path) 
+    save_dataframe_to_csv(df, path, api_config.get('natural_key')) 
     
     print(f"Data saved to {path}")
     return df
\ No newline at end of file
@@ -0,0 +1,182 @@
+"""
+Adaptive Request Window Planner
+
+Range endpoints (time series calls that take a startDate and an endDate) can only
+return a limited number of days per request, e.g. 366 days for pool price and
+182 days for system marginal price. Those limits are declared per endpoint in
+config/api_endpoints.json as max_window_days (or reporting_limit).
+
+fetch_range() covers a requested date range with as few requests as possible:
+1) The range is split into the largest windows the endpoint allows
+2) Windows are fetched concurrently, max_workers at a time
+3) After each batch the window size is adapted to the observed latency and rows per
+   request: windows shrink when responses are slow or very large and grow back
+   (up to the endpoint limit) when they are fast
+
+Daily endpoints (startDate only) and list endpoints are passed straight to fetch_data.
+"""
+
+import copy
+import time
+import datetime
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from src.logging_tools import get_logger
+
+logger = get_logger('window_planner')
+
+DEFAULT_MAX_WORKERS = 4
+# A window is sized so that one request takes about TARGET_SECONDS and returns at most TARGET_ROWS rows
+TARGET_SECONDS = 30.0
+TARGET_ROWS = 250000
+# Windows grow by at most this factor between batches
+MAX_GROWTH = 2.0
+
+#------------------------------------------------------
+def _to_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+def max_window_days(api_config):
+    """
+    Returns:
+        int or None: Largest number of days one request may cover (None = no limit)
+    """
+    limit = api_config.get('max_window_days') or api_config.get('reporting_limit')
+    return int(limit) if limit else None
+
+def is_range_request(api_config):
+    """
+    Returns:
+        bool: True for time series endpoints that take both a startDate and an endDate
+    """
+    params = api_config.get('params') or {}
+    return api_config.get('data_type') == 'time series' and 'endDate' in params
+
+def split_range(start_date, end_date, window_days):
+    """
+    Split [start_date, end_date] into consecutive windows of at most window_days days
+
+    Returns:
+        list: (window_start, window_end) date tuples, both inclusive
+    """
+    start_date, end_date = _to_date(start_date), _to_date(end_date)
+    windows = []
+    while start_date <= end_date:
+        window_end = end_date
+        if window_days:
+            window_end = min(end_date, start_date + datetime.timedelta(days=window_days - 1))
+        windows.append((start_date, window_end))
+        start_date = window_end + datetime.timedelta(days=1)
+    return windows
+
+
+class WindowPlanner:
+    """
+    Chooses the size of the next request windows from the endpoint limit and past responses
+    """
+
+    def __init__(self, api_config, target_seconds=TARGET_SECONDS, target_rows=TARGET_ROWS):
+        self.max_days = max_window_days(api_config)
+        self.window_days = self.max_days
+        self.target_seconds = target_seconds
+        self.target_rows = target_rows
+
+    def next_windows(self, start_date, end_date, count):
+        """
+        Returns:
+            list: Up to count windows starting at start_date
+        """
+        return split_range(start_date, end_date, self.window_days)[:count]
+
+    def observe(self, days, seconds, rows):
+        """
+        Record one response and resize the window for the next batch
+
+        Args:
+            days: Days covered by the request
+            seconds: Wall time of the request
+            rows: Rows returned
+        """
+        candidates = []
+        if seconds and seconds > 0:
+            candidates.append(days * self.target_seconds / seconds)
+        if rows:
+            candidates.append(days * self.target_rows / rows)
+        if not candidates:
+            return
+        proposed = min(candidates)
+        current = self.window_days or days
+        proposed = min(proposed, current * MAX_GROWTH)
+        if self.max_days:
+            proposed = min(proposed, self.max_days)
+        new_days = max(1, int(proposed))
+        if self.window_days is None and new_days >= days:
+            # No endpoint limit and the response was within target: keep whole-range requests
+            return
+        if new_days != self.window_days:
+            logger.debug("Window size %s -> %s days (%.1f s, %s rows for %s days)",
+                         self.window_days, new_days, seconds, rows, days)
+        self.window_days = new_days
+#------------------------------------------------------
+def _fetch_window(api_config, window_start, window_end):
+    from src.utilities import fetch_data
+    started = time.perf_counter()
+    # fetch_data writes the window dates into api_config['params'], so every window gets its own copy
+    df = fetch_data(copy.deepcopy(api_config), window_start.strftime('%Y-%m-%d'), window_end.strftime('%Y-%m-%d'))
+    return df, time.perf_counter() - started
+
+def fetch_range(api_config, start_date, end_date, max_workers=DEFAULT_MAX_WORKERS,
+                target_seconds=TARGET_SECONDS, target_rows=TARGET_ROWS):
+    """
+    Fetch a date range with the fewest requests the endpoint allows
+
+    Args:
+        api_config: API call dictionary
+        start_date: First date ('YYYY-MM-DD' or date)
+        end_date: Last date, inclusive ('YYYY-MM-DD' or date)
+        max_workers: Windows fetched concurrently
+        target_seconds: Target wall time per request
+        target_rows: Target rows per request
+
+    Returns:
+        DataFrame or None: All windows concatenated in time order (None if every window failed)
+    """
+    if not is_range_request(api_config):
+        from src.utilities import fetch_data
+        return fetch_data(api_config, start_date, end_date)
+
+    planner = WindowPlanner(api_config, target_seconds, target_rows)
+    cursor, end_date = _to_date(start_date), _to_date(end_date)
+    frames = []
+    failed = []
+    request_count = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while cursor <= end_date:
+            batch = planner.next_windows(cursor, end_date, max_workers)
+            # copy_context keeps the run_report endpoint/window context inside the worker threads
+            futures = [executor.submit(contextvars.copy_context().run, _fetch_window, api_config, window_start, window_end)
+                       for window_start, window_end in batch]
+            for (window_start, window_end), future in zip(batch, futures):
+                request_count += 1
+                df, seconds = future.result()
+                if df is None:
+                    failed.append((window_start, window_end))
+                    continue
+                frames.append(df)
+                planner.observe((window_end - window_start).days + 1, seconds, len(df))
+            cursor = batch[-1][1] + datetime.timedelta(days=1)
+
+    if failed:
+        logger.warning("%s of %s windows failed: %s", len(failed), request_count,
+                       ', '.join(f"{s}..{e}" for s, e in failed))
+    if not frames:
+        return None
+    logger.info("Fetched %s..%s in %s request(s)", _to_date(start_date), end_date, request_count)
+    return pd.concat(frames, ignore_index=True)
@@ -1,89 +1,46 @@
-import pandas as pd
-import glob
+from src.forecast_error_analytics import ForecastErrorAnalytics
 
 '''
 This code calculate forecast error between current period forecast and next period actual.
 '''
 
 # Special Note
-# The glob module in Python is used to retrieve files/pathnames matching a specified pattern. The pattern rules of glob 
-# follow standard Unix path expansion rules. It is very useful in cases when you need to process a list of files with 
-# similar names or extensions, but located in different directories.
+# The rolling statistics, forecast error, MAE and MAPE are computed by src/forecast_error_analytics.py.
+# Results are cached per year next to the pool price files, so re-running this script only
+# recomputes the years whose pool_price_data_{year}.csv files changed since the last run.
+# For quick lookups without parsing the csv files, the hourly pool price and forecast are also kept
+# as memory-mapped arrays (src/hourly_series_store.py), e.g.
+#   values, flags = HourlySeriesStore(output_folder).slice('pool_price', '2023-01-01 07:00', '2024-01-01 07:00')
 
-# Get a list of all file paths
-#file_paths = glob.glob('output_data/Historical Pool Price/pool_price_data*.csv')
-file_paths = glob.glob('C:/Users/kaczanor/OneDrive - Enbridge Inc/Documents/Python/Revised-AESO-API-master/output/Historical Pool Price/pool_price_data*.csv')
+directory = 'C:/Users/kaczanor/OneDrive - Enbridge Inc/Documents/Python/Revised-AESO-API-master/output/Historical Pool Price'
 
-# Read each file into a DataFrame and store all DataFrames in a list
-df_list = [pd.read_csv(file_path) for file_path in file_paths]
+analytics = ForecastErrorAnalytics(directory)
 
-# Concatenate all DataFrames
-df = pd.concat(df_list)
+# Hourly data with rolling_5day_avg/std, rolling_30day_avg/std, forecast_error, abs_error and ape
+df = analytics.load()
 
-# Convert the 'begin_datetime_mpt' column to datetime
-df['begin_datetime_mpt'] = pd.to_datetime(df['begin_datetime_mpt'])
+# Annual mean error, Mean Absolute Error (MAE), Mean Absolute Percentage Error (MAPE)
+# and annual average rolling standard deviations
+# Note "inf" values occur in hours with a pool_price of 0, so a small constant (0.001) is added
+# to the denominator of the absolute percentage error to avoid division by 0.
+annual_summary = analytics.annual_summary(df)
 
-# Set 'begin_datetime_mpt' as the index
-df.set_index('begin_datetime_mpt', inplace=True)
+# Correlations between the forecast error and the rolling average/std pool price, and between
+# the annual MAE/MAPE and the annual average rolling standard deviation. A positive number indicates
+# a positive relationship and a negative number indicates a negative relationship.
+correlations = analytics.correlations(df, annual_summary)
 
-#Add a rolling STD to the data frame
-df['rolling_30day_std'] = df['pool_price'].rolling('30D').std()
-annual_rolling_30day_std = df['rolling_30day_std'].resample('Y').mean()
+print("Annual Mean Absolute Error: \n", annual_summary['mae'])
+print("Annual Mean Absolute Percentage Error: \n", annual_summary['mape'])
 
-#Add additional rolling average/std pool price metrics over shorter period
-df['rolling_5day_avg'] = df['pool_price'].rolling('5D').mean()
-df['rolling_5day_std'] = df['pool_price'].rolling('5D').std()
-annual_rolling_5day_std = df['rolling_5day_std'].resample('Y').mean()
+print("Correlation between hourly forecast error and 30-day avg pool price: ", correlations['forecast_error_vs_rolling_30day_avg'])
+print("Correlation between hourly forecast error and 5-day avg pool price: ", correlations['forecast_error_vs_rolling_5day_avg'])
 
-# Calculate forecast error between current period forecast and next period actual
-#df['forecast_error'] = df['forecast_pool_price'] - df['pool_price']
-df['forecast_error'] = df['forecast_pool_price'].shift(-1) - df['pool_price']
+print("Correlation between hourly forecast error and 30-day std pool price: ", correlations['forecast_error_vs_rolling_30day_std'])
+print("Correlation between hourly forecast error and 5-day std pool price: ", correlations['forecast_error_vs_rolling_5day_std'])
 
-# Calculate annual Mean Absolute Error (MAE) in MWh
-# Here, forecast_error is the difference between the forecasted pool price and the actual pool price. 
-# The error is positive when the forecast is too high and negative when it's too low.
-annual_mae = df['forecast_error'].resample('Y').mean().abs()
+print("Correlation between annual MAE and 30-day rolling std: ", correlations['annual_mae_vs_rolling_30day_std'])
+print("Correlation between annual MAPE and 30-day rolling std: ", correlations['annual_mape_vs_rolling_30day_std'])
 
-# We can express this in % terms too
-# Calculate Mean Absolute Percentage Error (MAPE)
-# Note "inf" values occur in hours with a pool_price of 0, so when you calculate the absolute percentage error (APE), 
-# you're dividing by 0, which results in inf.  To address this, we can add a small constant value (like 0.001) to the 
-# denominator to avoid division by 0. Here's how you can modify the MAPE calculation code:
-
-df['abs_error'] = df['forecast_error'].abs()
-df['ape'] = df['abs_error'] / (df['pool_price'] + 0.001)
-mape = df['ape'].resample('Y').mean() * 100
-
-# Calculate correlation between forecast error and rolling average pool price
-# This will give you a number between -1 and 1. A positive number indicates a positive relationship (i.e., as the rolling average 
-# increases, so does the forecast error), and a negative number indicates a negative relationship.
-correlation_fe_30day_avg_poolprice = df['forecast_error'].corr(df['rolling_30day_avg'])
-correlation_fe_5day_avg_poolprice = df['forecast_error'].corr(df['rolling_5day_avg'])
-
-#Calculate the correlaton between the forecast and the rolling std dev
-correlation_forecast_30day_std_poolprice = df['forecast_error'].corr(df['rolling_30day_std'])
-correlation_forecast_5day_std_poolprice = df['forecast_error'].corr(df['rolling_5day_std'])
-
-#calculate the correlation between the annual MAE and the annual average rolling standard deviation:
-correlation_mae_30day_std = annual_mae.corr(annual_rolling_30day_std)
-correlation_mae_5day_std = annual_mae.corr(annual_rolling_5day_std)
-
-#calculated the correlation between the annual MAPE and the annual average rolling standard deviation:
-correlation_mape_30day_std = mape.corr(annual_rolling_30day_std)
-correlation_mape_5day_std = mape.corr(annual_rolling_5day_std)
-
-
-print("Annual Mean Absolute Error: \n", annual_mae)
-print("Annual Mean Absolute Error: \n", mape)
-
-print("Correlation between hourly forecast error and 30-day avg pool price: ", correlation_fe_30day_avg_poolprice)
-print("Correlation between hourly forecast error and 5-day avg pool price: ", correlation_fe_5day_avg_poolprice)
-
-print("Correlation between hourly forecast error and 30-day std pool price: ", correlation_forecast_30day_std_poolprice)
-print("Correlation between hourly forecast error and 5-day std pool price: ", correlation_forecast_5day_std_poolprice)
-
-print("Correlation between annual MAE and 30-day rolling std: ", correlation_mae_30day_std)
-print("Correlation between annual MAPE and 30-day rolling std: ", correlation_mape_30day_std)
-
-print("Correlation between annual MAE and 5-day rolling std: ", correlation_mae_5day_std)
-print("Correlation between annual MAPE and 5-day rolling std: ", correlation_mape_5day_std)
\ No newline at end of file
+print("Correlation between annual MAE and 5-day rolling std: ", correlations['annual_mae_vs_rolling_5day_std'])
+print("Correlation between annual MAPE and 5-day rolling std: ", correlations['annual_mape_vs_rolling_5day_std'])
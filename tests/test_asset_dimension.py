@@ -0,0 +1,104 @@
+"""
+Tests for the asset dimension (src/asset_dimension.py)
+"""
+
+import os
+import time
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import asset_dimension as asset_dimension_module
+from src.asset_dimension import AssetDimension, load_asset_dimension, file_lock, MISSING_KEY, KEY_COLUMN, \
+    ASSET_DIMENSION_FILE
+
+#------------------------------------------------------
+def _asset_list(ids, region='AB'):
+    return pd.DataFrame({'ASSET_ID': ids, 'ASSET_NAME': [f'{i} name' for i in ids], 'REGION': region})
+
+def test_keys_are_stable_across_updates(tmp_path):
+    output_folder = str(tmp_path)
+    dimension = load_asset_dimension(output_folder, _asset_list(['AAA', 'BBB', 'CCC']))
+    assert list(dimension.encode(['AAA', 'BBB', 'CCC'])) == [0, 1, 2]
+
+    # BBB leaves the asset list, DDD joins it and EEE only appears in fact data
+    dimension = load_asset_dimension(output_folder, _asset_list(['DDD', 'CCC', 'AAA'], region='BC'))
+    keys = dimension.encode(['EEE', 'AAA', 'BBB', 'CCC', 'DDD'])
+    assert list(keys) == [4, 0, 1, 2, 3]
+
+    reloaded = AssetDimension.load(output_folder)
+    assert list(reloaded.encode(['AAA', 'BBB', 'CCC', 'DDD', 'EEE'], add=False)) == [0, 1, 2, 3, 4]
+    # Listed assets get the latest attributes, BBB keeps its last known ones, EEE has none
+    assert list(reloaded.attribute([0, 1, 3], 'REGION')) == ['BC', 'AB', 'BC']
+    assert pd.isna(reloaded.attribute([4], 'REGION')[0])
+    stored = pd.read_csv(os.path.join(output_folder, ASSET_DIMENSION_FILE))
+    assert list(stored[KEY_COLUMN]) == [0, 1, 2, 3, 4]
+
+def test_encode_decode_round_trip():
+    dimension = AssetDimension()
+    ids = pd.Series(['BBB', 'AAA', np.nan, 'BBB', 'CCC', None])
+    keys = dimension.encode(ids)
+    assert keys.dtype == np.int32
+    assert list(keys) == [0, 1, MISSING_KEY, 0, 2, MISSING_KEY]
+    decoded = dimension.decode(keys)
+    assert list(decoded[[0, 1, 3, 4]]) == ['BBB', 'AAA', 'BBB', 'CCC']
+    assert pd.isna(decoded[2]) and pd.isna(decoded[5])
+    # Unknown ids are not added with add=False
+    assert list(dimension.encode(['ZZZ', 'AAA'], add=False)) == [MISSING_KEY, 1]
+    assert len(dimension) == 3
+
+def test_key_table_join_matches_merge():
+    dimension = AssetDimension()
+    facts = pd.DataFrame({'ASSET_ID': ['IMP1', 'EXP1', 'IMP2', 'IMP1', 'UNMAPPED'], 'volume': [1.0, 2.0, 3.0, 4.0, 5.0]})
+    keys = dimension.encode(facts['ASSET_ID'])
+    mapping = pd.DataFrame({'ASSET_ID': ['EXP1', 'IMP1', 'IMP2', 'OTHER'], 'REGION': ['EXPORT_BC', 'IMPORT_BC', None, 'X'],
+                            'ASSET_TYPE': ['SINK', 'SOURCE', 'SOURCE', 'SINK']})
+
+    joined = dimension.key_table(mapping).join(facts, keys)
+    merged = pd.merge(facts, mapping, how='left', on='ASSET_ID')
+    pd.testing.assert_frame_equal(joined, merged, check_dtype=False)
+
+def test_reordered_file_is_rejected(tmp_path):
+    output_folder = str(tmp_path)
+    load_asset_dimension(output_folder, _asset_list(['AAA', 'BBB', 'CCC']))
+    path = os.path.join(output_folder, ASSET_DIMENSION_FILE)
+    table = pd.read_csv(path)
+    table.iloc[[1, 0, 2]].to_csv(path, index=False)
+    with pytest.raises(ValueError, match='asset_key must run from 0 to 2'):
+        AssetDimension.load(output_folder)
+
+def test_file_lock_waits_for_a_slow_holder(tmp_path, monkeypatch):
+    monkeypatch.setattr(asset_dimension_module, 'LOCK_STALE_SECONDS', 0.5)
+    path = str(tmp_path / 'shared.csv')
+    events = []
+
+    def holder():
+        with file_lock(path):
+            events.append('holder in')
+            # Keep touching the lock like a slow holder that is still alive
+            for _ in range(6):
+                time.sleep(0.1)
+                os.utime(f"{path}.lock")
+            events.append('holder out')
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    while not events:
+        time.sleep(0.01)
+    with file_lock(path):
+        events.append('waiter in')
+    thread.join()
+    assert events == ['holder in', 'holder out', 'waiter in']
+
+def test_file_lock_breaks_an_old_lock(tmp_path, monkeypatch):
+    monkeypatch.setattr(asset_dimension_module, 'LOCK_STALE_SECONDS', 60)
+    path = str(tmp_path / 'shared.csv')
+    with open(f"{path}.lock", 'w'):
+        pass
+    old = time.time() - 120
+    os.utime(f"{path}.lock", (old, old))
+    with file_lock(path):
+        assert os.path.exists(f"{path}.lock")
+    assert not os.path.exists(f"{path}.lock")
@@ -0,0 +1,95 @@
+"""
+Tests for change detection of list endpoints (src/change_detection.py)
+"""
+
+import os
+import json
+
+from src.change_detection import ChangeTracker, content_hash, NOT_MODIFIED
+
+URL = 'https://api.example/assetlist-api/v1/assetlist'
+
+#------------------------------------------------------
+def _payload(assets, timestamp='2024-01-01 00:00:00'):
+    return json.dumps({'timestamp': timestamp, 'return': [{'asset_ID': a} for a in assets]})
+
+def _tracker(tmp_path):
+    tracker = ChangeTracker()
+    tracker.configure(str(tmp_path))
+    output_path = str(tmp_path / 'Asset List' / 'Asset_Lists.csv')
+    api_config = {'category_key': 'Asset_List', 'change_detection': True, 'output_path': output_path}
+    return tracker, api_config, output_path
+
+def _write_output(output_path):
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, 'w') as f:
+        f.write('ASSET_ID\nAAA\n')
+
+def _first_run(tracker, api_config, output_path, headers=None):
+    if headers is None:
+        headers = {'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'}
+    tracker.record_validators(URL, headers)
+    response = (200, _payload(['AAA', 'BBB']))
+    assert tracker.check(api_config, URL, response) == response
+    _write_output(output_path)
+    tracker.commit('Asset_List', output_path)
+
+def test_content_hash_ignores_timestamp_and_key_order():
+    assert content_hash(_payload(['AAA'], '2024-01-01')) == content_hash(_payload(['AAA'], '2024-06-01'))
+    assert content_hash('{"a": 1, "b": 2}') == content_hash('{"b": 2, "a": 1}')
+    assert content_hash(_payload(['AAA'])) != content_hash(_payload(['BBB']))
+
+def test_304_is_unchanged(tmp_path):
+    tracker, api_config, output_path = _tracker(tmp_path)
+    _first_run(tracker, api_config, output_path)
+
+    headers = tracker.request_headers(api_config, URL, {'Accept': 'application/json'})
+    assert headers == {'Accept': 'application/json', 'If-None-Match': '"v1"',
+                       'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT'}
+    assert tracker.check(api_config, URL, (NOT_MODIFIED, '')) == (NOT_MODIFIED, '')
+    assert tracker.is_unchanged('Asset_List')
+
+def test_same_content_200_is_unchanged(tmp_path):
+    tracker, api_config, output_path = _tracker(tmp_path)
+    _first_run(tracker, api_config, output_path, headers={})
+    assert tracker.request_headers(api_config, URL, {}) == {}
+
+    assert tracker.check(api_config, URL, (200, _payload(['AAA', 'BBB'], '2024-02-01'))) == (NOT_MODIFIED, '')
+    assert tracker.is_unchanged('Asset_List')
+    changed = (200, _payload(['AAA', 'CCC']))
+    assert tracker.check(api_config, URL, changed) == changed
+    assert not tracker.is_unchanged('Asset_List')
+
+def test_validators_are_only_stored_after_the_write(tmp_path):
+    tracker, api_config, output_path = _tracker(tmp_path)
+    _write_output(output_path)
+    tracker.record_validators(URL, {'ETag': '"v1"'})
+    tracker.check(api_config, URL, (200, _payload(['AAA'])))
+    # The run failed before commit: the next run must fetch and process the payload again
+    assert tracker.stored('Asset_List') == {}
+    assert tracker.request_headers(api_config, URL, {}) == {}
+    assert tracker.check(api_config, URL, (200, _payload(['AAA']))) == (200, _payload(['AAA']))
+
+    tracker.commit('Asset_List', output_path)
+    assert tracker.stored('Asset_List')[output_path]['content_hash'] == content_hash(_payload(['AAA']))
+    # A second commit without a new response leaves the stored validators alone
+    tracker.commit('Asset_List', output_path)
+    assert list(tracker.stored('Asset_List')) == [output_path]
+
+def test_validators_are_ignored_once_the_output_is_gone(tmp_path):
+    tracker, api_config, output_path = _tracker(tmp_path)
+    _first_run(tracker, api_config, output_path)
+    os.remove(output_path)
+
+    assert tracker.request_headers(api_config, URL, {}) == {}
+    response = (200, _payload(['AAA', 'BBB']))
+    assert tracker.check(api_config, URL, response) == response
+    assert not tracker.is_unchanged('Asset_List')
+
+def test_untracked_endpoints_are_left_alone(tmp_path):
+    tracker, api_config, output_path = _tracker(tmp_path)
+    _first_run(tracker, api_config, output_path)
+    untracked = dict(api_config, change_detection=False)
+    assert tracker.request_headers(untracked, URL, {}) == {}
+    tracker.configure(None)
+    assert tracker.request_headers(api_config, URL, {}) == {}
@@ -0,0 +1,62 @@
+"""
+Tests for the gap repair of stored datasets (src/completeness.py)
+"""
+
+import os
+
+import pandas as pd
+
+from src.asset_dimension import load_asset_dimension
+from src.completeness import find_gaps, merge_hours
+
+MERIT_ORDER_CONFIG = {
+    'category_key': 'Merit_Order_Data',
+    'natural_key': ['begin_dateTime_utc', 'asset_ID', 'block_number'],
+    'column_order': ['begin_dateTime_utc', 'begin_dateTime_mpt', 'asset_ID', 'block_number', 'block_price'],
+    'run_length_store': True,
+}
+
+#------------------------------------------------------
+def _merit_order_rows(hours, price):
+    return pd.DataFrame([{'begin_dateTime_utc': hour, 'begin_dateTime_mpt': hour, 'asset_ID': asset,
+                          'block_number': block, 'block_price': price}
+                         for hour in hours for asset in ['AAA1', 'BBB2'] for block in [0, 1]])
+
+def test_merge_merit_order_window(tmp_path):
+    folder = tmp_path / 'Merit Order Curves'
+    folder.mkdir()
+    path = str(folder / 'merit_order_data_2024.csv')
+    hours = list(pd.date_range('2024-01-01 07:00', periods=48, freq='h').strftime('%Y-%m-%d %H:%M'))
+    stored = _merit_order_rows(hours[:10] + hours[20:], 1.0)
+    stored['asset_key'] = load_asset_dimension(str(tmp_path)).encode(stored['asset_ID'])
+    stored.to_csv(path, index=False)
+    head = open(path, 'rb').read().split(b'\n')[:41]
+
+    merge_hours(path, _merit_order_rows(hours[10:20], 2.0), MERIT_ORDER_CONFIG, 'begin_dateTime_utc')
+
+    merged = pd.read_csv(path)
+    assert len(merged) == 48 * 4
+    assert merged['begin_dateTime_utc'].is_monotonic_increasing
+    assert merged['asset_key'].notna().all()
+    assert (merged.groupby('asset_ID')['asset_key'].nunique() == 1).all()
+    # Rows before the window are copied as they were
+    assert open(path, 'rb').read().split(b'\n')[:41] == head
+    # The run-length store is rebuilt from the repaired file
+    assert os.path.exists(folder / 'merit_order_runs_2024.npz')
+
+def test_repaired_hours_close_the_gap(tmp_path):
+    folder = tmp_path / 'Historical AIL Demand'
+    folder.mkdir()
+    path = str(folder / 'Metered_Demand_2024.csv')
+    mpt = pd.date_range('2024-03-01 00:00', periods=48, freq='h')
+    demand = pd.DataFrame({'begin_datetime_utc': (mpt + pd.Timedelta(hours=7)).strftime('%Y-%m-%d %H:%M'),
+                           'begin_datetime_mpt': mpt.strftime('%Y-%m-%d %H:%M'),
+                           'alberta_internal_load': range(48)})
+    demand.drop(index=range(30, 36)).to_csv(path, index=False)
+
+    report = find_gaps('ail_demand', '2024-03-01', '2024-03-02', base_dir=str(tmp_path))
+    assert len(report['missing_hours']) == 6
+    merge_hours(path, demand.iloc[30:36], {'natural_key': ['begin_datetime_utc']}, 'begin_datetime_utc')
+
+    assert len(find_gaps('ail_demand', '2024-03-01', '2024-03-02', base_dir=str(tmp_path))['missing_hours']) == 0
+    pd.testing.assert_frame_equal(pd.read_csv(path), demand.astype({'alberta_internal_load': 'int64'}))
@@ -0,0 +1,76 @@
+"""
+Tests for the CSD snapshot history (src/csd_poller.py)
+"""
+
+import pandas as pd
+
+from src.csd_poller import CsdSnapshotPoller, read_history, snapshot_at
+
+#------------------------------------------------------
+def _generation(snapshot_utc, rows):
+    return pd.DataFrame({'fuel_type': list(rows), 'maximum_capability': [str(v[0]) for v in rows.values()],
+                         'net_generation': [str(v[1]) for v in rows.values()], 'last_updated_datetime_utc': snapshot_utc})
+
+def _summary(snapshot_utc, load):
+    return pd.DataFrame({'alberta_internal_load': [str(load)], 'last_updated_datetime_utc': [snapshot_utc]})
+
+# COAL never changes, GAS changes, WIND disappears on the first poll of February
+SNAPSHOTS = [
+    ('2024-01-31 23:58', {'COAL': (800, 700), 'GAS': (9000, 6000), 'WIND': (4000, 1200)}, 10000),
+    ('2024-01-31 23:59', {'COAL': (800, 700), 'GAS': (9000, 6100), 'WIND': (4000, 1200)}, 10000),
+    ('2024-02-01 00:00', {'COAL': (800, 700), 'GAS': (9000, 6100)}, 10100),
+    ('2024-02-01 00:01', {'COAL': (800, 700), 'GAS': (9000, 6200)}, 10100),
+]
+
+def _poll_all(output_folder):
+    poller = CsdSnapshotPoller(output_folder)
+    changes = []
+    for snapshot_utc, generation, load in SNAPSHOTS:
+        if snapshot_utc[:7] != poller.month:
+            poller._start_month(snapshot_utc[:7])
+        changes.append((poller.stores['generation'].diff(_generation(snapshot_utc, generation), snapshot_utc),
+                        poller.stores['summary'].diff(_summary(snapshot_utc, load), snapshot_utc)))
+    poller.flush()
+    return changes
+
+def _expected(snapshot_utc, generation):
+    return _generation(snapshot_utc, generation).drop(columns=['last_updated_datetime_utc'])
+
+def _sorted(df):
+    return df.sort_values('fuel_type').reset_index(drop=True)
+
+def test_only_deltas_are_stored(tmp_path):
+    changes = _poll_all(str(tmp_path))
+    # February starts with a keyframe: every row plus the deletion of WIND
+    assert changes == [(3, 1), (1, 0), (3, 1), (1, 0)]
+
+    history = read_history(str(tmp_path), 'generation')
+    assert history[['snapshot_utc', 'op', 'fuel_type']].values.tolist() == [
+        ['2024-01-31 23:58', 'u', 'COAL'], ['2024-01-31 23:58', 'u', 'GAS'], ['2024-01-31 23:58', 'u', 'WIND'],
+        ['2024-01-31 23:59', 'u', 'GAS'],
+        ['2024-02-01 00:00', 'u', 'COAL'], ['2024-02-01 00:00', 'u', 'GAS'], ['2024-02-01 00:00', 'd', 'WIND'],
+        ['2024-02-01 00:01', 'u', 'GAS']]
+    assert 'last_updated_datetime_utc' not in history.columns
+
+def test_snapshot_at_rebuilds_every_snapshot(tmp_path):
+    _poll_all(str(tmp_path))
+    history = read_history(str(tmp_path), 'generation')
+    summary = read_history(str(tmp_path), 'summary')
+    for snapshot_utc, generation, load in SNAPSHOTS:
+        pd.testing.assert_frame_equal(_sorted(snapshot_at(history, ['fuel_type'], snapshot_utc)),
+                                      _sorted(_expected(snapshot_utc, generation)))
+        assert snapshot_at(summary, [], snapshot_utc).to_dict('records') == [{'alberta_internal_load': str(load)}]
+
+def test_monthly_file_is_readable_on_its_own(tmp_path):
+    _poll_all(str(tmp_path))
+    february = read_history(str(tmp_path), 'generation', months=['2024-02'])
+    for snapshot_utc, generation, _ in SNAPSHOTS[2:]:
+        pd.testing.assert_frame_equal(_sorted(snapshot_at(february, ['fuel_type'], snapshot_utc)),
+                                      _sorted(_expected(snapshot_utc, generation)))
+
+def test_restart_continues_from_the_stored_state(tmp_path):
+    _poll_all(str(tmp_path))
+    poller = CsdSnapshotPoller(str(tmp_path))
+    poller._start_month('2024-02')
+    snapshot_utc, generation, _ = SNAPSHOTS[-1]
+    assert poller.stores['generation'].diff(_generation(snapshot_utc, generation), snapshot_utc) == 0
@@ -0,0 +1,74 @@
+"""
+Tests for the time-indexed queries over stored annual partitions (core/data_query.py)
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from core.data_query import DataQuery
+
+#------------------------------------------------------
+def _pool_price(base_dir):
+    # Hourly rows from mid December 2023 to mid January 2024, partitioned by MPT year
+    utc = pd.date_range('2023-12-15 07:00', '2024-01-15 06:00', freq='h')
+    df = pd.DataFrame({'begin_datetime_utc': utc.strftime('%Y-%m-%d %H:%M'),
+                       'begin_datetime_mpt': (utc - pd.Timedelta(hours=7)).strftime('%Y-%m-%d %H:%M'),
+                       'pool_price': np.arange(len(utc)) * 1.5,
+                       'forecast_pool_price': np.arange(len(utc)) * 2.0})
+    folder = os.path.join(base_dir, 'Historical Pool Price')
+    os.makedirs(folder)
+    for year, part in df.groupby(df['begin_datetime_mpt'].str.slice(0, 4)):
+        part.to_csv(os.path.join(folder, f'pool_price_data_{year}.csv'), index=False)
+    return df
+
+def _expected(df, column, start, end, hours=None):
+    keys = df[column]
+    mask = (keys >= start) & (keys <= end)
+    if hours is not None:
+        mask &= keys.str.slice(11, 13).astype(int).isin(list(hours))
+    return df[mask].reset_index(drop=True)
+
+def test_range_across_partitions(tmp_path):
+    df = _pool_price(str(tmp_path))
+    query = DataQuery(base_dir=str(tmp_path))
+    assert [year for year, _ in query.partitions('pool_price')] == [2023, 2024]
+
+    result = query.query('pool_price', '2023-12-30 17:00', '2024-01-02')
+    pd.testing.assert_frame_equal(result, _expected(df, 'begin_datetime_mpt', '2023-12-30 17:00', '2024-01-02 23:59'))
+
+    # A UTC range spills into the next MPT partition
+    result = query.query('pool_price', '2023-12-31 20:00', '2024-01-01 09:00', time_basis='utc')
+    pd.testing.assert_frame_equal(result, _expected(df, 'begin_datetime_utc', '2023-12-31 20:00', '2024-01-01 09:00'))
+
+def test_columns_and_hours(tmp_path):
+    df = _pool_price(str(tmp_path))
+    result = DataQuery(base_dir=str(tmp_path)).query('pool_price', '2023-12-20', '2023-12-22', columns=['pool_price'],
+                                                     hours=range(17, 21))
+    expected = _expected(df, 'begin_datetime_mpt', '2023-12-20 00:00', '2023-12-22 23:59', hours=range(17, 21))
+    assert list(result.columns) == ['begin_datetime_utc', 'begin_datetime_mpt', 'pool_price']
+    assert len(result) == 3 * 4
+    pd.testing.assert_frame_equal(result, expected[list(result.columns)])
+
+def test_ranges_outside_the_stored_rows(tmp_path):
+    _pool_price(str(tmp_path))
+    query = DataQuery(base_dir=str(tmp_path))
+    assert query.query('pool_price', '2023-11-01', '2023-11-30').empty
+    assert query.query('pool_price', '2024-02-01', '2024-02-28').empty
+    assert len(query.query('pool_price', '2024-01-14 23:00', '2024-03-01')) == 1
+
+def test_assets_filter(tmp_path):
+    utc = pd.date_range('2024-01-01 07:00', periods=48, freq='h')
+    df = pd.DataFrame([{'begin_dateTime_utc': t.strftime('%Y-%m-%d %H:%M'),
+                        'begin_dateTime_mpt': (t - pd.Timedelta(hours=7)).strftime('%Y-%m-%d %H:%M'),
+                        'asset_ID': asset, 'block_number': 0, 'block_price': float(i)}
+                       for i, t in enumerate(utc) for asset in ('AAA', 'BBB', 'CCC')])
+    folder = os.path.join(str(tmp_path), 'Merit Order Curves')
+    os.makedirs(folder)
+    df.to_csv(os.path.join(folder, 'merit_order_data_2024.csv'), index=False)
+
+    result = DataQuery(base_dir=str(tmp_path)).query('merit_order', '2024-01-02', '2024-01-02', assets=['AAA', 'CCC'])
+    assert len(result) == 24 * 2
+    assert set(result['asset_ID']) == {'AAA', 'CCC'}
+    assert result['begin_dateTime_mpt'].str.startswith('2024-01-02').all()
@@ -0,0 +1,113 @@
+"""
+Tests for the daily fetch / normalize / write pipeline (src/fetch_pipeline.py)
+"""
+
+import time
+import random
+import datetime
+import threading
+
+import pandas as pd
+import pytest
+
+from src import fetch_pipeline
+from src.fetch_pipeline import run_daily_pipeline
+
+START = datetime.date(2024, 1, 1)
+
+#------------------------------------------------------
+class _FakeApi:
+    """
+    Stand-in for fetch_response / process_response with random delays
+    """
+
+    def __init__(self, seed=0, empty=(), failed=(), broken=()):
+        self.random = random.Random(seed)
+        self.empty = set(empty)
+        self.failed = set(failed)
+        self.broken = set(broken)
+        self.lock = threading.Lock()
+        self.outstanding = 0
+        self.max_outstanding = 0
+
+    def fetch(self, api_config, day, end_date):
+        with self.lock:
+            self.outstanding += 1
+            self.max_outstanding = max(self.max_outstanding, self.outstanding)
+            delay = self.random.uniform(0, 0.02)
+        time.sleep(delay)
+        if day in self.failed:
+            raise ConnectionError('timed out')
+        return 200, str(day)
+
+    def normalize(self, api_config, response):
+        status, response_str = response
+        time.sleep(self.random.uniform(0, 0.005))
+        day = datetime.date.fromisoformat(response_str)
+        if day in self.broken:
+            raise ValueError('bad payload')
+        rows = 0 if day in self.empty else 24
+        return pd.DataFrame({'begin_dateTime_mpt': [f'{day} {hour:02d}:00' for hour in range(rows)]})
+
+    def written(self):
+        with self.lock:
+            self.outstanding -= 1
+
+def _install(monkeypatch, api):
+    monkeypatch.setattr(fetch_pipeline, '_fetch', api.fetch)
+    monkeypatch.setattr(fetch_pipeline, '_normalize', api.normalize)
+
+def _days(count):
+    return [START + datetime.timedelta(days=i) for i in range(count)]
+
+def test_days_are_written_in_order(monkeypatch):
+    api = _FakeApi(seed=1)
+    _install(monkeypatch, api)
+    written = []
+
+    def write(day, df):
+        written.append(day)
+        assert df['begin_dateTime_mpt'].str.startswith(str(day)).all()
+        api.written()
+
+    stats = run_daily_pipeline({}, START, START + datetime.timedelta(days=29), write, fetch_concurrency=6,
+                               normalize_workers=2)
+    assert written == _days(30)
+    assert stats == {'days': 30, 'written': 30, 'failed': [], 'rows': 30 * 24}
+
+def test_days_in_flight_are_bounded(monkeypatch):
+    api = _FakeApi(seed=2)
+    _install(monkeypatch, api)
+
+    def slow_write(day, df):
+        time.sleep(0.01)
+        api.written()
+
+    run_daily_pipeline({}, START, START + datetime.timedelta(days=39), slow_write, fetch_concurrency=8,
+                       normalize_workers=2, queue_size=2, max_in_flight=3)
+    assert api.max_outstanding <= 3
+
+def test_empty_and_failed_days_are_skipped(monkeypatch):
+    days = _days(10)
+    api = _FakeApi(seed=3, empty={days[2]}, failed={days[5]}, broken={days[7]})
+    _install(monkeypatch, api)
+    written = []
+
+    stats = run_daily_pipeline({}, days[0], days[-1], lambda day, df: written.append(day), fetch_concurrency=4)
+    assert written == [day for i, day in enumerate(days) if i not in (2, 5, 7)]
+    assert stats['failed'] == [days[2], days[5], days[7]]
+    assert stats['rows'] == 7 * 24
+
+def test_write_errors_propagate(monkeypatch):
+    api = _FakeApi(seed=4)
+    _install(monkeypatch, api)
+    written = []
+
+    def write(day, df):
+        if day == START + datetime.timedelta(days=3):
+            raise OSError('disk full')
+        written.append(day)
+
+    with pytest.raises(OSError, match='disk full'):
+        run_daily_pipeline({}, START, START + datetime.timedelta(days=19), write, fetch_concurrency=4)
+    assert written == _days(3)
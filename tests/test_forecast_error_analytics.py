@@ -0,0 +1,48 @@
+"""
+Tests for the cached forecast error analytics (src/forecast_error_analytics.py)
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.forecast_error_analytics import ForecastErrorAnalytics, compute_forecast_error_frame
+
+#------------------------------------------------------
+def _pool_prices(start_mpt, hours, seed):
+    mpt = pd.date_range(start_mpt, periods=hours, freq='h')
+    random = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'begin_datetime_utc': (mpt + pd.Timedelta(hours=7)).strftime('%Y-%m-%d %H:%M'),
+        'begin_datetime_mpt': mpt.strftime('%Y-%m-%d %H:%M'),
+        'pool_price': random.uniform(20, 200, hours).round(2),
+        'forecast_pool_price': random.uniform(20, 200, hours).round(2),
+    })
+
+def test_append_first_day_of_year_updates_previous_year(tmp_path):
+    december = _pool_prices('2022-11-20 00:00', 42 * 24, seed=1)
+    january = _pool_prices('2023-01-01 00:00', 24, seed=2)
+    december.to_csv(tmp_path / 'pool_price_data_2022.csv', index=False)
+    analytics = ForecastErrorAnalytics(str(tmp_path))
+    assert analytics.refresh([2022]) == [2022]
+
+    analytics.append_day(january)
+
+    cache_2022 = pd.read_csv(analytics.cache_path(2022))
+    expected = january['forecast_pool_price'].iloc[0] - december['pool_price'].iloc[-1]
+    assert np.isclose(cache_2022['forecast_error'].iloc[-1], expected)
+    assert np.isclose(cache_2022['abs_error'].iloc[-1], abs(expected))
+    assert analytics.stale_years() == []
+
+def test_append_matches_full_recompute(tmp_path):
+    december = _pool_prices('2022-11-20 00:00', 42 * 24, seed=1)
+    january = _pool_prices('2023-01-01 00:00', 48, seed=2)
+    december.to_csv(tmp_path / 'pool_price_data_2022.csv', index=False)
+    analytics = ForecastErrorAnalytics(str(tmp_path))
+    analytics.refresh()
+    analytics.append_day(january.head(24))
+    analytics.append_day(january.tail(24))
+
+    cached = pd.concat([pd.read_csv(analytics.cache_path(year)) for year in (2022, 2023)], ignore_index=True)
+    full = compute_forecast_error_frame(pd.concat([december, january], ignore_index=True))
+    for column in ['rolling_5day_avg', 'rolling_30day_std', 'forecast_error', 'abs_error', 'ape']:
+        np.testing.assert_allclose(cached[column], full[column], rtol=1e-9, equal_nan=True)
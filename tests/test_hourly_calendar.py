@@ -0,0 +1,42 @@
+"""
+Tests for the shared UTC/MPT hourly calendar (src/hourly_calendar.py)
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.hourly_calendar import hourly_calendar, NO_HOUR
+
+#------------------------------------------------------
+def _utc_hour(value):
+    return hourly_calendar.utc_hours([value])[0]
+
+def test_spring_forward_hour_does_not_exist():
+    hours = hourly_calendar.mpt_hours(['2024-03-10 01:00', '2024-03-10 02:00', '2024-03-10 03:00'])
+    assert hours[0] == _utc_hour('2024-03-10 08:00')
+    assert hours[1] == NO_HOUR
+    assert hours[2] == _utc_hour('2024-03-10 09:00')
+
+def test_fall_back_hour_maps_to_its_first_occurrence():
+    hours = hourly_calendar.mpt_hours(['2024-11-03 00:00', '2024-11-03 01:00', '2024-11-03 02:00'])
+    assert list(hours) == [_utc_hour('2024-11-03 06:00'), _utc_hour('2024-11-03 07:00'),
+                           _utc_hour('2024-11-03 09:00')]
+    # Both UTC hours of the repeated wall clock hour show 01:00 MPT
+    wall_clock = hourly_calendar.mpt_of_utc([_utc_hour('2024-11-03 07:00'), _utc_hour('2024-11-03 08:00')])
+    assert list(hourly_calendar.strings(wall_clock)) == ['2024-11-03 01:00', '2024-11-03 01:00']
+
+def test_mpt_of_utc_matches_tz_convert():
+    utc = pd.date_range('2023-01-01 00:00', '2024-12-31 23:00', freq='h')
+    expected = utc.tz_localize('UTC').tz_convert('America/Edmonton').strftime('%Y-%m-%d %H:%M')
+    hours = hourly_calendar.utc_hours(pd.Series(utc.strftime('%Y-%m-%d %H:%M')))
+    assert list(hourly_calendar.strings(hourly_calendar.mpt_of_utc(hours))) == list(expected)
+
+def test_to_datetime_matches_pandas():
+    # Whole hours on the grid, seconds, a missing value, minutes off the grid and a year before it
+    values = pd.Series(['2024-02-29 23:00', '2024-03-01 00:00:00', None, '2024-03-01 00:30', '1999-12-31 23:00'],
+                       name='begin_datetime_mpt')
+    result = hourly_calendar.to_datetime(values)
+    expected = pd.to_datetime(values, format='ISO8601')
+    assert result.name == 'begin_datetime_mpt'
+    np.testing.assert_array_equal(result.to_numpy(dtype='datetime64[ns]'), expected.to_numpy(dtype='datetime64[ns]'))
+    assert hourly_calendar.grid_numbers(values)[2] == NO_HOUR
@@ -0,0 +1,56 @@
+"""
+Tests for the memory-mapped hourly series store (src/hourly_series_store.py)
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.hourly_series_store import HourlySeriesStore, update_hourly_series
+
+API_CONFIG = {'hourly_series_store': True, 'category_key': 'Historical_Pool_Price_Date_And_Range'}
+
+#------------------------------------------------------
+def _pool_price_file(output_folder, year, hours=24 * 20):
+    utc = pd.date_range(f'{year}-01-01 07:00', periods=hours, freq='h')
+    df = pd.DataFrame({'begin_datetime_utc': utc.strftime('%Y-%m-%d %H:%M'),
+                       'begin_datetime_mpt': (utc - pd.Timedelta(hours=7)).strftime('%Y-%m-%d %H:%M'),
+                       'pool_price': np.arange(hours) + year, 'forecast_pool_price': np.arange(hours) * 2.0})
+    path = os.path.join(output_folder, 'Spot_Prices', f'pool_price_data_{year}.csv')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_csv(path, index=False)
+    return df, path
+
+def _write_year(output_folder, year):
+    df, path = _pool_price_file(output_folder, year)
+    return update_hourly_series(API_CONFIG, df, path)
+
+def test_parallel_years_on_a_fresh_store(tmp_path):
+    years = [2020, 2021, 2022, 2023]
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        assert list(pool.map(_write_year, [str(tmp_path)] * len(years), years)) == [24 * 20] * len(years)
+
+    store = HourlySeriesStore(str(tmp_path))
+    for year in years:
+        values, _ = store.slice('pool_price', f'{year}-01-01 07:00', f'{year}-01-21 07:00')
+        np.testing.assert_array_equal(values, np.arange(24 * 20) + year)
+    assert sorted(store.sources('pool_price')) == [f'pool_price_data_{year}.csv' for year in years]
+
+def test_written_files_are_not_reloaded(tmp_path):
+    df, path = _pool_price_file(str(tmp_path), 2024)
+    update_hourly_series(API_CONFIG, df, path)
+
+    store = HourlySeriesStore(str(tmp_path))
+    assert store.populate(['pool_price']) == {'pool_price': []}
+    assert store.populate(['pool_price'], force=True) == {'pool_price': [path]}
+
+def test_first_write_loads_the_whole_file(tmp_path):
+    df, path = _pool_price_file(str(tmp_path), 2024)
+    # Only the last day was just processed, but the store has never seen the file
+    update_hourly_series(API_CONFIG, df.tail(24), path)
+
+    values, flags = HourlySeriesStore(str(tmp_path)).slice('pool_price', '2024-01-01 07:00', '2024-01-21 07:00')
+    np.testing.assert_array_equal(values, df['pool_price'].to_numpy())
+    assert (flags == 1).all()
@@ -0,0 +1,137 @@
+"""
+Tests for the run report spans (src/instrumentation.py)
+"""
+
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from src.instrumentation import RunReport, summarize_run_report, compare_run_reports
+
+#------------------------------------------------------
+def _records_by_stage(report):
+    return {record['stage']: record for record in report.records}
+
+def _write_report(path, records):
+    with open(path, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+
+def _record(stage, category_key, wall_s, rows=None):
+    return {'run_id': 'r', 'stage': stage, 'category_key': category_key, 'window': None, 'parent': None,
+            'wall_s': wall_s, 'bytes': None, 'rows': rows, 'rows_per_s': None,
+            'rss_growth_mb': 0.0, 'process_peak_rss_mb': 100.0, 'started': '2025-01-01T12:00:00'}
+
+def test_nested_spans_record_parent_and_inherit_context():
+    report = RunReport()
+    with report.context(category_key='Merit_Order_Data', window='2024-01-01..2024-12-31'):
+        with report.span('fetch') as fetch:
+            fetch.bytes = 1000
+            with report.span('decode') as decode:
+                decode.rows = 50
+        with report.span('persist', category_key='Override'):
+            pass
+    with report.span('outside'):
+        pass
+
+    records = _records_by_stage(report)
+    # Inner spans finish (and are recorded) first
+    assert [record['stage'] for record in report.records] == ['decode', 'fetch', 'persist', 'outside']
+    assert records['fetch']['parent'] is None
+    assert records['decode']['parent'] == 'fetch'
+    assert records['decode']['category_key'] == 'Merit_Order_Data'
+    assert records['decode']['window'] == '2024-01-01..2024-12-31'
+    assert records['decode']['rows'] == 50
+    assert records['fetch']['bytes'] == 1000
+    assert records['persist']['category_key'] == 'Override'
+    assert records['persist']['parent'] is None
+    assert records['outside']['category_key'] is None
+    assert records['outside']['window'] is None
+
+def test_span_records_rss_growth_next_to_process_peak():
+    report = RunReport()
+    with report.span('first'):
+        pass
+    with report.span('second'):
+        pass
+    for record in report.records:
+        if record['process_peak_rss_mb'] is None:
+            pytest.skip("resource module not available")
+        assert record['rss_growth_mb'] >= 0
+        assert record['rss_growth_mb'] <= record['process_peak_rss_mb']
+        assert 'peak_rss_mb' not in record
+
+def test_context_propagates_into_threads():
+    report = RunReport()
+
+    def _work(day):
+        with report.span('normalize', window=day):
+            pass
+
+    with report.context(category_key='Actual_Demand'):
+        with report.span('fetch'):
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                futures = [executor.submit(contextvars.copy_context().run, _work, f"2024-01-0{i}") for i in range(1, 5)]
+                for future in futures:
+                    future.result()
+        # A thread started without the copied context sees none of it
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(_work, 'bare').result()
+
+    normalize = [record for record in report.records if record['stage'] == 'normalize']
+    threaded = [record for record in normalize if record['window'] != 'bare']
+    assert sorted(record['window'] for record in threaded) == [f"2024-01-0{i}" for i in range(1, 5)]
+    assert all(record['category_key'] == 'Actual_Demand' and record['parent'] == 'fetch' for record in threaded)
+    bare = next(record for record in normalize if record['window'] == 'bare')
+    assert bare['category_key'] is None and bare['parent'] is None
+
+def test_start_writes_jsonl_records(tmp_path):
+    report = RunReport()
+    path = report.start(str(tmp_path), run_id='20250101T120000')
+    assert path.endswith('run_report_20250101T120000.jsonl')
+    with report.context(category_key='Merit_Order_Data'):
+        for _ in range(3):
+            with report.span('fetch') as span:
+                span.rows = 10
+
+    with open(path) as f:
+        lines = [json.loads(line) for line in f]
+    assert lines == report.records
+    assert all(line['run_id'] == '20250101T120000' for line in lines)
+
+    summary = summarize_run_report(path)
+    row = summary.loc[('fetch', 'Merit_Order_Data')]
+    assert row['count'] == 3
+    assert row['rows'] == 30
+    assert row['wall_s'] == pytest.approx(sum(line['wall_s'] for line in lines))
+
+def test_summarize_reads_old_peak_rss_column(tmp_path):
+    record = _record('fetch', 'A', 1.0)
+    record.pop('rss_growth_mb')
+    record['peak_rss_mb'] = record.pop('process_peak_rss_mb')
+    path = str(tmp_path / 'old.jsonl')
+    _write_report(path, [record])
+    summary = summarize_run_report(path)
+    assert summary.loc[('fetch', 'A'), 'process_peak_rss_mb'] == 100.0
+    assert pd.isna(summary.loc[('fetch', 'A'), 'rss_growth_mb'])
+
+def test_compare_run_reports(tmp_path):
+    baseline = str(tmp_path / 'baseline.jsonl')
+    candidate = str(tmp_path / 'candidate.jsonl')
+    _write_report(baseline, [_record('fetch', 'A', 2.0, rows=100), _record('fetch', 'A', 2.0, rows=100),
+                             _record('persist', 'A', 1.0), _record('fetch', 'B', 3.0)])
+    _write_report(candidate, [_record('fetch', 'A', 1.0, rows=100), _record('fetch', 'A', 1.0, rows=100),
+                              _record('persist', 'A', 1.5), _record('decode', 'C', 0.5)])
+
+    comparison = compare_run_reports(baseline, candidate)
+    assert comparison.loc[('fetch', 'A'), 'wall_s_baseline'] == 4.0
+    assert comparison.loc[('fetch', 'A'), 'wall_s_candidate'] == 2.0
+    assert comparison.loc[('fetch', 'A'), 'wall_s_ratio'] == 0.5
+    assert comparison.loc[('fetch', 'A'), 'rows_per_s_candidate'] == 100.0
+    assert comparison.loc[('persist', 'A'), 'wall_s_ratio'] == 1.5
+    # Stages only in one run are kept with the other side missing
+    assert pd.isna(comparison.loc[('fetch', 'B'), 'wall_s_candidate'])
+    assert pd.isna(comparison.loc[('decode', 'C'), 'wall_s_baseline'])
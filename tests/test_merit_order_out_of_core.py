@@ -0,0 +1,113 @@
+"""
+Tests for the out-of-core merit order processing (src/merit_order_out_of_core.py)
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.merit_order_out_of_core import MeritOrderCsvWriter, aggregate_merit_order, export_merit_order, \
+    iter_merit_order_chunks
+
+NATURAL_KEY = ['begin_dateTime_utc', 'asset_ID', 'block_number']
+
+#------------------------------------------------------
+def _day(day, price):
+    hours = pd.date_range(f'2024-01-{day:02d} 07:00', periods=24, freq='h').strftime('%Y-%m-%d %H:%M')
+    rows = [{'begin_dateTime_utc': hour, 'asset_ID': asset, 'block_number': block, 'block_price': price}
+            for hour in hours for asset in ['AAA1', 'BBB2'] for block in [0, 1]]
+    return pd.DataFrame(rows)
+
+def _write(path, days, replace):
+    writer = MeritOrderCsvWriter(str(path), natural_key=NATURAL_KEY, memory_budget_mb=1)
+    for day, price in days:
+        writer.append(_day(day, price))
+    return writer.close(replace=replace)
+
+def test_partial_year_keeps_stored_days(tmp_path):
+    path = tmp_path / 'merit_order_data_2024.csv'
+    _write(path, [(1, 10.0), (2, 20.0), (3, 30.0)], replace=True)
+
+    _write(path, [(2, 25.0)], replace=False)
+
+    stored = pd.read_csv(path)
+    assert len(stored) == 3 * 24 * 4
+    assert not stored.duplicated(NATURAL_KEY).any()
+    assert stored['begin_dateTime_utc'].is_monotonic_increasing
+    # Days start at 07:00 UTC
+    days = (pd.to_datetime(stored['begin_dateTime_utc']) - pd.Timedelta(hours=7)).dt.day
+    assert stored.groupby(days)['block_price'].unique().map(list).to_dict() == {1: [10.0], 2: [25.0], 3: [30.0]}
+    assert not (tmp_path / 'merit_order_data_2024.csv.partial').exists()
+
+def test_partial_year_appends_new_days(tmp_path):
+    path = tmp_path / 'merit_order_data_2024.csv'
+    _write(path, [(1, 10.0)], replace=True)
+    first = path.read_bytes()
+
+    _write(path, [(2, 20.0)], replace=False)
+
+    # The stored day is copied byte for byte ahead of the new one
+    assert path.read_bytes().startswith(first)
+    assert len(pd.read_csv(path)) == 2 * 24 * 4
+
+def test_whole_year_replaces_file(tmp_path):
+    path = tmp_path / 'merit_order_data_2024.csv'
+    _write(path, [(1, 10.0), (2, 20.0)], replace=True)
+
+    _write(path, [(2, 25.0)], replace=True)
+
+    assert set(pd.read_csv(path)['block_price']) == {25.0}
+
+def _partitions(directory, years=(2023, 2024), hours=300):
+    # About 12 000 rows a year, several chunks with a 1 MB budget
+    rng = np.random.default_rng(11)
+    frames = []
+    for year in years:
+        times = pd.date_range(f'{year}-03-01 07:00', periods=hours, freq='h').strftime('%Y-%m-%d %H:%M')
+        df = pd.DataFrame([{'begin_dateTime_utc': t, 'asset_ID': f'A{asset:03d}', 'block_number': block}
+                           for t in times for asset in range(20) for block in range(2)])
+        df['block_price'] = rng.uniform(-50, 999, len(df)).round(2)
+        df['available_MW'] = rng.integers(0, 200, len(df))
+        df.loc[rng.random(len(df)) < 0.02, 'block_price'] = np.nan
+        df.to_csv(directory / f'merit_order_data_{year}.csv', index=False)
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+def test_chunks_cover_every_row(tmp_path):
+    data = _partitions(tmp_path)
+    chunks = list(iter_merit_order_chunks(str(tmp_path), memory_budget_mb=1))
+    assert len(chunks) > 4
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), data, check_dtype=False)
+    # Partition pruning and projection
+    chunks = list(iter_merit_order_chunks(str(tmp_path), years=[2024], columns=['asset_ID'], memory_budget_mb=1))
+    assert sum(len(c) for c in chunks) == len(data) // 2
+    assert all(list(c.columns) == ['asset_ID'] for c in chunks)
+
+def test_aggregate_matches_groupby(tmp_path):
+    data = _partitions(tmp_path)
+    # Few groups, and one group per hour and asset, where the partials are folded together several times
+    for group_by in (['asset_ID', 'block_number'], ['begin_dateTime_utc', 'asset_ID']):
+        result = aggregate_merit_order(str(tmp_path), group_by, ['block_price', 'available_MW'], memory_budget_mb=1)
+        grouped = data.groupby(group_by)
+        for column in ('block_price', 'available_MW'):
+            expected = grouped[column].agg(['sum', 'count', 'min', 'max', 'mean']).add_prefix(f'{column}_')
+            pd.testing.assert_frame_equal(result[group_by + list(expected.columns)], expected.reset_index(),
+                                          check_dtype=False)
+
+def test_aggregate_with_filters_and_predicate(tmp_path):
+    data = _partitions(tmp_path)
+    result = aggregate_merit_order(str(tmp_path), 'asset_ID', 'available_MW', aggregations=('sum', 'mean'),
+                                   years=[2023], filters={'block_number': 1},
+                                   predicate=lambda chunk: chunk['asset_ID'] < 'A010', memory_budget_mb=1)
+    selected = data[data['begin_dateTime_utc'].str.startswith('2023') & (data['block_number'] == 1)
+                    & (data['asset_ID'] < 'A010')]
+    expected = selected.groupby('asset_ID')['available_MW'].agg(['sum', 'mean']).add_prefix('available_MW_').reset_index()
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+def test_export_writes_the_filtered_rows(tmp_path):
+    data = _partitions(tmp_path)
+    output_path = tmp_path / 'export' / 'A005.csv'
+    rows = export_merit_order(str(tmp_path), str(output_path), columns=['begin_dateTime_utc', 'block_price'],
+                              filters={'asset_ID': 'A005'}, memory_budget_mb=1)
+    expected = data.loc[data['asset_ID'] == 'A005', ['begin_dateTime_utc', 'block_price']].reset_index(drop=True)
+    assert rows == len(expected)
+    pd.testing.assert_frame_equal(pd.read_csv(output_path), expected)
@@ -0,0 +1,75 @@
+"""
+Tests for the run-length encoded merit order store (src/merit_order_runs.py)
+"""
+
+import io
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.merit_order_runs import (MeritOrderRunStore, encode_merit_order_partition, is_encoded, runs_path_for,
+                                  update_merit_order_runs)
+
+SORT_COLUMNS = ['begin_dateTime_utc', 'asset_ID', 'block_number']
+
+#------------------------------------------------------
+def _merit_order_csv(path, hours=72, seed=0):
+    random = np.random.default_rng(seed)
+    utc = pd.date_range('2024-03-09 07:00', periods=hours, freq='h')
+    rows = []
+    for hour in utc:
+        for asset in ['AAA1', 'BBB2', 'CCC3']:
+            for block in range(3):
+                # Some blocks are not offered in some hours
+                if random.random() < 0.1:
+                    continue
+                rows.append({'begin_dateTime_utc': hour.strftime('%Y-%m-%d %H:%M'),
+                             'begin_dateTime_mpt': (hour - pd.Timedelta(hours=7)).strftime('%Y-%m-%d %H:%M'),
+                             'asset_ID': asset, 'block_number': block,
+                             # Prices change every few hours, so most hours repeat the previous offer
+                             'block_price': float(block * 25 + (hour.hour // 6) * random.integers(0, 2)),
+                             'available_MW': random.choice(['10', '12.5', ''])})
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+def _sorted(df):
+    # Decoded values are typed like pd.read_csv, so both sides are compared as written to csv
+    df = pd.read_csv(io.StringIO(df.to_csv(index=False)))
+    return df.sort_values(SORT_COLUMNS, kind='stable').reset_index(drop=True)
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'merit_order_data_2024.csv')
+    _merit_order_csv(path)
+    stats = encode_merit_order_partition(path)
+
+    original = pd.read_csv(path)
+    decoded = MeritOrderRunStore(runs_path_for(path)).read()
+    assert stats['rows'] == len(original)
+    assert stats['runs'] < len(original) * (len(original.columns) - 4)
+    pd.testing.assert_frame_equal(_sorted(decoded), _sorted(original))
+
+def test_stack_at_one_hour(tmp_path):
+    path = str(tmp_path / 'merit_order_data_2024.csv')
+    _merit_order_csv(path)
+    encode_merit_order_partition(path)
+
+    original = pd.read_csv(path)
+    hour = original['begin_dateTime_utc'].iloc[100]
+    stack = MeritOrderRunStore(runs_path_for(path)).stack_at(hour)
+    pd.testing.assert_frame_equal(_sorted(stack), _sorted(original[original['begin_dateTime_utc'] == hour]))
+
+def test_unchanged_file_is_not_encoded_again(tmp_path):
+    path = str(tmp_path / 'merit_order_data_2024.csv')
+    _merit_order_csv(path)
+    api_config = {'run_length_store': True}
+
+    assert update_merit_order_runs({'run_length_store': False}, path) is None
+    assert update_merit_order_runs(api_config, path) is not None
+    assert is_encoded(path)
+    assert update_merit_order_runs(api_config, path) is None
+
+    _merit_order_csv(path, hours=96)
+    os.utime(path, (time.time() + 5, time.time() + 5))
+    assert not is_encoded(path)
+    assert update_merit_order_runs(api_config, path)['rows'] == len(pd.read_csv(path))
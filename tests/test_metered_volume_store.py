@@ -0,0 +1,72 @@
+"""
+Tests for the sparse metered volume store (src/metered_volume_store.py)
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.asset_dimension import AssetDimension, KEY_COLUMN
+from src.metered_volume_store import SparseMeteredVolumeBuilder, SparseMeteredVolumes
+from src.utilities import reshape_data
+
+CLASSES = {'IMPORTER': ['BC1', 'MT1', 'SK1'], 'IPP': ['G001', 'G002']}
+
+#------------------------------------------------------
+def _day(day, rng, absent=()):
+    utc = pd.date_range(f'{day} 07:00', periods=24, freq='h')
+    rows = []
+    for asset_class, assets in CLASSES.items():
+        for asset in assets:
+            if asset in absent:
+                continue
+            # Mostly zeros, some readings and a few missing hours
+            values = np.where(rng.random(24) < 0.7, 0.0, rng.integers(1, 500, 24).astype(float))
+            values[rng.random(24) < 0.1] = np.nan
+            rows.append(pd.DataFrame({'begin_date_utc': utc.strftime('%Y-%m-%d %H:%M'),
+                                      'begin_date_mpt': (utc - pd.Timedelta(hours=7)).strftime('%Y-%m-%d %H:%M'),
+                                      'asset_ID': asset, 'asset_class': asset_class, 'metered_volume': values}))
+    return pd.concat(rows, ignore_index=True)
+
+def _build(days):
+    dimension = AssetDimension()
+    builder = SparseMeteredVolumeBuilder()
+    for df in days:
+        builder.append(df.assign(**{KEY_COLUMN: dimension.encode(df['asset_ID'])}))
+    return builder.build(), dimension
+
+def _days():
+    rng = np.random.default_rng(7)
+    # MT1 does not report on the second day, G002 only on the third
+    return [_day('2024-03-01', rng, absent=('G002',)), _day('2024-03-02', rng, absent=('MT1', 'G002')),
+            _day('2024-03-03', rng)]
+
+def test_wide_matches_reshape_data():
+    days = _days()
+    sparse, dimension = _build(days)
+    combined = pd.concat(days, ignore_index=True)
+    for asset_class in CLASSES:
+        expected = reshape_data(combined[combined['asset_class'] == asset_class])
+        expected.columns.name = None
+        pd.testing.assert_frame_equal(sparse.wide(asset_class, dimension), expected, check_dtype=False)
+
+def test_readings_are_the_non_zero_melt(tmp_path):
+    days = _days()
+    sparse, dimension = _build(days)
+    path = str(tmp_path / 'metered_volumes_sparse_2024.npz')
+    sparse.save(path)
+    sparse = SparseMeteredVolumes.load(path)
+
+    combined = pd.concat(days, ignore_index=True)
+    importer = combined[(combined['asset_class'] == 'IMPORTER') & (combined['metered_volume'] > 0)]
+    expected = importer.sort_values(['asset_ID', 'begin_date_utc'])
+    readings = sparse.readings('IMPORTER', dimension)
+    assert list(readings['ASSET_ID']) == list(expected['asset_ID'])
+    assert list(readings['begin_date_utc']) == list(expected['begin_date_utc'])
+    np.testing.assert_array_equal(readings['metered_volume'], expected['metered_volume'])
+
+    stats = sparse.stats()
+    assert stats['nonzero'] == int((combined['metered_volume'] > 0).sum())
+    # Cells of the wide matrices: hours with at least one reading x assets of the class
+    observed = combined.dropna(subset=['metered_volume'])
+    assert stats['cells'] == sum(group['begin_date_utc'].nunique() * group['asset_ID'].nunique()
+                                 for _, group in observed.groupby('asset_class'))
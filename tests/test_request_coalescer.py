@@ -0,0 +1,115 @@
+"""
+Tests for request coalescing (src/request_coalescer.py)
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.request_coalescer import RequestCoalescer
+
+URL = 'https://api.example/report/v1/csd/summary/current'
+GROUP = ['Supply_Demand_Data_A', 'Supply_Demand_Data_B', 'Supply_Demand_Data_C']
+
+#------------------------------------------------------
+def _config(category_key):
+    return {'category_key': category_key, 'request_group': GROUP}
+
+class _Request:
+    """
+    Fake request callable that counts its calls, optionally waiting for joiners first
+    """
+
+    def __init__(self, response=(200, '{"ok": true}'), coalescer=None, joiners=0, error=None):
+        self.response = response
+        self.coalescer = coalescer
+        self.joiners = joiners
+        self.error = error
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        # Hold the request until the other callers are waiting on it
+        deadline = time.monotonic() + 5
+        while self.joiners and time.monotonic() < deadline:
+            in_flight = self.coalescer._in_flight.get(URL)
+            if in_flight is not None and len(in_flight['joined']) >= self.joiners:
+                break
+            time.sleep(0.005)
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+def _fetch_all(coalescer, request, category_keys):
+    with ThreadPoolExecutor(max_workers=len(category_keys)) as pool:
+        futures = [pool.submit(coalescer.fetch, URL, _config(key), request) for key in category_keys]
+        return [future.result() for future in futures]
+
+def test_identical_requests_in_flight_share_one_call():
+    coalescer = RequestCoalescer()
+    keys = [f'Endpoint_{i}' for i in range(6)]
+    request = _Request(coalescer=coalescer, joiners=len(keys) - 1)
+    assert _fetch_all(coalescer, request, keys) == [request.response] * len(keys)
+    assert request.calls == 1
+    assert coalescer.requests == 1 and coalescer.coalesced == len(keys) - 1
+    assert coalescer._in_flight == {}
+
+def test_exception_reaches_every_waiter():
+    coalescer = RequestCoalescer()
+    keys = ['Endpoint_0', 'Endpoint_1', 'Endpoint_2']
+    request = _Request(coalescer=coalescer, joiners=len(keys) - 1, error=ConnectionError('reset'))
+    with ThreadPoolExecutor(max_workers=len(keys)) as pool:
+        futures = [pool.submit(coalescer.fetch, URL, _config(key), request) for key in keys]
+        for future in futures:
+            with pytest.raises(ConnectionError, match='reset'):
+                future.result()
+    assert request.calls == 1
+    # The failed request is not remembered, the next caller tries again
+    retry = _Request()
+    assert coalescer.fetch(URL, _config('Endpoint_0'), retry) == retry.response
+    assert retry.calls == 1
+
+def test_shared_response_is_dropped_after_the_last_consumer():
+    coalescer = RequestCoalescer()
+    coalescer.start(GROUP + ['Pool_Price'])
+    request = _Request()
+    assert coalescer.fetch(URL, _config(GROUP[0]), request) == request.response
+    assert coalescer.fetch(URL, _config(GROUP[1]), request) == request.response
+    assert URL in coalescer._shared
+    assert coalescer.fetch(URL, _config(GROUP[2]), request) == request.response
+    assert request.calls == 1
+    assert coalescer._shared == {}
+
+    # A later run fetches again
+    coalescer.fetch(URL, _config(GROUP[0]), request)
+    assert request.calls == 2
+    coalescer.clear()
+    assert coalescer._shared == {}
+
+def test_waiters_are_not_counted_as_consumers():
+    coalescer = RequestCoalescer()
+    coalescer.start(GROUP)
+    request = _Request(coalescer=coalescer, joiners=1)
+    _fetch_all(coalescer, request, GROUP[:2])
+    # Only the endpoint that was not waiting still has to pick the response up
+    assert coalescer._shared[URL]['consumers'] == {GROUP[2]}
+    coalescer.fetch(URL, _config(GROUP[2]), request)
+    assert request.calls == 1 and coalescer._shared == {}
+
+def test_non_200_responses_are_not_shared():
+    coalescer = RequestCoalescer()
+    coalescer.start(GROUP)
+    failed = _Request(response=(500, 'error'))
+    assert coalescer.fetch(URL, _config(GROUP[0]), failed) == (500, 'error')
+    assert coalescer._shared == {}
+    ok = _Request()
+    assert coalescer.fetch(URL, _config(GROUP[1]), ok) == ok.response
+    assert ok.calls == 1
+    # Nothing is kept outside a run
+    coalescer.clear()
+    coalescer.fetch(URL, _config(GROUP[0]), ok)
+    assert coalescer._shared == {}
@@ -0,0 +1,64 @@
+"""
+Tests for the streaming rolling statistics (src/rolling_stats.py)
+"""
+
+import numpy as np
+import pandas as pd
+
+from src import rolling_stats
+from src.rolling_stats import StreamingRollingStats, RollingWindow
+
+WINDOWS = {'6h': 6, '1day': 24}
+
+#------------------------------------------------------
+def _prices(hours=400, seed=5):
+    rng = np.random.default_rng(seed)
+    utc = pd.date_range('2024-01-01 07:00', periods=hours, freq='h')
+    prices = pd.Series(rng.uniform(0, 300, hours).round(2), index=utc)
+    prices[rng.random(hours) < 0.05] = np.nan
+    # Hours that never arrive, including a gap longer than both windows
+    missing = (rng.random(hours) < 0.1) | ((np.arange(hours) >= 200) & (np.arange(hours) < 230))
+    return prices[~missing]
+
+def _expected(prices, label):
+    rolling = prices.rolling(f'{WINDOWS[label]}h')
+    return rolling.mean(), rolling.std()
+
+def test_matches_pandas_rolling():
+    prices = _prices()
+    stats = StreamingRollingStats(WINDOWS)
+    results = [stats.update(hour.strftime('%Y-%m-%d %H:%M'), price) for hour, price in prices.items()]
+
+    for label in WINDOWS:
+        mean, std = _expected(prices, label)
+        np.testing.assert_allclose([r[f'rolling_{label}_avg'] for r in results], mean.to_numpy(), rtol=1e-9)
+        np.testing.assert_allclose([r[f'rolling_{label}_std'] for r in results], std.to_numpy(), rtol=1e-7,
+                                   atol=1e-9)
+
+def test_update_from_frame_and_periodic_recompute(monkeypatch):
+    monkeypatch.setattr(rolling_stats, 'RECOMPUTE_INTERVAL', 7)
+    prices = _prices(seed=6)
+    df = pd.DataFrame({'begin_datetime_utc': prices.index.strftime('%Y-%m-%d %H:%M'),
+                       'pool_price': prices.astype(object).where(prices.notna(), '').to_numpy()})
+    result = StreamingRollingStats(WINDOWS).update_from_frame(df)
+    for label in WINDOWS:
+        mean, std = _expected(prices, label)
+        assert np.isclose(result[f'rolling_{label}_avg'], mean.iloc[-1])
+        assert np.isclose(result[f'rolling_{label}_std'], std.iloc[-1])
+
+def test_corrections_and_late_hours():
+    window = RollingWindow(4)
+    for hour, value in enumerate([10.0, np.nan, 30.0, 40.0, 50.0]):
+        window.update(hour, value)
+    # Window holds hours 1-4: nan, 30, 40, 50
+    assert window.avg() == 40.0
+    # The unsettled hour settles
+    window.update(1, 20.0)
+    assert window.avg() == 35.0 and window.count == 4
+    # Hour 0 is outside the window and is ignored
+    window.update(0, 1000.0)
+    assert window.avg() == 35.0
+    assert np.isclose(window.std(), np.std([20.0, 30.0, 40.0, 50.0], ddof=1))
+    # A gap of a whole window empties it
+    window.update(10, 5.0)
+    assert window.avg() == 5.0 and np.isnan(window.std())
@@ -0,0 +1,104 @@
+"""
+Tests for the materialized daily / monthly / annual rollups (src/rollups.py)
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.rollups import RollupStore, ON_PEAK_HOURS
+
+#------------------------------------------------------
+def _pool_price(output_folder, seed=3):
+    # Two months of MPT hours (around the spring DST change) with a few missing prices
+    utc = pd.date_range('2024-02-01 07:00', '2024-04-01 05:00', freq='h')
+    rng = np.random.default_rng(seed)
+    prices = rng.uniform(0, 500, len(utc)).round(2)
+    prices[rng.random(len(utc)) < 0.05] = np.nan
+    df = pd.DataFrame({'begin_datetime_utc': utc.strftime('%Y-%m-%d %H:%M'),
+                       'begin_datetime_mpt': utc.tz_localize('UTC').tz_convert('America/Edmonton').strftime('%Y-%m-%d %H:%M'),
+                       'pool_price': prices, 'forecast_pool_price': prices * 1.1})
+    folder = os.path.join(output_folder, 'Spot_Prices')
+    os.makedirs(folder, exist_ok=True)
+    df.to_csv(os.path.join(folder, 'pool_price_data_2024.csv'), index=False)
+    return df
+
+def _expected(df, length):
+    mpt = pd.to_datetime(df['begin_datetime_mpt'])
+    on_peak = mpt.dt.hour.isin(ON_PEAK_HOURS) & (mpt.dt.dayofweek < 6)
+    grouped = df.groupby(df['begin_datetime_mpt'].str.slice(0, length))
+    price = df['pool_price']
+    return pd.DataFrame({
+        'hours': grouped.size(),
+        'pool_price_mean': grouped['pool_price'].mean(),
+        'pool_price_min': grouped['pool_price'].min(),
+        'pool_price_max': grouped['pool_price'].max(),
+        'pool_price_count': grouped['pool_price'].count(),
+        'pool_price_on_peak_mean': price.where(on_peak).groupby(grouped.ngroup()).mean().values,
+        'pool_price_off_peak_count': price.where(~on_peak).groupby(grouped.ngroup()).count().values,
+    }).rename_axis('period').reset_index()
+
+def _assert_matches(store, df):
+    for level, length in (('daily', 10), ('monthly', 7), ('annual', 4)):
+        table = store.load('pool_price', level)
+        expected = _expected(df, length)
+        pd.testing.assert_frame_equal(table[expected.columns], expected, check_dtype=False)
+
+def test_rollups_match_a_groupby(tmp_path):
+    df = _pool_price(str(tmp_path))
+    store = RollupStore(str(tmp_path))
+    assert store.refresh('pool_price') == [('2024-01-01', '2024-12-31')]
+    _assert_matches(store, df)
+    # The spring DST day has 23 hours
+    assert store.load('pool_price', 'daily', '2024-03-10', '2024-03-10')['hours'].tolist() == [23]
+    # Unchanged files are not rolled up again
+    assert store.refresh('pool_price') == []
+
+def test_range_refresh_matches_a_full_rebuild(tmp_path):
+    _pool_price(str(tmp_path))
+    store = RollupStore(str(tmp_path))
+    store.refresh('pool_price')
+
+    # New prices for a few days in March
+    df = _pool_price(str(tmp_path), seed=4)
+    store.refresh('pool_price', '2024-03-05', '2024-03-08')
+
+    days = store.load('pool_price', 'daily')
+    changed = days['period'].between('2024-03-05', '2024-03-08')
+    expected = _expected(df, 10)
+    pd.testing.assert_frame_equal(days.loc[changed, expected.columns].reset_index(drop=True),
+                                  expected[changed.values].reset_index(drop=True), check_dtype=False)
+
+    # A full rebuild then agrees with the groupby at every level
+    store.clear('pool_price')
+    store.refresh('pool_price')
+    _assert_matches(store, df)
+
+def _year_file(output_folder, year):
+    utc = pd.date_range(f'{year}-01-01 07:00', f'{year + 1}-01-01 06:00', freq='h')
+    df = pd.DataFrame({'begin_datetime_utc': utc.strftime('%Y-%m-%d %H:%M'),
+                       'begin_datetime_mpt': utc.tz_localize('UTC').tz_convert('America/Edmonton').strftime('%Y-%m-%d %H:%M'),
+                       'pool_price': float(year), 'forecast_pool_price': float(year)})
+    df.to_csv(os.path.join(output_folder, 'Spot_Prices', f'pool_price_data_{year}.csv'), index=False)
+
+def _refresh_year(output_folder, year):
+    return RollupStore(output_folder).refresh('pool_price', f'{year}-01-01', f'{year}-12-31')
+
+def test_parallel_year_refreshes_keep_every_year(tmp_path):
+    output_folder = str(tmp_path)
+    os.makedirs(os.path.join(output_folder, 'Spot_Prices'))
+    years = list(range(2015, 2023))
+    for year in years:
+        _year_file(output_folder, year)
+
+    with ProcessPoolExecutor(max_workers=len(years)) as pool:
+        list(pool.map(_refresh_year, [output_folder] * len(years), years))
+
+    store = RollupStore(output_folder)
+    annual = store.load('pool_price', 'annual')
+    assert annual['period'].tolist() == [str(year) for year in years]
+    assert annual['pool_price_mean'].tolist() == [float(year) for year in years]
+    assert len(store.load('pool_price', 'monthly')) == 12 * len(years)
+    assert store.stale_years('pool_price') == []
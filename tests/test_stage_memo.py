@@ -0,0 +1,89 @@
+"""
+Tests for the content-hash memoization of derived datasets (src/stage_memo.py)
+"""
+
+import os
+
+from src.stage_memo import StageMemo, code_hash
+
+#------------------------------------------------------
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
+
+class _Stage:
+    """
+    Stand-in for aggregate_import_exports: concatenates its two inputs
+    """
+
+    def __init__(self, output_folder):
+        self.temp = os.path.join(output_folder, 'temp')
+        self.calls = 0
+
+    def __call__(self, year):
+        self.calls += 1
+        parts = []
+        for name in (f'export_categorized_filtered_sorted_{year}.csv', f'import_categorized_filtered_sorted_{year}.csv'):
+            with open(os.path.join(self.temp, name)) as f:
+                parts.append(f.read())
+        _write(os.path.join(self.temp, f'export_import_summary_{year}.csv'), ''.join(parts).upper())
+        return year
+
+def _run(memo, stage, output_folder, year=2024, params=None):
+    return memo.run('aggregate_import_exports', year, stage, year, params=params,
+                    output_folder=output_folder, year=year)
+
+def _inputs(output_folder, year=2024, export='a\n', import_='b\n'):
+    _write(os.path.join(output_folder, 'temp', f'export_categorized_filtered_sorted_{year}.csv'), export)
+    _write(os.path.join(output_folder, 'temp', f'import_categorized_filtered_sorted_{year}.csv'), import_)
+
+def test_unchanged_stage_is_skipped(tmp_path):
+    output_folder = str(tmp_path)
+    _inputs(output_folder)
+    stage = _Stage(output_folder)
+    memo = StageMemo(output_folder)
+
+    assert _run(memo, stage, output_folder) == 2024
+    assert _run(memo, stage, output_folder) == 2024
+    assert stage.calls == 1
+
+    # Changed parameters and force=True rerun the stage
+    _run(memo, stage, output_folder, params={'threshold': 1})
+    _run(StageMemo(output_folder, force=True), stage, output_folder, params={'threshold': 1})
+    assert stage.calls == 3
+
+def test_changed_input_or_output_reruns_the_stage(tmp_path):
+    output_folder = str(tmp_path)
+    _inputs(output_folder)
+    stage = _Stage(output_folder)
+    memo = StageMemo(output_folder)
+    _run(memo, stage, output_folder)
+
+    _inputs(output_folder, export='c\n')
+    _run(memo, stage, output_folder)
+    assert stage.calls == 2
+
+    os.remove(os.path.join(output_folder, 'temp', 'export_import_summary_2024.csv'))
+    _run(memo, stage, output_folder)
+    assert stage.calls == 3
+    with open(os.path.join(output_folder, 'temp', 'export_import_summary_2024.csv')) as f:
+        assert f.read() == 'C\nB\n'
+
+def test_rewritten_identical_input_is_not_a_change(tmp_path):
+    output_folder = str(tmp_path)
+    _inputs(output_folder)
+    stage = _Stage(output_folder)
+    memo = StageMemo(output_folder)
+    _run(memo, stage, output_folder)
+
+    # An upstream stage reran and wrote the same bytes (new modification time)
+    path = os.path.join(output_folder, 'temp', 'export_categorized_filtered_sorted_2024.csv')
+    _inputs(output_folder)
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10 ** 9))
+    _run(memo, stage, output_folder)
+    assert stage.calls == 1
+
+def test_code_hash_covers_the_module_and_version():
+    assert code_hash(_write) == code_hash(_run)
+    assert code_hash(_write, 1) != code_hash(_write, 2)
@@ -0,0 +1,87 @@
+"""
+Tests for the natural-key upserts (src/storage.py)
+"""
+
+import sqlite3
+
+import pandas as pd
+
+from src.storage import dedupe_frame, upsert_csv, upsert_sqlite
+
+KEY = ['begin_dateTime_utc', 'asset_ID', 'block_number']
+
+#------------------------------------------------------
+def _merit_order(start, hours, price=1.0):
+    times = pd.date_range(start, periods=hours, freq='h').strftime('%Y-%m-%d %H:%M')
+    rows = [{'begin_dateTime_utc': t, 'asset_ID': asset, 'block_number': block, 'block_price': price + block}
+            for t in times for asset in ('AAA', 'BBB') for block in (0, 1)]
+    return pd.DataFrame(rows)
+
+def _read(path):
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+def test_upsert_into_the_middle_copies_head_and_tail(tmp_path):
+    path = str(tmp_path / 'merit_order_2024.csv')
+    stored = _merit_order('2024-01-01 07:00', 72)
+    assert upsert_csv(stored, path, KEY)['rows_total'] == len(stored)
+    with open(path, 'rb') as f:
+        original = f.read().splitlines()
+
+    # Replace a day in the middle, with one new block per hour
+    new = _merit_order('2024-01-02 07:00', 24, price=50.0)
+    extra = new[new['block_number'] == 1].assign(block_number=2)
+    result = upsert_csv(pd.concat([new, extra]), path, KEY)
+
+    assert result['rows_written'] == len(new) + len(extra)
+    assert result['rows_kept'] == len(stored) - len(new)
+    assert result['rows_total'] == len(stored) + len(extra)
+
+    with open(path, 'rb') as f:
+        written = f.read().splitlines()
+    # Rows before and after the window are the original bytes
+    assert written[:1 + 24 * 4] == original[:1 + 24 * 4]
+    assert written[-24 * 4:] == original[-24 * 4:]
+
+    expected = dedupe_frame(pd.concat([stored, new, extra]).astype(str), KEY)
+    expected['block_price'] = expected['block_price'].astype(float).astype(str)
+    actual = _read(path)
+    actual['block_price'] = actual['block_price'].astype(float).astype(str)
+    pd.testing.assert_frame_equal(actual, expected)
+
+def test_repeated_and_appended_windows(tmp_path):
+    path = str(tmp_path / 'merit_order_2024.csv')
+    stored = _merit_order('2024-01-01 07:00', 48)
+    upsert_csv(stored, path, KEY)
+
+    # The same rows again leave the file as it was
+    with open(path, 'rb') as f:
+        before = f.read()
+    upsert_csv(stored.tail(8), path, KEY)
+    with open(path, 'rb') as f:
+        assert f.read() == before
+
+    # The next window is appended after every stored row
+    result = upsert_csv(_merit_order('2024-01-03 07:00', 24), path, KEY)
+    assert result['rows_kept'] == len(stored)
+    assert len(_read(path)) == len(stored) + 24 * 4
+    assert _read(path)['begin_dateTime_utc'].is_monotonic_increasing
+
+    assert upsert_csv(stored.iloc[:0], path, KEY) == {'rows_written': 0, 'rows_kept': None, 'rows_total': None}
+
+def test_new_column_rewrites_every_row(tmp_path):
+    path = str(tmp_path / 'pool_price_2024.csv')
+    stored = pd.DataFrame({'begin_datetime_utc': ['2024-01-01 07:00', '2024-01-01 08:00'], 'pool_price': [1, 2]})
+    upsert_csv(stored, path, ['begin_datetime_utc'])
+    upsert_csv(pd.DataFrame({'begin_datetime_utc': ['2024-01-01 08:00'], 'pool_price': [3], 'forecast_pool_price': [4]}),
+               path, ['begin_datetime_utc'])
+    assert _read(path).to_dict('records') == [
+        {'begin_datetime_utc': '2024-01-01 07:00', 'pool_price': '1', 'forecast_pool_price': ''},
+        {'begin_datetime_utc': '2024-01-01 08:00', 'pool_price': '3', 'forecast_pool_price': '4'}]
+
+def test_upsert_sqlite_replaces_on_the_natural_key():
+    connection = sqlite3.connect(':memory:')
+    upsert_sqlite(_merit_order('2024-01-01 07:00', 2), connection, 'merit_order', KEY)
+    upsert_sqlite(_merit_order('2024-01-01 08:00', 2, price=9.0), connection, 'merit_order', KEY)
+    rows = connection.execute('SELECT begin_dateTime_utc, block_price FROM merit_order '
+                              'WHERE asset_ID = "AAA" AND block_number = 0 ORDER BY 1').fetchall()
+    assert rows == [('2024-01-01 07:00', 1.0), ('2024-01-01 08:00', 9.0), ('2024-01-01 09:00', 9.0)]
@@ -0,0 +1,65 @@
+"""
+Tests for the merit order supply curve engine (src/supply_curve.py)
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.supply_curve import SupplyCurveEngine, to_hour_key, to_hour_keys
+
+H1 = '2024-01-01 07:00'
+H2 = '2024-01-01 08:00'
+
+#------------------------------------------------------
+def _engine():
+    # Blocks out of order, with zero-MW and NaN blocks that must be dropped
+    hours = [H2, H1, H1, H1, H2, H1, H2, H1]
+    prices = [30.0, 50.0, 0.0, 999.0, 10.0, 25.0, 20.0, np.nan]
+    mws = [100.0, 200.0, 500.0, 0.0, 50.0, 300.0, np.nan, 400.0]
+    return SupplyCurveEngine.from_arrays(to_hour_keys(hours), prices, mws)
+
+def test_from_arrays_builds_sorted_stacks_per_hour():
+    engine = _engine()
+    assert list(engine.hours) == [to_hour_key(H1), to_hour_key(H2)]
+    assert list(engine.offsets) == [0, 3, 5]
+    # The cumulative MW restarts at every hour
+    pd.testing.assert_frame_equal(engine.curve(H1), pd.DataFrame({'block_price': [0.0, 25.0, 50.0],
+                                                                   'cumulative_MW': [500.0, 800.0, 1000.0]}),
+                                  check_dtype=False)
+    pd.testing.assert_frame_equal(engine.curve(H2), pd.DataFrame({'block_price': [10.0, 30.0],
+                                                                   'cumulative_MW': [50.0, 150.0]}),
+                                  check_dtype=False)
+
+def test_clearing_price():
+    engine = _engine()
+    assert engine.clearing_price(H1, 500) == 0.0
+    assert engine.clearing_price(H1, 500.5) == 25.0
+    assert engine.clearing_price(H1, 1000) == 50.0
+    assert np.isnan(engine.clearing_price(H1, 1000.1))
+    assert engine.clearing_price(pd.Timestamp(H2), 60) == 30.0
+    with pytest.raises(KeyError):
+        engine.clearing_price('2024-01-01 09:00', 10)
+
+def test_clearing_prices_matches_the_scalar_query():
+    engine = _engine()
+    hours = [H1, H2, '2024-01-01 09:00', H1, to_hour_key(H2)]
+    mws = [700, 150, 10, 5000, 151]
+    result = engine.clearing_prices(hours, mws)
+    np.testing.assert_array_equal(result, [25.0, 30.0, np.nan, np.nan, np.nan])
+
+def test_available_mw_at_price():
+    engine = _engine()
+    assert engine.available_mw_at_price(H1, -1) == 0.0
+    assert engine.available_mw_at_price(H1, 0) == 500.0
+    assert engine.available_mw_at_price(H1, 49.99) == 800.0
+    assert engine.available_mw_at_price(H1, 999) == 1000.0
+    assert engine.available_mw_at_price(H2, 10) == 50.0
+
+def test_save_load_round_trip(tmp_path):
+    engine = _engine()
+    path = engine.save(str(tmp_path / 'curves' / 'supply_curves_2024.npz'))
+    loaded = SupplyCurveEngine.load(path)
+    for name in ('hours', 'offsets', 'prices', 'cum_mw'):
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(engine, name))
+    assert loaded.clearing_price(H1, 700) == 25.0
@@ -0,0 +1,75 @@
+"""
+Tests for the adaptive request window planner (src/window_planner.py)
+"""
+
+import datetime
+import threading
+
+import pandas as pd
+
+from src import window_planner
+from src.window_planner import WindowPlanner, split_range, fetch_range
+
+API_CONFIG = {'data_type': 'time series', 'params': {'startDate': None, 'endDate': None}, 'max_window_days': 30}
+
+#------------------------------------------------------
+def _covered(windows):
+    days = []
+    for start, end in windows:
+        days.extend(pd.date_range(start, end).date)
+    return days
+
+def test_split_range_covers_every_day_once():
+    windows = split_range('2024-01-01', '2024-03-15', 30)
+    assert windows[0] == (datetime.date(2024, 1, 1), datetime.date(2024, 1, 30))
+    assert windows[-1] == (datetime.date(2024, 3, 1), datetime.date(2024, 3, 15))
+    assert all((end - start).days < 30 for start, end in windows)
+    assert _covered(windows) == list(pd.date_range('2024-01-01', '2024-03-15').date)
+
+    assert split_range('2024-01-01', '2024-12-31', None) == [(datetime.date(2024, 1, 1), datetime.date(2024, 12, 31))]
+    assert split_range('2024-01-02', '2024-01-01', 30) == []
+
+def test_planner_shrinks_and_grows_within_the_limit():
+    planner = WindowPlanner(API_CONFIG, target_seconds=10, target_rows=1000)
+    assert planner.window_days == 30
+
+    # Slow responses shrink the window to the target time
+    planner.observe(30, seconds=60, rows=100)
+    assert planner.window_days == 5
+    # Large responses shrink it to the target rows
+    planner.observe(5, seconds=1, rows=2500)
+    assert planner.window_days == 2
+    # Fast responses grow it by at most MAX_GROWTH per batch, up to the endpoint limit
+    planner.observe(2, seconds=0.1, rows=10)
+    assert planner.window_days == 4
+    for _ in range(10):
+        planner.observe(planner.window_days, seconds=0.1, rows=10)
+    assert planner.window_days == 30
+
+def test_fetch_range_splits_and_concatenates(monkeypatch):
+    requests = []
+    lock = threading.Lock()
+
+    def fake_fetch(api_config, window_start, window_end):
+        with lock:
+            requests.append((window_start, window_end))
+        days = pd.date_range(window_start, window_end)
+        return pd.DataFrame({'begin_datetime_utc': days.strftime('%Y-%m-%d')}), 1.0
+
+    monkeypatch.setattr(window_planner, '_fetch_window', fake_fetch)
+    df = fetch_range(API_CONFIG, '2024-01-01', '2024-06-30', max_workers=2, target_seconds=100)
+
+    assert sorted(requests) == split_range('2024-01-01', '2024-06-30', 30)
+    assert list(df['begin_datetime_utc']) == list(pd.date_range('2024-01-01', '2024-06-30').strftime('%Y-%m-%d'))
+
+def test_failed_windows_are_left_out(monkeypatch):
+    def fake_fetch(api_config, window_start, window_end):
+        if window_start.month == 2:
+            return None, 1.0
+        return pd.DataFrame({'day': pd.date_range(window_start, window_end)}), 1.0
+
+    monkeypatch.setattr(window_planner, '_fetch_window', fake_fetch)
+    config = dict(API_CONFIG, max_window_days=31)
+    df = fetch_range(config, '2024-01-01', '2024-03-31', target_seconds=100)
+    assert set(df['day'].dt.month) == {1, 3}
+    assert fetch_range(config, '2024-02-01', '2024-02-20') is None